@@ -0,0 +1,261 @@
+"""
+归档存储模块
+把超过保留期限的作业、留言从数据文件移到按月分区的压缩归档文件中，数据文件只保留近期数据：
+- <数据文件>.archive/<集合名>/YYYY-MM.json.gz   当月的全部记录（gzip压缩的JSON列表）
+- <数据文件>.archive/index.json                 每个月份的记录数、班级/学科计数、ID范围
+
+查询时先根据索引挑出可能命中的月份，只解压这些月份；已解压的月份保存在容量有限的缓存中
+"""
+
+import os
+import gzip
+import json
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import records
+from lazy_store import day_ordinal
+
+ARCHIVE_INDEX_VERSION = 1
+
+# 最多同时保留在内存中的已解压月份数
+DEFAULT_MONTH_CACHE_SIZE = 12
+
+
+def archive_dir(source_path: str) -> str:
+    """获取数据文件对应的归档目录"""
+    return source_path + ".archive"
+
+
+def month_of(timestamp) -> Optional[str]:
+    """取时间戳所在月份 "YYYY-MM"，无法解析时返回None"""
+    ordinal = day_ordinal(timestamp)
+    if not ordinal:
+        return None
+    return date.fromordinal(ordinal).strftime("%Y-%m")
+
+
+def _month_bounds(month: str):
+    """月份的首日、末日序号"""
+    year, month_number = int(month[:4]), int(month[5:7])
+    first = date(year, month_number, 1).toordinal()
+    if month_number == 12:
+        last = date(year + 1, 1, 1).toordinal() - 1
+    else:
+        last = date(year, month_number + 1, 1).toordinal() - 1
+    return first, last
+
+
+class ArchiveStore:
+    """按月分区的归档存储（索引在首次访问时才读取）"""
+
+    def __init__(self, source_path: str, month_cache_size: int = DEFAULT_MONTH_CACHE_SIZE):
+        self.directory = archive_dir(source_path)
+        self.index_file = os.path.join(self.directory, "index.json")
+        self.month_cache_size = month_cache_size
+        self._index = None
+        self._month_cache = OrderedDict()  # {(集合名, 月份): 记录字典列表}
+
+    # ---- 索引 ----
+
+    @property
+    def index(self) -> Dict[str, Any]:
+        """归档索引 {"collections": {集合名: {月份: 月份信息}}}"""
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _load_index(self) -> Dict[str, Any]:
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get("version") == ARCHIVE_INDEX_VERSION:
+                    return index
+                print(f"归档索引版本不匹配，将重新生成: {self.index_file}")
+            except Exception as e:
+                print(f"读取归档索引失败，将重新生成: {e}")
+            return self._rebuild_index()
+        return {"version": ARCHIVE_INDEX_VERSION, "collections": {}}
+
+    def _rebuild_index(self) -> Dict[str, Any]:
+        """根据归档文件重新生成索引"""
+        index = {"version": ARCHIVE_INDEX_VERSION, "collections": {}}
+        if not os.path.isdir(self.directory):
+            return index
+        for collection in os.listdir(self.directory):
+            collection_dir = os.path.join(self.directory, collection)
+            if not os.path.isdir(collection_dir):
+                continue
+            for file_name in sorted(os.listdir(collection_dir)):
+                if file_name.endswith(".json.gz"):
+                    month = file_name[:-len(".json.gz")]
+                    items = self._read_month_file(collection, month)
+                    index["collections"].setdefault(collection, {})[month] = self._describe(items)
+        self._index = index
+        self._write_index()
+        return index
+
+    def _write_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, self.index_file)
+
+    @staticmethod
+    def _describe(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """生成月份信息：记录数、班级/学科计数、ID范围"""
+        classes = {}
+        subjects = {}
+        ids = [item.get("id") for item in items if isinstance(item.get("id"), int)]
+        for item in items:
+            class_name = item.get("class", "")
+            classes[class_name] = classes.get(class_name, 0) + 1
+            if "subject" in item:
+                subjects[item["subject"]] = subjects.get(item["subject"], 0) + 1
+        return {
+            "count": len(items),
+            "classes": classes,
+            "subjects": subjects,
+            "min_id": min(ids, default=0),
+            "max_id": max(ids, default=0)
+        }
+
+    def months(self, collection: str) -> Dict[str, Dict[str, Any]]:
+        """某集合已归档的月份信息"""
+        return self.index["collections"].get(collection, {})
+
+    def count(self, collection: str) -> int:
+        """某集合已归档的记录数"""
+        return sum(info["count"] for info in self.months(collection).values())
+
+    # ---- 月份文件 ----
+
+    def _month_path(self, collection: str, month: str) -> str:
+        return os.path.join(self.directory, collection, f"{month}.json.gz")
+
+    def _read_month_file(self, collection: str, month: str) -> List[Dict[str, Any]]:
+        path = self._month_path(collection, month)
+        if not os.path.exists(path):
+            return []
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            items = json.load(f)
+        # 早期归档的记录没有整数时间戳
+        for item in items:
+            if type(item.get("ts")) is not int:
+                item["ts"], item["timestamp"] = records.normalize_timestamp(item.get("timestamp"))
+        return items
+
+    def _load_month(self, collection: str, month: str) -> List[Dict[str, Any]]:
+        """读取月份记录（带缓存）"""
+        key = (collection, month)
+        items = self._month_cache.get(key)
+        if items is not None:
+            self._month_cache.move_to_end(key)
+            return items
+        items = self._read_month_file(collection, month)
+        self._month_cache[key] = items
+        if len(self._month_cache) > self.month_cache_size:
+            self._month_cache.popitem(last=False)
+        return items
+
+    def _write_month(self, collection: str, month: str, items: List[Dict[str, Any]]):
+        path = self._month_path(collection, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_file = path + ".tmp"
+        with gzip.open(temp_file, 'wt', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False, default=records.json_default)
+        os.replace(temp_file, path)
+        self._month_cache.pop((collection, month), None)
+
+    # ---- 归档与查询 ----
+
+    def archive(self, collection: str, items: List[Any]) -> int:
+        """将记录写入对应月份的归档文件（同一ID已归档时覆盖），返回写入的记录数
+
+        无法解析日期的记录不会归档，调用方应把它们留在数据文件中
+        """
+        by_month = {}
+        for item in items:
+            month = month_of(item.get("timestamp"))
+            if month is not None:
+                by_month.setdefault(month, []).append(item.to_dict() if isinstance(item, records.Record) else dict(item))
+
+        written = 0
+        collection_months = self.index["collections"].setdefault(collection, {})
+        for month, new_items in sorted(by_month.items()):
+            new_ids = {item.get("id") for item in new_items}
+            existing = [item for item in self._read_month_file(collection, month) if item.get("id") not in new_ids]
+            merged = existing + new_items
+            self._write_month(collection, month, merged)
+            collection_months[month] = self._describe(merged)
+            written += len(new_items)
+
+        if by_month:
+            self._write_index()
+        return written
+
+    def query(self, collection: str, class_name: str = None, subject: str = None,
+              since=None, until=None) -> List[Dict[str, Any]]:
+        """按班级、学科、日期范围查询归档记录（按时间倒序）"""
+        since_day = day_ordinal(since) if since else None
+        until_day = day_ordinal(until) if until else None
+
+        results = []
+        for month, info in self.months(collection).items():
+            first, last = _month_bounds(month)
+            if since_day and last < since_day or until_day and first > until_day:
+                continue
+            if class_name and not info["classes"].get(class_name):
+                continue
+            if subject and not info.get("subjects", {}).get(subject):
+                continue
+            for item in self._load_month(collection, month):
+                if class_name and item.get("class") != class_name:
+                    continue
+                if subject and item.get("subject") != subject:
+                    continue
+                if since_day or until_day:
+                    day = day_ordinal(item.get("timestamp"))
+                    if since_day and day < since_day or until_day and day > until_day:
+                        continue
+                results.append(dict(item))
+
+        results.sort(key=lambda x: x.get("ts", 0), reverse=True)
+        return results
+
+    def remove(self, collection: str, record_id) -> bool:
+        """删除归档中的记录，返回是否找到（只打开ID范围覆盖该ID的月份，月份删空时删除月份文件）"""
+        if not isinstance(record_id, int):
+            return False
+        collection_months = self.months(collection)
+        for month, info in list(collection_months.items()):
+            if not info["min_id"] <= record_id <= info["max_id"]:
+                continue
+            items = self._read_month_file(collection, month)
+            remaining = [item for item in items if item.get("id") != record_id]
+            if len(remaining) == len(items):
+                continue
+            if remaining:
+                self._write_month(collection, month, remaining)
+                collection_months[month] = self._describe(remaining)
+            else:
+                os.remove(self._month_path(collection, month))
+                self._month_cache.pop((collection, month), None)
+                del collection_months[month]
+            self._write_index()
+            return True
+        return False
+
+    def get_by_id(self, collection: str, record_id) -> Optional[Dict[str, Any]]:
+        """按ID查找归档记录，只打开ID范围覆盖该ID的月份"""
+        if not isinstance(record_id, int):
+            return None
+        for month, info in self.months(collection).items():
+            if info["min_id"] <= record_id <= info["max_id"]:
+                for item in self._load_month(collection, month):
+                    if item.get("id") == record_id:
+                        return dict(item)
+        return None
@@ -0,0 +1,326 @@
+"""
+备份归档格式模块
+备份的文件按内容切分为数据块，压缩后追加到数据包中，相同的数据块在所有备份之间只保存一份：
+- <备份目录>/packs/<备份名>.pack    一次备份新增的数据块（压缩后依次追加）
+- <备份目录>/chunks.json           数据块索引 {SHA-256: [包名, 偏移, 压缩后长度, 原始长度, 压缩方式]}
+
+删除备份后由collect回收不再引用的数据块：全部失效的数据包直接删除，
+有效内容不到一半的数据包把仍在使用的数据块（不重新压缩）合并写入一个新的数据包后删除。
+
+切分点由内容决定（按行切分，行的CRC32满足条件且数据块达到最小长度时切开），
+在文件中间插入或删除内容只影响附近的数据块，之后的切分点不变，所以每天的备份大部分数据块与前一天相同。
+读取时按文件的数据块列表依次解压，边读边写，不需要把整个文件读入内存。
+"""
+
+import os
+import json
+import lzma
+import zlib
+import hashlib
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Set
+
+PACKS_DIR = "packs"
+CHUNK_INDEX_NAME = "chunks.json"
+
+# 数据块长度：达到最小长度后才考虑切分，超过最大长度时强制切分
+MIN_CHUNK_SIZE = 8 * 1024
+MAX_CHUNK_SIZE = 256 * 1024
+
+# 行的CRC32能被该数整除时作为切分点（JSON数据文件平均约每256行一个切分点）
+BOUNDARY_DIVISOR = 256
+
+# 数据包中有效内容低于该比例时合并
+COMPACT_RATIO = 0.5
+
+# 读取源文件时每次处理的字节数
+READ_BLOCK_SIZE = 1024 * 1024
+
+# 压缩方式："zlib" 较快，"lzma" 压缩率更高；压缩后不比原数据小的数据块不压缩（"raw"）
+DEFAULT_CODEC = "zlib"
+COMPRESSORS = {
+    "zlib": lambda data: zlib.compress(data, 6),
+    "lzma": lambda data: lzma.compress(data, preset=6),
+}
+DECOMPRESSORS = {
+    "zlib": zlib.decompress,
+    "lzma": lzma.decompress,
+    "raw": bytes,
+}
+
+
+def iter_chunks(stream: BinaryIO, min_size: int = MIN_CHUNK_SIZE, max_size: int = MAX_CHUNK_SIZE,
+                divisor: int = BOUNDARY_DIVISOR) -> Iterator[bytes]:
+    """按内容把数据流切分为数据块"""
+    parts = []
+    size = 0
+    pending = b""
+    while True:
+        block = stream.read(READ_BLOCK_SIZE)
+        data = pending + block
+        if block:
+            # 最后一个换行之后的不完整行留到下一次（没有换行的二进制数据超过最大长度时直接切开）
+            end = data.rfind(b"\n") + 1
+            if end == 0 and len(data) >= max_size:
+                end = len(data)
+            data, pending = data[:end], data[end:]
+        else:
+            pending = b""
+
+        lines = data.split(b"\n")
+        last = lines.pop()  # data以换行结尾时为空
+        for line in lines:
+            line += b"\n"
+            while size + len(line) > max_size:
+                take = max_size - size
+                parts.append(line[:take])
+                line = line[take:]
+                yield b"".join(parts)
+                parts, size = [], 0
+            parts.append(line)
+            size += len(line)
+            if size >= min_size and zlib.crc32(line) % divisor == 0:
+                yield b"".join(parts)
+                parts, size = [], 0
+        while last:
+            take = max_size - size
+            parts.append(last[:take])
+            size += len(last[:take])
+            last = last[take:]
+            if size >= max_size:
+                yield b"".join(parts)
+                parts, size = [], 0
+
+        if not block:
+            break
+    if parts:
+        yield b"".join(parts)
+
+
+def hash_file(path: str) -> str:
+    """流式计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def crc32_range(path: str, start: int) -> int:
+    """计算文件从start开始到末尾的CRC32"""
+    crc = 0
+    with open(path, 'rb') as f:
+        f.seek(start)
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+
+class ChunkStore:
+    """备份目录中的数据块（索引在首次访问时才读取）"""
+
+    def __init__(self, directory: str, codec: str = DEFAULT_CODEC):
+        if codec not in COMPRESSORS:
+            raise ValueError(f"不支持的压缩方式: {codec}")
+        self.directory = directory
+        self.codec = codec
+        self.index_file = os.path.join(directory, CHUNK_INDEX_NAME)
+        self._index = None
+
+    @property
+    def index(self) -> Dict[str, List[Any]]:
+        """数据块索引 {SHA-256: [包名, 偏移, 压缩后长度, 原始长度, 压缩方式]}"""
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def _load_index(self) -> Dict[str, List[Any]]:
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"读取数据块索引失败: {e}")
+        return {}
+
+    def write_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.index_file)
+
+    def pack_path(self, pack_name: str) -> str:
+        return os.path.join(self.directory, PACKS_DIR, pack_name + ".pack")
+
+    def writer(self, pack_name: str) -> "PackWriter":
+        """创建向数据包追加数据块的写入器"""
+        return PackWriter(self, pack_name)
+
+    def read(self, chunks: Iterable[str]) -> Iterator[bytes]:
+        """依次读取并解压数据块（校验每个数据块的SHA-256）"""
+        handles = {}
+        try:
+            for sha256 in chunks:
+                pack_name, offset, length, raw_length, codec = self.index[sha256]
+                handle = handles.get(pack_name)
+                if handle is None:
+                    handle = handles[pack_name] = open(self.pack_path(pack_name), 'rb')
+                handle.seek(offset)
+                data = DECOMPRESSORS[codec](handle.read(length))
+                if len(data) != raw_length or hashlib.sha256(data).hexdigest() != sha256:
+                    raise IOError(f"数据块已损坏: {sha256}")
+                yield data
+        finally:
+            for handle in handles.values():
+                handle.close()
+
+    def stored_size(self) -> int:
+        """数据包占用的字节数"""
+        return sum(os.path.getsize(path) for path in self._pack_files().values())
+
+    def _pack_files(self) -> Dict[str, str]:
+        """{包名: 数据包路径}"""
+        packs_dir = os.path.join(self.directory, PACKS_DIR)
+        if not os.path.isdir(packs_dir):
+            return {}
+        return {entry.name[:-len(".pack")]: entry.path for entry in os.scandir(packs_dir)
+                if entry.is_file() and entry.name.endswith(".pack")}
+
+    def collect(self, live: Set[str], compact_ratio: float = COMPACT_RATIO) -> Dict[str, int]:
+        """回收live以外的数据块
+
+        先写入合并后的数据包并更新索引，再删除旧的数据包；中途中断时留下的未被索引引用的数据包在下次回收时删除。
+
+        Returns:
+            Dict[str, int]: {"removed_chunks", "removed_packs", "compacted_packs", "bytes_freed"}
+        """
+        size_before = self.stored_size()
+        index = self.index
+        usage = {}  # 包名 -> [有效字节数, 总字节数]
+        for sha256, (pack_name, _offset, length, _raw_length, _codec) in index.items():
+            pack_usage = usage.setdefault(pack_name, [0, 0])
+            pack_usage[1] += length
+            if sha256 in live:
+                pack_usage[0] += length
+        dead = [sha256 for sha256 in index if sha256 not in live]
+        compact = {pack_name for pack_name, (live_bytes, total) in usage.items()
+                   if 0 < live_bytes < total * compact_ratio}
+
+        for sha256 in dead:
+            del index[sha256]
+        if compact:
+            moving = sorted((entry[0], entry[1], sha256) for sha256, entry in index.items() if entry[0] in compact)
+            writer = self.writer(self._unused_pack_name("gc-" + datetime.now().strftime("%Y%m%d_%H%M%S")))
+            handles = {}
+            try:
+                for pack_name, offset, sha256 in moving:
+                    _pack, _offset, length, raw_length, codec = index[sha256]
+                    handle = handles.get(pack_name)
+                    if handle is None:
+                        handle = handles[pack_name] = open(self.pack_path(pack_name), 'rb')
+                    handle.seek(offset)
+                    writer.append(sha256, handle.read(length), raw_length, codec)
+            except Exception:
+                writer.abort()
+                raise
+            finally:
+                for handle in handles.values():
+                    handle.close()
+            writer.commit()
+        elif dead:
+            self.write_index()
+
+        referenced = {entry[0] for entry in index.values()}
+        removed_packs = 0
+        for pack_name, path in self._pack_files().items():
+            if pack_name not in referenced:
+                os.remove(path)
+                removed_packs += 1
+        return {"removed_chunks": len(dead), "removed_packs": removed_packs, "compacted_packs": len(compact),
+                "bytes_freed": size_before - self.stored_size()}
+
+    def _unused_pack_name(self, name: str) -> str:
+        unique, number = name, 1
+        while os.path.exists(self.pack_path(unique)):
+            number += 1
+            unique = f"{name}_{number}"
+        return unique
+
+
+class PackWriter:
+    """一次备份的数据包写入器：add追加新的数据块，commit校验写入的内容并更新索引，abort丢弃"""
+
+    def __init__(self, store: ChunkStore, pack_name: str):
+        self.store = store
+        self.pack_name = pack_name
+        self.path = store.pack_path(pack_name)
+        self.bytes_written = 0
+        self._file = None
+        self._start = 0
+        self._crc = 0
+        self._new = {}
+
+    def add(self, chunk: bytes) -> Optional[str]:
+        """追加数据块，返回其SHA-256；已有相同数据块时不写入"""
+        sha256 = hashlib.sha256(chunk).hexdigest()
+        if sha256 in self.store.index or sha256 in self._new:
+            return sha256
+
+        codec = self.store.codec
+        data = COMPRESSORS[codec](chunk)
+        if len(data) >= len(chunk):
+            codec, data = "raw", chunk
+        self.append(sha256, data, len(chunk), codec)
+        return sha256
+
+    def append(self, sha256: str, data: bytes, raw_length: int, codec: str):
+        """追加已经压缩的数据块"""
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'ab')
+            self._start = self._file.tell()
+        offset = self._start + self.bytes_written
+        self._file.write(data)
+        self._crc = zlib.crc32(data, self._crc)
+        self.bytes_written += len(data)
+        self._new[sha256] = [self.pack_name, offset, len(data), raw_length, codec]
+
+    def is_new(self, sha256: str) -> bool:
+        """数据块是否由本次写入"""
+        return sha256 in self._new
+
+    def commit(self):
+        """写入磁盘，重新读取比较CRC32，一致后把新数据块加入索引；不一致时丢弃并抛出IOError"""
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        if crc32_range(self.path, self._start) != self._crc:
+            self._truncate()
+            raise IOError(f"写入校验失败: {self.path}")
+        self.store.index.update(self._new)
+        self.store.write_index()
+        self._new = {}
+
+    def abort(self):
+        """丢弃本次写入的数据块"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._new:
+            self._truncate()
+        self._new = {}
+
+    def _truncate(self):
+        if not os.path.exists(self.path):
+            return
+        if self._start:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self._start)
+        else:
+            os.remove(self.path)
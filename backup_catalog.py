@@ -0,0 +1,192 @@
+"""
+备份目录模块
+列出可以用来恢复数据的备份，每个备份附带时间、大小、作业和留言数量、SHA-256：
+- 数据目录中从U盘恢复时留下的带时间戳副本（来自备份索引，见 backup_retention.BackupIndex）
+- U盘备份目录（<U盘>/作业查看器备份/）中各次备份里的数据文件（来自备份清单，见 backup_engine）
+- U盘根目录下的数据文件（见 usb_restore.DATA_FILE_NAMES）
+
+统计记录数需要解析整个JSON，结果按内容哈希缓存在目录文件中；U盘备份目录的清单没有变化时直接沿用上次列出的结果，
+U盘根目录下的文件大小和修改时间没有变化时沿用上次的哈希。所以打开恢复对话框时只解析新出现的备份：
+- <数据目录>/catalog.json   {"version": 1, "counts": {SHA-256: [作业数, 留言数]},
+                             "backup_dirs": {备份目录: {"signature", "entries"}}, "files": {路径: {"signature", "sha256"}}}
+"""
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, Iterator, List, Sequence
+
+import backup_engine
+import backup_retention
+from backup_archive import hash_file
+from usb_restore import DATA_FILE_NAMES
+
+CATALOG_NAME = "catalog.json"
+CATALOG_VERSION = 1
+
+# 备份来源
+SOURCE_LOCAL = "local"            # 数据目录中的带时间戳副本
+SOURCE_USB_BACKUP = "usb_backup"  # U盘备份目录中的备份
+SOURCE_USB_FILE = "usb_file"      # U盘根目录下的数据文件
+
+SOURCE_NAMES = {SOURCE_LOCAL: "本机副本", SOURCE_USB_BACKUP: "U盘备份", SOURCE_USB_FILE: "U盘文件"}
+
+
+def _signature(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BackupCatalog:
+    """数据目录及U盘上可以恢复的备份（目录文件在首次访问时才读取）"""
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self.catalog_file = os.path.join(data_dir, CATALOG_NAME)
+        self._catalog = None
+        self._changed = False
+
+    @property
+    def catalog(self) -> Dict[str, Any]:
+        if self._catalog is None:
+            self._catalog = self._load()
+        return self._catalog
+
+    def _load(self) -> Dict[str, Any]:
+        if os.path.exists(self.catalog_file):
+            try:
+                with open(self.catalog_file, 'r', encoding='utf-8') as f:
+                    catalog = json.load(f)
+                if catalog.get("version") == CATALOG_VERSION:
+                    return catalog
+            except Exception as e:
+                print(f"读取备份目录失败，将重新建立: {e}")
+        return {"version": CATALOG_VERSION, "counts": {}, "backup_dirs": {}, "files": {}}
+
+    def _save(self):
+        try:
+            os.makedirs(self.data_dir, exist_ok=True)
+            temp_file = self.catalog_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.catalog, f, ensure_ascii=False)
+            os.replace(temp_file, self.catalog_file)
+            self._changed = False
+        except OSError as e:
+            print(f"保存备份目录失败: {e}")
+
+    # ---- 列出 ----
+
+    def entries(self, drives: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """列出可以恢复的备份（按时间从新到旧）
+
+        Returns:
+            List[Dict[str, Any]]: [{"id", "source", "location", "name", "file", "time", "size", "sha256",
+            "homeworks", "messages"}]，无法解析的备份作业和留言数量为None
+        """
+        entries = self._local_entries()
+        for drive in drives:
+            entries.extend(self._usb_backup_entries(os.path.join(drive, backup_engine.BACKUP_DIR_NAME)))
+            entries.extend(self._usb_file_entries(drive))
+        for entry in entries:
+            entry["homeworks"], entry["messages"] = self._counts(entry)
+        if self._changed:
+            self._save()
+        entries.sort(key=lambda entry: (entry["time"], entry["id"]), reverse=True)
+        return entries
+
+    def _local_entries(self) -> List[Dict[str, Any]]:
+        return [{"id": f"{SOURCE_LOCAL}:{copy['file']}", "source": SOURCE_LOCAL, "location": self.data_dir,
+                 "name": copy["file"], "file": copy["file"], "time": copy["time"], "size": copy["size"],
+                 "sha256": copy["sha256"]}
+                for copy in backup_retention.BackupIndex(self.data_dir).list()]
+
+    def _usb_backup_entries(self, backup_dir: str) -> List[Dict[str, Any]]:
+        """U盘备份目录中各次备份里的数据文件（只包括备份根目录下的JSON文件，不包括分片、归档等）"""
+        manifest_file = os.path.join(backup_dir, backup_engine.MANIFEST_NAME)
+        try:
+            signature = _signature(manifest_file)
+        except OSError:
+            return []
+        cached = self.catalog["backup_dirs"].get(backup_dir)
+        if cached is None or cached["signature"] != signature:
+            entries = []
+            for backup in backup_engine.BackupEngine(backup_dir).backups():
+                for relative_path, info in backup["files"].items():
+                    if "/" in relative_path or not relative_path.endswith(".json"):
+                        continue
+                    entries.append({"id": f"{SOURCE_USB_BACKUP}:{backup_dir}:{backup['name']}:{relative_path}",
+                                    "source": SOURCE_USB_BACKUP, "location": backup_dir, "name": backup["name"],
+                                    "file": relative_path, "time": backup["time"], "size": info["size"],
+                                    "sha256": info["sha256"]})
+            cached = self.catalog["backup_dirs"][backup_dir] = {"signature": signature, "entries": entries}
+            self._changed = True
+        return [dict(entry) for entry in cached["entries"]]
+
+    def _usb_file_entries(self, drive: str) -> List[Dict[str, Any]]:
+        entries = []
+        for file_name in DATA_FILE_NAMES:
+            path = os.path.join(drive, file_name)
+            try:
+                signature = _signature(path)
+            except OSError:
+                continue
+            cached = self.catalog["files"].get(path)
+            if cached is None or cached["signature"] != signature:
+                try:
+                    cached = self.catalog["files"][path] = {"signature": signature, "sha256": hash_file(path)}
+                except OSError as e:
+                    print(f"读取U盘文件 {path} 时出错: {e}")
+                    continue
+                self._changed = True
+            entries.append({"id": f"{SOURCE_USB_FILE}:{path}", "source": SOURCE_USB_FILE, "location": drive,
+                            "name": file_name, "file": file_name, "time": signature[1] // 10 ** 9,
+                            "size": signature[0], "sha256": cached["sha256"]})
+        return entries
+
+    def _counts(self, entry: Dict[str, Any]):
+        """备份中的作业和留言数量（按内容哈希缓存）"""
+        counts = self.catalog["counts"].get(entry["sha256"])
+        if counts is None:
+            try:
+                data = self.load(entry)
+                counts = [len(data.get("homeworks", [])), len(data.get("messages", []))]
+            except Exception as e:
+                print(f"读取备份 {entry['name']} 失败: {e}")
+                return None, None
+            self.catalog["counts"][entry["sha256"]] = counts
+            self._changed = True
+        return counts[0], counts[1]
+
+    # ---- 读取 ----
+
+    def open(self, entry: Dict[str, Any]) -> Iterator[bytes]:
+        """流式读取备份的内容"""
+        if entry["source"] == SOURCE_USB_BACKUP:
+            for block in backup_engine.BackupEngine(entry["location"]).read(entry["name"], entry["file"]):
+                yield block
+            return
+        with open(os.path.join(entry["location"], entry["file"]), 'rb') as f:
+            for block in iter(lambda: f.read(backup_engine.COPY_BUFFER_SIZE), b""):
+                yield block
+
+    def load(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """读取并解析备份的数据，内容与登记的哈希不一致或不是数据文件时抛出ValueError"""
+        digest = hashlib.sha256()
+        blocks = []
+        for block in self.open(entry):
+            digest.update(block)
+            blocks.append(block)
+        if digest.hexdigest() != entry["sha256"]:
+            raise ValueError(f"备份 {entry['name']} 的内容与登记的哈希不一致")
+        data = json.loads(b"".join(blocks).decode('utf-8'))
+        if not isinstance(data, dict) or not all(isinstance(data.get(key, []), list)
+                                                 for key in ("homeworks", "messages")):
+            raise ValueError(f"备份 {entry['name']} 不是有效的数据文件")
+        return data
+
+    def find(self, entry_id: str, drives: Sequence[str] = ()) -> Dict[str, Any]:
+        """按ID查找备份，没有时返回None"""
+        for entry in self.entries(drives):
+            if entry["id"] == entry_id:
+                return entry
+        return None
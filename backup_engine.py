@@ -0,0 +1,285 @@
+"""
+增量备份模块
+把数据文件及其分片、归档、修订历史备份到U盘等目标目录，按原始字节备份，不解析JSON：
+- <备份目录>/manifest.json        备份清单：每次备份包含的文件及其大小、修改时间、SHA-256、数据块列表
+- <备份目录>/packs/、chunks.json   压缩并去重的数据块（格式见 backup_archive）
+- <备份目录>/objects/<前2位>/<SHA-256>   旧版（清单版本1）按整个文件保存的内容，仍可读取
+
+每次备份时先与上一次备份的清单比较：大小和修改时间都没变的文件直接沿用上次的数据块，不读取文件；
+变化了的文件按内容切分为数据块，只有备份目录中还没有的数据块才压缩写入。
+写入后重新读取数据包比较CRC32，确认写入的内容与读到的源文件一致。
+按保留策略（见 backup_retention）删除较早的备份后回收不再引用的数据块。
+"""
+
+import os
+import json
+import time
+import hashlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from backup_archive import ChunkStore, PackWriter, iter_chunks, hash_file, DEFAULT_CODEC
+from backup_retention import select_retained, DEFAULT_POLICY
+
+MANIFEST_NAME = "manifest.json"
+OBJECTS_DIR = "objects"
+MANIFEST_VERSION = 2
+# 可以读取的清单版本（版本1的文件没有数据块列表，内容在objects目录中）
+SUPPORTED_MANIFEST_VERSIONS = (1, 2)
+
+# U盘上的备份目录名
+BACKUP_DIR_NAME = "作业查看器备份"
+
+# 读写文件时每次处理的字节数
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class BackupEngine:
+    """备份目录中的增量备份（清单在首次访问时才读取）"""
+
+    def __init__(self, directory: str, codec: str = DEFAULT_CODEC):
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, MANIFEST_NAME)
+        self.chunks = ChunkStore(directory, codec)
+        self._manifest = None
+
+    # ---- 清单 ----
+
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        """备份清单 {"version", "backups": [{"name", "time", "files": {相对路径: 文件信息}}]}
+
+        文件信息为 {"size", "mtime_ns", "sha256", "chunks": [数据块SHA-256]}（版本1没有chunks）
+        """
+        if self._manifest is None:
+            self._manifest = self._load_manifest()
+        return self._manifest
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if os.path.exists(self.manifest_file):
+            try:
+                with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get("version") in SUPPORTED_MANIFEST_VERSIONS:
+                    return manifest
+                print(f"备份清单版本不匹配，将重新开始: {self.manifest_file}")
+            except Exception as e:
+                print(f"读取备份清单失败，将重新开始: {e}")
+        return {"version": MANIFEST_VERSION, "backups": []}
+
+    def _write_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        temp_file = self.manifest_file + ".tmp"
+        self.manifest["version"] = MANIFEST_VERSION
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.manifest_file)
+
+    def backups(self) -> List[Dict[str, Any]]:
+        """已有的备份（按时间先后）"""
+        return list(self.manifest["backups"])
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """最近一次备份"""
+        backups = self.manifest["backups"]
+        return backups[-1] if backups else None
+
+    # ---- 内容 ----
+
+    def object_path(self, sha256: str) -> str:
+        """旧版备份中内容对应的文件路径"""
+        return os.path.join(self.directory, OBJECTS_DIR, sha256[:2], sha256)
+
+    def _available(self, entry: Dict[str, Any]) -> bool:
+        """文件信息引用的内容是否都还在备份目录中"""
+        if "chunks" in entry:
+            index = self.chunks.index
+            return all(sha256 in index for sha256 in entry["chunks"])
+        return os.path.exists(self.object_path(entry["sha256"]))
+
+    def _store(self, source: str, writer: PackWriter) -> Dict[str, Any]:
+        """把源文件切分为数据块写入数据包（边读边计算哈希），返回 {"sha256", "size", "chunks", "copied"}
+
+        copied表示是否写入了新的数据块；数据块只有在writer.commit()校验通过后才加入索引。
+        """
+        digest = hashlib.sha256()
+        size = 0
+        chunks = []
+        copied = False
+        with open(source, 'rb') as src:
+            for chunk in iter_chunks(src):
+                digest.update(chunk)
+                size += len(chunk)
+                sha256 = writer.add(chunk)
+                copied = copied or writer.is_new(sha256)
+                chunks.append(sha256)
+        return {"sha256": digest.hexdigest(), "size": size, "chunks": chunks, "copied": copied}
+
+    def backup(self, files: Dict[str, str], name: str = None) -> Dict[str, Any]:
+        """备份一组文件
+
+        Args:
+            files: {备份中的相对路径: 源文件路径}
+            name: 备份名，默认为当前时间 YYYYMMDD_HHMMSS
+
+        Returns:
+            Dict[str, Any]: {"success", "message", "name", "copied", "unchanged", "bytes_copied",
+            "bytes_written", "elapsed"}（bytes_copied为有变化的文件的原始大小，bytes_written为压缩后写入的字节数；
+            内容与上一次备份完全相同时不产生新的备份，name为上一次备份的名称）
+        """
+        start = time.perf_counter()
+        result = {
+            "success": False,
+            "message": "",
+            "name": None,
+            "copied": [],
+            "unchanged": 0,
+            "bytes_copied": 0,
+            "bytes_written": 0,
+            "elapsed": 0.0
+        }
+        previous = self.latest()
+        previous_files = previous["files"] if previous else {}
+        name = self._unique_name(name or datetime.now().strftime("%Y%m%d_%H%M%S"))
+        writer = self.chunks.writer(name)
+
+        entries = {}
+        try:
+            for relative_path, source in sorted(files.items()):
+                stat = os.stat(source)
+                known = previous_files.get(relative_path)
+                if (known is not None and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns
+                        and self._available(known)):
+                    entries[relative_path] = known
+                    result["unchanged"] += 1
+                    continue
+
+                stored = self._store(source, writer)
+                entries[relative_path] = {"size": stored["size"], "mtime_ns": stat.st_mtime_ns,
+                                          "sha256": stored["sha256"], "chunks": stored["chunks"]}
+                if stored["copied"]:
+                    result["copied"].append(relative_path)
+                    result["bytes_copied"] += stored["size"]
+                else:
+                    result["unchanged"] += 1
+            result["bytes_written"] = writer.bytes_written
+            writer.commit()
+        except Exception as e:
+            writer.abort()
+            print(f"备份失败: {e}")
+            result["message"] = f"备份失败: {e}"
+            result["elapsed"] = time.perf_counter() - start
+            return result
+
+        result["success"] = True
+        if previous is not None and self._same_content(previous_files, entries):
+            if previous_files != entries:
+                # 只有修改时间变化：更新清单，下次可以直接跳过这些文件
+                previous["files"] = entries
+                self._write_manifest()
+            result["name"] = previous["name"]
+            result["message"] = "数据没有变化，无需备份"
+        else:
+            self.manifest["backups"].append({"name": name, "time": int(time.time()), "files": entries})
+            self._write_manifest()
+            result["name"] = name
+            result["message"] = (f"备份完成：{len(result['copied'])} 个文件有变化"
+                                 f"（{result['bytes_copied'] / 1024:.1f}KB，压缩后写入 {result['bytes_written'] / 1024:.1f}KB），"
+                                 f"{result['unchanged']} 个文件没有变化")
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    def prune(self, now: float = None, policy=DEFAULT_POLICY) -> Dict[str, Any]:
+        """按保留策略删除较早的备份，并回收不再引用的数据块和旧版对象
+
+        Returns:
+            Dict[str, Any]: {"removed": [备份名], "removed_chunks", "removed_packs", "compacted_packs", "bytes_freed"}
+        """
+        backups = self.manifest["backups"]
+        keep = select_retained([backup["time"] for backup in backups], now, policy)
+        removed = [backup["name"] for backup, kept in zip(backups, keep) if not kept]
+        if removed:
+            self.manifest["backups"] = [backup for backup, kept in zip(backups, keep) if kept]
+            self._write_manifest()
+
+        live_chunks = set()
+        live_objects = set()
+        for backup in self.manifest["backups"]:
+            for entry in backup["files"].values():
+                if "chunks" in entry:
+                    live_chunks.update(entry["chunks"])
+                else:
+                    live_objects.add(entry["sha256"])
+        result = {"removed": removed}
+        result.update(self.chunks.collect(live_chunks))
+
+        objects_dir = os.path.join(self.directory, OBJECTS_DIR)
+        for root, _dirs, names in os.walk(objects_dir):
+            for file_name in names:
+                if file_name not in live_objects:
+                    path = os.path.join(root, file_name)
+                    result["bytes_freed"] += os.path.getsize(path)
+                    os.remove(path)
+        return result
+
+    def _unique_name(self, name: str) -> str:
+        """同一秒内多次备份时在名称后加序号"""
+        unique, index = name, 1
+        while self.find(unique) is not None:
+            index += 1
+            unique = f"{name}_{index}"
+        return unique
+
+    @staticmethod
+    def _same_content(old: Dict[str, Any], new: Dict[str, Any]) -> bool:
+        return old.keys() == new.keys() and all(old[path]["sha256"] == new[path]["sha256"] for path in new)
+
+    def stored_size(self) -> int:
+        """备份目录中内容占用的字节数（数据包和旧版对象，不含清单和索引）"""
+        total = self.chunks.stored_size()
+        objects_dir = os.path.join(self.directory, OBJECTS_DIR)
+        for root, _dirs, names in os.walk(objects_dir):
+            total += sum(os.path.getsize(os.path.join(root, file_name)) for file_name in names)
+        return total
+
+    # ---- 读取 ----
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        """按名称查找备份"""
+        for backup in self.manifest["backups"]:
+            if backup["name"] == name:
+                return backup
+        return None
+
+    def read(self, name: str, relative_path: str) -> Iterator[bytes]:
+        """流式读取备份中的文件（按数据块依次解压）"""
+        backup = self.find(name)
+        if backup is None or relative_path not in backup["files"]:
+            raise FileNotFoundError(f"备份 {name} 中没有 {relative_path}")
+        entry = backup["files"][relative_path]
+        if "chunks" in entry:
+            for block in self.chunks.read(entry["chunks"]):
+                yield block
+            return
+        with open(self.object_path(entry["sha256"]), 'rb') as f:
+            for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+                yield block
+
+    def extract(self, name: str, target_dir: str) -> List[str]:
+        """把备份中的全部文件还原到目标目录，返回还原的相对路径"""
+        backup = self.find(name)
+        if backup is None:
+            raise FileNotFoundError(f"没有名为 {name} 的备份")
+        restored = []
+        for relative_path in backup["files"]:
+            target = os.path.join(target_dir, relative_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temp_file = target + ".tmp"
+            with open(temp_file, 'wb') as f:
+                for block in self.read(name, relative_path):
+                    f.write(block)
+            os.replace(temp_file, target)
+            restored.append(relative_path)
+        return restored
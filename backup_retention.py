@@ -0,0 +1,178 @@
+"""
+备份保留策略模块
+从U盘恢复时在数据目录中留下的带时间戳副本（<文件名>_<YYYYMMDD_HHMMSS>[_序号].json）按保留策略定期清理，
+U盘上的备份目录也使用同一策略（见 backup_engine.BackupEngine.prune）。
+
+保留策略按备份的时间分档，每档按时间段分组，每组只保留最新的一个：
+- 一天以内：每小时一个
+- 一个月以内：每天一个
+- 更早：每月一个
+最近的KEEP_LAST个备份总是保留（刚插拔几次U盘时不会马上合并）。
+分组是嵌套的（小时属于天，天属于月），一个备份只有在整个分组中最新时才保留，所以对清理后的结果再次清理与直接清理原始列表相同。
+
+带时间戳副本的列表保存在索引文件中，列出和清理时不需要扫描目录、计算哈希：
+- <数据目录>/backups.json   {"version": 1, "copies": {文件名主干: [[文件名, 时间戳, 大小, SHA-256], ...]}}（按时间先后）
+索引文件不存在或损坏时扫描一次数据目录重建。
+"""
+
+import os
+import re
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backup_archive import hash_file
+
+INDEX_NAME = "backups.json"
+INDEX_VERSION = 1
+
+# 保留策略：(分组方式, 适用的最大时长秒数)，None表示不限
+DEFAULT_POLICY = (("hour", 24 * 3600), ("day", 31 * 24 * 3600), ("month", None))
+BUCKET_FORMATS = {"hour": "%Y%m%d%H", "day": "%Y%m%d", "month": "%Y%m"}
+
+# 不论时间总是保留的最近备份数
+KEEP_LAST = 3
+
+# 带时间戳副本的文件名
+COPY_PATTERN = re.compile(r"^(?P<stem>.+)_(?P<time>\d{8}_\d{6})(?:_\d+)?\.json$")
+COPY_TIME_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def select_retained(times: Sequence[float], now: float = None,
+                    policy: Sequence[Tuple[str, Optional[int]]] = DEFAULT_POLICY,
+                    keep_last: int = KEEP_LAST) -> List[bool]:
+    """按保留策略选出要保留的备份
+
+    Args:
+        times: 各备份的时间戳（按时间先后）
+        now: 当前时间，默认为 time.time()
+
+    Returns:
+        List[bool]: 与times对应，True表示保留
+    """
+    now = time.time() if now is None else now
+    keep = [False] * len(times)
+    seen = {bucket: set() for bucket, _max_age in policy}
+    for position in range(len(times) - 1, -1, -1):
+        moment = datetime.fromtimestamp(times[position])
+        keys = {bucket: moment.strftime(BUCKET_FORMATS[bucket]) for bucket in seen}
+        age = now - times[position]
+        for bucket, max_age in policy:
+            if max_age is None or age <= max_age:
+                # 只保留所在分组中最新的一个（与更新的备份属于哪一档无关，保证再次清理时结果不变）
+                keep[position] = keys[bucket] not in seen[bucket]
+                break
+        for bucket, key in keys.items():
+            seen[bucket].add(key)
+    for position in range(max(0, len(times) - max(1, keep_last)), len(times)):
+        keep[position] = True
+    return keep
+
+
+class BackupIndex:
+    """数据目录中带时间戳副本的索引（在首次访问时才读取）"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_file = os.path.join(directory, INDEX_NAME)
+        self._copies = None
+
+    @property
+    def copies(self) -> Dict[str, List[List[Any]]]:
+        """{文件名主干: [[文件名, 时间戳, 大小, SHA-256], ...]}"""
+        if self._copies is None:
+            self._copies = self._load()
+        return self._copies
+
+    def _load(self) -> Dict[str, List[List[Any]]]:
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get("version") == INDEX_VERSION:
+                    return index["copies"]
+                print(f"备份索引版本不匹配，将重新扫描: {self.index_file}")
+            except Exception as e:
+                print(f"读取备份索引失败，将重新扫描: {e}")
+        copies = self._scan()
+        self._copies = copies
+        self.save()
+        return copies
+
+    def _scan(self) -> Dict[str, List[List[Any]]]:
+        """扫描数据目录中的带时间戳副本"""
+        copies = {}
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return copies
+        for name in names:
+            match = COPY_PATTERN.match(name)
+            if match is None:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                created = datetime.strptime(match.group("time"), COPY_TIME_FORMAT).timestamp()
+                copies.setdefault(match.group("stem"), []).append(
+                    [name, int(created), os.path.getsize(path), hash_file(path)])
+            except (OSError, ValueError) as e:
+                print(f"读取备份副本 {path} 时出错: {e}")
+        for entries in copies.values():
+            entries.sort(key=lambda entry: (entry[1], entry[0]))
+        return copies
+
+    def save(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            temp_file = self.index_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"version": INDEX_VERSION, "copies": self.copies}, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+        except OSError as e:
+            print(f"保存备份索引失败: {e}")
+
+    def add(self, stem: str, name: str, created: float, size: int, sha256: str):
+        """登记新的副本（调用save后写入索引文件）"""
+        entries = self.copies.setdefault(stem, [])
+        entries.append([name, int(created), size, sha256])
+        if len(entries) > 1 and entries[-2][1] > entries[-1][1]:
+            entries.sort(key=lambda entry: (entry[1], entry[0]))
+
+    def find(self, stem: str, size: int, sha256: str) -> Optional[str]:
+        """内容相同的副本的路径，没有时（包括已被手动删除）返回None"""
+        for name, _created, copy_size, copy_hash in self.copies.get(stem, []):
+            path = os.path.join(self.directory, name)
+            if copy_size == size and copy_hash == sha256 and os.path.exists(path):
+                return path
+        return None
+
+    def list(self, stem: str = None) -> List[Dict[str, Any]]:
+        """已有的副本（按时间先后）"""
+        stems = [stem] if stem is not None else sorted(self.copies)
+        return [{"file": name, "stem": copy_stem, "time": created, "size": size, "sha256": sha256}
+                for copy_stem in stems for name, created, size, sha256 in self.copies.get(copy_stem, [])]
+
+    def prune(self, now: float = None, policy: Sequence[Tuple[str, Optional[int]]] = DEFAULT_POLICY) -> List[str]:
+        """按保留策略删除多余的副本，返回删除的文件名"""
+        removed = []
+        for stem, entries in self.copies.items():
+            keep = select_retained([entry[1] for entry in entries], now, policy)
+            retained = []
+            for entry, kept in zip(entries, keep):
+                if kept:
+                    retained.append(entry)
+                    continue
+                try:
+                    os.remove(os.path.join(self.directory, entry[0]))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"删除备份副本 {entry[0]} 失败: {e}")
+                    retained.append(entry)
+                    continue
+                removed.append(entry[0])
+            entries[:] = retained
+        if removed:
+            self.save()
+        return removed
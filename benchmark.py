@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据管理器性能基准测试
+用生成的大数据集测量启动耗时等指标
+
+用法:
+    python benchmark.py startup --sizes 10000 100000 1000000
+    python benchmark.py memory --size 1000000 --class-name 701
+    python benchmark.py record-size --size 100000
+    python benchmark.py search --size 100000 --queries 第三单元 错题 essay
+    python benchmark.py write --size 100000
+    python benchmark.py revisions --homeworks 200 --edits 30
+    python benchmark.py backup --size 100000 --days 120
+    python benchmark.py network --size 100000 --servers 10
+    python benchmark.py integrity --size 300000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+from data_manager import DataManager
+import records
+import shard_store
+import revision_store
+import backup_engine
+import network_backup
+import integrity
+from communication import StudentServer
+
+# 可选：非Linux系统上通过psutil读取常驻内存
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SUBJECTS = ["语文", "数学", "英语", "物理", "化学", "生物", "历史", "地理", "政治"]
+CLASSES = [str(700 + i) for i in range(1, 11)]
+TEACHERS = ["张老师", "李老师", "王老师", "赵老师", "刘老师"]
+CONTENT_SAMPLES = [
+    "完成第三单元课后练习1-10题",
+    "背诵课文第二段并默写",
+    "整理本周错题，订正到错题本上",
+    "预习下一课，标出不认识的生字词",
+    "完成练习册第{}页",
+    "Write a short essay about your weekend",
+]
+
+
+def generate_data(record_count: int, seed: int = 0) -> dict:
+    """生成包含指定作业数量的数据（留言数量为作业的十分之一）"""
+    rng = random.Random(seed)
+    start = datetime(2023, 9, 1, 7, 0, 0)
+    homeworks = []
+    for i in range(1, record_count + 1):
+        timestamp = start + timedelta(minutes=i * 7 % (3 * 365 * 24 * 60))
+        homeworks.append({
+            "id": i,
+            "subject": rng.choice(SUBJECTS),
+            "content": rng.choice(CONTENT_SAMPLES).format(rng.randint(1, 200)),
+            "class": rng.choice(CLASSES),
+            "teacher": rng.choice(TEACHERS),
+            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+            "ts": int(timestamp.timestamp()),
+            "status": "active"
+        })
+    messages = []
+    for i in range(1, record_count // 10 + 1):
+        messages.append({
+            "id": i,
+            "content": "老师，这道题我不会做",
+            "student": f"学生{rng.randint(1, 50)}",
+            "class": rng.choice(CLASSES),
+            "timestamp": (start + timedelta(minutes=i * 13)).strftime("%Y-%m-%d %H:%M:%S"),
+            "ts": int((start + timedelta(minutes=i * 13)).timestamp()),
+            "status": "active"
+        })
+    return {
+        "homeworks": homeworks,
+        "messages": messages,
+        "classes": list(CLASSES),
+        "subjects": list(SUBJECTS),
+        "class_assignments": {},
+        "id_sequences": {"homeworks": len(homeworks), "messages": len(messages)},
+    }
+
+
+def write_data_file(path: str, record_count: int):
+    """生成数据并以与DataManager相同的格式写入文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(generate_data(record_count), f, ensure_ascii=False, indent=2)
+
+
+def timed(func, repeat: int = 1):
+    """执行函数并返回 (最短耗时秒数, 最后一次结果)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def current_rss() -> int:
+    """当前进程的常驻内存（字节），无法获取时返回0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return 0
+
+
+def bench_startup(sizes, repeat):
+    """比较JSON解析与快照缓存的启动耗时
+
+    "加载"只包含读取数据文件（_load_data），"启动"为完整的DataManager构造（含索引和统计重建）
+    """
+    print(f"{'记录数':>10} {'文件大小':>10} {'JSON加载':>10} {'快照加载':>10} {'加速比':>8} "
+          f"{'JSON启动':>10} {'快照启动':>10} {'加速比':>8} {'生成快照':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            data_file = os.path.join(temp_dir, "bench_data.json")
+            write_data_file(data_file, size)
+            file_mb = os.path.getsize(data_file) / 1024 / 1024
+
+            json_start, manager = timed(lambda: DataManager(data_file, use_snapshot_cache=False), repeat)
+            json_load, _ = timed(manager._load_data, repeat)
+
+            build_time, manager = timed(lambda: DataManager(data_file))  # 首次启动：解析JSON并写入快照
+            cached_start, manager = timed(lambda: DataManager(data_file), repeat)
+            cached_load, data = timed(manager._load_data, repeat)
+            assert len(data["homeworks"]) == size
+
+            print(f"{size:>10} {file_mb:>8.1f}MB {json_load * 1000:>8.0f}ms {cached_load * 1000:>8.0f}ms "
+                  f"{json_load / cached_load:>7.1f}x {json_start * 1000:>8.0f}ms {cached_start * 1000:>8.0f}ms "
+                  f"{json_start / cached_start:>7.1f}x {build_time * 1000:>8.0f}ms")
+
+
+def memory_probe(data_file: str, mode: str, class_name: str):
+    """在独立进程中测量加载和查询前后的常驻内存，结果以JSON输出到标准输出"""
+    before = current_rss()
+    load_time, manager = timed(lambda: DataManager(data_file, lazy=(mode == "lazy")))
+    after_load = current_rss()
+    query_time, homeworks = timed(lambda: manager.get_homeworks(class_name))
+    after_query = current_rss()
+    print(json.dumps({
+        "before": before,
+        "after_load": after_load,
+        "after_query": after_query,
+        "load_ms": load_time * 1000,
+        "query_ms": query_time * 1000,
+        "rows": len(homeworks)
+    }))
+
+
+def bench_memory(size, class_name):
+    """比较完整加载与延迟加载的常驻内存
+
+    每种模式在单独的子进程中运行，避免互相影响内存统计
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "bench_data.json")
+        write_data_file(data_file, size)
+        # 生成快照和延迟加载的记录文件，两种模式都按各自最快的路径启动
+        DataManager(data_file, lazy=True)
+
+        print(f"记录数 {size}，文件大小 {os.path.getsize(data_file) / 1024 / 1024:.1f}MB，查询班级 {class_name}")
+        print(f"{'模式':>6} {'启动前':>10} {'加载后':>10} {'查询后':>10} {'加载耗时':>10} {'查询耗时':>10} {'结果数':>8}")
+        for mode in ("eager", "lazy"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "memory-probe", data_file, mode, class_name],
+                check=True, stdout=subprocess.PIPE, universal_newlines=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            mb = lambda value: f"{value / 1024 / 1024:>8.1f}MB"
+            print(f"{mode:>6} {mb(result['before'])} {mb(result['after_load'])} {mb(result['after_query'])} "
+                  f"{result['load_ms']:>8.0f}ms {result['query_ms']:>8.0f}ms {result['rows']:>8}")
+
+
+def bench_record_size(size):
+    """比较每条作业记录的内存占用：json解析出的字典 vs 槽位记录（字符串驻留）"""
+    content = json.dumps(generate_data(size)["homeworks"], ensure_ascii=False)
+
+    def retained(build):
+        tracemalloc.start()
+        try:
+            result = build()
+            return tracemalloc.get_traced_memory()[0], result
+        finally:
+            tracemalloc.stop()
+
+    dict_bytes, homeworks = retained(lambda: json.loads(content))
+    assert len(homeworks) == size
+    del homeworks
+
+    record_bytes, homeworks = retained(lambda: records.adopt_records("homeworks", json.loads(content)))
+    assert len(homeworks) == size and homeworks[0] == json.loads(content)[0]
+    del homeworks
+
+    print(f"记录数 {size}")
+    print(f"{'存储方式':>10} {'总内存':>10} {'每条记录':>10}")
+    print(f"{'dict':>10} {dict_bytes / 1024 / 1024:>8.1f}MB {dict_bytes / size:>8.0f}B")
+    print(f"{'slots':>10} {record_bytes / 1024 / 1024:>8.1f}MB {record_bytes / size:>8.0f}B")
+    print(f"节省 {(1 - record_bytes / dict_bytes) * 100:.0f}%")
+
+
+def bench_search(size, queries, repeat):
+    """比较全文检索索引与逐条子串匹配的查询耗时"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "bench_data.json")
+        write_data_file(data_file, size)
+        manager = DataManager(data_file)
+
+        build_time, _ = timed(lambda: manager._load_search_indexes())  # 首次建立并保存索引
+        load_time, _ = timed(lambda: DataManager(data_file, enable_search=True), repeat)
+
+        print(f"记录数 {size}，建立索引 {build_time * 1000:.0f}ms，启动并读取索引 {load_time * 1000:.0f}ms")
+        print(f"{'查询':>12} {'命中数':>8} {'索引检索':>10} {'逐条匹配':>10}")
+        homeworks = manager.data["homeworks"]
+        for query in queries:
+            indexed, ids = timed(lambda: manager.search(query), repeat)
+            scanned, matched = timed(lambda: [h["id"] for h in homeworks if query.lower() in h["content"].lower()], repeat)
+            print(f"{query:>12} {len(ids):>8} {indexed * 1000:>8.2f}ms {scanned * 1000:>8.2f}ms")
+
+
+def bench_write(size, repeat):
+    """比较单个数据文件与按班级分片时，添加一份作业的耗时和写入量"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "bench_data.json")
+        write_data_file(data_file, size)
+        single = DataManager(data_file, use_snapshot_cache=False)
+        sharded = DataManager(data_file, sharded=True)
+        sharded.get_homeworks(CLASSES[0])
+
+        shard_file = os.path.join(shard_store.shard_dir(data_file), shard_store.shard_file_name(CLASSES[0]))
+        global_file = os.path.join(shard_store.shard_dir(data_file), shard_store.GLOBAL_FILE)
+        single_time, _ = timed(lambda: single.add_homework("数学", "基准测试", CLASSES[0], overwrite=False), repeat)
+        sharded_time, _ = timed(lambda: sharded.add_homework("数学", "基准测试", CLASSES[0], overwrite=False), repeat)
+        single_bytes = os.path.getsize(data_file)
+        sharded_bytes = os.path.getsize(shard_file) + os.path.getsize(global_file)
+
+        open_time, manager = timed(lambda: DataManager(data_file, sharded=True), repeat)
+        load_time, _ = timed(lambda: manager.get_homeworks(CLASSES[1]))
+        all_time, _ = timed(lambda: manager.get_homeworks())
+
+        print(f"记录数 {size}，班级数 {len(CLASSES)}")
+        print(f"{'存储方式':>8} {'添加一份作业':>12} {'写入量':>10}")
+        print(f"{'单文件':>8} {single_time * 1000:>10.0f}ms {single_bytes / 1024 / 1024:>8.1f}MB")
+        print(f"{'分片':>8} {sharded_time * 1000:>10.0f}ms {sharded_bytes / 1024 / 1024:>8.1f}MB")
+        print(f"分片模式启动 {open_time * 1000:.0f}ms，读取一个班级 {load_time * 1000:.0f}ms，"
+              f"并行读取其余班级 {all_time * 1000:.0f}ms")
+
+
+def edit_content(rng: random.Random, content: str) -> str:
+    """模拟老师修改作业：改页码、增删一行、改几个字"""
+    lines = content.split("\n")
+    action = rng.random()
+    index = rng.randrange(len(lines))
+    if action < 0.35:
+        lines[index] = CONTENT_SAMPLES[4].format(rng.randint(1, 200))
+    elif action < 0.6:
+        lines.insert(index + 1, rng.choice(CONTENT_SAMPLES).format(rng.randint(1, 200)))
+    elif action < 0.75 and len(lines) > 1:
+        del lines[index]
+    else:
+        line = lines[index]
+        position = rng.randrange(len(line) + 1)
+        lines[index] = line[:position] + rng.choice(["（必做）", "（选做）", "，明天交", "!"]) + line[position:]
+    return "\n".join(lines)
+
+
+def bench_revisions(homework_count, edits, seed=0):
+    """覆盖作业时修订链（差异+关键帧）与保存完整副本的存储量，以及读取修订的耗时"""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manager = DataManager(os.path.join(temp_dir, "bench_data.json"), use_snapshot_cache=False)
+        full_bytes = 0
+        revision_count = 0
+        targets = []
+        with manager.transaction():
+            for i in range(homework_count):
+                class_name, subject = CLASSES[i % len(CLASSES)], SUBJECTS[i // len(CLASSES) % len(SUBJECTS)]
+                content = "\n".join(rng.choice(CONTENT_SAMPLES).format(rng.randint(1, 200))
+                                    for _ in range(rng.randint(3, 12)))
+                homework = manager.add_homework(subject, content, class_name, teacher_name=rng.choice(TEACHERS))
+                targets.append((subject, class_name, homework["id"], content))
+
+        start = time.perf_counter()
+        for subject, class_name, homework_id, content in targets:
+            versions = [manager.get_homework(homework_id)]
+            for _ in range(edits):
+                content = edit_content(rng, content)
+                versions.append(manager.add_homework(subject, content, class_name, teacher_name=versions[0]["teacher"]))
+            full_bytes += sum(len(json.dumps(version, ensure_ascii=False).encode('utf-8')) + 1 for version in versions)
+            revision_count += len(versions)
+        record_time = time.perf_counter() - start
+
+        stored_bytes = manager.revisions.storage_size()
+        homework_id = targets[0][2]
+        latest = manager.revisions.count(homework_id)
+        worst = min(latest, revision_store.KEYFRAME_INTERVAL)  # 需要应用最多差异的修订
+        get_time, _ = timed(lambda: manager.get_homework_revision(homework_id, worst), 20)
+        diff_time, _ = timed(lambda: manager.diff_homework_revisions(homework_id, 1), 20)
+
+        print(f"作业 {homework_count} 份，每份覆盖 {edits} 次，共 {revision_count} 个修订，"
+              f"每 {revision_store.KEYFRAME_INTERVAL} 个修订一个关键帧")
+        print(f"{'完整副本':>8} {full_bytes / 1024:>10.1f}KB")
+        print(f"{'修订链':>8} {stored_bytes / 1024:>10.1f}KB  ({stored_bytes / full_bytes:.0%})")
+        print(f"每次覆盖记录修订 {record_time / (homework_count * edits) * 1000:.2f}ms，"
+              f"读取修订 {get_time * 1000:.2f}ms，与第1个修订比较 {diff_time * 1000:.2f}ms")
+
+
+def bench_backup(size, days, daily, codec, seed=0):
+    """一学期每天备份一次：压缩去重的备份目录与每天保存完整副本的存储量，以及列出、还原备份的耗时"""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "bench_data.json")
+        write_data_file(data_file, size)
+        manager = DataManager(data_file, use_snapshot_cache=False)
+        backup_dir = os.path.join(temp_dir, "usb")
+        full_bytes = 0
+        backup_times = []
+        for day in range(days):
+            with manager.transaction():
+                for _ in range(daily):
+                    class_name, subject = rng.choice(CLASSES), rng.choice(SUBJECTS)
+                    content = rng.choice(CONTENT_SAMPLES).format(rng.randint(1, 200))
+                    manager.add_homework(subject, content, class_name, teacher_name=rng.choice(TEACHERS),
+                                         overwrite=rng.random() < 0.5)
+            full_bytes += sum(os.path.getsize(path) for path in manager.backup_sources().values())
+            elapsed, result = timed(lambda: manager.backup_to(backup_dir))
+            if not result["success"]:
+                print(result["message"])
+                return
+            backup_times.append(elapsed)
+
+        last_copy = sum(os.path.getsize(path) for path in manager.backup_sources().values())
+        engine = backup_engine.BackupEngine(backup_dir, codec)
+        stored_bytes = sum(os.path.getsize(os.path.join(root, name))
+                           for root, _dirs, names in os.walk(backup_dir) for name in names)
+        list_time, backups = timed(lambda: backup_engine.BackupEngine(backup_dir).backups(), 5)
+        restore_time, _ = timed(lambda: engine.extract(backups[0]["name"], os.path.join(temp_dir, "restore")))
+
+        print(f"记录数 {size}，{days} 天每天添加或覆盖 {daily} 份作业并备份一次，压缩方式 {codec}")
+        print(f"{'每天完整副本':>10} {full_bytes / 1024 / 1024:>10.1f}MB")
+        print(f"{'压缩去重':>10} {stored_bytes / 1024 / 1024:>10.1f}MB  ({stored_bytes / full_bytes:.1%}，"
+              f"相当于 {stored_bytes / last_copy:.1f} 份完整副本)")
+        print(f"每次备份平均 {sum(backup_times) / len(backup_times) * 1000:.0f}ms（第一次 {backup_times[0] * 1000:.0f}ms），"
+              f"列出 {len(backups)} 个备份 {list_time * 1000:.1f}ms，还原最早的备份 {restore_time * 1000:.0f}ms")
+
+
+def bench_network(size, server_count):
+    """老师端并行从多个学生服务器拉取网络备份：首次完整传输与数据没有变化时的耗时"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "bench_data.json")
+        write_data_file(data_file, size)
+        servers = []
+        try:
+            for _ in range(server_count):
+                manager = DataManager(data_file, use_snapshot_cache=False)
+                server = StudentServer(host='127.0.0.1', port=0)
+                if not server.start_server():
+                    return
+                network_backup.BackupSource(manager).register(server)
+                servers.append(server)
+            addresses = [f"127.0.0.1:{server.server_socket.getsockname()[1]}" for server in servers]
+            collector = network_backup.BackupCollector(os.path.join(temp_dir, "backups"), addresses)
+            first_time, first = timed(collector.collect)
+            again_time, again = timed(collector.collect)
+        finally:
+            for server in servers:
+                server.stop_server()
+
+        received = sum(result["bytes_received"] for result in first["results"])
+        raw = sum(result["raw_size"] for result in first["results"])
+        print(f"记录数 {size}，{server_count} 个学生服务器")
+        print(f"首次备份 {first_time:.2f}秒（{first['message']}），传输 {received / 1024 / 1024:.1f}MB，"
+              f"原始数据 {raw / 1024 / 1024:.1f}MB")
+        print(f"数据没有变化时 {again_time * 1000:.0f}ms（{again['message']}）")
+
+
+def bench_integrity(size):
+    """数据文件完整性校验：保存时生成校验文件的开销、校验耗时，以及损坏一个字节后重新打开（找回数据）的耗时"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "bench_data.json")
+        write_data_file(data_file, size)
+        manager = DataManager(data_file, use_snapshot_cache=False)
+        plain_time, _ = timed(lambda: json.dumps(manager.data, ensure_ascii=False, indent=2,
+                                                 default=records.json_default).encode('utf-8'))
+        dump_time, _ = timed(lambda: integrity.dump_data(manager.data, ("homeworks", "messages"),
+                                                         default=records.json_default))
+        manager.save_data()
+        file_size = os.path.getsize(data_file)
+        verify_time, report = timed(lambda: integrity.verify(data_file), 3)
+
+        stat = os.stat(data_file)
+        with open(data_file, 'r+b') as f:
+            f.seek(file_size // 2)
+            f.write(b"#")
+        os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        recover_time, recovered = timed(lambda: DataManager(data_file, use_snapshot_cache=False))
+
+        print(f"记录数 {size}，数据文件 {file_size / 1024 / 1024:.1f}MB")
+        print(f"序列化 {plain_time * 1000:.0f}ms，同时记录位置和CRC32 {dump_time * 1000:.0f}ms")
+        print(f"校验 {verify_time * 1000:.0f}ms（{report['message']}）")
+        lost = sum(len(ids) for ids in recovered.recovery["lost"].values())
+        print(f"损坏一个字节后打开 {recover_time * 1000:.0f}ms，保留 {recovered.recovery['salvaged']} 条记录，丢失 {lost} 条")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据管理器性能基准测试")
+    subparsers = parser.add_subparsers(dest="command")
+
+    startup_parser = subparsers.add_parser("startup", help="启动耗时：JSON解析 vs 快照缓存")
+    startup_parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    startup_parser.add_argument("--repeat", type=int, default=3)
+
+    memory_parser = subparsers.add_parser("memory", help="常驻内存：完整加载 vs 延迟加载")
+    memory_parser.add_argument("--size", type=int, default=1000000)
+    memory_parser.add_argument("--class-name", default=CLASSES[0])
+
+    record_parser = subparsers.add_parser("record-size", help="每条记录的内存占用：字典 vs 槽位记录")
+    record_parser.add_argument("--size", type=int, default=100000)
+
+    search_parser = subparsers.add_parser("search", help="全文检索：倒排索引 vs 逐条匹配")
+    search_parser.add_argument("--size", type=int, default=100000)
+    search_parser.add_argument("--queries", nargs="+", default=["第三单元", "错题本", "生字词", "weekend", "练习册第"])
+    search_parser.add_argument("--repeat", type=int, default=5)
+
+    write_parser = subparsers.add_parser("write", help="写入量：单个数据文件 vs 按班级分片")
+    write_parser.add_argument("--size", type=int, default=100000)
+    write_parser.add_argument("--repeat", type=int, default=3)
+
+    revisions_parser = subparsers.add_parser("revisions", help="作业修订历史：差异+关键帧 vs 完整副本")
+    revisions_parser.add_argument("--homeworks", type=int, default=200)
+    revisions_parser.add_argument("--edits", type=int, default=30)
+
+    backup_parser = subparsers.add_parser("backup", help="U盘备份：压缩去重 vs 每天完整副本")
+    backup_parser.add_argument("--size", type=int, default=100000)
+    backup_parser.add_argument("--days", type=int, default=120)
+    backup_parser.add_argument("--daily", type=int, default=30)
+    backup_parser.add_argument("--codec", choices=["zlib", "lzma"], default="zlib")
+
+    network_parser = subparsers.add_parser("network", help="网络备份：并行拉取多个学生服务器")
+    network_parser.add_argument("--size", type=int, default=100000)
+    network_parser.add_argument("--servers", type=int, default=10)
+
+    integrity_parser = subparsers.add_parser("integrity", help="数据文件完整性校验与损坏后的恢复")
+    integrity_parser.add_argument("--size", type=int, default=300000)
+
+    probe_parser = subparsers.add_parser("memory-probe")  # 供memory子命令在子进程中调用
+    probe_parser.add_argument("data_file")
+    probe_parser.add_argument("mode", choices=["eager", "lazy"])
+    probe_parser.add_argument("class_name")
+
+    args = parser.parse_args(argv)
+    if args.command == "startup":
+        bench_startup(args.sizes, args.repeat)
+    elif args.command == "memory":
+        bench_memory(args.size, args.class_name)
+    elif args.command == "record-size":
+        bench_record_size(args.size)
+    elif args.command == "search":
+        bench_search(args.size, args.queries, args.repeat)
+    elif args.command == "write":
+        bench_write(args.size, args.repeat)
+    elif args.command == "revisions":
+        bench_revisions(args.homeworks, args.edits)
+    elif args.command == "backup":
+        bench_backup(args.size, args.days, args.daily, args.codec)
+    elif args.command == "network":
+        bench_network(args.size, args.servers)
+    elif args.command == "integrity":
+        bench_integrity(args.size)
+    elif args.command == "memory-probe":
+        memory_probe(args.data_file, args.mode, args.class_name)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
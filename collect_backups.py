@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通过网络收集学生数据备份
+老师端并行从各个教室的学生服务器拉取数据备份（见 network_backup），不需要插U盘；
+中断的传输下次从断点继续，数据没有变化的服务器不再传输
+
+用法:
+    python collect_backups.py 192.168.1.21 192.168.1.22:8888 --dir D:\\作业备份
+    python collect_backups.py --servers servers.txt --dir D:\\作业备份 --at 02:00
+"""
+
+import sys
+import time
+import argparse
+
+from network_backup import BackupCollector, DEFAULT_PULL_WORKERS
+
+
+def print_result(result: dict):
+    for item in result["results"]:
+        status = "成功" if item["success"] else "失败"
+        resumed = f"，从 {item['resumed_from'] / 1024:.1f}KB 处继续" if item["resumed_from"] else ""
+        print(f"  {item['server']:<22} {status}  {item['message']}{resumed}  {item['elapsed']:.2f}秒")
+    print(f"{result['message']}，耗时 {result['elapsed']:.2f}秒")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="通过网络收集学生数据备份")
+    parser.add_argument("server", nargs="*", help="学生服务器地址（主机 或 主机:端口）")
+    parser.add_argument("--servers", help="学生服务器地址列表文件，每行一个")
+    parser.add_argument("--dir", default="网络备份", help="备份目录，每个学生服务器一个子目录")
+    parser.add_argument("--workers", type=int, default=DEFAULT_PULL_WORKERS, help="同时拉取的服务器数")
+    parser.add_argument("--at", help="每天在该时间（HH:MM）收集一次，不指定时立即收集一次后退出")
+
+    args = parser.parse_args(argv)
+    servers = list(args.server)
+    if args.servers:
+        with open(args.servers, 'r', encoding='utf-8') as f:
+            servers.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not servers:
+        parser.print_help()
+        return 1
+
+    collector = BackupCollector(args.dir, servers, workers=args.workers)
+    if args.at is None:
+        result = collector.collect()
+        print_result(result)
+        return 0 if result["success"] else 1
+
+    print(f"每天 {args.at} 从 {len(servers)} 个学生服务器收集备份，按 Ctrl+C 退出")
+    collector.start(args.at, on_done=print_result)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        collector.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
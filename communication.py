@@ -5,11 +5,103 @@
 
 import socket
 import threading
+import re
 import json
 import time
+import codecs
 from datetime import datetime
 import uuid
 
+# 每次从套接字读取的字节数
+RECV_BUFFER_SIZE = 65536
+
+# 单条消息的最大长度（字符），超过时认为数据有误并断开连接
+MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+# 老师请求作业时每页的作业数（请求中未指定时使用）
+HOMEWORK_PAGE_SIZE = 100
+
+
+class MessageReader:
+    """从TCP数据流中拆分出完整的JSON消息
+    
+    消息直接首尾相接发送，没有长度前缀或分隔符：一次recv可能包含多条消息，也可能只有半条
+    （较长的作业列表会分多次到达）。每条消息都是JSON对象，这里逐段扫描收到的数据，
+    记录字符串外花括号的层数，层数回到0时消息完整，再解析这一条消息。
+    扫描状态在两次feed之间保留，未完整的消息按段保存，每个字节只扫描一次、解析一次，
+    大消息分很多次到达时耗时也与消息长度成正比。
+    """
+    
+    # 字符串外需要关注的字符，字符串内需要关注的字符
+    _STRUCTURE = re.compile(r'[{}"]')
+    _IN_STRING = re.compile(r'["\\]')
+    _SPACE = re.compile(r'\s*')
+    
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()  # 多字节字符可能被拆在两次recv中
+        self._pieces = []      # 未完整的消息在之前各段中的部分
+        self._size = 0         # 未完整的消息已收到的字符数
+        self._depth = 0        # 当前位置所在的花括号层数，0表示在两条消息之间
+        self._in_string = False
+        self._skip = 0         # 上一段以反斜杠结尾时，本段开头要跳过的被转义字符
+    
+    def feed(self, data: bytes) -> list:
+        """加入收到的数据，返回其中已经完整的消息"""
+        text = self._utf8.decode(data)
+        messages = []
+        length = len(text)
+        pos = min(self._skip, length)
+        self._skip -= pos
+        start = 0  # 未完整的消息在本段中的起点
+        while pos < length:
+            if self._depth == 0:
+                pos = self._SPACE.match(text, pos).end()
+                if pos == length:
+                    break
+                if text[pos] != "{":
+                    raise ValueError("消息格式错误")
+                start = pos
+                self._depth = 1
+                pos += 1
+            elif self._in_string:
+                match = self._IN_STRING.search(text, pos)
+                if match is None:
+                    pos = length
+                elif match.group() == "\\":
+                    # 跳过被转义的字符（可能在下一段中）
+                    pos = match.end() + 1
+                else:
+                    self._in_string = False
+                    pos = match.end()
+            else:
+                match = self._STRUCTURE.search(text, pos)
+                if match is None:
+                    pos = length
+                    continue
+                pos = match.end()
+                char = match.group()
+                if char == '"':
+                    self._in_string = True
+                elif char == "{":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        self._pieces.append(text[start:pos])
+                        messages.append(json.loads("".join(self._pieces)))
+                        self._pieces = []
+                        self._size = 0
+        
+        if self._depth > 0:
+            # 消息还不完整，保存本段中属于它的部分，等待后续数据
+            self._skip += pos - length
+            self._pieces.append(text[start:])
+            self._size += length - start
+            if self._size > MAX_MESSAGE_SIZE:
+                raise ValueError("消息过长或格式错误")
+        return messages
+
+
 class StudentServer:
     def __init__(self, host='0.0.0.0', port=8888):
         self.host = host
@@ -63,28 +155,27 @@ class StudentServer:
     def _handle_teacher(self, client_socket):
         """处理老师客户端消息"""
         teacher_id = None
+        reader = MessageReader()
         try:
             while True:
-                data = client_socket.recv(1024)
+                data = client_socket.recv(RECV_BUFFER_SIZE)
                 if not data:
                     break
-                    
-                message = data.decode('utf-8')
-                data_json = json.loads(message)
                 
-                # 处理连接建立消息
-                if data_json.get('type') == 'teacher_connect':
-                    teacher_id = data_json.get('teacher_id', str(uuid.uuid4()))
-                    self.connected_teachers[teacher_id] = client_socket
-                    print(f"老师 {data_json.get('teacher_name', 'Unknown')} 已连接 (ID: {teacher_id})")
+                for data_json in reader.feed(data):
+                    # 处理连接建立消息
+                    if data_json.get('type') == 'teacher_connect':
+                        teacher_id = data_json.get('teacher_id', str(uuid.uuid4()))
+                        self.connected_teachers[teacher_id] = client_socket
+                        print(f"老师 {data_json.get('teacher_name', 'Unknown')} 已连接 (ID: {teacher_id})")
+                        
+                        # 通知监听器
+                        for listener in self.teacher_listeners.get('teacher_connected', []):
+                            listener('teacher_connected', {'teacher_id': teacher_id, 'teacher_data': data_json})
+                        continue
                     
-                    # 通知监听器
-                    for listener in self.teacher_listeners.values():
-                        listener('teacher_connected', {'teacher_id': teacher_id, 'teacher_data': data_json})
-                    continue
-                
-                # 处理其他消息
-                self._process_message(data_json, client_socket, teacher_id)
+                    # 处理其他消息
+                    self._process_message(data_json, client_socket, teacher_id)
                 
         except Exception as e:
             print(f"处理老师消息错误: {e}")
@@ -94,7 +185,7 @@ class StudentServer:
                 self.connected_teachers.pop(teacher_id, None)
                 
                 # 通知监听器
-                for listener in self.teacher_listeners.values():
+                for listener in self.teacher_listeners.get('teacher_disconnected', []):
                     listener('teacher_disconnected', {'teacher_id': teacher_id})
                     
             client_socket.close()
@@ -117,7 +208,7 @@ class StudentServer:
             if teacher_id in self.connected_teachers:
                 socket = self.connected_teachers[teacher_id]
                 message_data = json.dumps(message, ensure_ascii=False)
-                socket.send(message_data.encode('utf-8'))
+                socket.sendall(message_data.encode('utf-8'))
                 return True
             else:
                 print(f"老师 {teacher_id} 不在线")
@@ -133,7 +224,7 @@ class StudentServer:
         
         for teacher_id, socket in list(self.connected_teachers.items()):
             try:
-                socket.send(message_data.encode('utf-8'))
+                socket.sendall(message_data.encode('utf-8'))
                 success_count += 1
             except Exception as e:
                 print(f"发送消息给老师 {teacher_id} 失败: {e}")
@@ -209,15 +300,15 @@ class TeacherClient:
     
     def _receive_messages(self):
         """接收消息"""
+        reader = MessageReader()
         try:
             while self.is_connected:
-                data = self.client_socket.recv(1024)
+                data = self.client_socket.recv(RECV_BUFFER_SIZE)
                 if not data:
                     break
-                    
-                message = data.decode('utf-8')
-                data_json = json.loads(message)
-                self._process_message(data_json)
+                
+                for data_json in reader.feed(data):
+                    self._process_message(data_json)
                 
         except Exception as e:
             print(f"接收消息错误: {e}")
@@ -241,7 +332,7 @@ class TeacherClient:
         try:
             if self.is_connected and self.client_socket:
                 message_data = json.dumps(message, ensure_ascii=False)
-                self.client_socket.send(message_data.encode('utf-8'))
+                self.client_socket.sendall(message_data.encode('utf-8'))
                 return True
             else:
                 print("未连接到服务器")
@@ -288,6 +379,10 @@ class MessageTypes:
     CLASS_LIST_REQUEST = "class_list_request" # 请求班级列表
     CLASS_LIST_RESPONSE = "class_list_response" # 班级列表响应
     
+    # 备份相关
+    BACKUP_REQUEST = "backup_request"         # 老师请求数据备份
+    BACKUP_CHUNK = "backup_chunk"             # 学生发送备份数据块
+    
     # 系统相关
     HEARTBEAT = "heartbeat"                   # 心跳包
     SYSTEM_INFO = "system_info"               # 系统信息
@@ -307,19 +402,31 @@ class MessageStructure:
         }
     
     @staticmethod
-    def homework_request(class_name, subject, message=""):
-        """老师请求作业消息"""
-        return {
+    def homework_request(class_name, subject, message="", limit=HOMEWORK_PAGE_SIZE, after=None):
+        """老师请求作业消息
+        
+        Args:
+            limit: 每页的作业数
+            after: 上一页回应中的next游标 [ts, id]，None表示第一页
+        """
+        request = {
             'type': MessageTypes.HOMEWORK_REQUEST,
             'class': class_name,
             'subject': subject,
             'message': message,
+            'limit': limit,
             'timestamp': datetime.now().isoformat()
         }
+        if after is not None:
+            request['after'] = list(after)
+        return request
     
     @staticmethod
     def homework_response(homework_data):
-        """学生回应作业消息"""
+        """学生回应作业消息
+        
+        homework_data中的next为下一页的游标（没有更多时为None），total为符合条件的作业总数
+        """
         return {
             'type': MessageTypes.HOMEWORK_RESPONSE,
             'homework': homework_data,
@@ -363,4 +470,51 @@ class MessageStructure:
             'type': MessageTypes.CLASS_LIST_RESPONSE,
             'classes': classes,
             'timestamp': datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def backup_request(snapshot=None, offset=0, have=None):
+        """老师请求数据备份消息
+        
+        Args:
+            snapshot: 上次未收完的快照ID，学生仍有该快照时从offset处继续发送
+            offset: 已收到的字节数
+            have: 上次收完的快照ID，数据没有变化时学生不再发送
+        """
+        return {
+            'type': MessageTypes.BACKUP_REQUEST,
+            'snapshot': snapshot,
+            'offset': offset,
+            'have': have,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def backup_chunk(snapshot, file_name, size, raw_size, created, offset, data, eof, unchanged=False):
+        """学生发送备份数据块消息
+        
+        snapshot为压缩后内容的SHA-256，size、raw_size为压缩后和压缩前的字节数，
+        data为从offset开始的一段压缩数据（base64），eof表示是最后一块
+        """
+        return {
+            'type': MessageTypes.BACKUP_CHUNK,
+            'snapshot': snapshot,
+            'file': file_name,
+            'size': size,
+            'raw_size': raw_size,
+            'created': created,
+            'offset': offset,
+            'data': data,
+            'eof': eof,
+            'unchanged': unchanged,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def backup_error(error):
+        """学生无法提供备份时的回应（作为备份数据块发送，老师收到后结束本次备份）"""
+        return {
+            'type': MessageTypes.BACKUP_CHUNK,
+            'error': error,
+            'timestamp': datetime.now().isoformat()
+        }
@@ -5,35 +5,366 @@
 
 import json
 import os
+import copy
 import shutil
 import hashlib
-from datetime import datetime
-from typing import Dict, List, Any
-import platform
-
-# 尝试导入win32api用于检测U盘（Windows系统）
-try:
-    import win32api
-    import win32file
-    CAN_DETECT_USB = True
-except ImportError:
-    print("未找到win32api模块，U盘检测功能将不可用。请安装pywin32: pip install pywin32")
-    CAN_DETECT_USB = False
+import difflib
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Any, Iterable
+
+import snapshot_cache
+import lazy_store
+import records
+import archive_store
+import search_index
+import shard_store
+import file_sync
+import data_snapshot
+import message_store
+import revision_store
+import backup_engine
+import backup_retention
+import backup_catalog
+import usb_restore
+import drive_watcher
+import integrity
+from records import HomeworkRecord, MessageRecord
+
+# 带ID的记录集合
+RECORD_COLLECTIONS = ("homeworks", "messages")
+
+# 不随网络备份发给其它电脑的全局字段
+PRIVATE_FIELDS = ("password", "password_version")
+
+# 建议的归档期限：数据文件保留最近约一个学期的记录（在设置中开启，见storage_options）
+DEFAULT_ARCHIVE_HORIZON_DAYS = 180
+
+# 分页查询默认每页的记录数
+DEFAULT_PAGE_SIZE = 200
+
+# 建议的每个班级保留的留言数（在设置中开启，见storage_options）
+DEFAULT_MESSAGE_CAPACITY = 1000
+
+# 可以在设置文件中开启的存储选项（DataManager的同名参数），都不设置时与原来一样：单个数据文件、不归档、不淘汰留言
+#   sharded               true 时按班级分片保存
+#   archive_horizon_days  早于该天数的记录移入按月归档（如 DEFAULT_ARCHIVE_HORIZON_DAYS）
+#   message_capacity      每个班级最多保留的留言数（如 DEFAULT_MESSAGE_CAPACITY）
+STORAGE_SETTINGS = ("sharded", "archive_horizon_days", "message_capacity")
+
+# 提交事务时校验的各集合记录的必需字段
+REQUIRED_FIELDS = {
+    "homeworks": ("id", "subject", "content", "class", "timestamp", "ts"),
+    "messages": ("id", "content", "timestamp", "ts"),
+}
+
+# 恢复预览中每类变化最多列出的记录数
+RESTORE_PREVIEW_LIMIT = 50
+
+
+class HomeworkStatistics:
+    """增量维护的作业统计计数
+    
+    每次添加、删除、修改作业时更新计数，查询时不再扫描全部作业：
+    - 按学科、按班级、按天的作业数
+    - 按(天, 班级, 学科)的明细计数，用于按日期范围汇总出按周统计
+    """
+    
+    def __init__(self):
+        self.subject_counts = Counter()
+        self.class_counts = Counter()
+        self.day_counts = Counter()
+        self.daily_rollup = Counter()  # {(天, 班级, 学科): 作业数}，无法解析日期时天为None
+        self._day_cache = {}  # 时间戳日期部分 -> date，避免重复解析
+    
+    def copy(self) -> "HomeworkStatistics":
+        """复制计数（日期解析缓存共用）"""
+        other = HomeworkStatistics()
+        other.subject_counts = self.subject_counts.copy()
+        other.class_counts = self.class_counts.copy()
+        other.day_counts = self.day_counts.copy()
+        other.daily_rollup = self.daily_rollup.copy()
+        other._day_cache = self._day_cache
+        return other
+    
+    def clear(self):
+        """清空所有计数"""
+        self.subject_counts.clear()
+        self.class_counts.clear()
+        self.day_counts.clear()
+        self.daily_rollup.clear()
+    
+    def rebuild(self, homeworks):
+        """根据全部作业重新计算计数（加载数据时使用，先按(天, 班级, 学科)聚合再汇总）"""
+        self.clear()
+        days = map(self._day_of, [h.get("timestamp") for h in homeworks])
+        classes = [h.get("class", "") for h in homeworks]
+        subjects = [h.get("subject", "") for h in homeworks]
+        self.daily_rollup.update(zip(days, classes, subjects))
+        
+        for (day, class_name, subject), count in self.daily_rollup.items():
+            self.subject_counts[subject] += count
+            self.class_counts[class_name] += count
+            if day is not None:
+                self.day_counts[day] += count
+    
+    def _day_of(self, timestamp):
+        """取时间戳所在的日期，无法解析时返回None"""
+        if not isinstance(timestamp, str) or len(timestamp) < 10:
+            return None
+        day_text = timestamp[:10]
+        if day_text not in self._day_cache:
+            try:
+                self._day_cache[day_text] = datetime.strptime(day_text, "%Y-%m-%d").date()
+            except ValueError:
+                self._day_cache[day_text] = None
+        return self._day_cache[day_text]
+    
+    def _apply(self, homework, delta):
+        self.add_count(homework.get("timestamp"), homework.get("class", ""), homework.get("subject", ""), delta)
+    
+    def add_count(self, timestamp, class_name: str, subject: str, count: int):
+        """按(天, 班级, 学科)计入作业数（分片模式下未读入的分片使用分片概况中保存的计数）"""
+        self.subject_counts[subject] += count
+        self.class_counts[class_name] += count
+        day = self._day_of(timestamp)
+        self.daily_rollup[(day, class_name, subject)] += count
+        if day is not None:
+            self.day_counts[day] += count
+    
+    def add(self, homework):
+        """计入一份作业"""
+        self._apply(homework, 1)
+    
+    def remove(self, homework):
+        """移除一份作业的计数"""
+        self._apply(homework, -1)
+    
+    def weekly_rollup(self, start_date=None, end_date=None, class_name=None, subject=None):
+        """按日期范围汇总 班级 -> 学科 -> 周 的作业数
+        
+        Args:
+            start_date: 起始日期（含），date或"YYYY-MM-DD"字符串
+            end_date: 结束日期（含），date或"YYYY-MM-DD"字符串
+            class_name: 只统计指定班级
+            subject: 只统计指定学科
+        
+        Returns:
+            Dict[str, Dict[str, Dict[str, int]]]: 周以ISO格式表示，如 "2025-W09"
+        """
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+        if isinstance(end_date, str):
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        
+        result = {}
+        for (day, rollup_class, rollup_subject), count in self.daily_rollup.items():
+            if count <= 0 or day is None:
+                continue
+            if start_date and day < start_date or end_date and day > end_date:
+                continue
+            if class_name and rollup_class != class_name or subject and rollup_subject != subject:
+                continue
+            year, week, _ = day.isocalendar()
+            week_key = f"{year}-W{week:02d}"
+            subject_weeks = result.setdefault(rollup_class, {}).setdefault(rollup_subject, {})
+            subject_weeks[week_key] = subject_weeks.get(week_key, 0) + count
+        return result
+
+
+def storage_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """从设置中取出存储选项（STORAGE_SETTINGS），作为DataManager的关键字参数
+    
+    没有设置或取值无效的选项不传入，使用DataManager的默认值。
+    """
+    options = {}
+    if settings.get("sharded") is True:
+        options["sharded"] = True
+    for key in ("archive_horizon_days", "message_capacity"):
+        value = settings.get(key)
+        if value is None:
+            continue
+        if type(value) is int and value > 0:
+            options[key] = value
+        else:
+            print(f"设置 {key} 的值无效（应为正整数），已忽略: {value!r}")
+    return options
+
+
+def _writes(method):
+    """修饰修改数据的方法：持有写锁执行，最外层的修改结束后发布新版本的快照"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._writing():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class DataManager:
-    def __init__(self, data_file="data.json"):
+    def __init__(self, data_file="data.json", use_snapshot_cache: bool = True,
+                 lazy: bool = False, lazy_cache_size: int = lazy_store.DEFAULT_CACHE_SIZE,
+                 archive_horizon_days: int = None, enable_search: bool = False,
+                 sharded: bool = False, shard_workers: int = shard_store.DEFAULT_SHARD_WORKERS,
+                 shared: bool = False, message_capacity: int = None,
+                 class_message_capacities: Dict[str, int] = None, message_max_age_days: int = None,
+                 archive_evicted_messages: bool = True, keep_revisions: bool = True):
+        """
+        Args:
+            data_file: 数据文件名（相对数据目录）或绝对路径
+            use_snapshot_cache: 是否使用二进制快照缓存加速启动
+            lazy: 延迟加载模式，启动时不读入全部作业和留言，查询时按需解码
+            lazy_cache_size: 延迟加载模式下缓存的已解码记录数上限
+            archive_horizon_days: 启动时把早于该天数的记录移入按月归档，None表示不自动归档
+            enable_search: 启动时加载全文检索索引（不启用时在首次检索时才建立）
+            sharded: 按班级分片保存作业和留言（<数据文件>.d/），修改某个班级只重写该班级的分片；
+                首次启用时拆分原数据文件，之后原数据文件不再更新。分片模式下不使用延迟加载
+            shard_workers: 并行读取分片的线程数
+            shared: 数据文件可能被其它进程同时使用：保存时持有文件锁并先合并其它进程的修改，
+                监视数据文件的变化，读取时增量合并其它进程保存的记录
+            message_capacity: 每个班级最多保留的留言数，添加留言时淘汰最旧的留言，None表示不限
+            class_message_capacities: 个别班级的留言容量 {班级: 容量}，覆盖message_capacity
+            message_max_age_days: 留言最多保留的天数，None表示不限
+            archive_evicted_messages: 被淘汰的留言移入归档（否则直接删除）
+            keep_revisions: 覆盖或修改作业时在修订链中保留之前的版本（<数据文件>.revisions/）
+        """
         # 定义数据文件存储路径 - 修复路径构建
         self.base_data_dir = os.path.join("C:", os.sep, "Program Files", "xsd")
-        
+
         # 确保数据目录存在
         self._ensure_data_directory_exists()
-        
+
         # 构建完整的数据文件路径
         self.data_file = os.path.join(self.base_data_dir, data_file)
-        
-        # 加载数据
-        self.data = self._load_data()
-    
+
+        # 启动时优先读取与数据文件一致的二进制快照
+        self.use_snapshot_cache = use_snapshot_cache
+
+        # 事务状态：嵌套深度、事务期间是否有待提交的修改，以及回滚用的撤销记录（见transaction）
+        self._transaction_depth = 0
+        self._transaction_dirty = False
+        self._undo = None
+
+        # ID索引：{集合名: {id: 记录}} 以及记录在列表中的位置 {集合名: {id: 下标}}
+        self._id_index = {}
+        self._id_positions = {}
+
+        # 增量维护的作业统计
+        self._statistics = HomeworkStatistics()
+
+        # 按天分桶的索引：{集合名: {日期序号: {id: 记录}}}，查询某天或日期范围时只访问对应的桶
+        self._day_buckets = {}
+        self._day_cache = {}
+
+        # 归档存储（首次查询归档时才读取归档索引）
+        self._archive = None
+
+        # 作业修订历史（首次修改作业时才创建）
+        self.keep_revisions = keep_revisions
+        self._revisions = None
+        self._after_commit = []  # 事务中对修订历史、归档的修改 [(方法, 参数)]，提交时执行，回滚时丢弃
+
+        # 全文检索索引：{集合名: SearchIndex}，None表示尚未加载
+        self._search_indexes = None
+
+        # 多进程共享：文件锁、文件监视，以及上次与磁盘同步时的状态
+        self.shared = shared
+        self._lock = file_sync.FileLock(self.data_file + ".lock") if shared else None
+        self._watcher = None
+        self._change_listeners = []
+        self._known_signatures = {}  # {文件路径: 上次同步时的文件签名}
+        self._base_globals = {}      # 上次同步时的全局字段
+        self._base_sequences = {}    # 上次同步时的ID序列
+        self._pending = {collection: {} for collection in RECORD_COLLECTIONS}  # 尚未保存的修改 {集合名: {id: True修改/False删除}}
+        self._applying = False       # 正在读入磁盘上已有的记录，不算作本进程的修改
+
+        # 分片模式：启动时只读取全局数据，班级的分片在首次访问该班级时读取
+        # 数据已经拆分为分片时原数据文件不再更新，即使没有开启也继续使用分片，避免读到过时的数据
+        if not sharded and shard_store.ShardStore(self.data_file).exists():
+            print(f"数据已按班级分片保存，继续使用分片模式: {shard_store.shard_dir(self.data_file)}")
+            sharded = True
+        self._shards = shard_store.ShardStore(self.data_file, shard_workers) if sharded else None
+        self._loaded_shards = set()  # 已读入内存的班级分片
+        self._dirty_shards = set()   # 有未保存修改的班级分片
+
+        # 多版本快照：修改数据的线程持有写锁，完成后发布新版本；其它线程读取时才生成快照（见_materialize）
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._writer = None           # 持有写锁的线程
+        self._modified = False        # 上次发布以来记录是否有变化
+        self._fresh_buckets = set()   # 上次生成快照以来新建或复制过的分桶 {(集合名, 日期序号)}，可以直接修改
+        self._statistics_shared = False  # 统计计数是否被已生成的快照引用
+        self._snapshot = data_snapshot.DataSnapshot(0)  # 最近生成的快照
+        self._pending_snapshot = None  # 已发布但尚未生成快照的版本 (版本号, 全局字段, 记录存储)
+
+        # 按班级的留言环形缓冲：限制每个班级保留的留言数和天数，未设置限制时不创建
+        if message_capacity is None and not class_message_capacities and message_max_age_days is None:
+            self._message_ring = None
+        else:
+            self._message_ring = message_store.MessageRing(message_capacity, class_message_capacities,
+                                                           message_max_age_days)
+        self.archive_evicted_messages = archive_evicted_messages
+
+        # 数据文件损坏时的恢复情况（见_recover_data），没有损坏时为None
+        self.recovery = None
+
+        # 上次保存（或打开延迟加载存储）时数据文件的签名，以及此后记录是否有变化：
+        # 记录没有变化时保存只重新序列化全局字段，伴随文件只更新签名
+        self._saved_signature = None
+        self._records_dirty = True
+
+        with self._writing():
+            # 读取前记录文件签名，读取期间被其它进程改写时下次同步会重新合并
+            signatures = self._current_signatures() if shared else None
+
+            # 延迟加载模式：记录文件与数据文件一致时只读取索引，记录留在磁盘上按需解码
+            self.lazy = lazy and not sharded
+            self._lazy_cache_size = lazy_cache_size
+            self._lazy_store = lazy_store.LazyRecordStore.open(self.data_file, lazy_cache_size) if self.lazy else None
+            if self._lazy_store is not None:
+                self.data = self._lazy_store.globals
+                self._saved_signature = self._lazy_store.signature
+                self._records_dirty = False
+                self._mark_synced(signatures)
+            elif self._shards is not None and self._shards.exists():
+                self._set_data(self._load_global_shard())
+                self._mark_synced(signatures)
+                self._migrate_data()
+            else:
+                # 加载数据
+                self._set_data(self._load_data())
+                self._mark_synced(signatures)
+                if self.recovery is None:
+                    # 内存中的记录与数据文件一致
+                    self._saved_signature = integrity.saved_signature(self.data_file)
+                    self._records_dirty = False
+
+                # 升级旧版本数据（补齐字段、重新编号重复ID）
+                self._migrate_data()
+
+                # 数据文件损坏后找回的数据立即保存（损坏的原文件已另存）
+                if self.recovery is not None:
+                    self.save_data()
+
+                # 本次已完整加载，生成记录文件供下次启动使用
+                if self.lazy and os.path.exists(self.data_file):
+                    lazy_store.build_lazy_files(self.data_file, self.data, RECORD_COLLECTIONS)
+
+                # 首次启用分片：把完整数据拆分为按班级的分片
+                if self._shards is not None:
+                    self._split_into_shards()
+
+            if archive_horizon_days is not None:
+                self.archive_old_records(horizon_days=archive_horizon_days)
+
+            if enable_search:
+                self._load_search_indexes()
+
+        if shared:
+            self._start_watching()
+
     def _ensure_data_directory_exists(self):
         """确保数据目录存在，如果不存在则创建
         
@@ -64,16 +395,155 @@ class DataManager:
             except Exception as e:
                 print(f"创建数据目录时发生未知错误: {e}")
     def _load_data(self):
-        """从文件加载数据"""
+        """从文件加载数据
+        
+        快照缓存与数据文件的大小、修改时间、内容哈希都一致时直接使用快照，
+        否则解析JSON并重新生成快照。解析失败或内容与校验文件（见integrity）不一致时
+        不使用默认数据覆盖，而是尽量找回数据（见_recover_data）。
+        """
         if os.path.exists(self.data_file):
+            if self.use_snapshot_cache:
+                data = snapshot_cache.load_snapshot(self.data_file, self._record_factories())
+                if data is not None:
+                    return data
+            
+            content = b""
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                with open(self.data_file, 'rb') as f:
+                    content = f.read()
+                data = json.loads(content.decode('utf-8'))
+                if not isinstance(data, dict):
+                    raise ValueError("数据文件的内容不是JSON对象")
             except Exception as e:
                 print(f"加载数据失败: {e}")
+                return self._recover_data(content, integrity.read_check(self.data_file), str(e))
+            
+            # JSON完好但内容被改动（如磁盘错误），只有校验文件对应当前文件时才能发现
+            check = integrity.read_check(self.data_file)
+            if check is not None and integrity.is_current(self.data_file, check) and \
+                    (len(content) != check["size"] or integrity.damaged_blocks(content, check)):
+                return self._recover_data(content, check, "数据文件的内容与校验文件不一致")
+            
+            if self.use_snapshot_cache:
+                snapshot_cache.write_snapshot(self.data_file, data, snapshot_cache.hash_bytes(content))
+            return data
         
         return self._get_default_data()
     
+    @staticmethod
+    def _record_factories():
+        """快照缓存中记录集合的解码工厂（直接还原为记录对象）"""
+        return {collection: records.RECORD_TYPES[collection].from_columns for collection in RECORD_COLLECTIONS}
+    
+    def _recover_data(self, content: bytes, check, reason: str) -> Dict[str, Any]:
+        """数据文件损坏时尽量找回数据
+        
+        1. 损坏的数据文件另存为 <数据文件>.corrupt-<时间>，之后保存时不会丢失
+        2. 快照缓存与校验文件对应同一次保存时，快照就是损坏前的完整数据，直接使用
+        3. 否则取出CRC32仍然一致的字段和记录，损坏的部分依次从快照缓存、数据目录中的带时间戳副本（从新到旧）按ID找回；
+           没有校验文件时不知道损坏了哪些记录，直接使用其中最新的一份
+        4. 损坏的全局字段（密码、设置、ID序列等）使用校验文件中保存的值，仍然缺少的使用默认值
+        5. ID序列不低于找回、丢失和校验文件中记录的最大ID，之后分配的ID不会与丢失的记录重复
+        恢复的情况记录在self.recovery中，加载完成后保存一次恢复后的数据。
+        """
+        report = {"reason": reason, "corrupt_copy": None, "sources": [], "salvaged": 0, "recovered": 0,
+                  "lost": {}, "reset": []}
+        self.recovery = report
+        corrupt_copy = f"{self.data_file}.corrupt-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        try:
+            shutil.copy2(self.data_file, corrupt_copy)
+            report["corrupt_copy"] = corrupt_copy
+        except OSError as e:
+            print(f"另存损坏的数据文件失败: {e}")
+        
+        snapshot = snapshot_cache.read_snapshot(self.data_file, self._record_factories())
+        if check is not None and snapshot is not None and snapshot[0] == check["sha1"]:
+            data = snapshot[1]
+            report["sources"].append("快照缓存")
+            report["recovered"] = sum(len(data.get(collection, [])) for collection in RECORD_COLLECTIONS)
+        else:
+            if check is not None:
+                data, lost = integrity.salvage(content, check)
+                report["salvaged"] = sum(len(data.get(collection, [])) for collection in RECORD_COLLECTIONS)
+            else:
+                data, lost = {}, None
+            for name, source in self._recovery_sources(snapshot):
+                if lost is None:
+                    data, lost = source, {"globals": []}
+                    report["sources"].append(name)
+                    report["recovered"] = sum(len(data.get(collection, [])) for collection in RECORD_COLLECTIONS)
+                    break
+                found = self._fill_lost(data, lost, source)
+                if found:
+                    report["sources"].append(name)
+                    report["recovered"] += found
+                if not any(lost.values()):
+                    break
+            if lost is not None:
+                report["lost"] = {collection: ids for collection, ids in lost.items() if collection != "globals" and ids}
+                report["reset"] = list(lost["globals"])
+            else:
+                report["reset"] = [key for key in self._get_default_data() if key not in RECORD_COLLECTIONS]
+        
+        for key, value in self._get_default_data().items():
+            data.setdefault(key, value)
+        self._raise_sequences(data, check, report["lost"])
+        
+        lost_count = sum(len(ids) for ids in report["lost"].values())
+        print(f"数据文件已损坏（{reason}），原文件另存为 {report['corrupt_copy']}；"
+              f"保留 {report['salvaged']} 条记录，从{'、'.join(report['sources']) or '备份'}找回 {report['recovered']} 条，"
+              f"丢失 {lost_count} 条" + (f"，以下字段恢复为默认值: {', '.join(report['reset'])}" if report["reset"] else ""))
+        return data
+    
+    def _recovery_sources(self, snapshot):
+        """找回数据的来源（从新到旧）：快照缓存、数据文件所在目录中的带时间戳副本"""
+        if snapshot is not None and isinstance(snapshot[1], dict):
+            yield "快照缓存", snapshot[1]
+        data_dir, file_name = os.path.split(self.data_file)
+        stem = os.path.splitext(file_name)[0]
+        for copy in reversed(backup_retention.BackupIndex(data_dir).list()):
+            if copy["stem"] != stem:
+                continue
+            try:
+                with open(os.path.join(data_dir, copy["file"]), 'rb') as f:
+                    data = json.loads(f.read().decode('utf-8'))
+            except Exception as e:
+                print(f"读取副本 {copy['file']} 失败: {e}")
+                continue
+            if isinstance(data, dict):
+                yield f"副本 {copy['file']}", data
+    
+    @staticmethod
+    def _raise_sequences(data: Dict[str, Any], check, lost: Dict[str, List]):
+        """把ID序列提高到已使用的最大ID：现有记录、丢失的记录以及校验文件记录表中的ID"""
+        entries = integrity.record_entries(check) if check is not None else {}
+        sequences = data["id_sequences"]
+        for collection in RECORD_COLLECTIONS:
+            used = [record.get("id") for record in data.get(collection, []) or [] if isinstance(record, dict)]
+            used.extend(lost.get(collection, ()))
+            used.extend(entry[0] for entry in entries.get(collection, ()))
+            used = [record_id for record_id in used if type(record_id) is int]
+            sequences[collection] = max([sequences.get(collection, 0)] + used)
+    
+    @staticmethod
+    def _fill_lost(data: Dict[str, Any], lost: Dict[str, List], source: Dict[str, Any]) -> int:
+        """从source中按字段名和记录ID找回损坏的部分，返回找回的记录数（lost中去掉已找回的部分）"""
+        for key in list(lost["globals"]):
+            if key in source:
+                data[key] = source[key]
+                lost["globals"].remove(key)
+        found = 0
+        for collection in RECORD_COLLECTIONS:
+            missing = set(lost.get(collection, ()))
+            if not missing:
+                continue
+            recovered = [record for record in source.get(collection, []) or [] if record.get("id") in missing]
+            data.setdefault(collection, []).extend(recovered)
+            recovered_ids = {record.get("id") for record in recovered}
+            lost[collection] = [record_id for record_id in lost[collection] if record_id not in recovered_ids]
+            found += len(recovered)
+        return found
+    
     def _get_default_data(self):
         """获取默认数据结构"""
         return {
@@ -83,19 +553,1083 @@ class DataManager:
             "subjects": ["语文", "数学", "英语", "物理", "化学", "生物", "历史", "地理", "政治"],  # 学科列表
             "class_assignments": {},  # 班级对应关系
             "password": self._encrypt_password("xiangjiang"),  # 默认密码（已加密）
-            "password_version": "encrypted"  # 标识密码已加密
+            "password_version": "encrypted",  # 标识密码已加密
+            "id_sequences": {collection: 0 for collection in RECORD_COLLECTIONS}  # 各集合已分配的最大ID
         }
     
+    def _set_data(self, data):
+        """替换内存数据并重建索引（记录集合中的字典转换为槽位记录）"""
+        for collection in RECORD_COLLECTIONS:
+            if isinstance(data.get(collection), list):
+                data[collection] = records.adopt_records(collection, data[collection])
+        self.data = data
+        self._rebuild_indexes()
+    
+    def _rebuild_indexes(self):
+        """根据内存数据重建ID索引和按天分桶索引"""
+        for collection in RECORD_COLLECTIONS:
+            items = self.data.get(collection, [])
+            self._id_index[collection] = {record.get("id"): record for record in items}
+            self._id_positions[collection] = {record.get("id"): i for i, record in enumerate(items)}
+            
+            buckets = self._day_buckets[collection] = {}
+            day_cache = self._day_cache
+            for record in items:
+                timestamp = getattr(record, "timestamp", None)
+                day = day_cache.get(timestamp[:10]) if type(timestamp) is str else None
+                if day is None:
+                    day = self._bucket_day(record)
+                bucket = buckets.get(day)
+                if bucket is None:
+                    bucket = buckets[day] = {}
+                bucket[getattr(record, "id", None)] = record
+        
+        # 已发布的快照可能引用原来的计数，重新建立时换成新对象
+        statistics = HomeworkStatistics()
+        statistics._day_cache = self._statistics._day_cache
+        statistics.rebuild(self.data.get("homeworks", []))
+        self._statistics = statistics
+        if self._message_ring is not None:
+            self._message_ring.rebuild(self.data.get("messages", []))
+        self._statistics_shared = False
+        self._modified = True
+        self._records_dirty = True
+        
+        if self._search_indexes is not None:
+            if self._shards is not None and not self._all_shards_loaded():
+                # 内存中只有部分分片的记录，下次检索时重新读取保存的索引
+                self._search_indexes = None
+            else:
+                self._search_indexes = search_index.build_indexes(
+                    {collection: self.data.get(collection, []) for collection in RECORD_COLLECTIONS})
+    
+    def _all_shards_loaded(self) -> bool:
+        """分片模式下所有班级的分片是否都已读入内存"""
+        return self._loaded_shards.issuperset(self._shards.class_names())
+    
+    def _bucket_day(self, record) -> int:
+        """记录所在日期的序号（由显示时间的日期部分得到，结果按日期字符串缓存）"""
+        timestamp = record.get("timestamp")
+        day_text = timestamp[:10] if isinstance(timestamp, str) else None
+        day = self._day_cache.get(day_text)
+        if day is None:
+            day = self._day_cache[day_text] = lazy_store.day_ordinal(day_text)
+        return day
+    
+    def _ensure_loaded(self, class_names: Iterable[str] = None):
+        """修改数据前调用
+        
+        延迟加载模式下把全部记录读入内存，之后按普通模式工作；
+        分片模式下读入指定班级的分片（None表示全部分片，空列表表示不需要读取分片）
+        """
+        if self._lazy_store is not None:
+            with self._writing():
+                self._load_lazy_records()
+        
+        self._ensure_shards(class_names)
+    
+    def _load_lazy_records(self):
+        """延迟加载模式切换为完整加载（持有写锁时调用）"""
+        store = self._lazy_store
+        if store is None:
+            return
+        self._lazy_store = None
+        loaded = {collection: store.load_all(collection) for collection in RECORD_COLLECTIONS}
+        
+        # 按原数据文件的字段顺序还原
+        data = {key: loaded[key] if key in loaded else self.data[key] for key in store.key_order}
+        data.update({key: value for key, value in self.data.items() if key not in data})
+        data.update({key: value for key, value in loaded.items() if key not in data})
+        self._set_data(data)
+        
+        # 数据内容没有变化，立即生成快照：旧快照不再引用记录文件，正在读取旧快照的线程结束后记录文件随之关闭
+        self._publish(materialize=True)
+    
+    def _load_global_shard(self):
+        """读取分片模式的全局数据（作业和留言在读取分片时加入）"""
+        try:
+            data = self._shards.load_global()
+        except Exception as e:
+            print(f"加载数据失败: {e}")
+            data = self._get_default_data()
+        for collection in RECORD_COLLECTIONS:
+            data[collection] = []
+        return data
+    
+    def _ensure_shards(self, class_names: Iterable[str] = None):
+        """读入尚未加载的班级分片（多个分片并行读取），None表示全部分片"""
+        if self._shards is None:
+            return
+        if class_names is None:
+            class_names = self._shards.class_names()
+        missing = [class_name for class_name in dict.fromkeys(class_names) if class_name not in self._loaded_shards]
+        if missing:
+            with self._writing():
+                self._load_shards(missing)
+    
+    def _load_shards(self, class_names: List[str]):
+        """读入班级分片（持有写锁时调用，等待写锁期间已被其它线程读入的分片跳过）"""
+        missing = [class_name for class_name in class_names if class_name not in self._loaded_shards]
+        if not missing:
+            return
+        
+        if self.shared:
+            for class_name in missing:
+                path = self._shards.shard_path(class_name)
+                self._known_signatures[path] = file_sync.file_signature(path)
+        
+        # 读入的记录与磁盘一致，不需要重新保存
+        self._applying = True
+        try:
+            for class_name, shard in self._shards.read_shards(missing).items():
+                for collection in RECORD_COLLECTIONS:
+                    for record in records.adopt_records(collection, shard[collection]):
+                        self._insert_record(collection, record)
+                self._loaded_shards.add(class_name)
+        finally:
+            self._applying = False
+    
+    def _mark_changed(self, collection: str, record, upsert: bool = True):
+        """记录本进程的修改：分片模式下标记所在班级的分片需要保存，多进程共享时记录尚未保存的ID"""
+        if self._applying:
+            return
+        self._records_dirty = True
+        if self._shards is not None:
+            self._dirty_shards.add(record.get("class", ""))
+        if self.shared:
+            self._pending[collection][record["id"]] = upsert
+    
+    def _split_into_shards(self):
+        """把内存中的完整数据拆分为按班级的分片"""
+        class_names = {record.get("class", "") for collection in RECORD_COLLECTIONS for record in self.data[collection]}
+        self._loaded_shards = set(class_names)
+        self._dirty_shards = set(class_names)
+        if self._write_data() and class_names:
+            print(f"已将数据按班级拆分为 {len(class_names)} 个分片: {self._shards.directory}")
+    
+    def _search_source(self) -> str:
+        """检索索引对应的文件：分片模式下与分片概况（global.json）一起保存和校验"""
+        return self._shards.global_file if self._shards is not None else self.data_file
+    
+    def _load_search_indexes(self):
+        """读取与数据文件一致的检索索引，不存在或已过期时根据内存数据重新建立并保存
+        
+        分片模式下读取已保存的索引不需要读入分片，之后读入的分片中的记录已在索引中。
+        """
+        source = self._search_source()
+        indexes = search_index.load_indexes(source)
+        if indexes is not None and all(collection in indexes for collection in RECORD_COLLECTIONS):
+            self._search_indexes = indexes
+            return
+        
+        self._ensure_loaded()
+        self._search_indexes = search_index.build_indexes(
+            {collection: self.data.get(collection, []) for collection in RECORD_COLLECTIONS})
+        if os.path.exists(source):
+            search_index.save_indexes(source, self._search_indexes)
+    
+    def _index_text(self, collection: str, record, add: bool = True):
+        """在检索索引中加入或移除记录的文本（索引未加载时不处理）"""
+        if self._search_indexes is None:
+            return
+        index = self._search_indexes[collection]
+        text = record.get(search_index.SEARCH_FIELDS[collection])
+        if add:
+            if self._applying and self._shards is not None and record["id"] in index:
+                return  # 读入的分片记录已在从磁盘读取的索引中
+            index.add(record["id"], text)
+        else:
+            index.remove(record["id"], text)
+    
+    # ---- 多版本快照 ----
+    
+    @contextmanager
+    def _writing(self):
+        """修改内存数据：同一时间只有一个线程修改，最外层结束时发布新版本的快照"""
+        with self._write_lock:
+            self._write_depth += 1
+            self._writer = threading.get_ident()
+            try:
+                yield
+            finally:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._publish()
+    
+    def _publish(self, materialize: bool = False):
+        """发布当前数据为新版本（持有写锁时调用，数据没有变化时不发布）
+        
+        发布时只记下版本号和全局字段的副本，快照等到其它线程读取时才生成（见_materialize），
+        连续修改而中间没有读取时，每次修改的开销与记录数无关。
+        materialize为True时立即生成快照。
+        """
+        pending = self._pending_snapshot
+        if pending is not None:
+            _version, latest_globals, latest_store = pending
+        else:
+            latest_globals, latest_store = self._snapshot.globals, self._snapshot.lazy_store
+        global_fields = {key: value for key, value in self.data.items() if key not in RECORD_COLLECTIONS}
+        if self._modified or latest_store is not self._lazy_store or latest_globals != global_fields:
+            self._modified = False
+            self._pending_snapshot = (self.version + 1, copy.deepcopy(global_fields), self._lazy_store)
+        if materialize:
+            self._materialize()
+    
+    def _materialize(self) -> data_snapshot.DataSnapshot:
+        """为已发布的版本生成快照（持有写锁、内存数据就是该版本时调用）
+        
+        记录集合、ID索引、分桶的外层字典在这里复制；记录本身、各天的分桶和统计计数在下次修改前才复制。
+        """
+        pending = self._pending_snapshot
+        if pending is None:
+            return self._snapshot
+        version, global_fields, store = pending
+        self._fresh_buckets.clear()
+        self._statistics_shared = True
+        self._snapshot = data_snapshot.DataSnapshot(
+            version,
+            global_fields,
+            {collection: tuple(self.data.get(collection, ())) for collection in RECORD_COLLECTIONS},
+            {collection: dict(self._id_index.get(collection, {})) for collection in RECORD_COLLECTIONS},
+            {collection: dict(self._day_buckets.get(collection, {})) for collection in RECORD_COLLECTIONS},
+            self._statistics,
+            store
+        )
+        # 先替换快照再清除标记，不加锁读取的线程看到标记已清除时一定能取得新快照
+        self._pending_snapshot = None
+        return self._snapshot
+    
+    def _published(self) -> data_snapshot.DataSnapshot:
+        """当前发布版本的快照：还没有生成时等待正在进行的修改结束后生成
+        
+        修改数据的线程在修改过程中取得的是最近生成的快照（不含尚未发布的修改）。
+        """
+        if self._pending_snapshot is None:
+            return self._snapshot
+        with self._write_lock:
+            if self._write_depth:
+                return self._snapshot
+            return self._materialize()
+    
+    def _view(self) -> data_snapshot.DataSnapshot:
+        """读取时使用的数据：正在修改数据的线程直接读取内存数据（可以读到自己尚未发布的修改），其它线程读取当前快照"""
+        if self._writer != threading.get_ident():
+            return self._published()
+        return data_snapshot.DataSnapshot(
+            self.version, self.data,
+            {collection: self.data.get(collection, ()) for collection in RECORD_COLLECTIONS},
+            self._id_index, self._day_buckets, self._statistics, self._lazy_store
+        )
+    
+    @property
+    def version(self) -> int:
+        """当前发布的数据版本号，数据每次变化后递增，可以作为界面渲染、序列化结果的缓存键"""
+        pending = self._pending_snapshot
+        return pending[0] if pending is not None else self._snapshot.version
+    
+    def snapshot(self) -> data_snapshot.DataSnapshot:
+        """取得当前版本的只读快照（之后的修改不影响已取得的快照）
+        
+        快照在发布后第一次读取时生成，此时如有其它线程正在修改数据会等待它结束；之后的读取不加锁。
+        """
+        return self._published()
+    
+    def _own_statistics(self) -> HomeworkStatistics:
+        """取得可以修改的统计计数：被已发布的快照引用时先复制"""
+        if self._statistics_shared:
+            self._statistics = self._statistics.copy()
+            self._statistics_shared = False
+        return self._statistics
+    
+    def _own_bucket(self, collection: str, day: int) -> Dict[int, Any]:
+        """取得可以修改的分桶：被已发布的快照引用时先复制，不存在时新建"""
+        buckets = self._day_buckets[collection]
+        bucket = buckets.get(day)
+        if (collection, day) not in self._fresh_buckets:
+            bucket = buckets[day] = dict(bucket) if bucket is not None else {}
+            self._fresh_buckets.add((collection, day))
+        elif bucket is None:
+            bucket = buckets[day] = {}
+        return bucket
+    
+    # ---- 多进程同步 ----
+    
+    def _locked(self):
+        """多进程共享时返回文件锁，否则返回空的上下文"""
+        return self._lock if self._lock is not None else nullcontext()
+    
+    def _current_signatures(self) -> Dict[str, Any]:
+        """本进程读入内存的文件的当前签名"""
+        if self._shards is None:
+            return {self.data_file: file_sync.file_signature(self.data_file)}
+        # 监视线程也会调用，先复制已读入的班级，避免遍历时被修改
+        paths = [self._shards.global_file] + [self._shards.shard_path(class_name) for class_name in list(self._loaded_shards)]
+        return {path: file_sync.file_signature(path) for path in paths}
+    
+    def _changed_files(self) -> List[str]:
+        """自上次同步以来被改写的文件"""
+        return [path for path, signature in self._current_signatures().items()
+                if signature != self._known_signatures.get(path)]
+    
+    def _mark_synced(self, signatures: Dict[str, Any] = None):
+        """记录内存数据已与磁盘一致（读取或保存之后调用）"""
+        if not self.shared:
+            return
+        self._known_signatures = signatures if signatures is not None else self._current_signatures()
+        self._base_globals = copy.deepcopy({key: value for key, value in self.data.items() if key not in RECORD_COLLECTIONS})
+        self._base_sequences = dict(self.data.get("id_sequences", {}))
+        for pending in self._pending.values():
+            pending.clear()
+    
+    def _start_watching(self):
+        """开始监视数据文件（分片模式下监视分片目录）"""
+        path = self._shards.directory if self._shards is not None else self.data_file
+        self._watcher = file_sync.FileWatcher([path], callback=self._on_file_changed)
+        self._watcher.start()
+    
+    def _on_file_changed(self):
+        """监视线程收到文件变化时调用：不是本进程保存的修改才通知监听者"""
+        if self._changed_files():
+            for listener in list(self._change_listeners):
+                listener()
+    
+    def add_change_listener(self, callback):
+        """注册数据被其它进程修改时的回调（在监视线程中调用，界面程序应转到主线程处理）"""
+        self._change_listeners.append(callback)
+    
+    def close(self):
+        """停止监视数据文件"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+    
+    def _refresh(self):
+        """收到文件变化通知后合并其它进程的修改（读写数据前调用，事务中不合并）
+        
+        其它线程正在修改数据时不等待，直接读取当前快照；该线程保存时会合并其它进程的修改。
+        """
+        if self._watcher is None or self._transaction_depth or not self._watcher.changed.is_set():
+            return
+        if not self._write_lock.acquire(blocking=False):
+            return
+        try:
+            with self._writing():
+                self._watcher.changed.clear()
+                self._merge_external()
+        finally:
+            self._write_lock.release()
+    
+    @_writes
+    def reload_changes(self) -> bool:
+        """立即检查并合并其它进程保存的修改，返回是否有变化"""
+        if self._watcher is not None:
+            self._watcher.changed.clear()
+        return self._merge_external()
+    
+    def _merge_external(self) -> bool:
+        """合并其它进程保存的修改，只读取发生变化的文件；本进程尚未保存的修改优先"""
+        if not self.shared:
+            return False
+        if self._lazy_store is not None:
+            return self._reopen_lazy_store()
+        if self._shards is not None:
+            return self._merge_external_shards()
+        
+        signature = file_sync.file_signature(self.data_file)
+        if signature is None or signature == self._known_signatures.get(self.data_file):
+            return False
+        try:
+            with open(self.data_file, 'rb') as f:
+                theirs = json.loads(f.read().decode('utf-8'))
+        except Exception as e:
+            print(f"读取其它程序保存的数据失败: {e}")
+            return False
+        self._apply_external(theirs, {collection: theirs.get(collection, []) for collection in RECORD_COLLECTIONS})
+        self._known_signatures[self.data_file] = signature
+        return True
+    
+    def _merge_external_shards(self) -> bool:
+        """分片模式：合并改写过的全局文件，以及已读入内存的班级中改写过的分片"""
+        changed = False
+        global_file = self._shards.global_file
+        signature = file_sync.file_signature(global_file)
+        if signature is not None and signature != self._known_signatures.get(global_file):
+            try:
+                self._apply_external(self._shards.load_global())
+                self._known_signatures[global_file] = signature
+                changed = True
+                if self._search_indexes is not None and not self._all_shards_loaded():
+                    # 其它程序可能修改了未读入的分片，下次检索时重新读取保存的索引
+                    self._search_indexes = None
+            except Exception as e:
+                print(f"读取其它程序保存的数据失败: {e}")
+        
+        for class_name in sorted(self._loaded_shards):
+            path = self._shards.shard_path(class_name)
+            signature = file_sync.file_signature(path)
+            if signature == self._known_signatures.get(path):
+                continue
+            try:
+                shard = self._shards.read_shard(class_name)
+            except Exception as e:
+                print(f"读取其它程序保存的数据失败: {e}")
+                continue
+            self._apply_external(None, shard, class_name)
+            self._known_signatures[path] = signature
+            changed = True
+        return changed
+    
+    def _reopen_lazy_store(self) -> bool:
+        """延迟加载模式：数据文件被改写后重新打开记录文件，记录文件已过期时完整加载"""
+        signature = file_sync.file_signature(self.data_file)
+        if signature is None or signature == self._known_signatures.get(self.data_file):
+            return False
+        # 旧的记录存储可能还被快照引用，不再被引用时自动关闭
+        self._lazy_store = lazy_store.LazyRecordStore.open(self.data_file, self._lazy_cache_size)
+        if self._lazy_store is not None:
+            self.data = self._lazy_store.globals
+            self._saved_signature = self._lazy_store.signature
+            self._records_dirty = False
+        else:
+            self._set_data(self._load_data())
+            lazy_store.build_lazy_files(self.data_file, self.data, RECORD_COLLECTIONS)
+        self._mark_synced({self.data_file: signature})
+        return True
+    
+    def _apply_external(self, theirs_globals: Dict[str, Any] = None,
+                        theirs_records: Dict[str, List[Dict[str, Any]]] = None, class_name: str = None):
+        """把其它进程保存的数据合并到内存
+        
+        Args:
+            theirs_globals: 磁盘上的全局字段；本进程修改过的字段保留本进程的值，ID序列取较大值
+            theirs_records: 磁盘上的记录 {集合名: 记录列表}；本进程尚未保存的记录保留本进程的版本
+            class_name: 分片模式下theirs_records只包含该班级的记录
+        """
+        if theirs_globals is not None:
+            self._merge_sequences(theirs_globals.get("id_sequences", {}))
+            for key, value in theirs_globals.items():
+                if key in RECORD_COLLECTIONS or key == "id_sequences":
+                    continue
+                if self.data.get(key) == self._base_globals.get(key):
+                    self.data[key] = value
+                self._base_globals[key] = copy.deepcopy(value)
+        
+        if theirs_records is not None:
+            self._applying = True
+            try:
+                for collection in RECORD_COLLECTIONS:
+                    self._merge_records(collection, theirs_records.get(collection, []), class_name)
+            finally:
+                self._applying = False
+    
+    def _merge_sequences(self, theirs: Dict[str, int]):
+        """合并ID序列：其它进程分配过的ID范围内本进程新增的记录重新编号"""
+        sequences = self.data.setdefault("id_sequences", {})
+        for collection, their_sequence in theirs.items():
+            if collection not in RECORD_COLLECTIONS:
+                continue
+            base_sequence = self._base_sequences.get(collection, 0)
+            sequences[collection] = max(sequences.get(collection, 0), their_sequence)
+            if their_sequence <= base_sequence:
+                continue
+            
+            pending = self._pending[collection]
+            conflicts = sorted(record_id for record_id, upsert in pending.items()
+                               if upsert and base_sequence < record_id <= their_sequence
+                               and record_id in self._id_index[collection])
+            for old_id in conflicts:
+                record = self._remove_record(collection, old_id)
+                if self._snapshot.get(collection, old_id) is record:
+                    record = record.copy()  # 已发布的快照引用原记录，修改它的副本
+                pending.pop(old_id, None)
+                record["id"] = self._next_id(collection)
+                self._insert_record(collection, record)
+                print(f"与其它程序新增的记录ID冲突，重新编号 {collection} 记录: {old_id} -> {record['id']}")
+            self._base_sequences[collection] = their_sequence
+    
+    def _merge_records(self, collection: str, items: List[Dict[str, Any]], class_name: str = None):
+        """按ID合并一个集合的记录：新增、修改、删除都通过增量维护索引的方法完成"""
+        pending = self._pending[collection]
+        ours = self._id_index[collection]
+        record_type = records.RECORD_TYPES[collection]
+        
+        theirs_ids = set()
+        for item in items:
+            record_id = item.get("id")
+            theirs_ids.add(record_id)
+            if record_id in pending:
+                continue
+            current = ours.get(record_id)
+            if current is not None:
+                if current.to_dict() == item:
+                    continue
+                self._remove_record(collection, record_id)
+            record = record_type.from_dict(item)
+            if type(record.get("ts")) is not int:
+                record["ts"], record["timestamp"] = records.normalize_timestamp(record.get("timestamp"))
+            self._insert_record(collection, record)
+        
+        # 其它进程删除的记录
+        removed = [record_id for record_id, record in ours.items()
+                   if record_id not in theirs_ids and record_id not in pending
+                   and (class_name is None or record.get("class", "") == class_name)]
+        for record_id in removed:
+            self._remove_record(collection, record_id)
+    
+    @property
+    def archive(self) -> archive_store.ArchiveStore:
+        """按月分区的归档存储"""
+        if self._archive is None:
+            self._archive = archive_store.ArchiveStore(self.data_file)
+        return self._archive
+    
+    @property
+    def revisions(self) -> revision_store.RevisionStore:
+        """作业修订历史"""
+        if self._revisions is None:
+            self._revisions = revision_store.RevisionStore(self.data_file)
+        return self._revisions
+    
+    def _merge_archived(self, hot: List[Dict[str, Any]], archived: List[Dict[str, Any]]):
+        """合并数据文件与归档中的查询结果（同一ID以数据文件为准），按时间倒序"""
+        if not archived:
+            return hot
+        hot_ids = {record.get("id") for record in hot}
+        merged = hot + [record for record in archived if record.get("id") not in hot_ids]
+        merged.sort(key=lambda x: x.get("ts", 0), reverse=True)
+        return merged
+    
+    def _migrate_data(self):
+        """升级旧版本数据
+        
+        1. 补齐缺失的数据字段
+        2. 旧版本用"列表长度+1"作为新ID，删除后会产生重复ID，这里为重复或无效的ID重新编号
+        3. 初始化各集合的单调递增ID序列
+        4. 为没有整数时间戳的记录补充ts，显示时间改为由ts生成（无法解析的时间如"刚刚"按当前时间处理）
+        """
+        defaults = self._get_default_data()
+        missing_keys = [key for key in ("homeworks", "messages", "classes", "subjects", "class_assignments", "id_sequences")
+                        if key not in self.data]
+        
+        renumber = {}
+        untimed = {}
+        max_ids = {}
+        for collection in RECORD_COLLECTIONS:
+            seen_ids = set()
+            for i, record in enumerate(self.data.get(collection, [])):
+                record_id = record.get("id")
+                if not isinstance(record_id, int) or isinstance(record_id, bool) or record_id <= 0 or record_id in seen_ids:
+                    renumber.setdefault(collection, []).append(i)
+                else:
+                    seen_ids.add(record_id)
+                if type(record.get("ts")) is not int:
+                    untimed.setdefault(collection, []).append(record)
+            max_ids[collection] = max(seen_ids, default=0)
+        
+        sequences = self.data.get("id_sequences", {})
+        stale_sequences = [collection for collection in RECORD_COLLECTIONS
+                           if sequences.get(collection, 0) < max_ids[collection]]
+        
+        if not (missing_keys or renumber or stale_sequences or untimed):
+            return
+        
+        with self.transaction():
+            # 下面直接修改记录的ID和时间，回滚时需要完整副本
+            self._save_undo_copy()
+            for key in missing_keys:
+                self.data[key] = defaults[key]
+            
+            sequences = self.data["id_sequences"]
+            for collection in RECORD_COLLECTIONS:
+                sequences[collection] = max(sequences.get(collection, 0), max_ids[collection])
+            
+            for collection, positions in renumber.items():
+                for i in positions:
+                    record = self.data[collection][i]
+                    new_id = self._next_id(collection)
+                    print(f"重新编号 {collection} 记录: {record.get('id')} -> {new_id}")
+                    record["id"] = new_id
+            
+            now = datetime.now().timestamp()
+            for collection, items in untimed.items():
+                for record in items:
+                    record["ts"], record["timestamp"] = records.normalize_timestamp(record.get("timestamp"), now)
+            
+            self._rebuild_indexes()
+            self.save_data()
+    
+    def _next_id(self, collection: str) -> int:
+        """分配下一个ID（单调递增，删除记录后也不会复用）"""
+        sequences = self.data.setdefault("id_sequences", {})
+        next_id = sequences.get(collection, 0) + 1
+        sequences[collection] = next_id
+        return next_id
+    
+    def _insert_record(self, collection: str, record: records.Record):
+        """追加记录并更新索引"""
+        self._remember(collection, record["id"])
+        items = self.data[collection]
+        self._id_index[collection][record["id"]] = record
+        self._id_positions[collection][record["id"]] = len(items)
+        items.append(record)
+        self._own_bucket(collection, self._bucket_day(record))[record["id"]] = record
+        if collection == "homeworks":
+            self._own_statistics().add(record)
+        elif self._message_ring is not None:
+            self._message_ring.add(record)
+        self._index_text(collection, record)
+        self._modified = True
+        self._mark_changed(collection, record)
+    
+    def _remove_record(self, collection: str, record_id: int):
+        """按ID删除记录，返回被删除的记录（不存在时返回None）
+        
+        用末尾记录填补被删除的位置，删除为O(1)；列表顺序不代表时间顺序，查询时会重新排序。
+        """
+        self._remember(collection, record_id)
+        record = self._id_index[collection].pop(record_id, None)
+        if record is None:
+            return None
+        
+        items = self.data[collection]
+        positions = self._id_positions[collection]
+        index = positions.pop(record_id)
+        last = items.pop()
+        if index < len(items):
+            items[index] = last
+            positions[last["id"]] = index
+        self._remove_from_bucket(collection, record)
+        if collection == "homeworks":
+            self._own_statistics().remove(record)
+        elif self._message_ring is not None:
+            self._message_ring.remove(record)
+        self._index_text(collection, record, add=False)
+        self._mark_changed(collection, record, upsert=False)
+        self._modified = True
+        return record
+    
+    def _remove_from_bucket(self, collection: str, record: records.Record):
+        """从按天分桶索引中移除记录"""
+        buckets = self._day_buckets[collection]
+        day = self._bucket_day(record)
+        if day not in buckets:
+            return
+        bucket = self._own_bucket(collection, day)
+        bucket.pop(record["id"], None)
+        if not bucket:
+            del buckets[day]
+    
+    def _update_homework_fields(self, homework: HomeworkRecord, fields: Dict[str, Any]) -> HomeworkRecord:
+        """修改作业字段并同步统计计数和分桶索引（修改时间时ts与显示时间一起规范化）
+        
+        原记录被已发布的快照引用时修改它的副本，返回修改后的记录。
+        """
+        self._remember("homeworks", homework["id"])
+        previous = homework.to_dict() if self.keep_revisions else None
+        fields = dict(fields)
+        if "ts" in fields or "timestamp" in fields:
+            fields["ts"], fields["timestamp"] = records.normalize_timestamp(fields.get("ts", fields.get("timestamp")))
+        
+        reindex = "content" in fields
+        statistics = self._own_statistics()
+        statistics.remove(homework)
+        self._remove_from_bucket("homeworks", homework)
+        if reindex:
+            self._index_text("homeworks", homework, add=False)
+        self._mark_changed("homeworks", homework)
+        
+        record_id = homework["id"]
+        if self._snapshot.get("homeworks", record_id) is homework:
+            updated = homework.copy()
+            self.data["homeworks"][self._id_positions["homeworks"][record_id]] = updated
+            self._id_index["homeworks"][record_id] = updated
+        else:
+            updated = homework
+        updated.update(fields)
+        
+        self._mark_changed("homeworks", updated)
+        self._own_bucket("homeworks", self._bucket_day(updated))[record_id] = updated
+        statistics.add(updated)
+        if reindex:
+            self._index_text("homeworks", updated)
+        self._modified = True
+        if previous is not None:
+            self._record_revision(previous, updated.to_dict())
+        return updated
+    
+    def _record_revision(self, previous: Dict[str, Any], current: Dict[str, Any]):
+        """把作业的修改记入修订历史"""
+        if previous == current:
+            return
+        self._change_revisions("record", previous, current)
+    
+    def _change_revisions(self, action: str, *args):
+        """修改修订历史（record/remove/clear）：事务中先记下，提交时才写入，回滚时丢弃；写入失败不影响数据的修改"""
+        if self._transaction_depth:
+            self._after_commit.append((self._change_revisions, (action,) + args))
+            return
+        try:
+            getattr(self.revisions, action)(*args)
+        except OSError as e:
+            print(f"保存修订历史失败: {e}")
+    
+    def _remove_archived(self, collection: str, record_id: int):
+        """删除归档中的记录：事务中先记下，提交时才删除"""
+        if self._transaction_depth:
+            self._after_commit.append((self._remove_archived, (collection, record_id)))
+            return
+        try:
+            self.archive.remove(collection, record_id)
+        except OSError as e:
+            print(f"删除归档记录失败: {e}")
+    
+    def _run_after_commit(self):
+        """事务提交后按顺序执行事务中记下的修订历史、归档的修改"""
+        pending, self._after_commit = self._after_commit, []
+        for method, args in pending:
+            method(*args)
+    
+    @_writes
     def save_data(self):
-        """保存数据到文件"""
+        """保存数据到文件
+        
+        处于事务中时只标记为待提交，由事务结束时统一写入一次。
+        """
+        if self._transaction_depth:
+            self._transaction_dirty = True
+            return True
+        return self._write_data()
+    
+    def verify_integrity(self) -> Dict[str, Any]:
+        """校验数据文件是否与保存时的校验文件一致（见 integrity.verify；分片模式下没有单个数据文件）
+        
+        Returns:
+            Dict[str, Any]: {"success", "message", "checked", "size", "damaged_blocks", "elapsed"}
+        """
+        if self._shards is not None:
+            return {"success": False, "message": "分片模式下不校验数据文件", "checked": False, "size": 0,
+                    "damaged_blocks": [], "elapsed": 0.0}
+        with self._locked():
+            return integrity.verify(self.data_file)
+    
+    def _write_data(self):
+        """将内存数据写入磁盘
+        
+        多进程共享时持有文件锁，先合并其它进程在此期间保存的修改，再写入，避免覆盖其它进程的数据。
+        """
+        try:
+            with self._locked():
+                self._merge_external()
+                if self._shards is not None:
+                    saved = self._write_shards()
+                else:
+                    saved = self._write_file()
+                if saved:
+                    self._mark_synced()
+                return saved
+        except TimeoutError as e:
+            print(f"保存数据失败: {e}")
+            return False
+    
+    def _previous_signature(self, path: str):
+        """上次保存时的文件签名，文件此后被改写过（如其它程序保存）时返回None"""
+        signature = self._saved_signature
+        if signature is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return signature if (stat.st_size, stat.st_mtime_ns) == tuple(signature[:2]) else None
+    
+    def _splice_lazy_globals(self, previous):
+        """延迟加载模式下只修改了全局字段：复用数据文件中记录的原始内容，不读入记录（不能复用时返回None）"""
+        if self._lazy_store is None or previous is None:
+            return None
+        check = integrity.read_check(self.data_file)
+        if check is None or check["sha1"] != previous[2] or not integrity.is_current(self.data_file, check):
+            return None
+        with open(self.data_file, 'rb') as f:
+            content = f.read()
+        return integrity.splice_globals(content, check, self.data, self._lazy_store.key_order,
+                                        default=records.json_default)
+    
+    def _write_file(self):
+        """将内存数据写入数据文件（先写临时文件再替换，避免写到一半损坏原文件）
+        
+        上次保存以来记录没有变化时（如只修改了班级、密码）只重新生成受影响的伴随文件：
+        延迟加载模式下复用数据文件中记录的原始内容，不读入记录、不写快照缓存；
+        记录文件只更新索引中的全局字段，检索索引只更新签名。
+        """
+        temp_file = self.data_file + ".tmp"
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            previous = self._previous_signature(self.data_file)
+            records_changed = self._records_dirty or previous is None
+            dumped = None if records_changed else self._splice_lazy_globals(previous)
+            if dumped is None:
+                # 需要完整序列化，延迟加载模式先读入全部记录
+                self._ensure_loaded(())
+                dumped = integrity.dump_data(self.data, RECORD_COLLECTIONS, default=records.json_default)
+            content, layout = dumped
+            content_hash = snapshot_cache.hash_bytes(content)
+            with open(temp_file, 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.data_file)
+            integrity.write_check(self.data_file, content, layout, content_hash)
+            if self.use_snapshot_cache and self._lazy_store is None:
+                snapshot_cache.write_snapshot(self.data_file, self.data, content_hash)
+            if self.lazy:
+                global_fields = {key: value for key, value in self.data.items() if key not in RECORD_COLLECTIONS}
+                if records_changed or not lazy_store.update_globals(self.data_file, previous, global_fields,
+                                                                    layout["keys"], content_hash):
+                    self._ensure_loaded(())
+                    lazy_store.build_lazy_files(self.data_file, self.data, RECORD_COLLECTIONS, content_hash)
+                elif self._lazy_store is not None:
+                    self._lazy_store.key_order = layout["keys"]
+            if records_changed or not search_index.resign_indexes(self.data_file, previous, content_hash):
+                if self._search_indexes is not None:
+                    search_index.save_indexes(self.data_file, self._search_indexes, content_hash)
+            self._saved_signature = snapshot_cache.source_signature(self.data_file, content_hash)
+            self._records_dirty = False
             return True
         except Exception as e:
             print(f"保存数据失败: {e}")
+            try:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            except OSError:
+                pass
             return False
     
+    def _write_shards(self):
+        """分片模式：只重写有修改的班级分片，再写入全局数据"""
+        try:
+            grouped = {class_name: {collection: [] for collection in RECORD_COLLECTIONS}
+                       for class_name in self._dirty_shards}
+            if grouped:
+                for collection in RECORD_COLLECTIONS:
+                    for record in self.data[collection]:
+                        shard = grouped.get(record.get("class", ""))
+                        if shard is not None:
+                            shard[collection].append(record)
+            for class_name, shard in grouped.items():
+                self._shards.write_shard(class_name, shard)
+                self._dirty_shards.discard(class_name)
+            
+            global_file = self._shards.global_file
+            previous = self._previous_signature(global_file)
+            self._shards.write_global({key: value for key, value in self.data.items() if key not in RECORD_COLLECTIONS})
+            signature = snapshot_cache.source_signature(global_file)
+            # 记录没有变化时已保存的检索索引只更新签名
+            if self._records_dirty or previous is None or \
+                    not search_index.resign_indexes(global_file, previous, signature[2]):
+                if self._search_indexes is not None:
+                    search_index.save_indexes(global_file, self._search_indexes, signature[2])
+            self._saved_signature = signature
+            self._records_dirty = False
+            return True
+        except Exception as e:
+            print(f"保存数据失败: {e}")
+            return False
+    
+    @contextmanager
+    def transaction(self):
+        """批量修改事务
+        
+        事务内的添加、删除、覆盖等操作只修改内存数据，退出时校验修改过的记录并只写一次文件；
+        事务内抛出异常或写入文件失败时回滚到事务开始前的状态并继续抛出异常。嵌套事务并入最外层事务。
+        事务期间持有写锁，其它线程读取的是事务开始前的快照，事务结束后才看到全部修改。
+        
+        回滚使用撤销记录：每条记录在事务中第一次被修改前保存原来的样子（见_remember），全局字段在开始时复制；
+        只有整体替换数据（清空、恢复备份、升级旧数据）时才保存完整副本（见_save_undo_copy）。
+        事务的开销与修改的记录数成正比，不读入延迟加载的记录和未读取的分片。
+        
+        用法:
+            with data_manager.transaction():
+                for item in items:
+                    data_manager.add_homework(...)
+        """
+        with self._writing():
+            if self._write_depth == 1:
+                # 事务期间其它线程读取事务开始前的快照，先生成好，读取时不必等待事务结束
+                self._materialize()
+            if self._transaction_depth:
+                self._transaction_depth += 1
+                try:
+                    yield self
+                finally:
+                    self._transaction_depth -= 1
+                return
+            
+            # 多进程共享时整个事务持有文件锁，事务开始前先合并其它进程的修改
+            with self._locked():
+                self._merge_external()
+                self._undo = {
+                    "records": {},  # {(集合名, ID): 修改前的记录副本，事务前不存在时为None}
+                    "globals": copy.deepcopy({key: value for key, value in self.data.items()
+                                              if key not in RECORD_COLLECTIONS}),
+                    "data": None,  # 整体替换数据前保存的完整副本
+                    "loaded_shards": set(self._loaded_shards),
+                    "state": (set(self._dirty_shards), self._records_dirty,
+                              {collection: dict(pending) for collection, pending in self._pending.items()}),
+                }
+                self._transaction_depth = 1
+                self._transaction_dirty = False
+                try:
+                    yield self
+                    self._validate_changes()
+                    if self._transaction_dirty:
+                        self._transaction_dirty = False
+                        if not self._write_data():
+                            raise OSError(f"保存数据失败: {self.data_file}")
+                except BaseException:
+                    # 回滚到事务开始前的数据（对修订历史和归档的修改一并丢弃）
+                    self._rollback()
+                    self._transaction_dirty = False
+                    self._after_commit = []
+                    raise
+                finally:
+                    self._transaction_depth = 0
+                    self._undo = None
+                
+                self._run_after_commit()
+    
+    def _remember(self, collection: str, record_id):
+        """事务中第一次修改记录前保存它原来的样子（不存在时为None），回滚时还原
+        
+        读入磁盘上已有的记录（分片、其它进程的修改）不算作事务的修改，不记录。
+        """
+        undo = self._undo
+        if undo is None or undo["data"] is not None or self._applying:
+            return
+        key = (collection, record_id)
+        if key not in undo["records"]:
+            record = self._id_index[collection].get(record_id)
+            undo["records"][key] = record.copy() if record is not None else None
+    
+    def _save_undo_copy(self):
+        """事务中整体替换或直接修改数据前调用：保存事务开始前数据的完整副本，回滚时直接还原
+        
+        延迟加载模式下先读入全部记录；分片模式下只包含已读入的分片，未读入的分片留在磁盘上不受影响。
+        """
+        undo = self._undo
+        if undo is None or undo["data"] is not None:
+            return
+        self._load_lazy_records()
+        backup = self._copy_data()
+        # 副本中已有事务前半段的修改，按撤销记录还原
+        for (collection, record_id), before in undo["records"].items():
+            items = [record for record in backup[collection] if record.get("id") != record_id]
+            if before is not None:
+                items.append(before)
+            backup[collection] = items
+        for key in [key for key in backup if key not in RECORD_COLLECTIONS]:
+            del backup[key]
+        backup.update(copy.deepcopy(undo["globals"]))
+        undo["data"] = backup
+        undo["loaded_shards"] = set(self._loaded_shards)
+    
+    def _rollback(self):
+        """按撤销记录把内存数据还原到事务开始前的状态"""
+        undo, self._undo = self._undo, None
+        dirty_shards, records_dirty, pending = undo["state"]
+        if undo["data"] is not None:
+            self._loaded_shards = undo["loaded_shards"]
+            self._set_data(undo["data"])
+        else:
+            # 不经过DataManager直接加入列表的记录不在撤销记录中，先去掉它们
+            stray = False
+            for collection in RECORD_COLLECTIONS:
+                items = self.data.get(collection)
+                if isinstance(items, list) and len(items) != len(self._id_index.get(collection, {})):
+                    index = self._id_index[collection]
+                    items[:] = [record for record in items
+                                if hasattr(record, "get") and index.get(record.get("id")) is record]
+                    stray = True
+            if stray:
+                self._rebuild_indexes()
+            # 事务中读入的分片一并丢弃
+            unloaded = self._loaded_shards - undo["loaded_shards"]
+            self._applying = True
+            try:
+                for (collection, record_id), before in undo["records"].items():
+                    if record_id in self._id_index[collection]:
+                        self._remove_record(collection, record_id)
+                    if before is not None:
+                        self._insert_record(collection, before)
+                if unloaded:
+                    for collection in RECORD_COLLECTIONS:
+                        for record_id in [record_id for record_id, record in self._id_index[collection].items()
+                                          if record.get("class", "") in unloaded]:
+                            self._remove_record(collection, record_id)
+                    self._loaded_shards = set(undo["loaded_shards"])
+            finally:
+                self._applying = False
+            for key in [key for key in self.data if key not in RECORD_COLLECTIONS]:
+                del self.data[key]
+            self.data.update(undo["globals"])
+        self._dirty_shards, self._records_dirty, self._pending = dirty_shards, records_dirty, pending
+        self._modified = True
+    
+    def _copy_data(self):
+        """复制内存数据（记录逐条浅拷贝，其它字段深拷贝），用于事务回滚"""
+        return {key: [record.copy() if isinstance(record, records.Record) else copy.deepcopy(record) for record in value]
+                if key in RECORD_COLLECTIONS and isinstance(value, list) else copy.deepcopy(value)
+                for key, value in self.data.items()}
+    
+    def _validate_changes(self):
+        """提交前校验：全局字段的结构和事务中修改过的记录，发现问题时抛出ValueError
+        
+        整体替换过数据时校验全部数据（见_validate_data）。
+        """
+        undo = self._undo
+        if undo["data"] is not None:
+            self._validate_data()
+            return
+        for key in ("classes", "subjects"):
+            if not isinstance(self.data.get(key), list):
+                raise ValueError(f"数据字段 {key} 必须是列表")
+        if self._lazy_store is None:
+            for collection in RECORD_COLLECTIONS:
+                if not isinstance(self.data.get(collection), list):
+                    raise ValueError(f"数据字段 {collection} 必须是列表")
+                if len(self._id_index.get(collection, {})) != len(self.data[collection]):
+                    raise ValueError(f"{collection} 的ID索引与数据不一致")
+        for collection, record_id in undo["records"]:
+            record = self._id_index[collection].get(record_id)
+            if record is not None:
+                self._validate_record(collection, record)
+    
+    def _validate_data(self):
+        """校验数据结构，发现问题时抛出ValueError"""
+        for key in ("homeworks", "messages", "classes", "subjects"):
+            if not isinstance(self.data.get(key), list):
+                raise ValueError(f"数据字段 {key} 必须是列表")
+        
+        for collection in RECORD_COLLECTIONS:
+            seen_ids = set()
+            for record in self.data[collection]:
+                self._validate_record(collection, record)
+                if record["id"] in seen_ids:
+                    raise ValueError(f"{collection} 中存在重复ID: {record['id']}")
+                seen_ids.add(record["id"])
+            
+            if len(self._id_index.get(collection, {})) != len(self.data[collection]):
+                raise ValueError(f"{collection} 的ID索引与数据不一致")
+    
+    @staticmethod
+    def _validate_record(collection: str, record):
+        """校验一条记录的类型和必需字段"""
+        if not isinstance(record, records.RECORD_TYPES[collection]):
+            raise ValueError(f"{collection} 中存在非法记录: {record!r}")
+        missing = [field for field in REQUIRED_FIELDS[collection] if field not in record]
+        if missing:
+            raise ValueError(f"{collection} 记录缺少字段 {missing}: {record!r}")
+    
+    @_writes
     def add_homework(self, subject: str, content: str, class_name: str, teacher_name: str = "老师", overwrite: bool = True, **kwargs) -> Dict[str, Any]:
         """添加作业
         
@@ -105,10 +1639,13 @@ class DataManager:
             class_name: 班级名称
             teacher_name: 老师姓名
             overwrite: 是否覆盖相同科目的作业（默认True）
-            **kwargs: 额外参数，如 timestamp, status 等
+            **kwargs: 额外参数，如 timestamp（时间字符串、datetime或Unix时间戳，无法解析时按当前时间）, status 等
         """
+        self._refresh()
+        self._ensure_loaded((class_name,))
+        
         # 获取额外参数
-        timestamp = kwargs.get('timestamp', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        ts, timestamp = records.normalize_timestamp(kwargs.get('timestamp'))
         status = kwargs.get('status', 'active')
         
         # 如果启用覆盖模式，先检查是否已存在相同科目的作业
@@ -121,109 +1658,519 @@ class DataManager:
             
             if existing_homework:
                 # 更新现有作业
-                existing_homework.update({
+                existing_homework = self._update_homework_fields(existing_homework, {
                     "content": content,
                     "teacher": teacher_name,
                     "timestamp": timestamp,
+                    "ts": ts,
                     "status": status
                 })
                 self.save_data()
-                return existing_homework
+                return existing_homework.to_dict()
         
         # 创建新作业
-        homework = {
-            "id": len(self.data["homeworks"]) + 1,
-            "subject": subject,
-            "content": content,
-            "class": class_name,
-            "teacher": teacher_name,
-            "timestamp": timestamp,
-            "status": status
-        }
-        self.data["homeworks"].append(homework)
+        homework = HomeworkRecord(self._next_id("homeworks"), subject, content, class_name,
+                                  teacher_name, timestamp, ts, status)
+        self._insert_record("homeworks", homework)
         self.save_data()
+        return homework.to_dict()
+    
+    def get_homework(self, homework_id: int):
+        """按ID获取作业，不存在时返回None"""
+        self._refresh()
+        self._ensure_shards()
+        view = self._view()
+        if view.lazy_store is not None:
+            homework = view.lazy_store.get_by_id("homeworks", homework_id)
+        else:
+            homework = records.to_dict(view.get("homeworks", homework_id))
+        if homework is None:
+            homework = self.archive.get_by_id("homeworks", homework_id)
         return homework
     
-    def get_homeworks(self, class_name: str = None, subject: str = None) -> List[Dict[str, Any]]:
-        """获取作业列表"""
-        homeworks = self.data["homeworks"]
+    @_writes
+    def update_homework(self, homework_id: int, **fields) -> Dict[str, Any]:
+        """按ID更新作业字段（ID不可修改）
+        
+        Returns:
+            Dict[str, Any]: 更新后的作业，不存在时返回None
+        """
+        self._refresh()
+        self._ensure_loaded()
+        homework = self._id_index["homeworks"].get(homework_id)
+        if homework is None:
+            return None
+        
+        fields.pop("id", None)
+        homework = self._update_homework_fields(homework, fields)
+        self.save_data()
+        return homework.to_dict()
+    
+    def get_homework_revisions(self, homework_id: int) -> List[Dict[str, Any]]:
+        """获取作业的全部修订（按修订号升序，最后一个为当前版本）
         
-        if class_name:
-            homeworks = [h for h in homeworks if h.get("class") == class_name]
+        作业从未被覆盖或修改过时只有当前版本这一个修订；作业不存在且没有修订历史时返回空列表。
+        """
+        history = self.revisions.history(homework_id)
+        if history:
+            return history
+        current = self.get_homework(homework_id)
+        return [dict(current, revision=1)] if current is not None else []
+    
+    def get_homework_revision(self, homework_id: int, revision: int) -> Dict[str, Any]:
+        """获取作业的指定修订（修订号从1开始），不存在时返回None"""
+        if self.revisions.count(homework_id) == 0:
+            current = self.get_homework(homework_id)
+            return dict(current, revision=1) if current is not None and revision == 1 else None
+        return self.revisions.get(homework_id, revision)
+    
+    def diff_homework_revisions(self, homework_id: int, old_revision: int, new_revision: int = None) -> str:
+        """比较作业两个修订的内容，返回unified diff格式的文本（内容相同时为空字符串）
         
-        if subject:
-            homeworks = [h for h in homeworks if h.get("subject") == subject]
+        Args:
+            homework_id: 作业ID
+            old_revision: 旧修订号
+            new_revision: 新修订号，None表示当前版本
         
-        # 按时间倒序排列
-        homeworks.sort(key=lambda x: x["timestamp"], reverse=True)
+        Returns:
+            str: 差异文本，修订不存在时返回None
+        """
+        if new_revision is None:
+            new_revision = max(1, self.revisions.count(homework_id))
+        old = self.get_homework_revision(homework_id, old_revision)
+        new = self.get_homework_revision(homework_id, new_revision)
+        if old is None or new is None:
+            return None
+        diff = difflib.unified_diff(old["content"].splitlines(), new["content"].splitlines(),
+                                    f"修订 {old_revision}", f"修订 {new_revision}", lineterm="")
+        return "\n".join(diff)
+    
+    def get_homeworks(self, class_name: str = None, subject: str = None,
+                      since=None, until=None, include_archive: bool = None) -> List[Dict[str, Any]]:
+        """获取作业列表
+        
+        Args:
+            class_name: 只返回指定班级
+            subject: 只返回指定学科
+            since: 起始时间（含）；date或"YYYY-MM-DD"表示当天0点，也可以是datetime、Unix时间戳
+            until: 结束时间（含）；date或"YYYY-MM-DD"表示到当天结束
+            include_archive: 是否包含已归档的作业；默认只在指定了since时包含
+        """
+        self._refresh()
+        if include_archive is None:
+            include_archive = bool(since)
+        start_ts, end_ts = records.time_bounds(since, until)
+        homeworks = self._query_homeworks(class_name, subject, start_ts, end_ts)
+        if include_archive:
+            since_day, until_day = self._day_range(start_ts, end_ts)
+            archived = self.archive.query("homeworks", class_name, subject, since_day, until_day)
+            homeworks = self._merge_archived(homeworks, self._within(archived, start_ts, end_ts))
         return homeworks
     
-    def add_message(self, content: str, student_name: str, class_name: str = "") -> Dict[str, Any]:
-        """添加留言"""
-        message = {
-            "id": len(self.data["messages"]) + 1,
-            "content": content,
-            "student": student_name,
-            "class": class_name,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "status": "active"
+    def get_today_homeworks(self, class_name: str = None, subject: str = None) -> List[Dict[str, Any]]:
+        """获取今天布置的作业（直接读取今天的分桶，不扫描全部作业）"""
+        today = date.today()
+        return self.get_homeworks(class_name, subject, since=today, until=today, include_archive=False)
+    
+    @staticmethod
+    def _day_range(start_ts: int = None, end_ts: int = None):
+        """时间戳范围对应的起止日期（None表示不限）"""
+        return (date.fromtimestamp(start_ts) if start_ts is not None else None,
+                date.fromtimestamp(end_ts) if end_ts is not None else None)
+    
+    @staticmethod
+    def _within(items: List[Dict[str, Any]], start_ts: int = None, end_ts: int = None) -> List[Dict[str, Any]]:
+        """按精确时间过滤字典形式的记录"""
+        if start_ts is None and end_ts is None:
+            return items
+        return [item for item in items
+                if not (start_ts is not None and item.get("ts", 0) < start_ts)
+                and not (end_ts is not None and item.get("ts", 0) > end_ts)]
+    
+    def _bucket_records(self, view: data_snapshot.DataSnapshot, collection: str,
+                        start_ts: int = None, end_ts: int = None) -> List[records.Record]:
+        """从按天分桶索引中取出时间范围内的记录"""
+        buckets = view.buckets(collection)
+        since_day, until_day = self._day_range(start_ts, end_ts)
+        first = since_day.toordinal() if since_day else min(buckets, default=0)
+        last = until_day.toordinal() if until_day else max(buckets, default=0)
+        if last - first + 1 <= len(buckets):
+            days = [day for day in range(first, last + 1) if day in buckets]
+        else:
+            days = [day for day in buckets if first <= day <= last]
+        
+        return [record for day in days for record in buckets[day].values()
+                if not (start_ts is not None and record.ts < start_ts)
+                and not (end_ts is not None and record.ts > end_ts)]
+    
+    def _query_homeworks(self, class_name: str = None, subject: str = None,
+                         start_ts: int = None, end_ts: int = None) -> List[Dict[str, Any]]:
+        """查询数据文件中的作业"""
+        self._ensure_shards((class_name,) if class_name else None)
+        view = self._view()
+        if view.lazy_store is not None:
+            since_day, until_day = self._day_range(start_ts, end_ts)
+            return self._within(view.lazy_store.query("homeworks", class_name, subject, since_day, until_day),
+                                start_ts, end_ts)
+        
+        def query():
+            if start_ts is None and end_ts is None:
+                homeworks = view.items("homeworks")
+            else:
+                homeworks = self._bucket_records(view, "homeworks", start_ts, end_ts)
+            
+            if class_name:
+                homeworks = [h for h in homeworks if h.class_name == class_name]
+            
+            if subject:
+                homeworks = [h for h in homeworks if h.subject == subject]
+            
+            # 按时间倒序排列（不改变存储列表本身的顺序）
+            return sorted(homeworks, key=lambda x: x.ts, reverse=True)
+        
+        # 同一版本内相同条件的查询只排序一次
+        return records.to_dicts(view.memo(("homeworks", class_name, subject, start_ts, end_ts), query))
+    
+    def get_homeworks_page(self, class_name: str = None, subject: str = None,
+                           limit: int = DEFAULT_PAGE_SIZE, after=None) -> Dict[str, Any]:
+        """按时间倒序分页获取作业（不包含已归档的作业）
+        
+        键集分页：游标是上一页最后一条作业的 (ts, id)，翻页时二分定位到游标之后，
+        翻到很靠后的页也不会变慢，翻页期间新增或删除作业也不会造成重复。
+        
+        Args:
+            class_name: 只返回指定班级
+            subject: 只返回指定学科
+            limit: 每页最多返回的作业数
+            after: 上一页返回的next游标，None表示第一页
+        
+        Returns:
+            Dict[str, Any]: {"items": 作业列表, "next": 下一页的游标（没有更多时为None）, "total": 符合条件的作业总数}
+        """
+        self._refresh()
+        return self._page("homeworks", class_name, subject, limit, after)
+    
+    def _page(self, collection: str, class_name: str = None, subject: str = None,
+              limit: int = DEFAULT_PAGE_SIZE, after=None) -> Dict[str, Any]:
+        """分页查询数据文件中的记录，按 (ts, id) 倒序"""
+        self._ensure_shards((class_name,) if class_name else None)
+        view = self._view()
+        cursor = records.page_cursor(after)
+        limit = max(1, int(limit))
+        if view.lazy_store is not None:
+            items, total, more = view.lazy_store.page(collection, class_name, subject, limit, cursor)
+        else:
+            def order():
+                selected = view.items(collection)
+                if class_name:
+                    selected = [record for record in selected if record.class_name == class_name]
+                if subject:
+                    selected = [record for record in selected if record.get("subject") == subject]
+                return sorted(selected, key=lambda record: (record.ts, record.id), reverse=True)
+            
+            # 排序结果按版本缓存，同一版本内翻页只需二分查找
+            ordered = view.memo(("page", collection, class_name, subject), order)
+            start = 0
+            if cursor is not None:
+                start = records.page_start(len(ordered), lambda i: (ordered[i].ts, ordered[i].id), cursor)
+            items = records.to_dicts(ordered[start:start + limit])
+            total, more = len(ordered), start + limit < len(ordered)
+        
+        return {
+            "items": items,
+            "next": [items[-1]["ts"], items[-1]["id"]] if more and items else None,
+            "total": total
         }
-        self.data["messages"].append(message)
-        self.save_data()
+    
+    @_writes
+    def add_message(self, content: str, student_name: str, class_name: str = "") -> Dict[str, Any]:
+        """添加留言（设置了留言保留限制时同时淘汰该班级最旧的留言）"""
+        self._refresh()
+        self._ensure_loaded((class_name,))
+        ts, timestamp = records.normalize_timestamp(None)
+        message = MessageRecord(self._next_id("messages"), content, student_name, class_name,
+                                timestamp, ts, "active")
+        self._insert_record("messages", message)
+        if not self._evict_messages(class_name):
+            self.save_data()
+        return message.to_dict()
+    
+    def _evict_messages(self, class_name: str) -> int:
+        """淘汰班级中超出容量或超过保留天数的留言并保存，返回淘汰数量（没有淘汰时不保存）
+        
+        被淘汰的留言先写入归档再从数据中删除，写入归档失败时保留这些留言，下次添加留言时重试。
+        超出容量时一次淘汰一批，归档文件和数据文件不会因每条新留言都多写一次。
+        无法解析日期的留言无法归档，淘汰时直接删除。
+        """
+        ring = self._message_ring
+        if ring is None:
+            return 0
+        cutoff_ts = None
+        if ring.max_age_days is not None:
+            cutoff_ts = records.to_epoch(date.today() - timedelta(days=ring.max_age_days))
+        evicted_ids = ring.overflow(class_name, cutoff_ts)
+        if not evicted_ids:
+            return 0
+        
+        if self.archive_evicted_messages:
+            try:
+                self.archive.archive("messages", [self._id_index["messages"][record_id] for record_id in evicted_ids])
+            except Exception as e:
+                print(f"写入归档失败: {e}")
+                return 0
+        with self.transaction():
+            for record_id in evicted_ids:
+                self._remove_record("messages", record_id)
+            self.save_data()
+        return len(evicted_ids)
+    
+    @_writes
+    def trim_messages(self, class_name: str = None) -> Dict[str, Any]:
+        """立即按留言容量和保留天数淘汰留言（平时只在添加留言时检查该班级）
+        
+        Args:
+            class_name: 只检查指定班级，None表示全部班级
+        
+        Returns:
+            Dict[str, Any]: {"success", "message", "evicted": 淘汰数量}
+        """
+        result = {"success": True, "message": "未设置留言保留限制", "evicted": 0}
+        if self._message_ring is None:
+            return result
+        
+        self._refresh()
+        self._ensure_loaded((class_name,) if class_name is not None else None)
+        class_names = [class_name] if class_name is not None else self._message_ring.class_names()
+        with self.transaction():
+            for name in class_names:
+                result["evicted"] += self._evict_messages(name)
+        result["message"] = f"已淘汰 {result['evicted']} 条留言"
+        return result
+    
+    def get_message(self, message_id: int):
+        """按ID获取留言，不存在时返回None"""
+        self._refresh()
+        self._ensure_shards()
+        view = self._view()
+        if view.lazy_store is not None:
+            message = view.lazy_store.get_by_id("messages", message_id)
+        else:
+            message = records.to_dict(view.get("messages", message_id))
+        if message is None:
+            message = self.archive.get_by_id("messages", message_id)
         return message
     
-    def get_messages(self, class_name: str = None) -> List[Dict[str, Any]]:
-        """获取留言列表"""
-        messages = self.data["messages"]
+    def get_messages(self, class_name: str = None, include_archive: bool = False) -> List[Dict[str, Any]]:
+        """获取留言列表
         
-        if class_name:
-            messages = [m for m in messages if m.get("class") == class_name]
+        Args:
+            class_name: 只返回指定班级
+            include_archive: 是否包含已归档的留言
+        """
+        self._refresh()
+        self._ensure_shards((class_name,) if class_name else None)
+        view = self._view()
+        if view.lazy_store is not None:
+            messages = view.lazy_store.query("messages", class_name)
+        else:
+            def query():
+                messages = view.items("messages")
+                if class_name:
+                    messages = [m for m in messages if m.get("class") == class_name]
+                # 按时间倒序排列（不改变存储列表本身的顺序）
+                return sorted(messages, key=lambda x: x.ts, reverse=True)
+            messages = records.to_dicts(view.memo(("messages", class_name), query))
         
-        # 按时间倒序排列
-        messages.sort(key=lambda x: x["timestamp"], reverse=True)
+        if include_archive:
+            messages = self._merge_archived(messages, self.archive.query("messages", class_name))
         return messages
     
+    def get_messages_page(self, class_name: str = None, limit: int = DEFAULT_PAGE_SIZE, after=None) -> Dict[str, Any]:
+        """按时间倒序分页获取留言（不包含已归档的留言），参数和返回值同get_homeworks_page"""
+        self._refresh()
+        return self._page("messages", class_name, None, limit, after)
+    
+    def search(self, query: str, collection: str = "homeworks", limit: int = None,
+               require_all: bool = True) -> List[int]:
+        """全文检索作业内容或留言内容，返回按相关度排序的ID（不包含已归档的记录）
+        
+        检索索引随修改增量更新，不在快照中，检索时持有写锁。
+        
+        Args:
+            query: 查询文本，按字符二元组匹配，中文无需分词
+            collection: "homeworks" 或 "messages"
+            limit: 最多返回的ID数
+            require_all: True时要求包含查询文本的全部二元组，False时命中任意一个即可
+        """
+        self._refresh()
+        with self._writing():
+            if self._search_indexes is None:
+                self._load_search_indexes()
+            return self._search_indexes[collection].search(query, limit, require_all)
+    
+    def search_homeworks(self, query: str, class_name: str = None, limit: int = None) -> List[Dict[str, Any]]:
+        """全文检索作业，返回按相关度排序的作业列表"""
+        results = []
+        for homework_id in self.search(query, "homeworks", None if class_name else limit):
+            homework = self.get_homework(homework_id)
+            if homework is None or class_name and homework.get("class") != class_name:
+                continue
+            results.append(homework)
+            if limit and len(results) >= limit:
+                break
+        return results
+    
+    def search_messages(self, query: str, class_name: str = None, limit: int = None) -> List[Dict[str, Any]]:
+        """全文检索留言，返回按相关度排序的留言列表"""
+        results = []
+        for message_id in self.search(query, "messages", None if class_name else limit):
+            message = self.get_message(message_id)
+            if message is None or class_name and message.get("class") != class_name:
+                continue
+            results.append(message)
+            if limit and len(results) >= limit:
+                break
+        return results
+    
+    @_writes
     def add_class(self, class_name: str):
         """添加班级"""
+        self._refresh()
         if class_name not in self.data["classes"]:
             self.data["classes"].append(class_name)
             self.save_data()
     
     def get_classes(self) -> List[str]:
         """获取班级列表"""
-        return self.data["classes"]
+        self._refresh()
+        return list(self._view().globals["classes"])
     
     def get_subjects(self) -> List[str]:
         """获取学科列表"""
-        return self.data["subjects"]
+        self._refresh()
+        return list(self._view().globals["subjects"])
     
+    @_writes
     def delete_homework(self, homework_id: int) -> bool:
-        """删除作业"""
-        original_count = len(self.data["homeworks"])
-        self.data["homeworks"] = [h for h in self.data["homeworks"] if h["id"] != homework_id]
-        
-        if len(self.data["homeworks"]) < original_count:
+        """删除作业（数据文件中没有时删除已归档的作业）"""
+        self._refresh()
+        if not self._delete_record("homeworks", homework_id):
+            print(f"要删除的作业不存在: {homework_id}")
+            return False
+        self._change_revisions("remove", homework_id)
+        return True
+    
+    @_writes
+    def delete_message(self, message_id: int) -> bool:
+        """删除留言（数据文件中没有时删除已归档的留言）"""
+        self._refresh()
+        if not self._delete_record("messages", message_id):
+            print(f"要删除的留言不存在: {message_id}")
+            return False
+        return True
+    
+    def _delete_record(self, collection: str, record_id: int) -> bool:
+        """从数据文件删除记录，没有时从归档中删除，返回是否找到"""
+        self._ensure_loaded()
+        if self._remove_record(collection, record_id) is not None:
             self.save_data()
             return True
+        if self.archive.get_by_id(collection, record_id) is not None:
+            self._remove_archived(collection, record_id)
+            return True
         return False
     
-    def delete_message(self, message_id: int) -> bool:
-        """删除留言"""
-        original_count = len(self.data["messages"])
-        self.data["messages"] = [m for m in self.data["messages"] if m["id"] != message_id]
+    @_writes
+    def archive_old_records(self, before=None, horizon_days: int = None) -> Dict[str, Any]:
+        """把早于指定日期的作业和留言移到按月分区的压缩归档中，数据文件只保留近期记录
+        
+        归档文件先写入，再从数据文件中删除；中途失败时记录仍在数据文件中，重新归档会覆盖同ID记录。
+        无法解析日期的记录保留在数据文件中。
+        
+        Args:
+            before: 归档该日期之前（不含）的记录，date或"YYYY-MM-DD"字符串
+            horizon_days: 未指定before时，归档早于最近该天数的记录
+        
+        Returns:
+            Dict[str, Any]: {"success", "message", "archived": {集合名: 归档数量}}
+        """
+        result = {
+            "success": False,
+            "message": "",
+            "archived": {collection: 0 for collection in RECORD_COLLECTIONS}
+        }
+        if before is None:
+            if horizon_days is None:
+                result["message"] = "未指定归档期限"
+                return result
+            before = date.today() - timedelta(days=horizon_days)
+        cutoff = lazy_store.day_ordinal(before)
+        
+        # 延迟加载模式下先用索引判断，避免无谓地读入全部记录
+        if self._lazy_store is not None and not self._lazy_store.has_records_before(cutoff):
+            result["success"] = True
+            result["message"] = "没有需要归档的记录"
+            return result
+        
+        # 分片模式下只读入有早于期限记录的班级分片
+        self._ensure_loaded(self._shards.classes_before(cutoff) if self._shards is not None else None)
+        old_records = {
+            collection: [record for record in self.data[collection]
+                         if 0 < self._bucket_day(record) < cutoff]
+            for collection in RECORD_COLLECTIONS
+        }
+        if not any(old_records.values()):
+            result["success"] = True
+            result["message"] = "没有需要归档的记录"
+            return result
         
-        if len(self.data["messages"]) < original_count:
+        try:
+            for collection, items in old_records.items():
+                if items:
+                    result["archived"][collection] = self.archive.archive(collection, items)
+        except Exception as e:
+            print(f"写入归档失败: {e}")
+            result["message"] = f"写入归档失败: {e}"
+            return result
+        
+        with self.transaction():
+            for collection, items in old_records.items():
+                for record in items:
+                    self._remove_record(collection, record["id"])
             self.save_data()
-            return True
-        return False
+        
+        result["success"] = True
+        result["message"] = "已归档 " + "，".join(f"{collection} {count} 条" for collection, count in result["archived"].items())
+        print(result["message"])
+        return result
     
+    @_writes
     def clear_all_data(self):
-        """清空所有数据"""
-        # 保留密码设置
-        current_password = self.get_password()
-        self.data = self._get_default_data()
-        self.set_password(current_password)
-        self.save_data()
+        """清空所有数据（包括归档）"""
+        # 保留密码设置（已加密的密码直接保留，避免被二次加密），整个过程只写一次文件
+        with self.transaction():
+            current_password = self.get_password()
+            password_version = self.data.get("password_version")
+            sequences = dict(self.data.get("id_sequences", {}))
+            self._save_undo_copy()
+            self._set_data(self._get_default_data())
+            if self._shards is not None:
+                # 所有分片都已清空，保存时删除分片文件
+                self._loaded_shards = set(self._shards.class_names())
+                self._dirty_shards.update(self._loaded_shards)
+            # 保留ID序列，清空后新记录也不会复用旧ID
+            self.data["id_sequences"].update(sequences)
+            self.data["password"] = current_password
+            if password_version:
+                self.data["password_version"] = password_version
+            else:
+                self.data.pop("password_version", None)
+            self.save_data()
+            self._change_revisions("clear")
+        
+        if os.path.isdir(self.archive.directory):
+            shutil.rmtree(self.archive.directory, ignore_errors=True)
+        self._archive = None
     
     def _encrypt_password(self, password):
         """加密密码
@@ -242,13 +2189,16 @@ class DataManager:
         Returns:
             bool: 密码是否已加密
         """
-        return (self.data.get("password_version") == "encrypted" or 
-               len(self.data.get("password", "")) == 64)  # SHA-256加密后长度为64
+        global_fields = self._view().globals
+        return (global_fields.get("password_version") == "encrypted" or 
+               len(global_fields.get("password", "")) == 64)  # SHA-256加密后长度为64
     
     def get_password(self):
         """获取当前密码"""
-        return self.data.get("password", "xiangjiang")
+        self._refresh()
+        return self._view().globals.get("password", "xiangjiang")
     
+    @_writes
     def set_password(self, new_password):
         """设置新密码
         
@@ -258,6 +2208,7 @@ class DataManager:
         Returns:
             bool: 设置是否成功
         """
+        self._refresh()
         if not new_password or len(new_password.strip()) == 0:
             return False
         
@@ -287,55 +2238,338 @@ class DataManager:
                 return True
             return False
     
+    def _statistics_view(self):
+        """统计用的数据：(快照, 全部作业的统计计数, 作业数, 留言数)
+        
+        分片模式下未读入的班级分片使用分片概况中保存的计数和记录数，不读取分片
+        （旧版本保存的概况中没有计数时才读入该分片）。
+        """
+        self._ensure_loaded(())
+        if self._shards is None:
+            view = self._view()
+            return view, view.statistics, len(view.items("homeworks")), len(view.items("messages"))
+        
+        with self._writing():
+            manifest = self._shards.manifest
+            unloaded = [class_name for class_name in self._shards.class_names() if class_name not in self._loaded_shards]
+            self._load_shards([class_name for class_name in unloaded if "rollup" not in manifest[class_name]])
+            unloaded = [class_name for class_name in unloaded if class_name not in self._loaded_shards]
+            
+            view = self._view()
+            statistics = view.statistics
+            homework_count = len(view.items("homeworks"))
+            message_count = len(view.items("messages"))
+            if unloaded:
+                statistics = statistics.copy()
+                for class_name in unloaded:
+                    info = manifest[class_name]
+                    for day, subject, count in info["rollup"]:
+                        statistics.add_count(day, class_name, subject, count)
+                    homework_count += info.get("homeworks", 0)
+                    message_count += info.get("messages", 0)
+            return view, statistics, homework_count, message_count
+    
     def get_statistics(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        homework_count = len(self.data["homeworks"])
-        message_count = len(self.data["messages"])
-        class_count = len(self.data["classes"])
+        """获取统计信息（计数在每次修改时增量维护，这里只做O(学科数)的汇总）"""
+        self._refresh()
+        view, statistics, homework_count, message_count = self._statistics_view()
+        class_count = len(view.globals["classes"])
         
         # 按学科统计作业数量
-        subject_stats = {}
-        for subject in self.data["subjects"]:
-            count = len([h for h in self.data["homeworks"] if h["subject"] == subject])
-            subject_stats[subject] = count
+        subject_counts = statistics.subject_counts
+        subject_stats = {subject: subject_counts.get(subject, 0) for subject in view.globals["subjects"]}
         
         return {
             "homework_count": homework_count,
             "message_count": message_count,
             "class_count": class_count,
             "subject_stats": subject_stats,
-            "total_homeworks": sum(subject_stats.values())
+            "class_stats": {class_name: count for class_name, count in statistics.class_counts.items() if count > 0},
+            "total_homeworks": sum(subject_stats.values()),
+            "archived_homework_count": self.archive.count("homeworks"),
+            "archived_message_count": self.archive.count("messages")
         }
     
-    def get_usb_drives(self) -> List[str]:
-        """检测所有连接的U盘驱动器
+    def get_daily_statistics(self, start_date=None, end_date=None) -> Dict[str, int]:
+        """获取每天的作业数
         
         Returns:
-            List[str]: U盘驱动器列表（如 ['D:', 'E:']）
+            Dict[str, int]: {"YYYY-MM-DD": 作业数}，按日期排序
         """
-        if not CAN_DETECT_USB or platform.system() != 'Windows':
-            print("U盘检测功能在当前环境下不可用")
-            return []
+        self._refresh()
+        statistics = self._statistics_view()[1]
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
+        if isinstance(end_date, str):
+            end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
+        
+        return {day.isoformat(): count for day, count in sorted(statistics.day_counts.items())
+                if count > 0 and not (start_date and day < start_date) and not (end_date and day > end_date)}
+    
+    def get_weekly_rollup(self, start_date=None, end_date=None, class_name: str = None, subject: str = None) -> Dict[str, Any]:
+        """按日期范围获取 班级 -> 学科 -> 周 的作业数汇总
         
+        数据来自预先按(天, 班级, 学科)聚合的计数，不会重新扫描作业列表。
+        """
+        self._refresh()
+        return self._statistics_view()[1].weekly_rollup(start_date, end_date, class_name, subject)
+    
+    def backup_sources(self) -> Dict[str, str]:
+        """需要备份的文件 {相对数据目录的路径: 文件路径}
+        
+        包括数据文件、分片、归档和修订历史；快照缓存、延迟加载记录文件、检索索引可以由数据文件重新生成，不需要备份。
+        """
+        base_dir = os.path.dirname(self.data_file)
+        sources = {}
+        if os.path.exists(self.data_file):
+            sources[os.path.basename(self.data_file)] = self.data_file
+        for directory in (shard_store.shard_dir(self.data_file), archive_store.archive_dir(self.data_file),
+                          revision_store.revisions_dir(self.data_file)):
+            for root, _, file_names in os.walk(directory):
+                for file_name in file_names:
+                    if file_name.endswith((".tmp", ".lock", ".search")):
+                        continue
+                    path = os.path.join(root, file_name)
+                    sources[os.path.relpath(path, base_dir).replace(os.sep, "/")] = path
+        return sources
+    
+    @_writes
+    def backup_to(self, directory: str) -> Dict[str, Any]:
+        """增量备份到指定目录（如U盘上的备份目录），只复制内容有变化的文件
+        
+        备份期间持有写锁（多进程共享时同时持有文件锁），备份的各个文件属于同一版本的数据。
+        备份成功后按保留策略删除较早的备份并回收空间（结果中的pruned，见 backup_engine.BackupEngine.prune）。
+        
+        Returns:
+            Dict[str, Any]: 备份结果，见 backup_engine.BackupEngine.backup
+        """
         try:
-            drives = []
-            # 获取所有驱动器
-            for drive in win32api.GetLogicalDriveStrings().split('\\\\')[:-1]:
-                # 检查是否为可移动驱动器（U盘）
-                try:
-                    drive_type = win32file.GetDriveType(drive + '\\')
-                    if drive_type == win32file.DRIVE_REMOVABLE:
-                        drives.append(drive)
-                except:
-                    continue
-            return drives
+            with self._locked():
+                engine = backup_engine.BackupEngine(directory)
+                result = engine.backup(self.backup_sources())
+        except TimeoutError as e:
+            print(f"备份失败: {e}")
+            return {"success": False, "message": f"备份失败: {e}", "name": None, "copied": [],
+                    "unchanged": 0, "bytes_copied": 0, "bytes_written": 0, "elapsed": 0.0}
+        
+        if result["success"]:
+            try:
+                result["pruned"] = engine.prune()
+            except Exception as e:
+                print(f"清理较早的备份失败: {e}")
+        return result
+    
+    def export_data(self, include_private: bool = True) -> bytes:
+        """当前数据的完整JSON（与未分片的数据文件格式相同），用于通过网络备份（见 network_backup）
+        
+        从当前版本的快照序列化，得到的是同一版本的数据，不改变加载方式：延迟加载模式下直接拼接记录文件中的原始内容，
+        分片模式下持有写锁读取尚未读入内存的分片（读取的记录不加入内存）。
+        
+        Args:
+            include_private: 是否包含密码（PRIVATE_FIELDS），发给其它电脑时不包含
+        """
+        self._refresh()
+        with self._writing() if self._shards is not None else nullcontext():
+            view = self._view()
+            global_fields = {key: value for key, value in view.globals.items()
+                             if include_private or key not in PRIVATE_FIELDS}
+            dump = functools.partial(json.dumps, ensure_ascii=False, default=records.json_default)
+            if view.lazy_store is not None:
+                key_order = view.lazy_store.key_order
+                collections = {collection: view.lazy_store.raw_array(collection) for collection in RECORD_COLLECTIONS}
+            else:
+                key_order = RECORD_COLLECTIONS
+                items = {collection: list(view.items(collection)) for collection in RECORD_COLLECTIONS}
+                if self._shards is not None:
+                    unloaded = [class_name for class_name in self._shards.class_names()
+                                if class_name not in self._loaded_shards]
+                    for shard in self._shards.read_shards(unloaded).values():
+                        for collection in RECORD_COLLECTIONS:
+                            items[collection].extend(shard[collection])
+                collections = {collection: dump(value).encode('utf-8') for collection, value in items.items()}
+        
+        keys = [key for key in key_order if key in collections or key in global_fields]
+        keys.extend(key for key in list(collections) + list(global_fields) if key not in keys)
+        pieces = [(dump(key) + ": ").encode('utf-8') +
+                  (collections[key] if key in collections else dump(global_fields[key]).encode('utf-8'))
+                  for key in keys]
+        return b"{" + b", ".join(pieces) + b"}"
+    
+    def list_backups(self) -> List[Dict[str, Any]]:
+        """数据目录中从U盘恢复时留下的带时间戳副本（读取备份索引，不扫描目录）
+        
+        Returns:
+            List[Dict[str, Any]]: [{"file", "stem", "time", "size", "sha256"}]，按时间先后
+        """
+        return backup_retention.BackupIndex(self.base_data_dir).list()
+    
+    def prune_backups(self, now: float = None) -> List[str]:
+        """按保留策略删除数据目录中多余的带时间戳副本（一天内每小时、一个月内每天、更早每月各保留一个）
+        
+        Returns:
+            List[str]: 删除的文件名
+        """
+        return backup_retention.BackupIndex(self.base_data_dir).prune(now)
+    
+    def list_restore_points(self, drives: List[str] = None) -> List[Dict[str, Any]]:
+        """列出可以恢复的备份：数据目录中的带时间戳副本、U盘备份目录中的备份、U盘上的数据文件
+        
+        Args:
+            drives: 要查找的U盘，None表示所有连接的U盘
+        
+        Returns:
+            List[Dict[str, Any]]: 按时间从新到旧，见 backup_catalog.BackupCatalog.entries
+        """
+        drives = self.get_usb_drives() if drives is None else drives
+        return backup_catalog.BackupCatalog(self.base_data_dir).entries(drives)
+    
+    def preview_restore(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """比较备份与当前数据，预览恢复后的变化
+        
+        Returns:
+            Dict[str, Any]: {"success", "message", "homeworks": {"added", "removed", "changed"}, "messages": {...}}，
+            added为只在备份中的记录（恢复后重新出现），removed为只在当前数据中的记录（恢复后消失），
+            各类变化是记录摘要的列表（最多 RESTORE_PREVIEW_LIMIT 条），数量见 "<类别>_count"
+        """
+        result = {"success": False, "message": ""}
+        try:
+            data = backup_catalog.BackupCatalog(self.base_data_dir).load(entry)
+        except Exception as e:
+            result["message"] = f"读取备份失败: {e}"
+            return result
+        
+        current = {"homeworks": self.get_homeworks(), "messages": self.get_messages()}
+        for collection in RECORD_COLLECTIONS:
+            mine = {record["id"]: record for record in current[collection]}
+            theirs = {record.get("id"): record for record in data.get(collection, []) if isinstance(record, dict)}
+            changes = {
+                "added": [theirs[record_id] for record_id in theirs if record_id not in mine],
+                "removed": [mine[record_id] for record_id in mine if record_id not in theirs],
+                "changed": [theirs[record_id] for record_id in theirs
+                            if record_id in mine and dict(mine[record_id]) != theirs[record_id]]
+            }
+            summary = {}
+            for kind, items in changes.items():
+                summary[f"{kind}_count"] = len(items)
+                summary[kind] = [self._describe_record(collection, record) for record in items[:RESTORE_PREVIEW_LIMIT]]
+            result[collection] = summary
+        
+        result["success"] = True
+        result["message"] = (f"恢复后作业 {len(data.get('homeworks', []))} 份（恢复 {result['homeworks']['added_count']}、"
+                             f"删除 {result['homeworks']['removed_count']}、改回 {result['homeworks']['changed_count']}），"
+                             f"留言 {len(data.get('messages', []))} 条（恢复 {result['messages']['added_count']}、"
+                             f"删除 {result['messages']['removed_count']}、改回 {result['messages']['changed_count']}）")
+        return result
+    
+    @staticmethod
+    def _describe_record(collection: str, record: Dict[str, Any]) -> str:
+        content = str(record.get("content", "")).replace("\n", " ")
+        content = content if len(content) <= 30 else content[:30] + "…"
+        if collection == "homeworks":
+            return f"#{record.get('id')} {record.get('timestamp', '')} {record.get('class', '')} {record.get('subject', '')}: {content}"
+        return f"#{record.get('id')} {record.get('timestamp', '')} {record.get('student', '')}: {content}"
+    
+    def restore_backup(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """用备份替换当前数据
+        
+        先把当前数据保存为带时间戳的副本（可以再恢复回来），然后在一个事务中换入备份的数据并写一次文件，
+        其它线程在恢复完成前读取的是恢复前的快照，之后直接看到恢复后的快照。
+        密码保留当前设置；ID序列取两者中较大的值，恢复后新添加的记录不会与修订历史、归档中的记录重号。
+        
+        Returns:
+            Dict[str, Any]: {"success", "message", "saved_copy", "homeworks", "messages"}
+        """
+        result = {"success": False, "message": "", "saved_copy": None, "homeworks": 0, "messages": 0}
+        try:
+            data = backup_catalog.BackupCatalog(self.base_data_dir).load(entry)
+        except Exception as e:
+            result["message"] = f"读取备份失败: {e}"
+            return result
+        
+        try:
+            with self.transaction():
+                self._ensure_loaded(None)
+                result["saved_copy"] = self._save_restore_copy()
+                current_password = self.get_password()
+                password_version = self.data.get("password_version")
+                sequences = dict(self.data.get("id_sequences", {}))
+                previous_classes = {record.get("class", "") for collection in RECORD_COLLECTIONS
+                                    for record in self.data[collection]}
+                
+                self._save_undo_copy()
+                self._set_data(data)
+                self._migrate_data()
+                for collection, value in sequences.items():
+                    self.data["id_sequences"][collection] = max(self.data["id_sequences"].get(collection, 0), value)
+                self.data["password"] = current_password
+                if password_version:
+                    self.data["password_version"] = password_version
+                else:
+                    self.data.pop("password_version", None)
+                if self._shards is not None:
+                    # 恢复前后所有班级的分片都要重写（恢复后没有记录的班级删除分片文件）
+                    restored_classes = {record.get("class", "") for collection in RECORD_COLLECTIONS
+                                        for record in self.data[collection]}
+                    classes = previous_classes | restored_classes | set(self._shards.class_names())
+                    self._loaded_shards = set(classes)
+                    self._dirty_shards.update(classes)
+                self.save_data()
+        except Exception as e:
+            print(f"恢复备份失败: {e}")
+            result["message"] = f"恢复备份失败: {e}"
+            return result
+        
+        result["success"] = True
+        result["homeworks"] = len(self.data["homeworks"])
+        result["messages"] = len(self.data["messages"])
+        result["message"] = (f"已恢复到 {entry['name']}（作业 {result['homeworks']} 份，留言 {result['messages']} 条），"
+                             f"恢复前的数据已保存为 {os.path.basename(result['saved_copy'])}")
+        return result
+    
+    def _save_restore_copy(self) -> str:
+        """把当前内存数据保存为数据目录中带时间戳的副本并登记到备份索引（在事务中调用）"""
+        stem = os.path.splitext(os.path.basename(self.data_file))[0]
+        now = datetime.now()
+        index = backup_retention.BackupIndex(self.base_data_dir)
+        name = f"{stem}_{now.strftime(backup_retention.COPY_TIME_FORMAT)}.json"
+        number = 1
+        while os.path.exists(os.path.join(self.base_data_dir, name)):
+            number += 1
+            name = f"{stem}_{now.strftime(backup_retention.COPY_TIME_FORMAT)}_{number}.json"
+        path = os.path.join(self.base_data_dir, name)
+        content = json.dumps(self.data, ensure_ascii=False, indent=2, default=records.json_default).encode('utf-8')
+        temp_file = path + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, path)
+        index.add(stem, name, now.timestamp(), len(content), hashlib.sha256(content).hexdigest())
+        index.save()
+        return path
+    
+    def get_usb_drives(self) -> List[str]:
+        """检测所有连接的U盘驱动器（Windows、Linux的挂载点，或环境变量指定的模拟U盘，见drive_watcher）
+        
+        Returns:
+            List[str]: U盘根目录列表（如 ['D:\\', 'E:\\'] 或 ['/media/user/U盘']）
+        """
+        try:
+            drives = drive_watcher.list_drives()
         except Exception as e:
             print(f"检测U盘时出错: {e}")
             return []
+        if drives is None:
+            print("U盘检测功能在当前环境下不可用")
+            return []
+        return [drive["path"] for drive in drives]
     
     def backup_from_usb(self) -> Dict[str, Any]:
         """从连接的U盘备份数据到程序的数据目录
         
+        多个U盘并行复制，与数据目录中内容相同的文件跳过；每个复制的文件记录字节数和耗时。
+        之后按保留策略清理多余的带时间戳副本（结果中的removed_backups）。
+        
         Returns:
             Dict[str, Any]: 备份结果信息
         """
@@ -343,6 +2577,8 @@ class DataManager:
             "success": False,
             "message": "",
             "backed_up_files": [],
+            "skipped_files": [],
+            "removed_backups": [],
             "usb_drives": []
         }
         
@@ -354,54 +2590,20 @@ class DataManager:
             result["message"] = "未检测到连接的U盘"
             return result
         
-        # 要查找的数据文件名
-        data_file_names = ["data.json", "student_data.json", "teacher_data.json", "demo_data.json"]
-        
-        # 记录成功备份的文件
-        backed_up_files = []
-        
-        # 遍历所有U盘
-        for drive in usb_drives:
-            try:
-                # 遍历可能的数据文件名
-                for file_name in data_file_names:
-                    usb_file_path = os.path.join(drive, file_name)
-                    
-                    # 检查文件是否存在
-                    if os.path.exists(usb_file_path):
-                        # 目标文件路径
-                        target_file_path = os.path.join(self.base_data_dir, file_name)
-                        
-                        try:
-                            # 创建备份副本名（带时间戳）
-                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                            backup_file_name = f"{os.path.splitext(file_name)[0]}_{timestamp}.json"
-                            backup_file_path = os.path.join(self.base_data_dir, backup_file_name)
-                            
-                            # 复制文件到目标位置
-                            shutil.copy2(usb_file_path, target_file_path)
-                            # 同时创建带时间戳的备份
-                            shutil.copy2(usb_file_path, backup_file_path)
-                            
-                            backed_up_files.append({
-                                "file": file_name,
-                                "from": usb_file_path,
-                                "to": target_file_path,
-                                "backup": backup_file_path
-                            })
-                            
-                            print(f"成功从U盘 {drive} 备份文件: {file_name} 到 {target_file_path}")
-                            print(f"创建备份副本: {backup_file_path}")
-                            
-                        except Exception as e:
-                            print(f"备份文件 {usb_file_path} 时出错: {e}")
-            except Exception as e:
-                print(f"访问U盘 {drive} 时出错: {e}")
+        # 并行从各个U盘复制，内容与数据目录中相同的文件跳过
+        index = backup_retention.BackupIndex(self.base_data_dir)
+        restored = usb_restore.restore_from_drives(usb_drives, self.base_data_dir, index=index)
+        backed_up_files = restored["backed_up_files"]
+        result["skipped_files"] = restored["skipped_files"]
+        result["removed_backups"] = index.prune()
         
         if backed_up_files:
             result["success"] = True
             result["message"] = f"成功备份 {len(backed_up_files)} 个文件"
             result["backed_up_files"] = backed_up_files
+        elif restored["skipped_files"]:
+            result["success"] = True
+            result["message"] = "U盘中的数据文件与现有数据相同，无需备份"
         else:
             result["message"] = "在U盘中未找到可备份的数据文件"
         
@@ -0,0 +1,62 @@
+"""
+多版本快照模块
+DataManager每完成一次修改就发布一个新版本，其它线程读取时使用该版本的只读快照：
+- 修改数据的线程持有写锁，修改过程中的中间状态不会被其它线程看到
+- 快照在发布后第一次被读取时才生成，连续修改而没有读取时不复制记录集合和索引；
+  已生成的快照直接读取，不需要加锁，读取线程要么看到修改前的版本，要么看到修改后的版本
+- 快照中的记录、分桶、统计计数在生成后不再修改（DataManager修改前先复制，即写时复制）
+
+快照的版本号单调递增，可以作为界面渲染、序列化结果的缓存键；
+同一快照内派生出的数据（如排序后的作业列表）可以通过memo缓存，版本变化后自然失效。
+"""
+
+from typing import Any, Callable, Dict, Optional, Sequence
+
+
+class DataSnapshot:
+    """某一版本数据的只读视图
+
+    Attributes:
+        version: 版本号，每次发布加一
+        globals: 班级、学科、密码、ID序列等全局字段
+        statistics: 该版本的作业统计计数
+        lazy_store: 延迟加载模式下的记录存储（此时记录不在内存中）
+    """
+
+    __slots__ = ("version", "globals", "statistics", "lazy_store", "_records", "_id_index", "_day_buckets", "_memo")
+
+    def __init__(self, version: int, globals: Dict[str, Any] = None,
+                 records: Dict[str, Sequence[Any]] = None, id_index: Dict[str, Dict[int, Any]] = None,
+                 day_buckets: Dict[str, Dict[int, Dict[int, Any]]] = None,
+                 statistics: Any = None, lazy_store: Any = None):
+        self.version = version
+        self.globals = globals if globals is not None else {}
+        self.statistics = statistics
+        self.lazy_store = lazy_store
+        self._records = records or {}
+        self._id_index = id_index or {}
+        self._day_buckets = day_buckets or {}
+        self._memo = {}
+
+    def items(self, collection: str) -> Sequence[Any]:
+        """集合中的全部记录（存储顺序，不代表时间顺序）"""
+        return self._records.get(collection, ())
+
+    def get(self, collection: str, record_id) -> Optional[Any]:
+        """按ID取记录"""
+        return self._id_index.get(collection, {}).get(record_id)
+
+    def buckets(self, collection: str) -> Dict[int, Dict[int, Any]]:
+        """按天分桶索引 {日期序号: {id: 记录}}"""
+        return self._day_buckets.get(collection, {})
+
+    def memo(self, key, build: Callable[[], Any]) -> Any:
+        """缓存由本快照派生的数据，同一key只计算一次
+
+        多个线程同时计算同一key时可能各算一次，但只保留先完成的结果。
+        缓存的数据会被多个调用方共用，不应修改。
+        """
+        try:
+            return self._memo[key]
+        except KeyError:
+            return self._memo.setdefault(key, build())
@@ -19,11 +19,12 @@ def demo_data_manager():
     # 创建数据管理器
     dm = DataManager("demo_data.json")
     
-    # 添加一些示例作业
+    # 添加一些示例作业（事务内批量写入，只保存一次文件）
     print("1. 添加示例作业...")
-    homework1 = dm.add_homework("数学", "完成课后习题1-10题", "高一(1)班", "张老师")
-    homework2 = dm.add_homework("语文", "背诵《静夜思》并默写", "高一(1)班", "李老师")
-    homework3 = dm.add_homework("英语", "Write an essay about your hometown", "高二(1)班", "王老师")
+    with dm.transaction():
+        homework1 = dm.add_homework("数学", "完成课后习题1-10题", "高一(1)班", "张老师")
+        homework2 = dm.add_homework("语文", "背诵《静夜思》并默写", "高一(1)班", "李老师")
+        homework3 = dm.add_homework("英语", "Write an essay about your hometown", "高二(1)班", "王老师")
     
     print(f"添加作业1: {homework1['subject']} - {homework1['content']}")
     print(f"添加作业2: {homework2['subject']} - {homework2['content']}")
@@ -31,8 +32,9 @@ def demo_data_manager():
     
     # 添加示例留言
     print("\n2. 添加示例留言...")
-    message1 = dm.add_message("老师，这道数学题我不会做", "小明", "高一(1)班")
-    message2 = dm.add_message("英语作业已经完成", "小红", "高一(1)班")
+    with dm.transaction():
+        message1 = dm.add_message("老师，这道数学题我不会做", "小明", "高一(1)班")
+        message2 = dm.add_message("英语作业已经完成", "小红", "高一(1)班")
     
     print(f"添加留言1: {message1['content']}")
     print(f"添加留言2: {message2['content']}")
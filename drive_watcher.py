@@ -0,0 +1,382 @@
+"""
+可移动磁盘监视模块
+U盘插入或拔出时通知回调；没有插拔时监视线程阻塞等待系统通知，不做轮询：
+- Windows：隐藏窗口接收 WM_DEVICECHANGE 通知，收到通知后才列出可移动磁盘（需要pywin32；有WMI时读取设备ID和描述）
+- Linux：在 /proc/self/mountinfo 上等待 POLLPRI（挂载表变化时内核唤醒），只列出 /media、/run/media、/mnt 下的挂载点
+- 模拟：把一个目录（如仓库中的 mock_usb/）当作U盘，用于在没有U盘的环境中测试备份流程；
+  目录本身含有数据文件时作为一个U盘，其下每个子目录各作为一个U盘，按目录的修改时间判断是否有变化
+设置环境变量 HOMEWORK_MOCK_USB 为模拟目录时使用模拟后端。
+
+每个U盘用字典表示：{"path": 根目录, "name": 显示名称, "description": 描述, "device_id": 设备ID}
+"""
+
+import os
+import time
+import select
+import platform
+import threading
+from typing import Callable, Dict, List, Optional
+
+from usb_restore import DATA_FILE_NAMES
+
+# 可选：Windows上接收设备通知、列出可移动磁盘（pywin32），通过WMI读取U盘的设备ID和描述（与之前保存在设置中的设备ID一致）
+# 导入较慢，第一次用到Windows后端时才导入（None表示尚未检查）
+HAS_WIN32 = None
+HAS_WMI = None
+
+
+def load_win32() -> bool:
+    """按需导入pywin32，不可用时返回False"""
+    global HAS_WIN32, win32api, win32con, win32file, win32gui
+    if HAS_WIN32 is None:
+        try:
+            import win32api
+            import win32con
+            import win32file
+            import win32gui
+            HAS_WIN32 = True
+        except ImportError:
+            HAS_WIN32 = False
+    return HAS_WIN32
+
+
+def load_wmi() -> bool:
+    """按需导入WMI，不可用时返回False"""
+    global HAS_WMI, wmi, pythoncom
+    if HAS_WMI is None:
+        try:
+            import wmi
+            import pythoncom
+            HAS_WMI = True
+        except ImportError:
+            HAS_WMI = False
+    return HAS_WMI
+
+MOCK_USB_ENV = "HOMEWORK_MOCK_USB"
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+LINUX_MOUNT_ROOTS = ("/media/", "/run/media/", "/mnt/")
+
+# 模拟后端检查目录变化的间隔（秒）
+MOCK_POLL_INTERVAL = 1.0
+
+# 等待通知的最长时间（秒），超时后重新列出一次，避免漏掉通知
+MAX_WAIT_SECONDS = 60.0
+
+# Windows：收到通知后等待文件系统就绪的时间（秒）
+DEVICE_SETTLE_SECONDS = 1.0
+
+WM_DEVICECHANGE = 0x0219
+DBT_DEVICEARRIVAL = 0x8000
+DBT_DEVICEREMOVECOMPLETE = 0x8004
+
+
+class DriveBackend:
+    """监视后端：list_drives列出当前的U盘，wait阻塞到可能有变化、超时或close"""
+
+    def list_drives(self) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+    def wait(self, timeout: float) -> bool:
+        """等待变化，返回是否收到了通知"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def parse_mountinfo(text: str, roots=LINUX_MOUNT_ROOTS) -> List[Dict[str, str]]:
+    """从 /proc/self/mountinfo 的内容中取出位于roots下的挂载点"""
+    drives = []
+    for line in text.splitlines():
+        fields = line.split(" ")
+        if len(fields) < 10 or "-" not in fields:
+            continue
+        # 挂载点中的空格等字符以八进制转义（如 \040）
+        mount_point = fields[4].encode('latin-1').decode('unicode_escape').encode('latin-1').decode('utf-8', 'replace')
+        if not mount_point.startswith(roots):
+            continue
+        separator = fields.index("-")
+        source = fields[separator + 2] if len(fields) > separator + 2 else ""
+        drives.append({"path": mount_point, "name": os.path.basename(mount_point.rstrip("/")),
+                       "description": source, "device_id": mount_point})
+    return drives
+
+
+class LinuxMountBackend(DriveBackend):
+    """Linux：挂载表变化时内核在 /proc/self/mountinfo 上产生POLLPRI事件，读取一次文件后事件清除"""
+
+    def __init__(self, mountinfo: str = MOUNTINFO_PATH, roots=LINUX_MOUNT_ROOTS):
+        self.roots = roots
+        self._lock = threading.Lock()
+        self._wait_lock = threading.Lock()  # 等待期间持有，close等等待的线程醒来后才关闭文件描述符
+        self._closed = False
+        self._file = open(mountinfo, 'rb')
+        self._wake_read, self._wake_write = os.pipe()
+        self._poll = select.poll()
+        self._poll.register(self._file.fileno(), select.POLLPRI | select.POLLERR)
+        self._poll.register(self._wake_read, select.POLLIN)
+
+    def list_drives(self) -> List[Dict[str, str]]:
+        with self._lock:
+            self._file.seek(0)
+            text = self._file.read().decode('utf-8', 'replace')
+        return parse_mountinfo(text, self.roots)
+
+    def wait(self, timeout: float) -> bool:
+        with self._wait_lock:
+            if self._closed:
+                return False
+            events = self._poll.poll(timeout * 1000)
+            return any(fd == self._file.fileno() for fd, _event in events)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            os.write(self._wake_write, b"x")
+        # 唤醒的线程从poll返回后再注销并关闭管道和挂载表
+        with self._wait_lock:
+            self._poll.unregister(self._file.fileno())
+            self._poll.unregister(self._wake_read)
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+            self._file.close()
+
+
+class MockDriveBackend(DriveBackend):
+    """模拟U盘：root本身含有数据文件时作为一个U盘，root下的每个子目录各作为一个U盘"""
+
+    def __init__(self, root: str, interval: float = MOCK_POLL_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.interval = interval
+        self._closed = threading.Event()
+        self._signature = self._current_signature()
+
+    def _current_signature(self):
+        try:
+            return os.stat(self.root).st_mtime_ns
+        except OSError:
+            return None
+
+    def list_drives(self) -> List[Dict[str, str]]:
+        self._signature = self._current_signature()
+        try:
+            entries = sorted(os.scandir(self.root), key=lambda entry: entry.name)
+        except OSError:
+            return []
+        drives = []
+        if any(entry.is_file() and entry.name in DATA_FILE_NAMES for entry in entries):
+            drives.append(self._drive(self.root))
+        drives.extend(self._drive(entry.path) for entry in entries if entry.is_dir())
+        return drives
+
+    @staticmethod
+    def _drive(path: str) -> Dict[str, str]:
+        name = os.path.basename(path)
+        return {"path": path, "name": name, "description": "模拟U盘", "device_id": f"mock:{name}"}
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self._closed.is_set():
+            if self._current_signature() != self._signature:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._closed.wait(min(self.interval, remaining))
+        return False
+
+    def close(self):
+        self._closed.set()
+
+
+class WindowsDriveBackend(DriveBackend):
+    """Windows：隐藏的顶层窗口接收 WM_DEVICECHANGE（卷的到达和移除只广播给顶层窗口，仅消息窗口收不到）"""
+
+    def __init__(self):
+        if not load_win32():
+            raise RuntimeError("监视U盘需要pywin32")
+        self._changed = threading.Event()
+        self._closed = False
+        self._hwnd = None
+        self._thread = None
+
+    def _start(self):
+        """首次等待时才创建窗口（只列出U盘时不需要）"""
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._message_loop, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait(5)
+
+    def _message_loop(self, ready: threading.Event):
+        try:
+            window_class = win32gui.WNDCLASS()
+            window_class.lpszClassName = "HomeworkViewerDriveWatcher"
+            window_class.hInstance = win32api.GetModuleHandle(None)
+            window_class.lpfnWndProc = {
+                WM_DEVICECHANGE: self._on_device_change,
+                win32con.WM_CLOSE: lambda hwnd, msg, wparam, lparam: win32gui.DestroyWindow(hwnd),
+                win32con.WM_DESTROY: lambda hwnd, msg, wparam, lparam: win32gui.PostQuitMessage(0),
+            }
+            try:
+                atom = win32gui.RegisterClass(window_class)
+            except win32gui.error:
+                atom = window_class.lpszClassName  # 同一进程中已经注册过
+            self._hwnd = win32gui.CreateWindow(atom, "作业查看器U盘监视", 0, 0, 0, 0, 0, 0, 0,
+                                               window_class.hInstance, None)
+        except Exception as e:
+            print(f"创建U盘监视窗口失败: {e}")
+            return
+        finally:
+            ready.set()
+        win32gui.PumpMessages()
+
+    def _on_device_change(self, hwnd, msg, wparam, lparam):
+        if wparam in (DBT_DEVICEARRIVAL, DBT_DEVICEREMOVECOMPLETE):
+            self._changed.set()
+        return True
+
+    def list_drives(self) -> List[Dict[str, str]]:
+        if load_wmi():
+            try:
+                return self._list_wmi()
+            except Exception as e:
+                print(f"通过WMI获取U盘信息失败: {e}")
+        drives = []
+        for root in win32api.GetLogicalDriveStrings().split("\x00"):
+            if not root or win32file.GetDriveType(root) != win32file.DRIVE_REMOVABLE:
+                continue
+            try:
+                label, serial = win32api.GetVolumeInformation(root)[:2]
+            except Exception:
+                label, serial = "", 0
+            drives.append({"path": root, "name": root.rstrip("\\"), "description": label or "可移动磁盘",
+                           "device_id": f"{serial:08X}"})
+        return drives
+
+    @staticmethod
+    def _list_wmi() -> List[Dict[str, str]]:
+        """与原来的学生端相同，设备ID为磁盘的DeviceID（在监视线程中调用时需要初始化COM）"""
+        pythoncom.CoInitialize()
+        try:
+            drives = []
+            for disk in wmi.WMI().Win32_DiskDrive():
+                if 'removable' not in (disk.MediaType or "").lower() and 'usb' not in disk.PNPDeviceID.lower():
+                    continue
+                for partition in disk.associators(wmi_association='Win32_DiskDriveToDiskPartition'):
+                    for logical_disk in partition.associators(wmi_association='Win32_LogicalDiskToPartition'):
+                        drives.append({"path": logical_disk.Name + "\\", "name": logical_disk.Name,
+                                       "description": disk.Caption, "device_id": disk.DeviceID})
+            return drives
+        finally:
+            pythoncom.CoUninitialize()
+
+    def wait(self, timeout: float) -> bool:
+        if self._thread is None:
+            self._start()
+        changed = self._changed.wait(timeout)
+        if changed and not self._closed:
+            # 同一次插拔会连续收到多个通知，等文件系统就绪后一起处理
+            time.sleep(DEVICE_SETTLE_SECONDS)
+        self._changed.clear()
+        return changed and not self._closed
+
+    def close(self):
+        self._closed = True
+        self._changed.set()
+        if self._hwnd is not None:
+            win32gui.PostMessage(self._hwnd, win32con.WM_CLOSE, 0, 0)
+
+
+def create_backend(mock_root: str = None) -> Optional[DriveBackend]:
+    """按运行环境选择监视后端，不支持时返回None"""
+    mock_root = mock_root or os.environ.get(MOCK_USB_ENV)
+    if mock_root:
+        return MockDriveBackend(mock_root)
+    system = platform.system()
+    if system == "Windows" and load_win32():
+        return WindowsDriveBackend()
+    if system == "Linux" and hasattr(select, "poll") and os.path.exists(MOUNTINFO_PATH):
+        try:
+            return LinuxMountBackend()
+        except OSError as e:
+            print(f"无法监视挂载表: {e}")
+    return None
+
+
+def list_drives(mock_root: str = None) -> Optional[List[Dict[str, str]]]:
+    """列出当前连接的U盘（只查询一次，不创建监视用的窗口、管道等资源），不支持时返回None"""
+    mock_root = mock_root or os.environ.get(MOCK_USB_ENV)
+    if mock_root:
+        return MockDriveBackend(mock_root).list_drives()
+    system = platform.system()
+    if system == "Windows" and load_win32():
+        return WindowsDriveBackend().list_drives()
+    if system == "Linux" and os.path.exists(MOUNTINFO_PATH):
+        with open(MOUNTINFO_PATH, 'rb') as f:
+            return parse_mountinfo(f.read().decode('utf-8', 'replace'))
+    return None
+
+
+class DriveWatcher:
+    """在后台线程中监视U盘插拔，插入时调用on_insert(drive)，拔出时调用on_remove(drive)（在监视线程中调用）"""
+
+    def __init__(self, backend: DriveBackend, on_insert: Callable[[Dict[str, str]], None] = None,
+                 on_remove: Callable[[Dict[str, str]], None] = None):
+        self.backend = backend
+        self.on_insert = on_insert
+        self.on_remove = on_remove
+        self._drives = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def drives(self) -> List[Dict[str, str]]:
+        """当前连接的U盘（上次收到通知时列出的结果，不重新查询）"""
+        with self._lock:
+            return [dict(drive) for drive in self._drives]
+
+    def start(self):
+        """列出当前的U盘并开始监视（启动前已连接的U盘不触发on_insert）"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            self._drives = self.backend.list_drives()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.backend.wait(MAX_WAIT_SECONDS)
+                if self._stopped.is_set():
+                    break
+                self.refresh()
+            except Exception as e:
+                print(f"U盘监控错误: {e}")
+                self._stopped.wait(5)
+
+    def refresh(self):
+        """重新列出U盘，对新插入和拔出的U盘调用回调"""
+        current = self.backend.list_drives()
+        with self._lock:
+            previous = {drive["device_id"]: drive for drive in self._drives}
+            self._drives = current
+        current_ids = {drive["device_id"] for drive in current}
+        for drive in current:
+            if drive["device_id"] not in previous and self.on_insert is not None:
+                self.on_insert(dict(drive))
+        for device_id, drive in previous.items():
+            if device_id not in current_ids and self.on_remove is not None:
+                self.on_remove(dict(drive))
+
+    def stop(self, timeout: float = 2):
+        self._stopped.set()
+        self.backend.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,285 @@
+"""
+多进程同步模块
+老师端、学生端可能同时使用同一个数据目录，这里提供：
+- FileLock: 跨进程的咨询锁（Linux/macOS使用fcntl.flock，Windows使用msvcrt.locking），写入数据时持有
+- FileWatcher: 监视数据文件的变化，Linux上使用inotify，其它系统定时检查修改时间
+- file_signature: 文件签名（inode、大小、修改时间），用于判断文件是否被其它进程改写
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# 可选：POSIX文件锁
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 可选：Windows文件锁
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# 获取锁的默认超时（秒）
+DEFAULT_LOCK_TIMEOUT = 10.0
+
+# 不支持inotify时检查修改时间的间隔（秒）
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify事件掩码（见 <sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """文件签名 (inode, 大小, 修改时间纳秒)，文件不存在时返回None
+
+    数据文件总是先写临时文件再替换，每次保存inode都会改变
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileLock:
+    """跨进程的咨询锁
+
+    同一个实例可以重入（嵌套的with只在最外层真正加锁），并且同一进程内的线程之间互斥。
+    锁文件本身不保存内容，只用于加锁。
+    """
+
+    def __init__(self, path: str, timeout: float = DEFAULT_LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def _try_lock(self) -> bool:
+        fd = self._file.fileno()
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError as e:
+            if e.errno in (errno.EACCES, errno.EAGAIN, errno.EDEADLK):
+                return False
+            raise
+
+    def _unlock(self):
+        fd = self._file.fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def acquire(self):
+        """加锁，超时未获得时抛出TimeoutError"""
+        if not self._thread_lock.acquire(timeout=self.timeout):
+            raise TimeoutError(f"等待文件锁超时: {self.path}")
+        if self._depth:
+            self._depth += 1
+            return
+
+        try:
+            self._file = open(self.path, 'a+b')
+            deadline = time.monotonic() + self.timeout
+            while not self._try_lock():
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"数据文件正被其它程序使用，等待文件锁超时: {self.path}")
+                time.sleep(0.02)
+        except BaseException:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._thread_lock.release()
+            raise
+        self._depth = 1
+
+    def release(self):
+        """解锁"""
+        self._depth -= 1
+        if not self._depth:
+            try:
+                self._unlock()
+            finally:
+                self._file.close()
+                self._file = None
+        self._thread_lock.release()
+
+    @property
+    def locked(self) -> bool:
+        """本实例当前是否持有锁"""
+        return self._depth > 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _load_inotify():
+    """通过ctypes加载libc中的inotify函数，不支持时返回None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """监视文件或目录的变化
+
+    文件通过监视其所在目录实现（替换写入会改变inode，直接监视文件会丢失后续事件）；
+    目录中任意文件变化都会触发（临时文件除外）。
+    变化时设置changed事件并在监视线程中调用回调，回调应尽快返回。
+    """
+
+    def __init__(self, paths: Iterable[str], callback: Callable[[], None] = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, use_inotify: bool = True):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.changed = threading.Event()
+        self.mode = None  # "inotify" 或 "poll"
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def start(self):
+        """启动监视线程"""
+        if self._thread is not None:
+            return
+        libc = _load_inotify() if self.use_inotify else None
+        if libc is not None and self._start_inotify(libc):
+            self.mode = "inotify"
+            target = self._inotify_loop
+        else:
+            self.mode = "poll"
+            target = self._poll_loop
+        self._thread = threading.Thread(target=target, name="FileWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止监视"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _notify(self):
+        self.changed.set()
+        if self.callback is not None:
+            try:
+                self.callback()
+            except Exception as e:
+                print(f"处理文件变化通知失败: {e}")
+
+    # ---- inotify ----
+
+    def _targets(self) -> Dict[str, Optional[set]]:
+        """需要监视的目录 -> 关心的文件名（None表示目录中的全部文件）"""
+        targets = {}
+        for path in self.paths:
+            if os.path.isdir(path):
+                targets[path] = None
+            else:
+                directory = os.path.dirname(path)
+                names = targets.setdefault(directory, set())
+                if names is not None:
+                    names.add(os.path.basename(path))
+        return targets
+
+    def _start_inotify(self, libc) -> bool:
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self._watches = {}
+        for directory, names in self._targets().items():
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                os.close(fd)
+                return False
+            self._watches[wd] = names
+        self._fd = fd
+        return True
+
+    def _inotify_loop(self):
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                buffer = os.read(self._fd, 65536)
+            except (OSError, ValueError):
+                break
+
+            relevant = False
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buffer):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b"\0").decode('utf-8', 'replace')
+                offset += length
+                names = self._watches.get(wd)
+                if name.endswith(".tmp"):
+                    continue
+                if names is None or name in names:
+                    relevant = True
+            if relevant:
+                self._notify()
+
+    # ---- 定时检查 ----
+
+    def _snapshot(self) -> List:
+        result = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                try:
+                    names = sorted(name for name in os.listdir(path) if not name.endswith(".tmp"))
+                except OSError:
+                    names = []
+                result.append([(name, file_signature(os.path.join(path, name))) for name in names])
+            else:
+                result.append(file_signature(path))
+        return result
+
+    def _poll_loop(self):
+        last = self._snapshot()
+        while not self._stop.wait(self.poll_interval):
+            current = self._snapshot()
+            if current != last:
+                last = current
+                self._notify()
@@ -0,0 +1,369 @@
+"""
+数据文件完整性校验模块
+保存数据文件时同时写入校验文件，读取时可以快速确认数据文件完好，损坏时只丢弃损坏的记录：
+- <数据文件>.check   第一行为格式标识，第二行为JSON头，之后是块CRC表和记录表：
+  JSON头   {"size", "mtime_ns", "sha1", "block_size", "blocks", "byteorder", "keys": 顶层字段顺序,
+            "globals": {字段: [偏移, 长度, CRC32]}, "values": {字段: 值}, "collections": {集合名: 记录数}}
+  块CRC表  数据文件每 BLOCK_SIZE 字节一个CRC32（uint32）
+  记录表   按collections的顺序依次排列，每条记录 (ID, 偏移, 长度, CRC32) 四个int64
+数据文件本身仍是普通的JSON（与 json.dumps(data, indent=2) 的结果逐字节相同），其它程序照常读取。
+
+校验时只计算各块的CRC32，100MB的数据文件约0.1秒；发现损坏时再逐条比较记录的CRC32，
+完好的记录和全局字段单独解析后保留，损坏的全局字段（密码、设置、ID序列等）使用校验文件中保存的值，
+损坏的记录按ID报告，由调用方从快照缓存或备份中找回。
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+CHECK_MAGIC = b"HWCHECK1\n"
+
+# 计算块CRC的块大小
+BLOCK_SIZE = 64 * 1024
+
+
+def check_path(data_file: str) -> str:
+    """获取数据文件对应的校验文件路径"""
+    return data_file + ".check"
+
+
+def _record_id(record) -> int:
+    record_id = record.get("id")
+    return record_id if type(record_id) is int else -1
+
+
+def dump_data(data: Dict[str, Any], record_keys: Sequence[str], default=None) -> Tuple[bytes, Dict[str, Any]]:
+    """序列化数据（与 json.dumps(data, ensure_ascii=False, indent=2) 相同），同时记录各字段和记录的位置
+
+    Returns:
+        Tuple[bytes, Dict[str, Any]]: (内容, 布局 {"keys", "globals": {字段: [偏移, 长度, CRC32]},
+        "collections": {集合名: [(ID, 偏移, 长度, CRC32)]}})
+    """
+    pieces = []
+    offset = 0
+    layout = {"keys": list(data), "globals": {}, "collections": {}}
+    encode = json.JSONEncoder(ensure_ascii=False, indent=2, default=default).encode
+
+    def add(piece: bytes):
+        nonlocal offset
+        pieces.append(piece)
+        offset += len(piece)
+
+    if not data:
+        return b"{}", layout
+    add(b"{")
+    for number, (key, value) in enumerate(data.items()):
+        add(((",\n  " if number else "\n  ") + json.dumps(key, ensure_ascii=False) + ": ").encode('utf-8'))
+        if key in record_keys and isinstance(value, list):
+            entries = layout["collections"][key] = []
+            if not value:
+                add(b"[]")
+                continue
+            add(b"[")
+            for index, record in enumerate(value):
+                add(b",\n    " if index else b"\n    ")
+                piece = encode(record).replace("\n", "\n    ").encode('utf-8')
+                entries.append((_record_id(record), offset, len(piece), zlib.crc32(piece)))
+                add(piece)
+            add(b"\n  ]")
+        else:
+            piece = encode(value).replace("\n", "\n  ").encode('utf-8')
+            layout["globals"][key] = [offset, len(piece), zlib.crc32(piece)]
+            add(piece)
+    add(b"\n}")
+    return b"".join(pieces), layout
+
+
+def splice_globals(content: bytes, check: Dict[str, Any], data: Dict[str, Any], key_order: Sequence[str],
+                   default=None) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+    """记录没有变化时重新生成数据文件：只序列化全局字段，记录部分原样复用原内容（不需要解析记录）
+
+    结果与 dump_data 对完整数据的结果相同。content与校验文件不一致（已损坏或被其它程序改写）时返回None。
+
+    Args:
+        content: 原数据文件的内容
+        check: 原数据文件的校验文件（read_check的结果）
+        data: 全局字段（不含记录集合）
+        key_order: 顶层字段顺序，其中的记录集合使用原内容
+    """
+    if len(content) != check["size"] or damaged_blocks(content, check):
+        return None
+    entries = record_entries(check)
+    pieces = []
+    offset = 0
+    layout = {"keys": [], "globals": {}, "collections": {}}
+    encode = json.JSONEncoder(ensure_ascii=False, indent=2, default=default).encode
+
+    def add(piece: bytes):
+        nonlocal offset
+        pieces.append(piece)
+        offset += len(piece)
+
+    keys = [key for key in key_order if key in entries or key in data]
+    keys.extend(key for key in data if key not in keys)
+    if not keys:
+        return b"{}", layout
+    add(b"{")
+    for number, key in enumerate(keys):
+        layout["keys"].append(key)
+        add(((",\n  " if number else "\n  ") + json.dumps(key, ensure_ascii=False) + ": ").encode('utf-8'))
+        if key in entries:
+            old_entries = entries[key]
+            if not old_entries:
+                layout["collections"][key] = []
+                add(b"[]")
+                continue
+            add(b"[\n    ")
+            start = old_entries[0][1]
+            end = old_entries[-1][1] + old_entries[-1][2]
+            shift = offset - start
+            layout["collections"][key] = [(record_id, record_offset + shift, length, crc)
+                                          for record_id, record_offset, length, crc in old_entries]
+            add(content[start:end])
+            add(b"\n  ]")
+        else:
+            piece = encode(data[key]).replace("\n", "\n  ").encode('utf-8')
+            layout["globals"][key] = [offset, len(piece), zlib.crc32(piece)]
+            add(piece)
+    add(b"\n}")
+    return b"".join(pieces), layout
+
+
+def block_crcs(content: bytes, block_size: int = BLOCK_SIZE) -> array:
+    """内容每block_size字节的CRC32"""
+    view = memoryview(content)
+    return array('I', [zlib.crc32(view[start:start + block_size]) for start in range(0, len(content), block_size)])
+
+
+def write_check(data_file: str, content: bytes, layout: Dict[str, Any], content_hash: str) -> bool:
+    """为已写入磁盘的数据文件写入校验文件（先写临时文件再替换）
+
+    全局字段的值同时写入JSON头，数据文件中的全局字段损坏时仍能找回。
+    """
+    path = check_path(data_file)
+    temp_path = path + ".tmp"
+    try:
+        stat = os.stat(data_file)
+        blocks = block_crcs(content)
+        table = array('q')
+        for entries in layout["collections"].values():
+            for entry in entries:
+                table.extend(entry)
+        header = {
+            "size": len(content), "mtime_ns": stat.st_mtime_ns, "sha1": content_hash,
+            "block_size": BLOCK_SIZE, "blocks": len(blocks), "byteorder": sys.byteorder,
+            "keys": layout["keys"], "globals": layout["globals"],
+            "values": {key: json.loads(content[offset:offset + length].decode('utf-8'))
+                       for key, (offset, length, _crc) in layout["globals"].items()},
+            "collections": {key: len(entries) for key, entries in layout["collections"].items()}
+        }
+        with open(temp_path, 'wb') as f:
+            f.write(CHECK_MAGIC)
+            f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n")
+            f.write(blocks.tobytes())
+            f.write(table.tobytes())
+        os.replace(temp_path, path)
+        return True
+    except Exception as e:
+        print(f"写入校验文件失败: {e}")
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+
+def read_check(data_file: str) -> Optional[Dict[str, Any]]:
+    """读取校验文件，不存在或格式不符时返回None
+
+    Returns:
+        Optional[Dict[str, Any]]: JSON头的内容，另外 "block_crcs" 为块CRC表，"record_table" 为记录表（见record_entries）
+    """
+    try:
+        with open(check_path(data_file), 'rb') as f:
+            if f.readline() != CHECK_MAGIC:
+                return None
+            check = json.loads(f.readline().decode('utf-8'))
+            blocks = array('I')
+            blocks.frombytes(f.read(check["blocks"] * blocks.itemsize))
+            table = array('q')
+            table.frombytes(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"读取校验文件失败: {e}")
+        return None
+
+    if check["byteorder"] != sys.byteorder:
+        blocks.byteswap()
+        table.byteswap()
+    if len(blocks) != check["blocks"] or len(table) != 4 * sum(check["collections"].values()):
+        print("校验文件不完整，已忽略")
+        return None
+    check["block_crcs"] = blocks
+    check["record_table"] = table
+    return check
+
+
+def saved_signature(data_file: str) -> Optional[Tuple[int, int, str]]:
+    """校验文件记录的数据文件签名 (大小, 修改时间纳秒, 内容哈希)，只读取JSON头
+
+    校验文件不存在或不对应数据文件的当前版本时返回None。
+    """
+    try:
+        with open(check_path(data_file), 'rb') as f:
+            if f.readline() != CHECK_MAGIC:
+                return None
+            check = json.loads(f.readline().decode('utf-8'))
+        stat = os.stat(data_file)
+    except (OSError, ValueError):
+        return None
+    if stat.st_size != check["size"] or stat.st_mtime_ns != check["mtime_ns"]:
+        return None
+    return check["size"], check["mtime_ns"], check["sha1"]
+
+
+def record_entries(check: Dict[str, Any]) -> Dict[str, List[Tuple[int, int, int, int]]]:
+    """把记录表拆分为 {集合名: [(ID, 偏移, 长度, CRC32)]}（只在需要逐条校验时调用）"""
+    table = check["record_table"]
+    entries = {}
+    position = 0
+    for key, count in check["collections"].items():
+        entries[key] = [tuple(table[i:i + 4]) for i in range(position, position + 4 * count, 4)]
+        position += 4 * count
+    return entries
+
+
+def is_current(data_file: str, check: Dict[str, Any]) -> bool:
+    """校验文件是否对应数据文件的当前版本（数据文件被其它程序改写后不再对应）"""
+    try:
+        stat = os.stat(data_file)
+    except OSError:
+        return False
+    return stat.st_mtime_ns == check["mtime_ns"]
+
+
+def damaged_blocks(content: bytes, check: Dict[str, Any]) -> List[int]:
+    """内容与校验文件不一致的块序号（内容被截断时缺少的块也算作损坏）"""
+    expected = check["block_crcs"]
+    actual = block_crcs(content, check["block_size"])
+    damaged = [index for index, crc in enumerate(actual) if index >= len(expected) or crc != expected[index]]
+    damaged.extend(range(len(actual), len(expected)))
+    return damaged
+
+
+def verify(data_file: str) -> Dict[str, Any]:
+    """校验数据文件
+
+    Returns:
+        Dict[str, Any]: {"success", "message", "checked"(是否有可用的校验文件), "size", "damaged_blocks", "elapsed"}
+    """
+    start = time.perf_counter()
+    result = {"success": False, "message": "", "checked": False, "size": 0, "damaged_blocks": [], "elapsed": 0.0}
+    try:
+        with open(data_file, 'rb') as f:
+            content = f.read()
+    except OSError as e:
+        result["message"] = f"无法读取数据文件: {e}"
+        return result
+    result["size"] = len(content)
+
+    check = read_check(data_file)
+    if check is None or not is_current(data_file, check):
+        result["message"] = "数据文件没有对应的校验文件（可能由其它程序写入），无法校验"
+    else:
+        result["checked"] = True
+        result["damaged_blocks"] = damaged_blocks(content, check)
+        if len(content) != check["size"]:
+            result["message"] = f"数据文件长度为 {len(content)} 字节，应为 {check['size']} 字节"
+        elif result["damaged_blocks"]:
+            result["message"] = f"数据文件有 {len(result['damaged_blocks'])} 个块损坏"
+        else:
+            result["success"] = True
+            result["message"] = "数据文件完好"
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def salvage(content: bytes, check: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """从损坏的内容中取出完好的字段和记录
+
+    不涉及损坏块的连续记录一次解析；涉及损坏块的记录逐条比较CRC32，一致的单独解析后保留。
+
+    Returns:
+        Tuple[Dict[str, Any], Dict[str, Any]]: (数据, 损坏的部分 {"globals": [字段], 集合名: [ID]})，
+        损坏的全局字段使用校验文件中保存的值（旧版本的校验文件没有时缺少该字段），记录集合只包含完好的记录
+    """
+    block_size = check["block_size"]
+    damaged = set(damaged_blocks(content, check))
+
+    def intact_blocks(offset, length):
+        return not any(block in damaged for block in range(offset // block_size, (offset + max(length, 1) - 1) // block_size + 1))
+
+    def piece_of(offset, length, crc):
+        """(是否完好, 解析结果)"""
+        piece = content[offset:offset + length]
+        if len(piece) != length or zlib.crc32(piece) != crc:
+            return False, None
+        try:
+            return True, json.loads(piece.decode('utf-8'))
+        except ValueError:
+            return False, None
+
+    def parse_run(run):
+        """连续的完好记录之间只有分隔符，拼成一个数组解析"""
+        start = run[0][1]
+        end = run[-1][1] + run[-1][2]
+        items = json.loads(b"".join((b"[", content[start:end], b"]")).decode('utf-8'))
+        if len(items) != len(run) or not all(isinstance(item, dict) for item in items):
+            raise ValueError("记录数与校验文件不一致")
+        return items
+
+    data = {}
+    lost = {"globals": []}
+    entries = record_entries(check)
+    for key in check["keys"]:
+        if key not in entries:
+            intact, value = piece_of(*check["globals"][key])
+            if intact:
+                data[key] = value
+            elif key in check.get("values", {}):
+                data[key] = check["values"][key]
+            else:
+                lost["globals"].append(key)
+            continue
+
+        items = data[key] = []
+        missing = lost[key] = []
+        run = []
+        for entry in entries[key] + [None]:
+            if entry is not None and intact_blocks(entry[1], entry[2]):
+                run.append(entry)
+                continue
+            if run:
+                try:
+                    items.extend(parse_run(run))
+                except ValueError:
+                    # 块CRC碰巧一致但内容有误，逐条校验
+                    damaged.update(range(run[0][1] // block_size, (run[-1][1] + run[-1][2]) // block_size + 1))
+                    for record_id, offset, length, crc in run:
+                        intact, record = piece_of(offset, length, crc)
+                        if intact and isinstance(record, dict):
+                            items.append(record)
+                        else:
+                            missing.append(record_id)
+                run = []
+            if entry is not None:
+                record_id, offset, length, crc = entry
+                intact, record = piece_of(offset, length, crc)
+                if intact and isinstance(record, dict):
+                    items.append(record)
+                else:
+                    missing.append(record_id)
+    return data, lost
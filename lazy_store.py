@@ -0,0 +1,401 @@
+"""
+延迟加载模块
+为数据文件生成伴随的记录文件和索引文件，启动时不再把全部作业、留言解析成字典：
+- <数据文件>.records      每行一条JSON记录，通过mmap按偏移读取
+- <数据文件>.records.idx  marshal格式的索引：记录偏移、ID、班级/学科编码、日期、时间戳，以及按时间倒序的各班级记录位置
+
+查询某个班级或日期范围时才解码对应的记录，解码结果放在容量有限的LRU缓存中
+"""
+
+import os
+import json
+import mmap
+import marshal
+from array import array
+from collections import OrderedDict
+from datetime import datetime, date
+from typing import Any, Dict, List, Optional, Tuple
+
+import snapshot_cache
+import records
+
+LAZY_INDEX_VERSION = 4
+
+# 默认最多缓存的已解码记录数
+DEFAULT_CACHE_SIZE = 4096
+
+
+def records_path(source_path: str) -> str:
+    """获取数据文件对应的记录文件路径"""
+    return source_path + ".records"
+
+
+def index_path(source_path: str) -> str:
+    """获取数据文件对应的索引文件路径"""
+    return source_path + ".records.idx"
+
+
+def day_ordinal(timestamp) -> int:
+    """将时间戳（字符串、date或datetime）转换为日期序号，无法解析时返回0"""
+    if isinstance(timestamp, datetime):
+        return timestamp.date().toordinal()
+    if isinstance(timestamp, date):
+        return timestamp.toordinal()
+    if isinstance(timestamp, str) and len(timestamp) >= 10:
+        try:
+            return date(int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10])).toordinal()
+        except ValueError:
+            return 0
+    return 0
+
+
+def build_lazy_files(source_path: str, data: Dict[str, Any], collections, content_hash: str = None) -> bool:
+    """根据完整数据生成记录文件和索引文件（先写临时文件再替换）
+
+    Args:
+        source_path: 数据文件路径（必须已写入磁盘，索引记录其签名）
+        data: 完整数据
+        collections: 需要延迟加载的记录集合名称
+        content_hash: 数据文件内容哈希，已知时传入可避免重新读取文件
+    """
+    records_file = records_path(source_path)
+    index_file = index_path(source_path)
+    temp_records = records_file + ".tmp"
+    temp_index = index_file + ".tmp"
+    try:
+        index = {
+            "version": LAZY_INDEX_VERSION,
+            "signature": snapshot_cache.source_signature(source_path, content_hash),
+            "key_order": list(data),
+            "globals": {key: value for key, value in data.items() if key not in collections},
+            "collections": {}
+        }
+
+        offset = 0
+        with open(temp_records, 'wb') as f:
+            for collection in collections:
+                items = data.get(collection, [])
+                offsets = array('q')
+                ids = array('q')
+                days = array('i')
+                timestamps = array('q')
+                subject_codes = array('H')
+                subjects = {}
+                class_positions = {}
+
+                for position, record in enumerate(items):
+                    line = json.dumps(record, ensure_ascii=False, default=records.json_default).encode('utf-8') + b"\n"
+                    offsets.append(offset)
+                    f.write(line)
+                    offset += len(line)
+                    record_id = record.get("id")
+                    ids.append(record_id if isinstance(record_id, int) else -1)
+                    days.append(day_ordinal(record.get("timestamp")))
+                    ts = record.get("ts")
+                    timestamps.append(ts if type(ts) is int else 0)
+                    subject_codes.append(subjects.setdefault(record.get("subject", ""), len(subjects)))
+                    class_positions.setdefault(record.get("class", ""), []).append(position)
+                offsets.append(offset)
+
+                # 与get_homeworks相同的排序：按时间倒序，时间相同时保持存储顺序
+                order = sorted(range(len(items)), key=timestamps.__getitem__, reverse=True)
+                rank = array('i', bytes(4 * len(items)))
+                for i, position in enumerate(order):
+                    rank[position] = i
+
+                index["collections"][collection] = {
+                    "count": len(items),
+                    "offsets": offsets.tobytes(),
+                    "ids": ids.tobytes(),
+                    "days": days.tobytes(),
+                    "timestamps": timestamps.tobytes(),
+                    "min_day": min((day for day in days if day), default=0),
+                    "subject_codes": subject_codes.tobytes(),
+                    "subjects": list(subjects),
+                    "order": array('i', order).tobytes(),
+                    "classes": {class_name: array('i', sorted(positions, key=rank.__getitem__)).tobytes()
+                                for class_name, positions in class_positions.items()}
+                }
+
+        with open(temp_index, 'wb') as f:
+            f.write(marshal.dumps(index))
+        os.replace(temp_records, records_file)
+        os.replace(temp_index, index_file)
+        return True
+    except Exception as e:
+        print(f"生成延迟加载索引失败: {e}")
+        for path in (temp_records, temp_index):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                pass
+        return False
+
+
+def update_globals(source_path: str, previous_signature, data: Dict[str, Any], key_order: List[str],
+                   content_hash: str = None) -> bool:
+    """记录没有变化、只修改了全局字段时更新索引中的全局字段和数据文件签名，记录文件不重新生成
+
+    Args:
+        previous_signature: 修改前数据文件的签名，索引不是对应该版本生成的时不更新
+        data: 全局字段（不含记录集合）
+
+    Returns:
+        bool: 是否已更新（返回False时应调用build_lazy_files重新生成）
+    """
+    index_file = index_path(source_path)
+    temp_index = index_file + ".tmp"
+    try:
+        with open(index_file, 'rb') as f:
+            index = marshal.loads(f.read())
+        if index.get("version") != LAZY_INDEX_VERSION or tuple(index["signature"]) != tuple(previous_signature):
+            return False
+        index["signature"] = snapshot_cache.source_signature(source_path, content_hash)
+        index["key_order"] = list(key_order)
+        index["globals"] = dict(data)
+        with open(temp_index, 'wb') as f:
+            f.write(marshal.dumps(index))
+        os.replace(temp_index, index_file)
+        return True
+    except Exception as e:
+        print(f"更新延迟加载索引失败: {e}")
+        try:
+            if os.path.exists(temp_index):
+                os.remove(temp_index)
+        except OSError:
+            pass
+        return False
+
+
+def remove_lazy_files(source_path: str):
+    """删除记录文件和索引文件"""
+    for path in (records_path(source_path), index_path(source_path)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _CollectionIndex:
+    """单个记录集合的索引（数组形式，内存占用为每条记录二十几个字节）"""
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.count = raw["count"]
+        self.offsets = self._array('q', raw["offsets"])
+        self.ids = self._array('q', raw["ids"])
+        self.days = self._array('i', raw["days"])
+        self.timestamps = self._array('q', raw["timestamps"])
+        self.min_day = raw["min_day"]
+        self.subject_codes = self._array('H', raw["subject_codes"])
+        self.subjects = {subject: code for code, subject in enumerate(raw["subjects"])}
+        self.order = self._array('i', raw["order"])
+        self.classes = {class_name: self._array('i', positions) for class_name, positions in raw["classes"].items()}
+        self._id_positions = None
+
+    @staticmethod
+    def _array(typecode: str, raw: bytes) -> array:
+        values = array(typecode)
+        values.frombytes(raw)
+        return values
+
+    def position_of(self, record_id) -> Optional[int]:
+        """按ID查找记录位置（首次调用时建立ID映射）"""
+        if self._id_positions is None:
+            self._id_positions = dict(zip(self.ids, range(self.count)))
+        return self._id_positions.get(record_id)
+
+
+class LazyRecordStore:
+    """只读的延迟加载记录存储
+    
+    返回的记录可能来自缓存，调用方不应修改；需要修改时由DataManager切换为完整加载。
+    可以被多个线程同时读取（数据快照引用的存储不再被引用时自动关闭）。
+    """
+
+    def __init__(self, source_path: str, index: Dict[str, Any], cache_size: int = DEFAULT_CACHE_SIZE):
+        self.source_path = source_path
+        self.signature = tuple(index["signature"])  # 打开时数据文件的签名
+        self.key_order = index["key_order"]
+        self.globals = index["globals"]
+        self.collections = {name: _CollectionIndex(raw) for name, raw in index["collections"].items()}
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # {(集合名, 位置): 记录}
+        self._page_orders = {}       # {(集合名, 班级, 学科): 按 (ts, id) 倒序的记录位置}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._mmap = None
+        self._file = open(records_path(source_path), 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    @classmethod
+    def open(cls, source_path: str, cache_size: int = DEFAULT_CACHE_SIZE) -> Optional["LazyRecordStore"]:
+        """打开与数据文件一致的延迟加载存储，文件缺失或已过期时返回None"""
+        if not (os.path.exists(source_path) and os.path.exists(records_path(source_path))
+                and os.path.exists(index_path(source_path))):
+            return None
+        try:
+            with open(index_path(source_path), 'rb') as f:
+                index = marshal.loads(f.read())
+            if index.get("version") != LAZY_INDEX_VERSION:
+                return None
+
+            size, mtime_ns, content_hash = index["signature"]
+            stat = os.stat(source_path)
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                return None
+            if snapshot_cache.hash_file(source_path) != content_hash:
+                return None
+            return cls(source_path, index, cache_size)
+        except Exception as e:
+            print(f"打开延迟加载索引失败，将完整加载数据: {e}")
+            return None
+
+    def close(self):
+        """关闭记录文件"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._cache.clear()
+
+    def __del__(self):
+        if getattr(self, "_file", None) is not None:
+            self.close()
+
+    def count(self, collection: str) -> int:
+        """记录数量"""
+        return self.collections[collection].count
+
+    def has_records_before(self, day: int) -> bool:
+        """是否有日期早于指定日期序号的记录（无法解析日期的记录不计）"""
+        return any(0 < index.min_day < day for index in self.collections.values())
+
+    def _decode(self, collection: str, position: int, use_cache: bool = True) -> Dict[str, Any]:
+        """解码指定位置的记录（缓存中的记录返回副本，调用方修改结果不会影响缓存）"""
+        key = (collection, position)
+        if use_cache:
+            record = self._cache.get(key)
+            if record is not None:
+                try:
+                    self._cache.move_to_end(key)
+                except KeyError:
+                    pass  # 其它线程刚刚把它淘汰
+                self.cache_hits += 1
+                return dict(record)
+            self.cache_misses += 1
+
+        offsets = self.collections[collection].offsets
+        record = json.loads(self._mmap[offsets[position]:offsets[position + 1]].decode('utf-8'))
+
+        if use_cache:
+            self._cache[key] = record
+            while len(self._cache) > self.cache_size:
+                try:
+                    self._cache.popitem(last=False)
+                except KeyError:
+                    break
+            return dict(record)
+        return record
+
+    def query(self, collection: str, class_name: str = None, subject: str = None,
+              since=None, until=None) -> List[Dict[str, Any]]:
+        """按班级、学科、日期范围查询记录，结果按时间倒序
+
+        Args:
+            since: 起始日期（含），date、datetime或"YYYY-MM-DD"字符串
+            until: 结束日期（含）
+        """
+        index = self.collections[collection]
+        if class_name:
+            positions = index.classes.get(class_name)
+            if positions is None:
+                return []
+        else:
+            positions = index.order
+
+        subject_code = None
+        if subject:
+            subject_code = index.subjects.get(subject)
+            if subject_code is None:
+                return []
+
+        since_day = day_ordinal(since) if since else None
+        until_day = day_ordinal(until) if until else None
+
+        # 只在索引数组上过滤，命中的记录才解码；不带条件的全量查询不经过缓存，避免冲掉常用记录
+        use_cache = bool(class_name or since_day or until_day)
+        days = index.days
+        subject_codes = index.subject_codes
+        results = []
+        for position in positions:
+            if subject_code is not None and subject_codes[position] != subject_code:
+                continue
+            if since_day and days[position] < since_day or until_day and days[position] > until_day:
+                continue
+            results.append(self._decode(collection, position, use_cache))
+        return results
+
+    def _page_order(self, collection: str, class_name: str = None, subject: str = None) -> array:
+        """符合条件的记录位置，按 (ts, id) 倒序（首次分页查询时排序，之后复用）"""
+        key = (collection, class_name, subject)
+        order = self._page_orders.get(key)
+        if order is not None:
+            return order
+
+        index = self.collections[collection]
+        positions = index.classes.get(class_name, ()) if class_name else range(index.count)
+        if subject:
+            subject_code = index.subjects.get(subject)
+            subject_codes = index.subject_codes
+            positions = [position for position in positions if subject_codes[position] == subject_code]
+        timestamps, ids = index.timestamps, index.ids
+        order = array('i', sorted(positions, key=lambda position: (timestamps[position], ids[position]), reverse=True))
+        return self._page_orders.setdefault(key, order)
+
+    def page(self, collection: str, class_name: str = None, subject: str = None,
+             limit: int = 100, after: Tuple[int, int] = None) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """按 (ts, id) 倒序分页读取，只解码本页的记录
+
+        Args:
+            after: 上一页最后一条记录的 (ts, id)，None表示第一页
+
+        Returns:
+            (本页记录, 符合条件的记录总数, 之后是否还有记录)
+        """
+        order = self._page_order(collection, class_name, subject)
+        start = 0
+        if after is not None:
+            index = self.collections[collection]
+            timestamps, ids = index.timestamps, index.ids
+            start = records.page_start(len(order), lambda i: (timestamps[order[i]], ids[order[i]]), after)
+        items = [self._decode(collection, position) for position in order[start:start + limit]]
+        return items, len(order), start + limit < len(order)
+
+    def get_by_id(self, collection: str, record_id) -> Optional[Dict[str, Any]]:
+        """按ID获取记录"""
+        position = self.collections[collection].position_of(record_id)
+        if position is None:
+            return None
+        return self._decode(collection, position)
+
+    def raw_array(self, collection: str) -> bytes:
+        """全部记录组成的JSON数组（按存储顺序拼接记录文件中的原始内容，不解码）"""
+        index = self.collections[collection]
+        if not index.count:
+            return b"[]"
+        content = self._mmap[index.offsets[0]:index.offsets[index.count]]
+        return b"[" + content.rstrip(b"\n").replace(b"\n", b", ") + b"]"
+
+    def load_all(self, collection: str) -> List[Dict[str, Any]]:
+        """按存储顺序解码全部记录（切换为完整加载时使用）"""
+        index = self.collections[collection]
+        if not index.count:
+            return []
+        # 只按b"\n"拆分：记录中的U+2028等字符不转义，str.splitlines会把它们也当作换行
+        content = self._mmap[index.offsets[0]:index.offsets[index.count]]
+        return [json.loads(line.decode('utf-8')) for line in content.split(b"\n") if line]
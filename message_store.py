@@ -0,0 +1,113 @@
+"""
+留言环形缓冲模块
+按班级限制留言的保留数量和保留天数：每个班级的留言按时间先后排成一个环形缓冲，
+新留言加入队尾，超出容量或超过保留天数的留言从队头淘汰（DataManager可以先把它们移入归档）。
+班级再活跃，内存中的留言数以及每次保存写入的留言数都不会超过容量。
+
+为避免每条新留言都重写一次归档文件，超出容量时一次淘汰一批（容量的1/10）；
+保留天数按整天计算，每个班级每天最多淘汰一次。
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import deque
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional
+
+# 超出容量时一次淘汰容量的几分之一
+EVICTION_BATCH_DIVISOR = 10
+
+
+class MessageRing:
+    """按班级的留言环形缓冲
+
+    只保存每条留言的 (ts, id)，按时间升序排列，记录本身仍由DataManager保存。
+    """
+
+    def __init__(self, capacity: Optional[int] = None, class_capacities: Dict[str, int] = None,
+                 max_age_days: Optional[int] = None):
+        """
+        Args:
+            capacity: 每个班级最多保留的留言数，None表示不限
+            class_capacities: 个别班级的容量 {班级: 容量}，覆盖capacity
+            max_age_days: 留言最多保留的天数，None表示不限
+        """
+        self.capacity = capacity
+        self.class_capacities = dict(class_capacities or {})
+        self.max_age_days = max_age_days
+        self._rings = {}  # {班级: deque[(ts, id)]}
+
+    def capacity_of(self, class_name: str) -> Optional[int]:
+        """班级的留言容量"""
+        return self.class_capacities.get(class_name, self.capacity)
+
+    def __len__(self) -> int:
+        return sum(len(ring) for ring in self._rings.values())
+
+    def count(self, class_name: str) -> int:
+        """班级当前保留的留言数"""
+        return len(self._rings.get(class_name, ()))
+
+    def class_names(self) -> List[str]:
+        """有留言的班级"""
+        return list(self._rings)
+
+    @staticmethod
+    def _key(message: Any):
+        return (message.get("ts") or 0, message.get("id"))
+
+    def rebuild(self, messages: Iterable[Any]):
+        """根据全部留言重建缓冲"""
+        grouped = {}
+        for message in messages:
+            grouped.setdefault(message.get("class", ""), []).append(self._key(message))
+        self._rings = {class_name: deque(sorted(keys)) for class_name, keys in grouped.items()}
+
+    def add(self, message: Any):
+        """加入一条留言（新留言直接追加到队尾，合并来的旧留言插入到对应位置）"""
+        ring = self._rings.get(message.get("class", ""))
+        if ring is None:
+            ring = self._rings[message.get("class", "")] = deque()
+        key = self._key(message)
+        if not ring or key >= ring[-1]:
+            ring.append(key)
+        else:
+            ring.insert(bisect_right(ring, key), key)
+
+    def remove(self, message: Any):
+        """移除一条留言（淘汰时移除的是队头，为O(1)）"""
+        class_name = message.get("class", "")
+        ring = self._rings.get(class_name)
+        if not ring:
+            return
+        key = self._key(message)
+        if ring[0] == key:
+            ring.popleft()
+        elif ring[-1] == key:
+            ring.pop()
+        else:
+            try:
+                ring.remove(key)
+            except ValueError:
+                pass
+        if not ring:
+            del self._rings[class_name]
+
+    def overflow(self, class_name: str, cutoff_ts: Optional[int] = None) -> List[int]:
+        """班级中应当淘汰的留言ID（从最旧的开始）
+
+        Args:
+            class_name: 班级
+            cutoff_ts: 早于该时间（epoch秒）的留言已超过保留天数，None表示不按时间淘汰
+        """
+        ring = self._rings.get(class_name)
+        if not ring:
+            return []
+
+        count = 0
+        capacity = self.capacity_of(class_name)
+        if capacity is not None and len(ring) > capacity:
+            batch = max(1, capacity // EVICTION_BATCH_DIVISOR)
+            count = min(len(ring), len(ring) - capacity + batch - 1)
+        if cutoff_ts is not None and ring[0][0] < cutoff_ts:
+            count = max(count, bisect_left(ring, (cutoff_ts,)))
+        return [record_id for _, record_id in islice(ring, count)]
@@ -0,0 +1,389 @@
+"""
+网络备份模块
+老师端通过学生服务器的通信协议拉取学生数据的备份，不需要插U盘：
+- 老师发送 backup_request，学生取得当前数据的一致快照（见 DataManager.export_data，不包含密码），zlib压缩后分块回应 backup_chunk
+- 快照ID为压缩后内容的SHA-256；学生保留最近的几个快照，老师带着未收完的快照ID和已收到的字节数请求时从断点继续，
+  数据没有变化时重新生成的快照内容相同，学生重启后也可以继续
+- 老师带着上次收完的快照ID请求时，数据没有变化则不再发送
+- 老师端 BackupCollector 并行从各个教室的学生服务器拉取，可以每天定时执行
+
+老师端保存的文件（每个学生服务器一个目录）：
+- <备份目录>/<服务器>/作业查看器备份/    收到的数据按增量备份保存（格式见 backup_engine，可以用 restore.py --drive <备份目录>/<服务器> 恢复）
+- <备份目录>/<服务器>/pull_state.json    {"partial": 未收完的快照 {"snapshot", "file", "size", "raw_size", "created"}, "last": 上次收完的快照ID}
+- <备份目录>/<服务器>/incoming.part      未收完的压缩数据
+"""
+
+import os
+import json
+import time
+import zlib
+import queue
+import base64
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Sequence, Tuple
+
+from communication import TeacherClient, MessageTypes, MessageStructure
+from backup_engine import BackupEngine, BACKUP_DIR_NAME
+
+# 每个备份数据块的字节数（压缩后，base64编码前）
+BACKUP_CHUNK_SIZE = 256 * 1024
+
+# 压缩级别
+COMPRESS_LEVEL = 6
+
+# 学生端保留的快照数（正在被老师下载的快照在数据变化后仍可继续下载）
+KEEP_SNAPSHOTS = 2
+
+# 老师端超过该秒数没有收到数据块时放弃本次备份（已收到的部分下次继续）
+RECEIVE_TIMEOUT = 30.0
+
+# 同时拉取的学生服务器数
+DEFAULT_PULL_WORKERS = 16
+
+DEFAULT_PORT = 8888
+
+STATE_NAME = "pull_state.json"
+PARTIAL_NAME = "incoming.part"
+COLLECTOR_NAME = "备份收集"
+
+
+class BackupSource:
+    """学生端：为老师的备份请求提供数据快照"""
+
+    def __init__(self, data_manager, chunk_size: int = BACKUP_CHUNK_SIZE):
+        self.data_manager = data_manager
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._snapshots = OrderedDict()  # {快照ID: 快照}
+        self._current = None  # (数据版本, 快照ID)
+
+    def register(self, server):
+        """在学生服务器上注册备份请求的处理器"""
+        def handle_backup_request(message, client_socket, teacher_id):
+            self.serve(message, lambda reply: server.send_to_teacher(teacher_id, reply))
+        server.register_handler(MessageTypes.BACKUP_REQUEST, handle_backup_request)
+
+    def snapshot(self, snapshot_id: str = None) -> Dict[str, Any]:
+        """取得快照：snapshot_id仍保留时返回该快照，否则返回当前数据的快照（同一数据版本只压缩一次）
+
+        Returns:
+            Dict[str, Any]: {"snapshot", "file", "payload", "raw_size", "created"}
+        """
+        with self._lock:
+            if snapshot_id in self._snapshots:
+                return self._snapshots[snapshot_id]
+            version = self.data_manager.version
+            if self._current is not None and self._current[0] == version and self._current[1] in self._snapshots:
+                return self._snapshots[self._current[1]]
+
+            # 备份通过局域网发送，不包含密码
+            raw = self.data_manager.export_data(include_private=False)
+            payload = zlib.compress(raw, COMPRESS_LEVEL)
+            snapshot = {"snapshot": hashlib.sha256(payload).hexdigest(),
+                        "file": os.path.basename(self.data_manager.data_file),
+                        "payload": payload, "raw_size": len(raw), "created": time.time()}
+            self._snapshots.pop(snapshot["snapshot"], None)
+            self._snapshots[snapshot["snapshot"]] = snapshot
+            while len(self._snapshots) > KEEP_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+            self._current = (version, snapshot["snapshot"])
+            return snapshot
+
+    def serve(self, message: Dict[str, Any], send) -> int:
+        """按请求依次发送数据块，返回发送的字节数（send返回False时停止）"""
+        try:
+            snapshot = self.snapshot(message.get('snapshot'))
+        except Exception as e:
+            print(f"生成备份快照失败: {e}")
+            send(MessageStructure.backup_error(f"生成备份快照失败: {e}"))
+            return 0
+
+        payload = snapshot["payload"]
+        size = len(payload)
+
+        def chunk(offset, data, eof, unchanged=False):
+            return MessageStructure.backup_chunk(snapshot["snapshot"], snapshot["file"], size, snapshot["raw_size"],
+                                                 snapshot["created"], offset, data, eof, unchanged)
+
+        if message.get('have') == snapshot["snapshot"]:
+            send(chunk(size, "", True, unchanged=True))
+            return 0
+
+        offset = message.get('offset') or 0
+        if message.get('snapshot') != snapshot["snapshot"] or not 0 <= offset <= size:
+            offset = 0
+        sent = 0
+        while True:
+            data = payload[offset:offset + self.chunk_size]
+            eof = offset + len(data) >= size
+            if not send(chunk(offset, base64.b64encode(data).decode('ascii'), eof)):
+                break
+            offset += len(data)
+            sent += len(data)
+            if eof:
+                break
+        return sent
+
+
+def parse_server(text: str) -> Tuple[str, int]:
+    """把 "主机" 或 "主机:端口" 解析为 (主机, 端口)"""
+    host, _, port = text.strip().rpartition(":")
+    if not host or not port.isdigit():
+        return text.strip(), DEFAULT_PORT
+    return host, int(port)
+
+
+def _load_state(state_file: str) -> Dict[str, Any]:
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if isinstance(state, dict):
+            return state
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"读取备份进度失败，将重新下载: {e}")
+    return {"partial": None, "last": None}
+
+
+def _save_state(state_file: str, state: Dict[str, Any]):
+    temp_file = state_file + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(temp_file, state_file)
+
+
+def pull_backup(host: str, port: int = DEFAULT_PORT, backup_root: str = ".", name: str = None,
+                timeout: float = RECEIVE_TIMEOUT) -> Dict[str, Any]:
+    """从一个学生服务器拉取数据备份，保存到 <backup_root>/<name>/作业查看器备份/
+
+    上次没有收完时从断点继续；收完后校验SHA-256，解压后作为一次增量备份保存并按保留策略清理。
+
+    Args:
+        name: 该服务器的备份目录名，默认为 "<主机>_<端口>"
+
+    Returns:
+        Dict[str, Any]: {"success", "message", "server", "bytes_received", "resumed_from", "raw_size",
+        "backup", "unchanged", "elapsed"}
+    """
+    start = time.perf_counter()
+    result = {
+        "success": False,
+        "message": "",
+        "server": f"{host}:{port}",
+        "bytes_received": 0,
+        "resumed_from": 0,
+        "raw_size": 0,
+        "backup": None,
+        "unchanged": False,
+        "elapsed": 0.0
+    }
+    server_dir = os.path.join(backup_root, name or f"{host}_{port}")
+    state_file = os.path.join(server_dir, STATE_NAME)
+    part_file = os.path.join(server_dir, PARTIAL_NAME)
+    os.makedirs(server_dir, exist_ok=True)
+    state = _load_state(state_file)
+    partial = state.get("partial")
+    offset = os.path.getsize(part_file) if partial and os.path.exists(part_file) else 0
+    if partial is None or offset > partial["size"]:
+        partial, offset = None, 0
+
+    chunks = queue.Queue()
+    client = TeacherClient()
+    client.register_handler(MessageTypes.BACKUP_CHUNK, chunks.put)
+    if not client.connect_to_student_server(host, port, teacher_id=f"backup-{uuid.uuid4()}",
+                                            teacher_name=COLLECTOR_NAME):
+        result["message"] = f"无法连接学生服务器 {host}:{port}"
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    try:
+        client._send_message(MessageStructure.backup_request(partial and partial["snapshot"], offset, state.get("last")))
+        part = None
+        try:
+            idle_since = time.monotonic()
+            while True:
+                try:
+                    message = chunks.get(timeout=0.5)
+                except queue.Empty:
+                    if not client.is_connected and chunks.empty():
+                        result["message"] = "连接已断开（已收到的部分下次继续）"
+                        return result
+                    if time.monotonic() - idle_since > timeout:
+                        result["message"] = "接收备份超时（已收到的部分下次继续）"
+                        return result
+                    continue
+                idle_since = time.monotonic()
+
+                if message.get('error'):
+                    result["message"] = message['error']
+                    return result
+                if message.get('unchanged'):
+                    result["success"] = True
+                    result["unchanged"] = True
+                    result["message"] = "数据没有变化，无需备份"
+                    return result
+
+                if partial is None or message['snapshot'] != partial["snapshot"]:
+                    # 新的快照：丢弃未收完的旧快照，从头接收
+                    partial = {key: message[key] for key in ("snapshot", "file", "size", "raw_size", "created")}
+                    state["partial"] = partial
+                    _save_state(state_file, state)
+                    offset = 0
+                    if part is not None:
+                        part.close()
+                    part = open(part_file, 'wb')
+                elif part is None:
+                    result["resumed_from"] = offset
+                    part = open(part_file, 'r+b' if os.path.exists(part_file) else 'wb')
+                    part.truncate(offset)
+                    part.seek(offset)
+
+                if message['offset'] != offset:
+                    result["message"] = f"数据块不连续：期望偏移 {offset}，收到 {message['offset']}"
+                    return result
+                data = base64.b64decode(message['data'])
+                part.write(data)
+                offset += len(data)
+                result["bytes_received"] += len(data)
+                if message['eof']:
+                    break
+        finally:
+            if part is not None:
+                part.close()
+    finally:
+        client.disconnect()
+        result["elapsed"] = time.perf_counter() - start
+
+    return _store_backup(server_dir, state_file, part_file, state, result, start)
+
+
+def _store_backup(server_dir: str, state_file: str, part_file: str, state: Dict[str, Any],
+                  result: Dict[str, Any], start: float) -> Dict[str, Any]:
+    """校验并解压收完的快照，保存为一次增量备份"""
+    partial = state["partial"]
+    with open(part_file, 'rb') as f:
+        payload = f.read()
+    state["partial"] = None
+    if hashlib.sha256(payload).hexdigest() != partial["snapshot"]:
+        # 内容有误，下次重新下载
+        _save_state(state_file, state)
+        os.remove(part_file)
+        result["message"] = "收到的备份与快照的SHA-256不一致"
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    raw = zlib.decompress(payload)
+    result["raw_size"] = len(raw)
+    data_file = part_file + ".json"
+    with open(data_file, 'wb') as f:
+        f.write(raw)
+    try:
+        engine = BackupEngine(os.path.join(server_dir, BACKUP_DIR_NAME))
+        backup = engine.backup({partial["file"]: data_file})
+        if backup["success"]:
+            try:
+                backup["pruned"] = engine.prune()
+            except Exception as e:
+                print(f"清理较早的备份失败: {e}")
+    finally:
+        os.remove(data_file)
+
+    result["backup"] = backup
+    if backup["success"]:
+        state["last"] = partial["snapshot"]
+        os.remove(part_file)
+        result["success"] = True
+        result["message"] = f"已备份 {len(raw) / 1024:.1f}KB 数据（传输 {result['bytes_received'] / 1024:.1f}KB）"
+    else:
+        result["message"] = backup["message"]
+    _save_state(state_file, state)
+    result["elapsed"] = time.perf_counter() - start
+    return result
+
+
+def next_run_time(now: datetime, at: str) -> datetime:
+    """每天 at（HH:MM）执行时，now之后的下一次执行时间"""
+    hour, minute = (int(part) for part in at.split(":"))
+    run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run <= now:
+        run += timedelta(days=1)
+    return run
+
+
+class BackupCollector:
+    """老师端：并行从多个学生服务器拉取数据备份"""
+
+    def __init__(self, backup_root: str, servers: Sequence[str], workers: int = DEFAULT_PULL_WORKERS,
+                 timeout: float = RECEIVE_TIMEOUT):
+        """
+        Args:
+            backup_root: 备份目录，每个学生服务器一个子目录
+            servers: 学生服务器地址列表（"主机" 或 "主机:端口"）
+        """
+        self.backup_root = backup_root
+        self.servers = [parse_server(server) for server in servers]
+        self.workers = workers
+        self.timeout = timeout
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def collect(self) -> Dict[str, Any]:
+        """拉取所有学生服务器的备份
+
+        Returns:
+            Dict[str, Any]: {"success", "message", "results": [各服务器的pull_backup结果], "elapsed"}
+        """
+        start = time.perf_counter()
+        if not self.servers:
+            return {"success": False, "message": "没有要备份的学生服务器", "results": [], "elapsed": 0.0}
+
+        def pull(server):
+            host, port = server
+            try:
+                return pull_backup(host, port, self.backup_root, timeout=self.timeout)
+            except Exception as e:
+                print(f"从 {host}:{port} 备份失败: {e}")
+                return {"success": False, "message": f"备份失败: {e}", "server": f"{host}:{port}",
+                        "bytes_received": 0, "resumed_from": 0, "raw_size": 0, "backup": None,
+                        "unchanged": False, "elapsed": 0.0}
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(self.servers))) as executor:
+            results = list(executor.map(pull, self.servers))
+        succeeded = sum(1 for result in results if result["success"])
+        return {
+            "success": succeeded == len(results),
+            "message": f"{succeeded}/{len(results)} 个学生服务器备份成功",
+            "results": results,
+            "elapsed": time.perf_counter() - start
+        }
+
+    def start(self, at: str = "02:00", on_done=None):
+        """每天at（HH:MM）拉取一次，完成后调用on_done(结果)（在后台线程中调用）"""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+
+        def run():
+            while True:
+                delay = (next_run_time(datetime.now(), at) - datetime.now()).total_seconds()
+                if self._stopped.wait(max(delay, 0)):
+                    break
+                result = self.collect()
+                print(f"定时网络备份: {result['message']}，耗时 {result['elapsed']:.1f}秒")
+                if on_done is not None:
+                    on_done(result)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
@@ -0,0 +1,320 @@
+"""
+记录类型模块
+作业、留言在内存中以__slots__对象保存，不再是每条记录一个字典：
+- 固定字段保存在槽位中，没有每条记录的字典开销
+- 学科、班级、老师、状态等重复出现的字符串经过sys.intern，所有记录共用同一个对象
+- 数据文件中出现的其它字段保存在extra中，保存时原样写回
+
+记录支持 record["subject"]、record.get("class") 等字典式读写，DataManager内部代码无需区分；
+对外接口和序列化时通过to_dict()转换为普通字典。
+
+时间统一保存为整数Unix时间戳ts（秒），timestamp为由ts生成的显示字符串。
+"""
+
+import sys
+import time
+from datetime import datetime, date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+_intern = sys.intern
+
+# 显示用的时间格式
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# fromisoformat之外额外支持的时间格式
+_EXTRA_TIME_FORMATS = ("%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y/%m/%d")
+
+# 未设置槽位的占位值（旧数据中缺少的字段不会出现在to_dict()的结果中）
+_MISSING = object()
+
+
+def to_epoch(value) -> Optional[int]:
+    """将时间值（Unix时间戳、datetime、date或时间字符串）转换为Unix时间戳（秒），无法解析时返回None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, date):
+        return int(time.mktime(value.timetuple()))
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(datetime.fromisoformat(text).timestamp())
+        except ValueError:
+            pass
+        for time_format in _EXTRA_TIME_FORMATS:
+            try:
+                return int(datetime.strptime(text, time_format).timestamp())
+            except ValueError:
+                continue
+    return None
+
+
+def format_timestamp(ts: int) -> str:
+    """由Unix时间戳生成显示字符串"""
+    return datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT)
+
+
+def normalize_timestamp(value, now: float = None) -> Tuple[int, str]:
+    """规范化时间值，返回 (Unix时间戳, 显示字符串)
+
+    无法解析的值（如"刚刚"、空字符串、None）按当前时间处理
+    """
+    ts = to_epoch(value)
+    if ts is None:
+        ts = int(now if now is not None else time.time())
+    return ts, format_timestamp(ts)
+
+
+def time_bounds(since=None, until=None) -> Tuple[Optional[int], Optional[int]]:
+    """将查询的起止时间转换为Unix时间戳范围（含两端）
+
+    date或"YYYY-MM-DD"表示整天：since取当天0点，until取当天最后一秒；
+    datetime、Unix时间戳或完整时间字符串按精确时间处理
+    """
+    def is_day(value):
+        return (isinstance(value, date) and not isinstance(value, datetime)) or \
+            (isinstance(value, str) and len(value.strip()) == 10)
+
+    start = end = None
+    if since is not None and since != "":
+        start = to_epoch(since)
+    if until is not None and until != "":
+        end = to_epoch(until)
+        if end is not None and is_day(until):
+            end = to_epoch(date.fromordinal(datetime.fromtimestamp(end).toordinal() + 1)) - 1
+    return start, end
+
+
+class Record:
+    """槽位记录基类
+
+    子类需要定义:
+        KEYS: 字典字段名（与数据文件一致）
+        __slots__: 与KEYS一一对应的属性名，最后加上 "extra"
+        INTERNED: 需要驻留的字段名
+    """
+
+    __slots__ = ()
+    KEYS = ()
+    INTERNED = frozenset()
+    _ATTRS = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Record":
+        """由字典创建记录，未知字段放入extra"""
+        if tuple(data) == cls.KEYS:
+            return cls(*data.values())
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in data.items():
+            attr = cls._ATTRS.get(key)
+            if attr is None:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+            else:
+                if key in cls.INTERNED and type(value) is str:
+                    value = _intern(value)
+                setattr(record, attr, value)
+        record.extra = extra
+        return record
+
+    @classmethod
+    def from_columns(cls, keys: tuple, columns: list) -> List["Record"]:
+        """由按列存储的数据批量创建记录（快照缓存使用）"""
+        if not columns:
+            return []
+        if keys == cls.KEYS:
+            return list(map(cls, *columns))
+        return [cls.from_dict(dict(zip(keys, row))) for row in zip(*columns)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通字典（字段顺序与数据文件一致）"""
+        result = {}
+        for key, attr in self._ATTRS.items():
+            value = getattr(self, attr, _MISSING)
+            if value is not _MISSING:
+                result[key] = value
+        if self.extra:
+            result.update(self.extra)
+        return result
+
+    def copy(self) -> "Record":
+        """浅拷贝记录（extra字典也会复制）"""
+        record = self.__class__.__new__(self.__class__)
+        for attr in self.__slots__:
+            value = getattr(self, attr, _MISSING)
+            if value is not _MISSING:
+                setattr(record, attr, value)
+        if self.extra:
+            record.extra = dict(self.extra)
+        return record
+
+    # ---- 字典式访问 ----
+
+    def __getitem__(self, key: str) -> Any:
+        attr = self._ATTRS.get(key)
+        if attr is not None:
+            try:
+                return getattr(self, attr)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        attr = self._ATTRS.get(key)
+        if attr is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+        else:
+            if key in self.INTERNED and type(value) is str:
+                value = _intern(value)
+            setattr(self, attr, value)
+
+    def __contains__(self, key: str) -> bool:
+        attr = self._ATTRS.get(key)
+        if attr is not None:
+            return hasattr(self, attr)
+        return bool(self.extra) and key in self.extra
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Record):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        attr = self._ATTRS.get(key)
+        if attr is not None:
+            return getattr(self, attr, default)
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def keys(self) -> List[str]:
+        result = [key for key, attr in self._ATTRS.items() if hasattr(self, attr)]
+        if self.extra:
+            result.extend(self.extra)
+        return result
+
+    def values(self) -> List[Any]:
+        result = [getattr(self, attr) for attr in self._ATTRS.values() if hasattr(self, attr)]
+        if self.extra:
+            result.extend(self.extra.values())
+        return result
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+    def update(self, fields: Dict[str, Any]):
+        for key, value in fields.items():
+            self[key] = value
+
+
+class HomeworkRecord(Record):
+    """作业记录"""
+
+    __slots__ = ("id", "subject", "content", "class_name", "teacher", "timestamp", "ts", "status", "extra")
+    KEYS = ("id", "subject", "content", "class", "teacher", "timestamp", "ts", "status")
+    INTERNED = frozenset(("subject", "class", "teacher", "status"))
+    _ATTRS = dict(zip(KEYS, __slots__))
+
+    def __init__(self, id, subject, content, class_name, teacher, timestamp, ts, status, extra=None):
+        self.id = id
+        self.subject = _intern(subject) if type(subject) is str else subject
+        self.content = content
+        self.class_name = _intern(class_name) if type(class_name) is str else class_name
+        self.teacher = _intern(teacher) if type(teacher) is str else teacher
+        self.timestamp = timestamp
+        self.ts = ts
+        self.status = _intern(status) if type(status) is str else status
+        self.extra = extra
+
+
+class MessageRecord(Record):
+    """留言记录"""
+
+    __slots__ = ("id", "content", "student", "class_name", "timestamp", "ts", "status", "extra")
+    KEYS = ("id", "content", "student", "class", "timestamp", "ts", "status")
+    INTERNED = frozenset(("student", "class", "status"))
+    _ATTRS = dict(zip(KEYS, __slots__))
+
+    def __init__(self, id, content, student, class_name, timestamp, ts, status, extra=None):
+        self.id = id
+        self.content = content
+        self.student = _intern(student) if type(student) is str else student
+        self.class_name = _intern(class_name) if type(class_name) is str else class_name
+        self.timestamp = timestamp
+        self.ts = ts
+        self.status = _intern(status) if type(status) is str else status
+        self.extra = extra
+
+
+# 集合名 -> 记录类型
+RECORD_TYPES = {
+    "homeworks": HomeworkRecord,
+    "messages": MessageRecord,
+}
+
+
+def adopt_records(collection: str, items: Iterable[Any]) -> List[Any]:
+    """将字典转换为对应的记录类型，已经是记录或无法转换的元素保持不变"""
+    record_type = RECORD_TYPES[collection]
+    return [record_type.from_dict(item) if type(item) is dict else item for item in items]
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps的default参数，将记录序列化为字典"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def to_dicts(items: Iterable[Any]) -> List[Dict[str, Any]]:
+    """将记录列表转换为字典列表（对外接口使用）"""
+    return [item.to_dict() for item in items]
+
+
+def to_dict(item: Optional[Record]) -> Optional[Dict[str, Any]]:
+    """将单条记录转换为字典，None原样返回"""
+    return item.to_dict() if item is not None else None
+
+
+def page_cursor(value) -> Optional[Tuple[int, int]]:
+    """规范化分页游标 (ts, id)，来自网络消息时可能是列表；格式不正确时返回None"""
+    if isinstance(value, (list, tuple)) and len(value) == 2 and all(type(part) is int for part in value):
+        return value[0], value[1]
+    return None
+
+
+def page_start(count: int, key_at, cursor: Tuple[int, int]) -> int:
+    """在按 (ts, id) 倒序排列的序列中二分查找游标之后的第一个位置
+
+    Args:
+        count: 序列长度
+        key_at: 取第i个元素的 (ts, id)
+        cursor: 上一页最后一条记录的 (ts, id)
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if key_at(middle) < cursor:
+            high = middle
+        else:
+            low = middle + 1
+    return low
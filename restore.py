@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+从备份恢复数据
+列出数据目录和U盘上的备份，预览与当前数据的差异，把数据恢复到某个备份（恢复前的数据自动保存为带时间戳的副本）；
+也可以校验数据文件是否完好（见 integrity）
+
+用法:
+    python restore.py list
+    python restore.py list --data-file teacher_data.json --drive E:\\
+    python restore.py preview 3
+    python restore.py restore 3 --yes
+    python restore.py verify
+"""
+
+import sys
+import argparse
+from datetime import datetime
+
+from data_manager import DataManager
+from backup_catalog import SOURCE_NAMES
+
+
+def format_entry(number: int, entry: dict) -> str:
+    """备份的一行摘要"""
+    counts = "无法读取" if entry["homeworks"] is None else f"作业 {entry['homeworks']:>5}  留言 {entry['messages']:>5}"
+    return (f"{number:>3}. {datetime.fromtimestamp(entry['time']).strftime('%Y-%m-%d %H:%M:%S')}  "
+            f"{SOURCE_NAMES[entry['source']]:<6} {entry['size'] / 1024:>9.1f}KB  {counts}  "
+            f"{entry['sha256'][:12]}  {entry['name']}")
+
+
+def select_entry(entries: list, key: str):
+    """按列表中的编号或备份ID选择备份"""
+    if key.isdigit() and 1 <= int(key) <= len(entries):
+        return entries[int(key) - 1]
+    for entry in entries:
+        if entry["id"] == key:
+            return entry
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从备份恢复数据")
+    parser.add_argument("--data-file", default="student_data.json", help="数据文件名（相对数据目录）或绝对路径")
+    parser.add_argument("--drive", action="append", help="要查找备份的U盘（可以多次指定），默认为所有连接的U盘")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("list", help="列出可以恢复的备份")
+    preview_parser = subparsers.add_parser("preview", help="预览恢复后与当前数据的差异")
+    preview_parser.add_argument("backup", help="list中的编号或备份ID")
+    restore_parser = subparsers.add_parser("restore", help="恢复到指定备份")
+    restore_parser.add_argument("backup", help="list中的编号或备份ID")
+    restore_parser.add_argument("--yes", action="store_true", help="不再确认")
+    subparsers.add_parser("verify", help="校验数据文件是否完好")
+
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 1
+
+    data_manager = DataManager(args.data_file)
+    try:
+        if args.command == "verify":
+            if data_manager.recovery is not None:
+                print(f"打开时发现数据文件已损坏并已恢复，损坏的原文件: {data_manager.recovery['corrupt_copy']}")
+            report = data_manager.verify_integrity()
+            print(f"{report['message']}（{report['size'] / 1024 / 1024:.1f}MB，{report['elapsed'] * 1000:.0f}ms）")
+            return 0 if report["success"] else 1
+
+        entries = data_manager.list_restore_points(args.drive)
+        if args.command == "list":
+            if not entries:
+                print("没有可以恢复的备份")
+            for number, entry in enumerate(entries, 1):
+                print(format_entry(number, entry))
+            return 0
+
+        entry = select_entry(entries, args.backup)
+        if entry is None:
+            print(f"没有找到备份: {args.backup}")
+            return 1
+        preview = data_manager.preview_restore(entry)
+        print(format_entry(entries.index(entry) + 1, entry))
+        print(preview["message"])
+        if not preview["success"]:
+            return 1
+        for collection, title in (("homeworks", "作业"), ("messages", "留言")):
+            for kind, label in (("added", "恢复"), ("removed", "删除"), ("changed", "改回")):
+                for line in preview[collection][kind]:
+                    print(f"  {label}{title} {line}")
+                hidden = preview[collection][f"{kind}_count"] - len(preview[collection][kind])
+                if hidden > 0:
+                    print(f"  ……另有 {hidden} 条{title}{label}")
+        if args.command == "preview":
+            return 0
+
+        if not args.yes and input("确定要恢复到这个备份吗？(y/N) ").strip().lower() != "y":
+            print("已取消")
+            return 1
+        result = data_manager.restore_backup(entry)
+        print(result["message"])
+        return 0 if result["success"] else 1
+    finally:
+        data_manager.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+作业修订历史模块
+覆盖作业时保留之前的版本，每份作业一个修订链文件：
+- <数据文件>.revisions/<作业ID>.jsonl   每行一个修订 {"rev", "fields", "content"|"delta"}
+
+为了不让历史版本占用过多空间，修订链只保存相对上一修订的文本差异（difflib按字符比较）和有变化的字段，
+每隔KEYFRAME_INTERVAL个修订保存一次完整内容和全部字段作为关键帧，读取某个修订时从之前最近的关键帧开始还原，
+最多应用KEYFRAME_INTERVAL-1个差异。差异不比完整内容小时也直接保存完整内容。
+"""
+
+import os
+import json
+import difflib
+import shutil
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# 每隔多少个修订保存一次完整内容
+KEYFRAME_INTERVAL = 10
+
+# 缓存最近使用的修订链末尾内容的作业数
+DEFAULT_TAIL_CACHE_SIZE = 64
+
+
+def revisions_dir(source_path: str) -> str:
+    """获取数据文件对应的修订历史目录"""
+    return source_path + ".revisions"
+
+
+def make_delta(old: str, new: str) -> List[list]:
+    """计算把old变为new的差异 [[起始, 结束, 替换文本], ...]（位置相对old）"""
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    return [[i1, i2, new[j1:j2]] for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def apply_delta(old: str, delta: List[list]) -> str:
+    """把差异应用到old上"""
+    parts = []
+    position = 0
+    for start, end, text in delta:
+        parts.append(old[position:start])
+        parts.append(text)
+        position = end
+    parts.append(old[position:])
+    return "".join(parts)
+
+
+class RevisionStore:
+    """按作业ID保存修订链"""
+
+    def __init__(self, source_path: str, keyframe_interval: int = KEYFRAME_INTERVAL,
+                 tail_cache_size: int = DEFAULT_TAIL_CACHE_SIZE):
+        self.directory = revisions_dir(source_path)
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.tail_cache_size = tail_cache_size
+        self._tails = OrderedDict()  # {作业ID: (文件大小, 修订数, 最后一个修订)}
+
+    def _path(self, record_id: int) -> str:
+        return os.path.join(self.directory, f"{record_id}.jsonl")
+
+    def _read_entries(self, record_id: int) -> List[Dict[str, Any]]:
+        path = self._path(record_id)
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # 写到一半的最后一行（程序异常退出），忽略
+                    break
+        return entries
+
+    @staticmethod
+    def _rebuild(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """依次还原每个修订的字段和内容（entries的第一个修订必须是关键帧）"""
+        revisions = []
+        fields = {}
+        content = ""
+        for entry in entries:
+            if "content" in entry:
+                fields = dict(entry.get("fields", {}))
+                content = entry["content"]
+            else:
+                fields = dict(fields, **entry.get("fields", {}))
+                content = apply_delta(content, entry["delta"])
+            revisions.append(dict(fields, content=content))
+        return revisions
+
+    def _tail(self, record_id: int):
+        """修订链的修订数和最后一个修订（文件大小不变时使用缓存）"""
+        path = self._path(record_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self._tails.get(record_id)
+        if cached is not None and cached[0] == size:
+            self._tails.move_to_end(record_id)
+            return cached[1], cached[2]
+
+        entries = self._read_entries(record_id)
+        revisions = self._rebuild(entries)
+        tail = (len(entries), revisions[-1] if revisions else None)
+        self._remember(record_id, size, *tail)
+        return tail
+
+    def _remember(self, record_id: int, size: int, count: int, last: Optional[Dict[str, Any]]):
+        self._tails[record_id] = (size, count, last)
+        self._tails.move_to_end(record_id)
+        while len(self._tails) > self.tail_cache_size:
+            self._tails.popitem(last=False)
+
+    def _append(self, record_id: int, entry: Dict[str, Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(record_id), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _fields(record: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in record.items() if key not in ("id", "content")}
+
+    def record(self, previous: Dict[str, Any], current: Dict[str, Any]) -> int:
+        """记录一次修改，返回current的修订号（从1开始）
+
+        修订链为空，或最后一个修订与previous的内容不一致时（如事务回滚、其它程序修改），
+        先把previous作为关键帧写入，保证修订链的最后一个修订就是修改前的版本。
+        """
+        record_id = current["id"]
+        count, last = self._tail(record_id)
+        previous = dict(self._fields(previous), content=previous.get("content", ""))
+        if count == 0 or last != previous:
+            count += 1
+            self._append(record_id, {"rev": count, "fields": self._fields(previous), "content": previous["content"]})
+            last = previous
+
+        count += 1
+        current = dict(self._fields(current), content=current.get("content", ""))
+        fields = self._fields(current)
+        entry = {"rev": count}
+        if (count - 1) % self.keyframe_interval == 0:
+            entry.update(fields=fields, content=current["content"])
+        else:
+            delta = make_delta(last["content"], current["content"])
+            if len(json.dumps(delta, ensure_ascii=False)) < len(json.dumps(current["content"], ensure_ascii=False)):
+                entry.update(fields={key: value for key, value in fields.items() if last.get(key) != value}, delta=delta)
+            else:
+                entry.update(fields=fields, content=current["content"])
+        self._append(record_id, entry)
+        self._remember(record_id, os.path.getsize(self._path(record_id)), count, current)
+        return count
+
+    def count(self, record_id: int) -> int:
+        """作业的修订数（没有修订历史时为0）"""
+        return self._tail(record_id)[0]
+
+    def history(self, record_id: int) -> List[Dict[str, Any]]:
+        """作业的全部修订（按修订号升序），每个修订为 {"revision", "content", 其它字段...}"""
+        entries = self._read_entries(record_id)
+        return [dict(revision, id=record_id, revision=index)
+                for index, revision in enumerate(self._rebuild(entries), 1)]
+
+    def get(self, record_id: int, revision: int) -> Optional[Dict[str, Any]]:
+        """还原指定修订，不存在时返回None（只解码最近的关键帧之后的差异）"""
+        entries = self._read_entries(record_id)
+        if not 1 <= revision <= len(entries):
+            return None
+        start = revision - 1
+        while start > 0 and "content" not in entries[start]:
+            start -= 1
+        return dict(self._rebuild(entries[start:revision])[-1], id=record_id, revision=revision)
+
+    def remove(self, record_id: int):
+        """删除作业的修订历史"""
+        self._tails.pop(record_id, None)
+        try:
+            os.remove(self._path(record_id))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """删除全部修订历史"""
+        self._tails.clear()
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def storage_size(self) -> int:
+        """修订历史占用的字节数"""
+        if not os.path.isdir(self.directory):
+            return 0
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.is_file())
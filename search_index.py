@@ -0,0 +1,271 @@
+"""
+全文检索模块
+基于字符二元组（bigram）的倒排索引，不依赖分词库，中文、英文都适用：
+- "完成第三单元练习" 索引为 "完成" "成第" "第三" "三单" "单元" "元练" "练习" 以及各个单字
+- 英文字母统一小写，空格和标点不参与索引
+- 查询至少两个字时按二元组匹配，只有一个字时按单字匹配
+
+每个词项的倒排列表是按ID升序排列的array('i')，新记录的ID单调递增，追加即可保持有序。
+索引与数据文件一起保存在 <数据文件>.search 中（分片模式下为分片目录中的 global.json.search），
+签名与数据文件不一致时重新建立。
+"""
+
+import os
+import math
+import marshal
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+import snapshot_cache
+
+SEARCH_INDEX_VERSION = 1
+
+# 各集合参与检索的字段
+SEARCH_FIELDS = {
+    "homeworks": "content",
+    "messages": "content",
+}
+
+# BM25参数（每个词项在一条记录中只计一次）
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _characters(text) -> List[str]:
+    """取出参与索引的字符（小写，去掉空白和标点）"""
+    if not isinstance(text, str):
+        return []
+    return [char for char in text.lower() if char.isalnum()]
+
+
+def document_terms(text) -> set:
+    """记录文本的全部词项：单字和相邻二元组"""
+    chars = _characters(text)
+    terms = set(chars)
+    terms.update(chars[i] + chars[i + 1] for i in range(len(chars) - 1))
+    return terms
+
+
+def query_terms(text) -> set:
+    """查询文本的词项：两个字以上用二元组，否则用单字"""
+    chars = _characters(text)
+    if len(chars) >= 2:
+        return {chars[i] + chars[i + 1] for i in range(len(chars) - 1)}
+    return set(chars)
+
+
+class SearchIndex:
+    """单个记录集合的倒排索引"""
+
+    def __init__(self):
+        self.postings = {}  # {词项: array('i') 升序ID}
+        self.lengths = {}   # {ID: 词项数}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self.lengths
+
+    def add(self, doc_id: int, text):
+        """加入一条记录（同一ID已存在时先调用remove）"""
+        terms = document_terms(text)
+        for term in terms:
+            ids = self.postings.get(term)
+            if ids is None:
+                self.postings[term] = array('i', [doc_id])
+            elif ids[-1] < doc_id:
+                ids.append(doc_id)
+            else:
+                position = bisect_left(ids, doc_id)
+                if position == len(ids) or ids[position] != doc_id:
+                    ids.insert(position, doc_id)
+        self.lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, doc_id: int, text):
+        """移除一条记录（text为加入时的文本）"""
+        if doc_id not in self.lengths:
+            return
+        for term in document_terms(text):
+            ids = self.postings.get(term)
+            if ids is None:
+                continue
+            position = bisect_left(ids, doc_id)
+            if position < len(ids) and ids[position] == doc_id:
+                del ids[position]
+                if not ids:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def search(self, query: str, limit: int = None, require_all: bool = True) -> List[int]:
+        """检索并按相关度排序
+
+        Args:
+            query: 查询文本
+            limit: 最多返回的结果数
+            require_all: True时只返回包含全部查询词项的记录，False时包含任意词项即可
+
+        Returns:
+            List[int]: 按BM25得分从高到低排列的ID，得分相同时ID大（较新）的在前
+        """
+        terms = query_terms(query)
+        if not terms or not self.lengths:
+            return []
+
+        postings = [self.postings.get(term) for term in terms]
+        if require_all and any(ids is None for ids in postings):
+            return []
+        postings = sorted((ids for ids in postings if ids is not None), key=len)
+        if not postings:
+            return []
+
+        lengths = self.lengths
+        if require_all:
+            # 从最短的倒排列表开始求交集
+            candidates = set(postings[0])
+            for ids in postings[1:]:
+                candidates.intersection_update(ids)
+                if not candidates:
+                    return []
+            # 命中记录的idf之和相同，得分只随长度递减：先按ID倒序，再按长度稳定排序
+            ordered = sorted(candidates, reverse=True)
+            ordered.sort(key=lengths.__getitem__)
+            return ordered[:limit] if limit else ordered
+
+        count = len(lengths)
+        average_length = self.total_length / count
+        matched = Counter()
+        for ids in postings:
+            idf = math.log(1 + (count - len(ids) + 0.5) / (len(ids) + 0.5))
+            for doc_id in ids:
+                matched[doc_id] += idf
+        scored = [(doc_id, self._score(idf_sum, lengths[doc_id], average_length))
+                  for doc_id, idf_sum in matched.items()]
+        scored.sort(key=lambda item: (-item[1], -item[0]))
+        return [doc_id for doc_id, _ in (scored[:limit] if limit else scored)]
+
+    @staticmethod
+    def _score(idf_sum: float, length: int, average_length: float) -> float:
+        """BM25得分（词频恒为1）"""
+        norm = 1 - BM25_B + BM25_B * length / average_length
+        return idf_sum * (BM25_K1 + 1) / (1 + BM25_K1 * norm)
+
+    def to_payload(self) -> Dict[str, Any]:
+        """转换为可marshal的数据"""
+        return {
+            "postings": {term: ids.tobytes() for term, ids in self.postings.items()},
+            "lengths": self.lengths,
+            "total_length": self.total_length
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "SearchIndex":
+        """由to_payload的结果还原"""
+        index = cls()
+        for term, raw in payload["postings"].items():
+            ids = array('i')
+            ids.frombytes(raw)
+            index.postings[term] = ids
+        index.lengths = payload["lengths"]
+        index.total_length = payload["total_length"]
+        return index
+
+
+def build_indexes(collections: Dict[str, Iterable[Any]]) -> Dict[str, SearchIndex]:
+    """为各集合的记录建立索引，collections为 {集合名: 记录列表}"""
+    indexes = {}
+    for collection, items in collections.items():
+        field = SEARCH_FIELDS[collection]
+        index = SearchIndex()
+        # 按ID升序加入，倒排列表只需追加
+        for record in sorted(items, key=lambda item: item.get("id") or 0):
+            if isinstance(record.get("id"), int):
+                index.add(record["id"], record.get(field))
+        indexes[collection] = index
+    return indexes
+
+
+def index_path(source_path: str) -> str:
+    """获取数据文件对应的索引文件路径"""
+    return source_path + ".search"
+
+
+def save_indexes(source_path: str, indexes: Dict[str, SearchIndex], content_hash: str = None) -> bool:
+    """保存索引（先写临时文件再替换）"""
+    path = index_path(source_path)
+    temp_path = path + ".tmp"
+    try:
+        payload = {
+            "version": SEARCH_INDEX_VERSION,
+            "signature": snapshot_cache.source_signature(source_path, content_hash),
+            "collections": {collection: index.to_payload() for collection, index in indexes.items()}
+        }
+        with open(temp_path, 'wb') as f:
+            f.write(marshal.dumps(payload))
+        os.replace(temp_path, path)
+        return True
+    except Exception as e:
+        print(f"保存检索索引失败: {e}")
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+
+def resign_indexes(source_path: str, previous_signature, content_hash: str = None) -> bool:
+    """记录没有变化时把已保存的索引改为对应数据文件的新版本，不重新建立
+
+    Returns:
+        bool: 是否已更新（索引不存在或不是对应previous_signature的版本时返回False）
+    """
+    path = index_path(source_path)
+    temp_path = path + ".tmp"
+    try:
+        with open(path, 'rb') as f:
+            payload = marshal.loads(f.read())
+        if payload.get("version") != SEARCH_INDEX_VERSION or tuple(payload["signature"]) != tuple(previous_signature):
+            return False
+        payload["signature"] = snapshot_cache.source_signature(source_path, content_hash)
+        with open(temp_path, 'wb') as f:
+            f.write(marshal.dumps(payload))
+        os.replace(temp_path, path)
+        return True
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"更新检索索引失败: {e}")
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+
+def load_indexes(source_path: str) -> Optional[Dict[str, SearchIndex]]:
+    """读取与数据文件一致的索引，不存在或已过期时返回None"""
+    path = index_path(source_path)
+    if not os.path.exists(path) or not os.path.exists(source_path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            payload = marshal.loads(f.read())
+        if payload.get("version") != SEARCH_INDEX_VERSION:
+            return None
+
+        size, mtime_ns, content_hash = payload["signature"]
+        stat = os.stat(source_path)
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return None
+        if snapshot_cache.hash_file(source_path) != content_hash:
+            return None
+        return {collection: SearchIndex.from_payload(raw) for collection, raw in payload["collections"].items()}
+    except Exception as e:
+        print(f"读取检索索引失败，将重新建立: {e}")
+        return None
@@ -0,0 +1,125 @@
+"""
+分片存储模块
+按班级把作业、留言拆分到独立的文件中，修改某个班级时只重写该班级的分片：
+- <数据文件>.d/global.json            班级、学科、密码、ID序列等全局数据，以及各分片的概况（记录数、最早日期、按(天, 学科)的作业数）
+- <数据文件>.d/class_<班级>.json      该班级的作业和留言 {"class": 班级, "homeworks": [...], "messages": [...]}
+
+分片在首次访问对应班级时才读取，需要同时读取多个分片时使用线程池并行读取
+"""
+
+import os
+import json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List
+from urllib.parse import quote
+
+import records
+from lazy_store import day_ordinal
+
+GLOBAL_FILE = "global.json"
+
+# 并行读取分片的默认线程数
+DEFAULT_SHARD_WORKERS = 4
+
+
+def shard_dir(source_path: str) -> str:
+    """获取数据文件对应的分片目录"""
+    return source_path + ".d"
+
+
+def shard_file_name(class_name: str) -> str:
+    """班级分片的文件名（班级名经过URL编码，可以包含括号、斜杠等字符）"""
+    return "class_" + quote(class_name, safe="") + ".json"
+
+
+class ShardStore:
+    """按班级分片的数据文件"""
+
+    def __init__(self, source_path: str, max_workers: int = DEFAULT_SHARD_WORKERS):
+        self.directory = shard_dir(source_path)
+        self.global_file = os.path.join(self.directory, GLOBAL_FILE)
+        self.max_workers = max_workers
+        # 各分片概况 {班级: {"homeworks": 作业数, "messages": 留言数, "min_day": 最早日期序号,
+        #                   "rollup": [[日期, 学科, 作业数], ...]}}，统计时不需要读取分片
+        self.manifest = {}
+
+    def exists(self) -> bool:
+        """分片布局是否已建立"""
+        return os.path.exists(self.global_file)
+
+    def class_names(self) -> List[str]:
+        """已保存分片的班级"""
+        return list(self.manifest)
+
+    def classes_before(self, day: int) -> List[str]:
+        """有日期早于指定日期序号的记录的班级（无法解析日期的记录不计）"""
+        return [class_name for class_name, info in self.manifest.items() if 0 < info.get("min_day", 0) < day]
+
+    # ---- 读取 ----
+
+    def load_global(self) -> Dict[str, Any]:
+        """读取全局数据（不含作业和留言），同时读取分片概况"""
+        with open(self.global_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.manifest = data.pop("shards", {})
+        return data
+
+    def shard_path(self, class_name: str) -> str:
+        return os.path.join(self.directory, shard_file_name(class_name))
+
+    def read_shard(self, class_name: str) -> Dict[str, List[Dict[str, Any]]]:
+        """读取一个班级的分片，分片不存在时返回空列表"""
+        path = self.shard_path(class_name)
+        if not os.path.exists(path):
+            return {"homeworks": [], "messages": []}
+        with open(path, 'rb') as f:
+            shard = json.loads(f.read().decode('utf-8'))
+        return {"homeworks": shard.get("homeworks", []), "messages": shard.get("messages", [])}
+
+    def read_shards(self, class_names: Iterable[str]) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        """读取多个班级的分片（多于一个时并行读取）"""
+        class_names = list(class_names)
+        if len(class_names) <= 1 or self.max_workers <= 1:
+            return {class_name: self.read_shard(class_name) for class_name in class_names}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(class_names))) as executor:
+            return dict(zip(class_names, executor.map(self.read_shard, class_names)))
+
+    # ---- 写入 ----
+
+    def _write_json(self, path: str, payload: Any, indent: int = None):
+        """先写临时文件再替换"""
+        os.makedirs(self.directory, exist_ok=True)
+        temp_file = path + ".tmp"
+        try:
+            content = json.dumps(payload, ensure_ascii=False, indent=indent, default=records.json_default)
+            with open(temp_file, 'wb') as f:
+                f.write(content.encode('utf-8'))
+            os.replace(temp_file, path)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+    def write_shard(self, class_name: str, shard: Dict[str, List[Any]]):
+        """保存一个班级的分片并更新概况，班级没有任何记录时删除分片文件"""
+        path = self.shard_path(class_name)
+        if not any(shard.values()):
+            if os.path.exists(path):
+                os.remove(path)
+            self.manifest.pop(class_name, None)
+            return
+
+        self._write_json(path, {"class": class_name, **shard})
+        days = [day_ordinal(record.get("timestamp")) for items in shard.values() for record in items]
+        rollup = Counter((record.get("timestamp")[:10] if isinstance(record.get("timestamp"), str) else None,
+                          record.get("subject", "")) for record in shard.get("homeworks", []))
+        self.manifest[class_name] = {
+            **{collection: len(items) for collection, items in shard.items()},
+            "min_day": min((day for day in days if day), default=0),
+            "rollup": [[day, subject, count] for (day, subject), count in sorted(rollup.items(), key=str)]
+        }
+
+    def write_global(self, data: Dict[str, Any]):
+        """保存全局数据和分片概况（data中不应包含作业和留言）"""
+        self._write_json(self.global_file, {**data, "shards": self.manifest}, indent=2)
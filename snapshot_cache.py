@@ -0,0 +1,207 @@
+"""
+快照缓存模块
+将数据文件解析后的内容以marshal二进制格式保存在数据文件旁边，
+启动时只要源文件的大小、修改时间和内容哈希都没有变化，就直接读取快照，跳过JSON解析
+
+记录列表（如作业、留言）按列存储：相同字段的值放在同一个列表中；
+相等的字符串合并为同一个对象，marshal只保存一次（学科、班级、状态等重复值），
+读取时也只创建一次，比逐条解析JSON字典快得多
+"""
+
+import gc
+import os
+import sys
+import marshal
+import hashlib
+from typing import Any, Optional, Tuple
+
+# 快照文件头：格式版本 + Python版本（marshal格式随Python版本变化）
+SNAPSHOT_MAGIC = b"HWSNAP2"
+SNAPSHOT_HEADER = SNAPSHOT_MAGIC + f"-py{sys.version_info[0]}{sys.version_info[1]}-m{marshal.version}\n".encode("ascii")
+
+# 计算哈希时每次读取的块大小
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+def encode_records(records: list, string_memo: dict = None) -> list:
+    """将字典列表编码为按列存储的分段列表
+    
+    连续的、字段完全相同的记录合并为一段: (字段元组, [每个字段的值列表])，保持原有顺序
+    
+    Args:
+        records: 字典列表（或支持keys()/values()的记录对象）
+        string_memo: 字符串去重表，相等的字符串替换为同一个对象
+    """
+    if string_memo is None:
+        string_memo = {}
+    segments = []
+    keys = None
+    columns = None
+    for record in records:
+        record_keys = tuple(record.keys())
+        if record_keys != keys:
+            keys = record_keys
+            columns = [[] for _ in keys]
+            segments.append((keys, columns))
+        for column, value in zip(columns, record.values()):
+            if type(value) is str:
+                value = string_memo.setdefault(value, value)
+            column.append(value)
+    return segments
+
+
+def decode_records(segments: list, factory=None) -> list:
+    """将按列存储的分段列表还原为字典列表
+    
+    Args:
+        factory: 可选，factory(字段元组, 列列表) 直接返回该段的记录列表，用于还原为字典以外的记录类型
+    """
+    records = []
+    for keys, columns in segments:
+        if factory is not None:
+            records.extend(factory(keys, columns))
+        else:
+            records.extend(map(dict, map(zip, [keys] * len(columns[0]) if columns else [], zip(*columns))))
+    return records
+
+
+def _encode_data(data: Any) -> Any:
+    """将顶层的记录列表转换为按列存储，其它字段原样保留"""
+    if not isinstance(data, dict):
+        return ("raw", data)
+    plain = {}
+    columnar = {}
+    string_memo = {}
+    for key, value in data.items():
+        if isinstance(value, list) and value and all(isinstance(item, dict) or hasattr(item, "to_dict") for item in value):
+            columnar[key] = encode_records(value, string_memo)
+        else:
+            plain[key] = value
+    return ("columnar", list(data), plain, columnar)
+
+
+def _decode_data(payload: Any, factories: dict = None) -> Any:
+    """还原_encode_data的结果，factories为 {字段名: 记录工厂}"""
+    if payload[0] == "raw":
+        return payload[1]
+    _, key_order, plain, columnar = payload
+    factories = factories or {}
+    return {key: decode_records(columnar[key], factories.get(key)) if key in columnar else plain[key]
+            for key in key_order}
+
+
+def snapshot_path(source_path: str) -> str:
+    """获取数据文件对应的快照文件路径"""
+    return source_path + ".snapshot"
+
+
+def hash_bytes(content: bytes) -> str:
+    """计算内容哈希"""
+    return hashlib.sha1(content).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """分块计算文件内容哈希"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_signature(path: str, content_hash: str = None) -> Tuple[int, int, str]:
+    """获取源文件签名 (大小, 修改时间纳秒, 内容哈希)"""
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns, content_hash or hash_file(path))
+
+
+def load_snapshot(source_path: str, factories: dict = None) -> Optional[Any]:
+    """读取快照，快照不存在、格式不符或与源文件不一致时返回None
+    
+    Args:
+        factories: 可选，{字段名: factory(字段元组, 列列表)}，直接还原为记录对象而不是字典
+    """
+    cache_path = snapshot_path(source_path)
+    if not os.path.exists(cache_path) or not os.path.exists(source_path):
+        return None
+
+    try:
+        with open(cache_path, 'rb') as f:
+            if f.readline() != SNAPSHOT_HEADER:
+                return None
+            # 一次读入后再反序列化，marshal.load直接读文件对象时非常慢
+            signature, payload = marshal.loads(f.read())
+
+        # 先比较大小和修改时间，都一致时再校验内容哈希
+        size, mtime_ns, content_hash = signature
+        stat = os.stat(source_path)
+        if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+            return None
+        if hash_file(source_path) != content_hash:
+            return None
+        
+        # 大量创建字典时暂停循环垃圾回收，避免反复全量扫描
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return _decode_data(payload, factories)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    except Exception as e:
+        print(f"读取快照缓存失败，将重新解析数据文件: {e}")
+        return None
+
+
+def read_snapshot(source_path: str, factories: dict = None) -> Optional[Tuple[str, Any]]:
+    """读取快照但不与源文件比较，用于源文件损坏时找回上次保存的数据
+
+    Returns:
+        Optional[Tuple[str, Any]]: (写入快照时源文件的内容哈希, 数据)，快照不存在或无法读取时返回None
+    """
+    try:
+        with open(snapshot_path(source_path), 'rb') as f:
+            if f.readline() != SNAPSHOT_HEADER:
+                return None
+            signature, payload = marshal.loads(f.read())
+        return signature[2], _decode_data(payload, factories)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"读取快照缓存失败: {e}")
+        return None
+
+
+def write_snapshot(source_path: str, data: Any, content_hash: str = None) -> bool:
+    """为源文件写入快照（先写临时文件再替换）
+
+    Args:
+        source_path: 数据文件路径（必须已写入磁盘）
+        data: 只包含dict/list/str/int等基本类型（或记录对象）的数据
+        content_hash: 源文件内容哈希，已知时传入可避免重新读取文件
+    """
+    cache_path = snapshot_path(source_path)
+    temp_path = cache_path + ".tmp"
+    try:
+        signature = source_signature(source_path, content_hash)
+        with open(temp_path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER)
+            f.write(marshal.dumps((signature, _encode_data(data))))
+        os.replace(temp_path, cache_path)
+        return True
+    except Exception as e:
+        print(f"写入快照缓存失败: {e}")
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError:
+            pass
+        return False
+
+
+def remove_snapshot(source_path: str):
+    """删除快照文件"""
+    try:
+        os.remove(snapshot_path(source_path))
+    except OSError:
+        pass
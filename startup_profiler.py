@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时分析
+学生端和老师端启动时按阶段记录耗时，与各阶段的预算比较，超出预算的阶段打印警告，便于发现让启动变慢的改动：
+  imports      导入模块（界面模块开始导入到导入完成）
+  window       创建窗口和控件
+  first_paint  窗口第一次显示
+  data         打开数据文件并填充列表（窗口显示之后）
+  background   后台子系统：图标、进程保护、开机自启动设置、U盘监视等（在后台线程中，与界面并行）
+
+设置环境变量 HOMEWORK_STARTUP_PROFILE=1 时启动完成后打印每个阶段的耗时。
+也可以在命令行分析导入各模块的耗时（python -X importtime），超出imports预算时返回1:
+    python startup_profiler.py student
+    python startup_profiler.py teacher --top 20
+"""
+
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Tuple
+
+# 启用详细报告的环境变量
+PROFILE_ENV = "HOMEWORK_STARTUP_PROFILE"
+
+PHASE_LABELS = {
+    "imports": "导入模块",
+    "window": "创建窗口",
+    "first_paint": "首次绘制",
+    "data": "加载数据",
+    "background": "后台子系统",
+}
+
+# 各阶段的预算（毫秒），按教室里较慢的电脑估计
+STARTUP_BUDGETS = {
+    "student": {"imports": 400, "window": 300, "first_paint": 500, "data": 1000, "background": 3000},
+    "teacher": {"imports": 400, "window": 300, "first_paint": 500, "data": 2000},
+}
+
+# 界面模块所在的目录（相对本文件）和模块名
+GUI_MODULES = {
+    "student": ("student", "student_gui"),
+    "teacher": ("teacher", "teacher_gui"),
+}
+
+# 窗口一直没有显示（如启动时隐藏）时，最多等待多少毫秒后继续启动
+FIRST_PAINT_TIMEOUT_MS = 1000
+
+# 窗口显示后等待多少毫秒再加载数据，让窗口先完成绘制
+FIRST_PAINT_DELAY_MS = 10
+
+
+class StartupProfiler:
+    """记录启动各阶段的耗时
+
+    mark(阶段) 把上一个标记到现在的时间记为该阶段；measure(阶段) 单独计时，可在后台线程中使用。
+    同一阶段再次记录时覆盖原来的耗时。
+    """
+
+    def __init__(self, app: str, budgets: Dict[str, float] = None, verbose: bool = None):
+        self.app = app
+        self.budgets = STARTUP_BUDGETS.get(app, {}) if budgets is None else budgets
+        self.verbose = bool(os.environ.get(PROFILE_ENV)) if verbose is None else verbose
+        self.start = time.perf_counter()
+        self.phases = {}  # {阶段: 毫秒}
+        self._last = self.start
+        self._lock = threading.Lock()
+
+    def mark(self, phase: str) -> float:
+        """把上一个标记到现在的时间记为phase，返回毫秒数"""
+        now = time.perf_counter()
+        with self._lock:
+            elapsed = (now - self._last) * 1000
+            self._last = now
+            self.phases[phase] = elapsed
+        return elapsed
+
+    @contextmanager
+    def measure(self, phase: str):
+        """单独计时一段代码（不影响mark的起点）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[phase] = (time.perf_counter() - start) * 1000
+
+    def after_first_paint(self, root, callback, delay_ms: int = FIRST_PAINT_DELAY_MS):
+        """窗口第一次显示后记录first_paint，再调用callback（只调用一次）
+
+        窗口一直没有显示时，FIRST_PAINT_TIMEOUT_MS 毫秒后照常调用callback。
+        """
+        state = {"done": False}
+
+        def run(event=None):
+            if state["done"] or (event is not None and event.widget is not root):
+                return
+            state["done"] = True
+            self.mark("first_paint")
+            root.after(delay_ms, callback)
+
+        # 绑定在顶层窗口上的<Map>也会收到子控件的事件，只处理窗口本身的
+        root.bind("<Map>", run, add="+")
+        root.after(FIRST_PAINT_TIMEOUT_MS, run)
+
+    def over_budget(self) -> List[str]:
+        """超出预算的阶段"""
+        with self._lock:
+            phases = dict(self.phases)
+        return [phase for phase, elapsed in phases.items()
+                if phase in self.budgets and elapsed > self.budgets[phase]]
+
+    def report(self) -> Dict[str, Any]:
+        """启动耗时报告
+
+        Returns:
+            Dict[str, Any]: {"success"(没有阶段超出预算), "message", "app", "total_ms",
+            "phases": [{"phase", "label", "ms", "budget_ms", "over"}]}
+        """
+        with self._lock:
+            phases = dict(self.phases)
+        rows = []
+        for phase, elapsed in phases.items():
+            budget = self.budgets.get(phase)
+            rows.append({"phase": phase, "label": PHASE_LABELS.get(phase, phase), "ms": round(elapsed, 1),
+                         "budget_ms": budget, "over": budget is not None and elapsed > budget})
+        # 后台子系统与界面并行，不计入启动总耗时
+        total = sum(row["ms"] for row in rows if row["phase"] != "background")
+        over = [row["label"] for row in rows if row["over"]]
+        if over:
+            message = f"{self.app} 启动耗时 {total:.0f}ms，超出预算: {'、'.join(over)}"
+        else:
+            message = f"{self.app} 启动耗时 {total:.0f}ms"
+        return {"success": not over, "message": message, "app": self.app, "total_ms": round(total, 1), "phases": rows}
+
+    def finish(self) -> Dict[str, Any]:
+        """启动完成：启用详细报告时打印每个阶段的耗时，否则只在超出预算时打印警告"""
+        report = self.report()
+        if self.verbose:
+            print(format_report(report))
+        elif not report["success"]:
+            for row in report["phases"]:
+                if row["over"]:
+                    print(f"警告: 启动阶段「{row['label']}」耗时 {row['ms']:.0f}ms，超出预算 {row['budget_ms']}ms")
+        return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """启动耗时报告的文本形式"""
+    lines = [report["message"]]
+    for row in report["phases"]:
+        budget = f"/ {row['budget_ms']}ms" if row["budget_ms"] is not None else ""
+        flag = "  超出预算" if row["over"] else ""
+        lines.append(f"  {row['label']:<8} {row['ms']:>8.1f}ms {budget}{flag}")
+    return "\n".join(lines)
+
+
+def parse_importtime(text: str) -> List[Tuple[str, int, int, int]]:
+    """解析 python -X importtime 的输出
+
+    Returns:
+        List[Tuple[str, int, int, int]]: [(模块, 自身微秒, 累计微秒, 嵌套深度)]，按输出顺序
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头
+        name = parts[2].rstrip()
+        module = name.lstrip()
+        depth = (len(name) - len(module) - 1) // 2
+        entries.append((module, int(parts[0]), int(parts[1]), depth))
+    return entries
+
+
+def profile_imports(app: str) -> Dict[str, Any]:
+    """在子进程中导入界面模块，统计导入耗时（不创建窗口）
+
+    Returns:
+        Dict[str, Any]: {"success"(没有超出imports预算), "message", "total_ms", "budget_ms",
+        "modules": [(顶层模块, 累计毫秒)]（从慢到快）}
+    """
+    import subprocess
+
+    directory, module = GUI_MODULES[app]
+    root = os.path.dirname(os.path.abspath(__file__))
+    code = f"import sys; sys.path[:0] = [{root!r}, {os.path.join(root, directory)!r}]; import {module}"
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                             capture_output=True, text=True, cwd=root)
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()[-1:] or ["未知错误"]
+        return {"success": False, "message": f"导入 {module} 失败: {error[0]}", "total_ms": 0.0,
+                "budget_ms": STARTUP_BUDGETS[app].get("imports"), "modules": []}
+
+    # 只统计界面模块本身导入的模块（解释器启动时导入的模块不算）
+    entries = parse_importtime(process.stderr)
+    target = next((index for index, entry in enumerate(entries) if entry[0] == module and entry[3] == 0), None)
+    start = 0
+    if target is not None:
+        # 界面模块导入的模块列在它之前、嵌套深度大于0的连续几行
+        start = target
+        while start > 0 and entries[start - 1][3] > 0:
+            start -= 1
+        entries = entries[start:target + 1]
+    total = sum(cumulative for _name, _self, cumulative, depth in entries if depth == 0) / 1000
+    modules = sorted(((name, cumulative / 1000) for name, _self, cumulative, depth in entries if depth == 1),
+                     key=lambda item: item[1], reverse=True)
+    budget = STARTUP_BUDGETS[app].get("imports")
+    over = budget is not None and total > budget
+    message = f"导入 {module} 耗时 {total:.0f}ms" + (f"，超出预算 {budget}ms" if over else "")
+    return {"success": not over, "message": message, "total_ms": round(total, 1), "budget_ms": budget,
+            "modules": modules}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="分析学生端、老师端导入模块的耗时")
+    parser.add_argument("app", choices=sorted(GUI_MODULES), help="要分析的程序")
+    parser.add_argument("--top", type=int, default=10, help="列出最慢的几个模块")
+    args = parser.parse_args(argv)
+
+    result = profile_imports(args.app)
+    print(result["message"])
+    for name, elapsed in result["modules"][:args.top]:
+        print(f"  {name:<30} {elapsed:>8.1f}ms")
+    return 0 if result["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,61 @@
 """
 学生端主程序
 提供作业查看功能，可以作为服务器被老师连接 405 密码 xj123456
+
+启动分阶段进行，窗口先显示出来（见 startup_profiler）：
+  1. 创建窗口和控件
+  2. 窗口显示后打开数据文件、接入后台服务、填充作业列表
+  3. 后台线程中加载窗口图标、增强进程保护、启动U盘监视
+PIL、pystray和pywin32只在用到时导入（托盘图标、窗口图标、Windows专用功能），不拖慢启动
 """
 
+import startup_profiler
+
+STARTUP = startup_profiler.StartupProfiler("student")
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, scrolledtext
 import threading
 import json
 import os
 import sys
-import ctypes
-from PIL import Image
-import pystray
 from communication import StudentServer, TeacherClient, MessageTypes, MessageStructure
-from data_manager import DataManager
+from data_manager import DataManager, storage_options
+from backup_engine import BACKUP_DIR_NAME
+from backup_catalog import SOURCE_NAMES
+from drive_watcher import DriveWatcher, create_backend
+from network_backup import BackupSource
+from student_service import HomeworkResponder, DEFAULT_CLASSES, attach as attach_service, load_settings as read_settings, update_settings
 import socket
-import subprocess
 import time
+from datetime import datetime
+
+STARTUP.mark("imports")
+
+# pywin32是否可用，第一次调用load_win32时检查（None表示尚未检查）
+HAS_WIN32 = None
+
+
+def load_win32() -> bool:
+    """按需导入pywin32和winreg（导入较慢，只在用到Windows专用功能时导入），不可用时返回False"""
+    global HAS_WIN32, win32event, win32api, win32con, win32process, winreg, ERROR_ALREADY_EXISTS
+    if HAS_WIN32 is None:
+        try:
+            import win32event
+            import win32api
+            import win32con
+            import win32process
+            import winreg  # 用于操作注册表实现自动启动
+            from winerror import ERROR_ALREADY_EXISTS
+            HAS_WIN32 = True
+        except ImportError:
+            HAS_WIN32 = False
+    return HAS_WIN32
 
-try:
-    import win32event
-    import win32api
-    import win32file
-    import win32con
-    import win32process
-    import wmi
-    import winreg  # 添加winreg模块用于操作注册表实现自动启动
-    from winerror import ERROR_ALREADY_EXISTS
-    HAS_WIN32 = True
-except ImportError:
-    HAS_WIN32 = False
 
 class StudentGUI:
     def __init__(self):
-        # 初始化前先增强进程保护（如果有win32支持）
-        if HAS_WIN32:
-            self.enhance_process_protection()
+        self.startup = STARTUP
         self.root = tk.Tk()
         self.root.title("作业查看器 - 学生端")
         self.root.geometry("900x650")
@@ -54,35 +74,11 @@ class StudentGUI:
         
         # 设置文件路径 - 保存在应用目录中
         self.settings_file = os.path.join(self.app_dir, "student_settings.json")
-        self.data_manager = DataManager(os.path.join(self.app_dir, "student_data.json"))
         
-        # 设置主窗口图标
-        try:
-            # 获取应用程序运行目录
-            if hasattr(sys, '_MEIPASS'):
-                # 当使用PyInstaller打包后，_MEIPASS指向临时解压目录
-                base_path = sys._MEIPASS
-            else:
-                # 未打包时，使用当前目录
-                base_path = os.path.abspath('.')
-            
-            # 构建图标文件的路径
-            icon_path = os.path.join(base_path, 'student.png')
-            if os.path.exists(icon_path):
-                # 先尝试使用iconphoto设置图标（支持PNG）
-                from PIL import ImageTk
-                icon_image = ImageTk.PhotoImage(Image.open(icon_path))
-                self.root.iconphoto(True, icon_image)
-                self.window_icon = icon_image  # 保持引用以防止被垃圾回收
-                print(f"成功设置主窗口图标: {icon_path}")
-            else:
-                print(f"警告: 找不到图标文件 {icon_path}")
-        except Exception as e:
-            print(f"设置主窗口图标失败: {e}")
-        
-        # 初始化组件
+        # 数据管理器和后台服务在窗口显示后再打开（见load_data）
         self.server = StudentServer()  # 学生端服务器
-        self.data_manager = DataManager("student_data.json")
+        self.data_manager = None
+        self.service = None
         
         # 初始化变量
         self.selected_class = tk.StringVar()
@@ -104,26 +100,101 @@ class StudentGUI:
         self.is_minimized_to_tray = False
         
         # U盘监控相关变量
-        self.usb_watcher_thread = None
-        self.stop_usb_watcher = False
-        self.usb_devices = []  # 存储已连接的U盘信息
+        self.drive_watcher = None  # U盘插拔监视（见drive_watcher）
+        self.backup_running = False  # 是否正在备份到U盘
         self.selected_usb = tk.StringVar()  # 存储用户选择的U盘
         self.settings_file = "student_settings.json"  # 设置文件
         
-        # 加载设置
-        self.load_settings()
-        
         # 设置界面
         self.setup_ui()
         
+        # 绑定关闭事件
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # 窗口显示后再加载数据和其它子系统
+        self.startup.mark("window")
+        self.startup.after_first_paint(self.root, self.load_data)
+    
+    def load_data(self):
+        """启动第二阶段（窗口已显示）：打开数据文件、接入后台服务、填充作业列表"""
+        # 初始化组件（数据管理器只创建一次，避免重复加载数据文件）
+        # 学生端只查看一个班级，使用延迟加载模式，历史作业留在磁盘上按需读取；
+        # 数据目录可能同时被其它程序使用，保存时加锁合并，其它程序保存后自动刷新作业列表；
+        # 归档、留言容量等存储选项只在设置文件中开启时使用（见 data_manager.storage_options）
+        self.data_manager = DataManager("student_data.json", lazy=True, shared=True,
+                                        **storage_options(read_settings(self.settings_file)))
+        self.data_manager.add_change_listener(lambda: self.root.after(0, self.refresh_homeworks))
+        # 后台服务（student_service）已在运行时接入它，服务器和U盘自动备份由服务负责，窗口不再重复启动
+        self.service = attach_service(settings_file=self.settings_file)
+        if self.service:
+            print("已接入学生端后台服务")
+            self.service.add_listener(lambda event: self.root.after(0, self.on_service_event, event))
+        
         # 注册消息处理器
         self.setup_message_handlers()
         
-        # 绑定关闭事件
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # 初始化数据
+        self.init_data()
+        self.start_server_btn.config(state="normal")
+        
+        # 显示后台服务的状态
+        if self.service:
+            self.load_service_status()
         
-        # 启动U盘监控
-        self.start_usb_monitoring()
+        self.startup.mark("data")
+        self.root.after(0, self.start_background_subsystems)
+    
+    def start_background_subsystems(self):
+        """启动第三阶段：加载设置（可能改写注册表中的自动启动项），其余较慢的子系统在后台线程中启动"""
+        self.load_settings()
+        
+        def background():
+            with self.startup.measure("background"):
+                # 增强进程保护（如果有win32支持）
+                if load_win32():
+                    self.enhance_process_protection()
+                self.load_window_icon()
+                # 启动U盘监控
+                self.start_usb_monitoring()
+            self.startup.finish()
+        
+        threading.Thread(target=background, daemon=True).start()
+    
+    def load_window_icon(self):
+        """读取主窗口图标（在后台线程中调用，读取后在主线程中设置）"""
+        try:
+            # 获取应用程序运行目录
+            if hasattr(sys, '_MEIPASS'):
+                # 当使用PyInstaller打包后，_MEIPASS指向临时解压目录
+                base_path = sys._MEIPASS
+            else:
+                # 未打包时，使用当前目录
+                base_path = os.path.abspath('.')
+            
+            # 构建图标文件的路径
+            icon_path = os.path.join(base_path, 'student.png')
+            if not os.path.exists(icon_path):
+                print(f"警告: 找不到图标文件 {icon_path}")
+                return
+            from PIL import Image
+            image = Image.open(icon_path)
+            image.load()
+        except Exception as e:
+            print(f"设置主窗口图标失败: {e}")
+            return
+        
+        def apply_icon():
+            try:
+                # 使用iconphoto设置图标（支持PNG）
+                from PIL import ImageTk
+                icon_image = ImageTk.PhotoImage(image)
+                self.root.iconphoto(True, icon_image)
+                self.window_icon = icon_image  # 保持引用以防止被垃圾回收
+                print(f"成功设置主窗口图标: {icon_path}")
+            except Exception as e:
+                print(f"设置主窗口图标失败: {e}")
+        
+        self.root.after(0, apply_icon)
     
     def setup_ui(self):
         """设置用户界面"""
@@ -245,8 +316,8 @@ class StudentGUI:
         # 绑定窗口大小变化事件，实现自动调整字体
         self.root.bind("<Configure>", self.on_window_resize)
         
-        # 初始化数据
-        self.init_data()
+        # 数据在窗口显示后加载（见load_data），加载前不能启动服务器
+        self.start_server_btn.config(state="disabled")
         
         # 初始化字体大小设置
         self.default_font_size = 10
@@ -267,10 +338,7 @@ class StudentGUI:
     def init_data(self):
         """初始化数据"""
         # 添加默认班级 - 仅包含701-710班级
-        default_classes = [
-            "701", "702", "703", "704", "705", "706", "707", "708", "709", "710"
-        ]
-        for class_name in default_classes:
+        for class_name in DEFAULT_CLASSES:
             self.data_manager.add_class(class_name)
         
         # 加载班级列表
@@ -288,65 +356,29 @@ class StudentGUI:
     
     def setup_message_handlers(self):
         """设置消息处理器"""
+        # 作业回应（同一数据版本下相同的请求直接使用上次整理好的作业）
+        self.homework_responder = HomeworkResponder(self.data_manager)
+        
         def handle_homework_request(message, client_socket, teacher_id):
             """处理老师请求作业消息"""
-            class_name = message.get('class', '')
-            subject = message.get('subject', '')
-            teacher_message = message.get('message', '')
-            
-            print(f"收到老师请求作业：班级={class_name}，学科={subject}")
-            
-            # 获取学生的作业数据
-            student_class = self.selected_class.get()
-            student_name = self.student_name.get()
+            print(f"收到老师请求作业：班级={message.get('class', '')}，学科={message.get('subject', '')}")
             
-            # 根据老师请求过滤对应的作业
-            matched_homeworks = []
-            if class_name == student_class or class_name == "全部":
-                # 从本地数据中获取匹配的作业
-                homeworks = self.data_manager.get_homeworks(
-                    class_name=student_class,
-                    subject=subject if subject != "全部" else None
-                )
-                
-                for homework in homeworks:
-                    # 构建符合格式的作业回应
-                    homework_data = {
-                        'id': homework.get('id', ''),
-                        'class': homework.get('class', ''),
-                        'subject': homework.get('subject', ''),
-                        'content': homework.get('content', ''),
-                        'teacher': homework.get('teacher', ''),
-                        'student': student_name,
-                        'timestamp': homework.get('timestamp', ''),
-                        'status': homework.get('status', '已完成')
-                    }
-                    matched_homeworks.append(homework_data)
-            
-            # 发送作业回应给老师
-            if matched_homeworks:
-                response_message = MessageStructure.homework_response({
-                    'student_class': student_class,
-                    'student_name': student_name,
-                    'homeworks': matched_homeworks,
-                    'teacher_message': teacher_message
-                })
-                self.server.send_to_teacher(teacher_id, response_message)
-                print(f"向老师发送了 {len(matched_homeworks)} 份作业")
+            # 根据老师请求过滤对应的作业，发送作业回应给老师（没有匹配的作业时发送空回应）
+            response_message = self.homework_responder.respond(
+                message, self.selected_class.get(), self.student_name.get())
+            self.server.send_to_teacher(teacher_id, response_message)
+            homeworks = response_message['homework']['homeworks']
+            if homeworks:
+                print(f"向老师发送了 {len(homeworks)} 份作业（共 {response_message['homework']['total']} 份）")
             else:
-                # 没有找到匹配的作业，发送空回应
-                response_message = MessageStructure.homework_response({
-                    'student_class': student_class,
-                    'student_name': student_name,
-                    'homeworks': [],
-                    'teacher_message': teacher_message
-                })
-                self.server.send_to_teacher(teacher_id, response_message)
                 print("没有找到匹配的作业，向老师发送空回应")
         
         # 注册处理器
         self.server.register_handler(MessageTypes.HOMEWORK_REQUEST, handle_homework_request)
         self.server.register_handler(MessageTypes.CLASS_LIST_REQUEST, self.handle_class_list_request)
+        # 老师端通过网络拉取数据备份
+        self.backup_source = BackupSource(self.data_manager)
+        self.backup_source.register(self.server)
         
         # 添加事件监听器
         self.server.add_listener('teacher_connected', self.on_teacher_connected)
@@ -356,7 +388,11 @@ class StudentGUI:
         """启动服务器"""
         # 学生姓名已设置为默认值"学生"，无需验证
         def start_thread():
-            if self.server.start_server():
+            if self.service:
+                started = self.service.request("start_server")["success"]
+            else:
+                started = self.server.start_server()
+            if started:
                 self.is_server_running = True
                 self.root.after(0, self.on_server_start_success)
             else:
@@ -367,8 +403,7 @@ class StudentGUI:
     
     def on_server_start_success(self):
         """服务器启动成功"""
-        self.status_label.config(text=f"服务器运行中 (端口: {self.port.get()})", foreground="green")
-        self.start_server_btn.config(text="停止服务器", command=self.stop_server, state="disabled")
+        self.update_server_status()
         messagebox.showinfo("成功", "服务器启动成功，等待老师连接！")
     
     def on_server_start_failed(self):
@@ -382,10 +417,26 @@ class StudentGUI:
         if not self.verify_exit_password():
             return
         
-        self.server.stop_server()
+        def stop_thread():
+            # 接入后台服务时通过控制连接（带令牌）停止
+            if self.service:
+                result = self.service.request("stop_server")
+            else:
+                self.server.stop_server()
+                result = {"success": True}
+            self.root.after(0, self.on_server_stopped, result)
+        
+        self.start_server_btn.config(state="disabled")
+        threading.Thread(target=stop_thread, daemon=True).start()
+    
+    def on_server_stopped(self, result):
+        """停止服务器的结果（在主线程中调用）"""
+        if not result.get("success"):
+            self.update_server_status()
+            messagebox.showerror("错误", f"停止服务器失败: {result.get('message', '未知错误')}")
+            return
         self.is_server_running = False
-        self.status_label.config(text="服务器未启动", foreground="red")
-        self.start_server_btn.config(text="启动服务器", command=self.start_server, state="normal")
+        self.update_server_status()
         
         # 清空老师列表
         for item in self.teachers_tree.get_children():
@@ -446,6 +497,9 @@ class StudentGUI:
     
     def on_class_selected(self, event=None):
         """班级选择事件"""
+        # 接入后台服务时，服务按新班级回应老师
+        if self.service:
+            self.service.request("set_student", **{"class": self.selected_class.get()})
         # 更新本地显示
         self.refresh_homeworks()
     
@@ -550,11 +604,16 @@ class StudentGUI:
         print("已退出全屏模式")
     
     def load_local_homeworks(self):
-        """从本地加载作业"""
-        homeworks = self.data_manager.get_homeworks(
-            class_name=self.selected_class.get() if self.selected_class.get() else None,
-            subject=self.selected_subject.get() if self.selected_subject.get() != "全部" else None
-        )
+        """从本地加载作业（全屏展示时只显示今天的作业，今天没有作业时显示全部）"""
+        if self.data_manager is None:
+            return
+        class_name = self.selected_class.get() if self.selected_class.get() else None
+        subject = self.selected_subject.get() if self.selected_subject.get() != "全部" else None
+        homeworks = []
+        if self.fullscreen:
+            homeworks = self.data_manager.get_today_homeworks(class_name=class_name, subject=subject)
+        if not homeworks:
+            homeworks = self.data_manager.get_homeworks(class_name=class_name, subject=subject)
         
         # 清空现有项目
         for item in self.homework_tree.get_children():
@@ -597,9 +656,13 @@ class StudentGUI:
                 # 停止U盘监控
                 self.stop_usb_monitoring()
                 
-                # 停止服务器并退出
-                if self.is_server_running:
+                # 停止服务器并退出（接入后台服务时服务继续运行）
+                if self.service:
+                    self.service.close()
+                elif self.is_server_running:
                     self.server.stop_server()
+                if self.data_manager:
+                    self.data_manager.close()
                 self.root.destroy()
 
     def verify_exit_password(self):
@@ -729,6 +792,9 @@ class StudentGUI:
         # 清空所有数据按钮
         ttk.Button(main_frame, text="清空所有数据（谨慎操作）", command=self.confirm_clear_data, width=25).pack(pady=(10, 10))
         
+        # 从备份恢复按钮
+        ttk.Button(main_frame, text="从备份恢复数据", command=self.show_restore_dialog, width=25).pack(pady=(10, 10))
+        
         # 创建分割线
         ttk.Separator(main_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=15)
         
@@ -753,7 +819,7 @@ class StudentGUI:
                  font=('微软雅黑', 10), foreground='#666666').pack(padx=15, pady=(0, 10), anchor=tk.W)
         
         # 如果系统不支持win32扩展，则禁用自动启动选项
-        if not HAS_WIN32:
+        if not load_win32():
             auto_start_check.config(state=tk.DISABLED)
             ttk.Label(startup_frame, text="(系统不支持此功能)", foreground="red", font=('微软雅黑', 10)).pack(padx=15, anchor=tk.W)
         
@@ -805,6 +871,8 @@ class StudentGUI:
                     self.selected_usb.set(usb_devices[index]['device_id'])
                     # 保存设置
                     self.save_settings()
+                    if self.service:
+                        self.service.request("set_backup_drive", device_id=self.selected_usb.get())
                     messagebox.showinfo("设置成功", f"已设置自动备份U盘: {usb_devices[index]['name']}")
         
         # 按钮框架
@@ -987,7 +1055,7 @@ class StudentGUI:
     
     def toggle_auto_start(self):
         """切换自动启动状态"""
-        if not HAS_WIN32:
+        if not load_win32():
             messagebox.showerror("错误", "系统不支持自动启动功能")
             self.auto_start_var.set(False)
             return
@@ -1053,7 +1121,7 @@ class StudentGUI:
         Returns:
             bool: 是否已启用自动启动
         """
-        if not HAS_WIN32:
+        if not load_win32():
             return False
             
         try:
@@ -1085,6 +1153,88 @@ class StudentGUI:
                 # 刷新作业列表
                 self.refresh_homeworks()
     
+    def show_restore_dialog(self):
+        """显示从备份恢复的对话框：列出备份，选中后预览与当前数据的差异"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("从备份恢复数据")
+        dialog.geometry("760x520")
+        dialog.transient(self.root)
+        dialog.grab_set()
+        dialog.geometry("+%d+%d" % (
+            self.root.winfo_rootx() + 50,
+            self.root.winfo_rooty() + 50
+        ))
+        
+        main_frame = ttk.Frame(dialog, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # 备份列表
+        columns = ("time", "source", "size", "homeworks", "messages", "name")
+        tree = ttk.Treeview(main_frame, columns=columns, show='headings', height=10)
+        for column, title, width in (("time", "时间", 140), ("source", "来源", 70), ("size", "大小", 80),
+                                     ("homeworks", "作业", 60), ("messages", "留言", 60), ("name", "名称", 300)):
+            tree.heading(column, text=title)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.BOTH, expand=True)
+        
+        # 差异预览
+        preview_text = scrolledtext.ScrolledText(main_frame, height=10, wrap=tk.WORD)
+        preview_text.pack(fill=tk.BOTH, expand=True, pady=(10, 0))
+        
+        drives = [device['path'] for device in self.get_usb_devices()]
+        entries = {}
+        for entry in self.data_manager.list_restore_points(drives):
+            counts = ("-", "-") if entry["homeworks"] is None else (entry["homeworks"], entry["messages"])
+            item = tree.insert('', tk.END, values=(
+                datetime.fromtimestamp(entry["time"]).strftime("%Y-%m-%d %H:%M:%S"),
+                SOURCE_NAMES[entry["source"]], f"{entry['size'] / 1024:.1f}KB", counts[0], counts[1], entry["name"]))
+            entries[item] = entry
+        if not entries:
+            preview_text.insert(tk.END, "没有可以恢复的备份")
+        
+        def selected_entry():
+            selection = tree.selection()
+            return entries.get(selection[0]) if selection else None
+        
+        def on_select(event=None):
+            entry = selected_entry()
+            if entry is None:
+                return
+            preview = self.data_manager.preview_restore(entry)
+            preview_text.delete("1.0", tk.END)
+            preview_text.insert(tk.END, preview["message"] + "\n")
+            if preview["success"]:
+                for collection, title in (("homeworks", "作业"), ("messages", "留言")):
+                    for kind, label in (("added", "恢复"), ("removed", "删除"), ("changed", "改回")):
+                        for line in preview[collection][kind]:
+                            preview_text.insert(tk.END, f"{label}{title} {line}\n")
+                        hidden = preview[collection][f"{kind}_count"] - len(preview[collection][kind])
+                        if hidden > 0:
+                            preview_text.insert(tk.END, f"……另有 {hidden} 条{title}{label}\n")
+        
+        def on_restore():
+            entry = selected_entry()
+            if entry is None:
+                messagebox.showwarning("提示", "请先选择一个备份", parent=dialog)
+                return
+            if not messagebox.askyesno("确认", f"确定要把数据恢复到 {entry['name']} 吗？\n恢复前的数据会自动保存为副本。",
+                                       parent=dialog):
+                return
+            result = self.data_manager.restore_backup(entry)
+            if result["success"]:
+                messagebox.showinfo("成功", result["message"], parent=dialog)
+                dialog.destroy()
+                self.refresh_homeworks()
+            else:
+                messagebox.showerror("恢复失败", result["message"], parent=dialog)
+        
+        tree.bind("<<TreeviewSelect>>", on_select)
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(button_frame, text="关闭", command=dialog.destroy, width=10).pack(side=tk.RIGHT, padx=(5, 0))
+        ttk.Button(button_frame, text="恢复", command=on_restore, width=10).pack(side=tk.RIGHT)
+    
     def minimize_to_tray(self):
         """最小化到系统托盘"""
         try:
@@ -1116,6 +1266,9 @@ class StudentGUI:
     
     def create_tray_icon(self):
         """创建系统托盘图标"""
+        # 托盘图标只在最小化到托盘时才需要，用到时再导入
+        from PIL import Image
+        import pystray
         try:
             # 使用用户指定的图标文件路径
             image_path = "C:\\Users\\Lucas\\Desktop\\fan\\homework_viewer\\student.png"
@@ -1158,6 +1311,8 @@ class StudentGUI:
     
     def create_system_tray_menu(self):
         """创建系统托盘菜单"""
+        import pystray
+        
         def hide_window(icon, item):
             self.tray_icon.visible = False
         
@@ -1193,6 +1348,7 @@ class StudentGUI:
             try:
                 # 设置进程为关键进程（需要管理员权限）
                 # 这会使进程在任务管理器中更难被终止
+                import ctypes
                 kernel32 = ctypes.windll.kernel32
                 kernel32.SetProcessWorkingSetSize(process_handle, -1, -1)
                 
@@ -1214,6 +1370,7 @@ class StudentGUI:
         """获取本地IP地址"""
         try:
             # 使用 ipconfig 命令获取本机IP
+            import subprocess
             result = subprocess.run(['ipconfig'], capture_output=True, text=True, encoding='gbk')
             lines = result.stdout.splitlines()
             for line in lines:
@@ -1227,93 +1384,64 @@ class StudentGUI:
             return "127.0.0.1"
     
     def get_usb_devices(self):
-        """获取当前连接的U盘列表"""
-        if not HAS_WIN32:
-            print("未安装pywin32模块，无法获取U盘信息")
+        """获取当前连接的U盘列表（监视已启动时直接返回监视到的U盘，不重新查询）"""
+        if self.drive_watcher:
+            return self.drive_watcher.drives
+        
+        backend = create_backend()
+        if backend is None:
+            print("当前环境不支持检测U盘")
             return []
         
         try:
-            c = wmi.WMI()
-            usb_devices = []
-            
-            # 遍历所有磁盘驱动器
-            for disk in c.Win32_DiskDrive():
-                # 检查是否是可移动磁盘
-                if 'removable' in disk.MediaType.lower() or 'usb' in disk.PNPDeviceID.lower():
-                    # 获取分区信息
-                    partitions = disk.associators(wmi_association='Win32_DiskDriveToDiskPartition')
-                    for partition in partitions:
-                        # 获取逻辑磁盘信息
-                        logical_disks = partition.associators(wmi_association='Win32_LogicalDiskToPartition')
-                        for logical_disk in logical_disks:
-                            device_info = {
-                                'name': logical_disk.Name,  # 驱动器号，如 "E:" 
-                                'description': disk.Caption,  # 设备描述
-                                'device_id': disk.DeviceID  # 设备ID
-                            }
-                            usb_devices.append(device_info)
-            
-            return usb_devices
+            return backend.list_drives()
         except Exception as e:
             print(f"获取U盘信息失败: {e}")
             return []
+        finally:
+            backend.close()
     
-    def usb_watcher(self):
-        """U盘监控线程"""
-        while not self.stop_usb_watcher:
-            try:
-                current_devices = self.get_usb_devices()
-                current_device_ids = [device['device_id'] for device in current_devices]
-                previous_device_ids = [device['device_id'] for device in self.usb_devices]
-                
-                # 检查是否有新的U盘插入
-                for device in current_devices:
-                    if device['device_id'] not in previous_device_ids:
-                        print(f"检测到U盘插入: {device['name']} - {device['description']}")
-                        # 如果插入的是用户选择的U盘，执行备份
-                        if self.selected_usb.get() == device['device_id']:
-                            self.perform_backup(device['name'])
-                
-                # 更新U盘列表
-                self.usb_devices = current_devices
-                
-                # 等待一段时间后再次检查
-                time.sleep(2)
-            except Exception as e:
-                print(f"U盘监控错误: {e}")
-                time.sleep(5)
+    def on_usb_inserted(self, device):
+        """U盘插入（在监视线程中调用）"""
+        print(f"检测到U盘插入: {device['name']} - {device['description']}")
+        # 如果插入的是用户选择的U盘，在主线程中执行备份
+        self.root.after(0, lambda: self.backup_if_selected(device))
+    
+    def backup_if_selected(self, device):
+        """插入的是用户选择的U盘时执行备份"""
+        if self.selected_usb.get() == device['device_id']:
+            self.perform_backup(device['path'])
     
     def start_usb_monitoring(self):
-        """启动U盘监控"""
-        if self.usb_watcher_thread and self.usb_watcher_thread.is_alive():
+        """启动U盘监控（等待系统的插拔通知，不轮询）；接入后台服务时由服务监控"""
+        if self.drive_watcher or self.service:
             return
         
-        self.stop_usb_watcher = False
-        self.usb_watcher_thread = threading.Thread(target=self.usb_watcher, daemon=True)
-        self.usb_watcher_thread.start()
+        backend = create_backend()
+        if backend is None:
+            print("当前环境不支持检测U盘，U盘监控未启动")
+            return
+        
+        self.drive_watcher = DriveWatcher(backend, on_insert=self.on_usb_inserted)
+        self.drive_watcher.start()
         print("U盘监控已启动")
     
     def stop_usb_monitoring(self):
         """停止U盘监控"""
-        self.stop_usb_watcher = True
-        if self.usb_watcher_thread:
-            self.usb_watcher_thread.join(timeout=2)
+        if self.drive_watcher:
+            self.drive_watcher.stop()
+            self.drive_watcher = None
             print("U盘监控已停止")
     
     def save_settings(self):
-        """保存设置到文件"""
+        """保存设置到文件（设置文件与后台服务共用，只改写窗口的设置）"""
+        settings = {
+            'selected_usb': self.selected_usb.get(),
+            'auto_start_enabled': self.auto_start_enabled
+        }
         try:
-            settings = {
-                'selected_usb': self.selected_usb.get(),
-                'auto_start_enabled': self.auto_start_enabled
-            }
-            
-            # 确保设置文件目录存在
-            os.makedirs(os.path.dirname(self.settings_file), exist_ok=True)
-            
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-            
+            if not update_settings(self.settings_file, **settings):
+                raise OSError(self.settings_file)
             print("设置已保存到:", self.settings_file)
         except Exception as e:
             print(f"保存设置失败: {e}")
@@ -1354,7 +1482,7 @@ class StudentGUI:
                 if 'auto_start_enabled' in settings:
                     self.auto_start_enabled = settings['auto_start_enabled']
                     # 根据设置更新注册表
-                    if HAS_WIN32:
+                    if load_win32():
                         self.set_auto_start(self.auto_start_enabled)
                         print(f"已加载设置: 自动启动设置为{'开启' if self.auto_start_enabled else '关闭'}")
                 loaded = True
@@ -1372,7 +1500,7 @@ class StudentGUI:
                     # 加载设置...
                     if 'auto_start_enabled' in settings:
                         self.auto_start_enabled = settings['auto_start_enabled']
-                        if HAS_WIN32:
+                        if load_win32():
                             self.set_auto_start(self.auto_start_enabled)
                     loaded = True
                     print("从备用设置文件成功加载设置")
@@ -1380,7 +1508,7 @@ class StudentGUI:
                     print(f"从备用设置文件加载失败: {e}")
         
         # 尝试检测当前注册表中的自动启动状态
-        if not loaded and HAS_WIN32:
+        if not loaded and load_win32():
             try:
                 current_status = self.is_auto_start_enabled()
                 if current_status != self.auto_start_enabled:
@@ -1390,34 +1518,35 @@ class StudentGUI:
                 pass
     
     def perform_backup(self, usb_path):
-        """执行数据备份到U盘"""
-        try:
-            # 获取本地数据目录
-            local_data_dir = os.path.dirname(os.path.abspath(self.data_manager.file_path))
-            
-            # 创建备份目录
-            backup_dir = os.path.join(usb_path, "作业查看器备份")
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
-            
-            # 备份数据文件
-            backup_file = os.path.join(backup_dir, f"student_data_backup_{time.strftime('%Y%m%d_%H%M%S')}.json")
-            
-            # 复制数据文件
-            with open(self.data_manager.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            with open(backup_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
-            print(f"数据备份成功: {backup_file}")
+        """执行数据备份到U盘（增量备份：只复制上次备份后有变化的文件）
+        
+        备份在后台线程中进行，复制期间界面照常响应，完成后在主线程中显示结果；上一次备份尚未完成时不重复备份。
+        """
+        if self.backup_running:
+            print(f"上一次备份尚未完成，跳过: {usb_path}")
+            return
+        self.backup_running = True
+        backup_dir = os.path.join(usb_path, BACKUP_DIR_NAME)
+        
+        def backup_thread():
+            try:
+                result = self.data_manager.backup_to(backup_dir)
+            except Exception as e:
+                result = {"success": False, "message": str(e)}
+            self.root.after(0, self.on_backup_finished, usb_path, backup_dir, result)
+        
+        threading.Thread(target=backup_thread, daemon=True).start()
+    
+    def on_backup_finished(self, usb_path, backup_dir, result):
+        """备份完成（在主线程中调用）"""
+        self.backup_running = False
+        if result["success"]:
+            print(f"{result['message']}，耗时 {result['elapsed'] * 1000:.0f}ms: {backup_dir}")
             
             # 显示通知
             self.show_tray_notification("备份成功", f"数据已成功备份到U盘: {usb_path}")
-            
-        except Exception as e:
-            print(f"备份失败: {e}")
-            messagebox.showerror("备份失败", f"无法备份数据到U盘: {str(e)}")
+        else:
+            messagebox.showerror("备份失败", f"无法备份数据到U盘: {result['message']}")
     
     def show_about(self, icon=None, item=None):
         """显示关于信息"""
@@ -1514,6 +1643,58 @@ class StudentGUI:
             self.root.after(0, self.show_tray_notification, 
                 "老师断开", f"老师 {teacher_id} 已断开连接")
     
+    def load_service_status(self):
+        """显示接入的后台服务的状态：服务器、已连接的老师和本机班级"""
+        status = self.service.request("status")
+        if not status["success"]:
+            print(f"获取学生端服务状态失败: {status['message']}")
+            return
+        self.is_server_running = status["server_running"]
+        self.port.set(status["port"])
+        self.update_server_status()
+        for teacher_id, teacher_name in status["teachers"]:
+            self.add_teacher_to_list(teacher_id, teacher_name)
+        if status["student_class"]:
+            self.selected_class.set(status["student_class"])
+            self.refresh_homeworks()
+        self.student_name.set(status["student_name"])
+    
+    def update_server_status(self):
+        """按服务器是否运行更新状态显示"""
+        if self.is_server_running:
+            self.status_label.config(text=f"服务器运行中 (端口: {self.port.get()})", foreground="green")
+            self.start_server_btn.config(text="停止服务器", command=self.stop_server, state="normal")
+        else:
+            self.status_label.config(text="服务器未启动", foreground="red")
+            self.start_server_btn.config(text="启动服务器", command=self.start_server, state="normal")
+    
+    def on_service_event(self, event):
+        """后台服务的事件（在主线程中调用）"""
+        kind = event.get("event")
+        if kind == "teacher_connected":
+            self.add_teacher_to_list(event["teacher_id"], event["teacher_name"])
+            if self.is_minimized_to_tray:
+                self.show_tray_notification("老师连接", f"老师 {event['teacher_name']} 已连接")
+        elif kind == "teacher_disconnected":
+            self.remove_teacher_from_list(event["teacher_id"])
+        elif kind == "server_state":
+            self.is_server_running = event["server_running"]
+            self.port.set(event["port"])
+            self.update_server_status()
+            if not self.is_server_running:
+                for item in self.teachers_tree.get_children():
+                    self.teachers_tree.delete(item)
+        elif kind == "backup_done":
+            if event["success"]:
+                self.show_tray_notification("备份成功", f"数据已成功备份到U盘: {event['path']}")
+            else:
+                messagebox.showerror("备份失败", f"无法备份数据到U盘: {event['message']}")
+        elif kind == "disconnected" and self.service is not None:
+            print("与学生端后台服务的连接已断开")
+            self.service = None
+            self.is_server_running = False
+            self.update_server_status()
+    
     def run(self):
         """运行程序"""
         self.root.mainloop()
@@ -1524,7 +1705,7 @@ def ensure_single_instance():
     Returns:
         bool: 如果是第一个实例返回True，否则返回False
     """
-    if HAS_WIN32:
+    if load_win32():
         # 创建一个命名互斥锁
         mutex_name = "HomeworkViewerStudentMutex"
         try:
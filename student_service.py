@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+学生端后台服务
+不打开窗口，只运行学生服务器（StudentServer）、数据管理器、网络备份（BackupSource）和插入U盘时的自动备份；
+不导入tkinter、pystray、PIL和WMI，适合只需要向老师提供作业数据、偶尔才打开窗口的教室电脑开机运行
+
+用法:
+    python student_service.py
+    python student_service.py --port 8888 --data-file student_data.json --settings student_settings.json
+
+服务在本机回环地址的 SERVICE_PORT 端口接受控制连接。打开学生端窗口时先尝试接入已在运行的服务，
+接入后窗口不再启动自己的服务器和U盘监视，只通过控制连接查看和修改服务的状态
+（作业数据由两边各自的DataManager以共享模式读写同一个数据目录，一边保存后另一边自动刷新）。
+
+控制端口只接受带令牌的请求：服务第一次启动时生成令牌，写入设置文件旁只有当前用户能读取的
+<设置文件>.token 中（见 ensure_token），窗口接入时读取该文件（见 ServiceClient）。
+令牌不正确的请求被拒绝并断开连接，未通过验证的连接也收不到事件，本机其它用户无法控制服务或查看老师连接。
+
+控制连接上的消息与老师连接相同，是首尾相接的JSON对象（见 communication.MessageReader）：
+  请求  {"type": 命令, "request_id": 编号, "token": 令牌, ...参数}
+  回应  {"type": "reply", "request_id": 编号, "success", "message", ...}
+  事件  {"type": "event", "event": "teacher_connected" | "teacher_disconnected" | "server_state" | "backup_done", ...}
+命令:
+  status            服务状态 {"server_running", "port", "teachers": [[ID, 姓名]], "student_class", "student_name",
+                    "backup_drive", "pid"}
+  start_server      启动学生服务器
+  stop_server       停止学生服务器（服务本身继续运行）
+  set_student       设置本机的班级和学生姓名 {"class", "name"}
+  set_backup_drive  设置插入时自动备份的U盘 {"device_id"}，空字符串表示不自动备份
+  shutdown          退出服务
+"""
+
+import os
+import sys
+import hmac
+import json
+import socket
+import secrets
+import signal
+import argparse
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from communication import StudentServer, MessageReader, MessageTypes, MessageStructure, RECV_BUFFER_SIZE, HOMEWORK_PAGE_SIZE
+from data_manager import DataManager, storage_options
+from backup_engine import BACKUP_DIR_NAME
+from drive_watcher import DriveWatcher, create_backend
+from network_backup import BackupSource, DEFAULT_PORT
+
+# 控制连接的端口（只监听本机回环地址）
+SERVICE_PORT = 8899
+
+# 与学生端窗口共用的设置文件（selected_usb 为自动备份的U盘，student_class/student_name 为本机的班级和学生姓名）
+SETTINGS_FILE = "student_settings.json"
+
+# 控制连接令牌文件的后缀（与设置文件放在一起）
+TOKEN_SUFFIX = ".token"
+
+# 等待服务回应的秒数
+REQUEST_TIMEOUT = 5.0
+
+# 学生端默认的班级
+DEFAULT_CLASSES = ["701", "702", "703", "704", "705", "706", "707", "708", "709", "710"]
+
+
+class HomeworkResponder:
+    """整理老师请求的作业回应，学生端窗口和后台服务共用
+
+    同一数据版本下相同的请求直接使用上次整理好的作业（版本变化后整体丢弃）
+    """
+
+    def __init__(self, data_manager: DataManager):
+        self.data_manager = data_manager
+        self._version = None
+        self._cache = {}
+
+    def respond(self, message: Dict[str, Any], student_class: str, student_name: str) -> Dict[str, Any]:
+        """老师的作业请求对应的回应消息（作业按页回应：第一页之后老师带着上一页的next游标继续请求）"""
+        class_name = message.get('class', '')
+        subject = message.get('subject', '')
+        limit = message.get('limit') or HOMEWORK_PAGE_SIZE
+        after = message.get('after')
+
+        version = self.data_manager.version
+        if self._version != version:
+            self._version = version
+            self._cache = {}
+        cache_key = (class_name, subject, student_class, student_name, limit, str(after))
+        cached = self._cache.get(cache_key)
+
+        if cached is None:
+            matched_homeworks = []
+            next_cursor, total = None, 0
+            if class_name == student_class or class_name == "全部":
+                page = self.data_manager.get_homeworks_page(
+                    class_name=student_class,
+                    subject=subject if subject != "全部" else None,
+                    limit=limit,
+                    after=after
+                )
+                next_cursor, total = page["next"], page["total"]
+                for homework in page["items"]:
+                    matched_homeworks.append({
+                        'id': homework.get('id', ''),
+                        'class': homework.get('class', ''),
+                        'subject': homework.get('subject', ''),
+                        'content': homework.get('content', ''),
+                        'teacher': homework.get('teacher', ''),
+                        'student': student_name,
+                        'timestamp': homework.get('timestamp', ''),
+                        'ts': homework.get('ts'),
+                        'status': homework.get('status', '已完成')
+                    })
+            cached = self._cache[cache_key] = (matched_homeworks, next_cursor, total)
+        matched_homeworks, next_cursor, total = cached
+
+        return MessageStructure.homework_response({
+            'student_class': student_class,
+            'student_name': student_name,
+            'homeworks': matched_homeworks,
+            'teacher_message': message.get('message', ''),
+            'next': next_cursor,
+            'total': total
+        })
+
+
+def load_settings(settings_file: str) -> Dict[str, Any]:
+    """读取设置文件，不存在或无法读取时返回空字典"""
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+        return settings if isinstance(settings, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"读取设置文件失败: {e}")
+        return {}
+
+
+def update_settings(settings_file: str, **values) -> bool:
+    """修改设置文件中的部分设置，其它设置保持不变"""
+    settings = load_settings(settings_file)
+    settings.update(values)
+    try:
+        directory = os.path.dirname(os.path.abspath(settings_file))
+        os.makedirs(directory, exist_ok=True)
+        with open(settings_file, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+        return True
+    except Exception as e:
+        print(f"保存设置失败: {e}")
+        return False
+
+
+def token_path(settings_file: str) -> str:
+    """获取设置文件对应的控制连接令牌文件路径"""
+    return settings_file + TOKEN_SUFFIX
+
+
+def read_token(settings_file: str) -> Optional[str]:
+    """读取控制连接令牌，不存在或无法读取时返回None"""
+    try:
+        with open(token_path(settings_file), 'r', encoding='utf-8') as f:
+            token = f.read().strip()
+        return token or None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"读取控制连接令牌失败: {e}")
+        return None
+
+
+def ensure_token(settings_file: str) -> Optional[str]:
+    """读取控制连接令牌，还没有时生成一个（每次安装一个），令牌文件只允许当前用户读写
+
+    Returns:
+        Optional[str]: 令牌，无法写入令牌文件时返回None
+    """
+    token = read_token(settings_file)
+    if token is not None:
+        return token
+    path = token_path(settings_file)
+    temp_path = path + ".tmp"
+    token = secrets.token_hex(32)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        # 创建时就只允许当前用户读写，不留下其它用户可读的时间窗口
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(token)
+        os.chmod(temp_path, 0o600)
+        os.replace(temp_path, path)
+        return token
+    except Exception as e:
+        print(f"保存控制连接令牌失败: {e}")
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError:
+            pass
+        return None
+
+
+class StudentService:
+    """学生端后台服务：学生服务器 + 网络备份 + U盘自动备份 + 本机控制连接"""
+
+    def __init__(self, data_file: str = "student_data.json", port: int = DEFAULT_PORT,
+                 service_port: int = SERVICE_PORT, settings_file: str = SETTINGS_FILE,
+                 host: str = '0.0.0.0', drive_backend=None, data_manager: DataManager = None):
+        """
+        Args:
+            drive_backend: U盘检测后端（见 drive_watcher），不指定时按当前系统创建
+            data_manager: 已创建的数据管理器，不指定时与学生端窗口相同地以延迟加载、共享模式打开data_file，
+                存储选项按设置文件（见 data_manager.storage_options）
+        """
+        self.settings_file = settings_file
+        self.service_port = service_port
+        settings = load_settings(settings_file)
+        self.data_manager = data_manager or DataManager(data_file, lazy=True, shared=True, **storage_options(settings))
+        self.server = StudentServer(host=host, port=port)
+        self.responder = HomeworkResponder(self.data_manager)
+        self.backup_source = BackupSource(self.data_manager)
+        self._drive_backend = drive_backend
+        self.drive_watcher = None
+
+        self.backup_drive = settings.get('selected_usb', '')
+        self.student_name = settings.get('student_name') or "学生"
+        self.student_class = settings.get('student_class') or ""
+        for class_name in DEFAULT_CLASSES:
+            self.data_manager.add_class(class_name)
+        if not self.student_class:
+            classes = self.data_manager.get_classes()
+            self.student_class = classes[0] if classes else ""
+
+        self.teachers = {}  # {teacher_id: 老师姓名}
+        self._clients = {}  # {控制连接: 发送锁}
+        self._clients_lock = threading.Lock()
+        self._control_socket = None
+        self._token = None
+        self._stopped = threading.Event()
+
+        self.server.register_handler(MessageTypes.HOMEWORK_REQUEST, self._handle_homework_request)
+        self.server.register_handler(MessageTypes.CLASS_LIST_REQUEST, self._handle_class_list_request)
+        self.backup_source.register(self.server)
+        self.server.add_listener('teacher_connected', self._on_teacher_connected)
+        self.server.add_listener('teacher_disconnected', self._on_teacher_disconnected)
+
+    # ---- 启动和停止 ----
+
+    def start(self) -> Dict[str, Any]:
+        """开始接受控制连接，启动学生服务器和U盘监视
+
+        Returns:
+            Dict[str, Any]: {"success", "message"}，控制端口已被占用（服务已在运行）或无法保存令牌时失败
+        """
+        self._token = ensure_token(self.settings_file)
+        if self._token is None:
+            return {"success": False, "message": f"无法保存控制连接令牌: {token_path(self.settings_file)}"}
+        control_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            control_socket.bind(('127.0.0.1', self.service_port))
+            control_socket.listen(5)
+        except OSError as e:
+            control_socket.close()
+            return {"success": False, "message": f"学生端服务已在运行或端口 {self.service_port} 被占用: {e}"}
+        self._control_socket = control_socket
+        self.service_port = control_socket.getsockname()[1]
+        threading.Thread(target=self._accept_clients, daemon=True).start()
+
+        result = self.start_server()
+        self.start_drive_watcher()
+        return {"success": True, "message": f"学生端服务已启动（控制端口 {self.service_port}）；{result['message']}"}
+
+    def start_server(self) -> Dict[str, Any]:
+        """启动学生服务器"""
+        if self.server.is_running:
+            return {"success": True, "message": "服务器已在运行"}
+        if not self.server.start_server():
+            return {"success": False, "message": "服务器启动失败，请检查端口是否被占用"}
+        self.server.port = self.server.server_socket.getsockname()[1]
+        self._broadcast({"event": "server_state", "server_running": True, "port": self.server.port})
+        return {"success": True, "message": f"服务器运行中 (端口: {self.server.port})"}
+
+    def stop_server(self) -> Dict[str, Any]:
+        """停止学生服务器（控制连接和U盘监视继续运行）"""
+        if self.server.is_running:
+            self.server.stop_server()
+            self.teachers.clear()
+            self._broadcast({"event": "server_state", "server_running": False, "port": self.server.port})
+        return {"success": True, "message": "服务器已停止"}
+
+    def start_drive_watcher(self):
+        """开始监视U盘插拔（当前环境不支持检测U盘时不启动）"""
+        if self.drive_watcher:
+            return
+        backend = self._drive_backend or create_backend()
+        if backend is None:
+            print("当前环境不支持检测U盘，U盘自动备份未启动")
+            return
+        self.drive_watcher = DriveWatcher(backend, on_insert=self._on_drive_inserted)
+        self.drive_watcher.start()
+
+    def stop(self):
+        """停止服务：关闭控制连接、学生服务器和U盘监视"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self._control_socket:
+            try:
+                # 关闭前先shutdown，Linux上阻塞在accept中的线程才会返回
+                self._control_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._control_socket.close()
+        with self._clients_lock:
+            clients = list(self._clients)
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except OSError:
+                pass
+        if self.drive_watcher:
+            self.drive_watcher.stop()
+            self.drive_watcher = None
+        self.server.stop_server()
+        self.data_manager.close()
+        print("学生端服务已停止")
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待服务停止，停止后返回True"""
+        return self._stopped.wait(timeout)
+
+    # ---- 状态 ----
+
+    def status(self) -> Dict[str, Any]:
+        """服务状态（控制命令status的回应）"""
+        return {
+            "success": True, "message": "",
+            "server_running": self.server.is_running, "port": self.server.port,
+            "teachers": [[teacher_id, name] for teacher_id, name in self.teachers.items()],
+            "student_class": self.student_class, "student_name": self.student_name,
+            "backup_drive": self.backup_drive, "pid": os.getpid()
+        }
+
+    def set_student(self, class_name: str = None, name: str = None) -> Dict[str, Any]:
+        """设置本机的班级和学生姓名（保存到设置文件）"""
+        if class_name is not None:
+            self.student_class = class_name
+        if name:
+            self.student_name = name
+        update_settings(self.settings_file, student_class=self.student_class, student_name=self.student_name)
+        return {"success": True, "message": f"班级: {self.student_class}，学生: {self.student_name}"}
+
+    def set_backup_drive(self, device_id: str) -> Dict[str, Any]:
+        """设置插入时自动备份的U盘（保存到设置文件）"""
+        self.backup_drive = device_id or ""
+        update_settings(self.settings_file, selected_usb=self.backup_drive)
+        return {"success": True, "message": "已设置自动备份U盘" if self.backup_drive else "已取消自动备份"}
+
+    # ---- 老师连接 ----
+
+    def _handle_homework_request(self, message, client_socket, teacher_id):
+        print(f"收到老师请求作业：班级={message.get('class', '')}，学科={message.get('subject', '')}")
+        response = self.responder.respond(message, self.student_class, self.student_name)
+        self.server.send_to_teacher(teacher_id, response)
+
+    def _handle_class_list_request(self, message, client_socket, teacher_id):
+        self.server.send_to_teacher(teacher_id, MessageStructure.class_list_response(self.data_manager.get_classes()))
+
+    def _on_teacher_connected(self, event_type, data):
+        teacher_id = data.get('teacher_id')
+        teacher_name = data.get('teacher_data', {}).get('teacher_name', 'Unknown')
+        self.teachers[teacher_id] = teacher_name
+        self.server.send_to_teacher(teacher_id, MessageStructure.class_list_response(self.data_manager.get_classes()))
+        self._broadcast({"event": "teacher_connected", "teacher_id": teacher_id, "teacher_name": teacher_name})
+
+    def _on_teacher_disconnected(self, event_type, data):
+        teacher_id = data.get('teacher_id')
+        self.teachers.pop(teacher_id, None)
+        self._broadcast({"event": "teacher_disconnected", "teacher_id": teacher_id})
+
+    # ---- U盘自动备份 ----
+
+    def _on_drive_inserted(self, drive: Dict[str, str]):
+        """插入的是设置的U盘时备份（在监视线程中调用）"""
+        print(f"检测到U盘插入: {drive['name']} - {drive['description']}")
+        if not self.backup_drive or drive['device_id'] != self.backup_drive:
+            return
+        backup_dir = os.path.join(drive['path'], BACKUP_DIR_NAME)
+        result = self.data_manager.backup_to(backup_dir)
+        if result["success"]:
+            print(f"{result['message']}，耗时 {result['elapsed'] * 1000:.0f}ms: {backup_dir}")
+        else:
+            print(f"无法备份数据到U盘: {result['message']}")
+        self._broadcast({"event": "backup_done", "success": result["success"], "message": result["message"],
+                         "path": drive['path']})
+
+    # ---- 控制连接 ----
+
+    def _accept_clients(self):
+        while not self._stopped.is_set():
+            try:
+                client, _address = self._control_socket.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle_client, args=(client,), daemon=True).start()
+
+    def _handle_client(self, client: socket.socket):
+        """处理一个控制连接：每个请求都要带正确的令牌，第一次通过验证后才接收事件"""
+        reader = MessageReader()
+        try:
+            while True:
+                data = client.recv(RECV_BUFFER_SIZE)
+                if not data:
+                    break
+                for message in reader.feed(data):
+                    command = message.get('type')
+                    if not self._authorized(message):
+                        reply = {"type": "reply", "request_id": message.get('request_id'),
+                                 "success": False, "message": "控制连接令牌不正确"}
+                        client.sendall(json.dumps(reply, ensure_ascii=False).encode('utf-8'))
+                        return
+                    with self._clients_lock:
+                        self._clients.setdefault(client, threading.Lock())
+                    try:
+                        reply = self._execute(command, message)
+                    except Exception as e:
+                        reply = {"success": False, "message": f"执行命令 {command} 出错: {e}"}
+                    reply.update({"type": "reply", "request_id": message.get('request_id')})
+                    self._send(client, reply)
+                    if command == "shutdown":
+                        threading.Thread(target=self.stop, daemon=True).start()
+        except (OSError, ValueError):
+            pass
+        finally:
+            with self._clients_lock:
+                self._clients.pop(client, None)
+            client.close()
+
+    def _authorized(self, message: Dict[str, Any]) -> bool:
+        token = message.get('token')
+        return isinstance(token, str) and hmac.compare_digest(token.encode('utf-8'), self._token.encode('utf-8'))
+
+    def _execute(self, command: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        if command == "status":
+            return self.status()
+        if command == "start_server":
+            return self.start_server()
+        if command == "stop_server":
+            return self.stop_server()
+        if command == "set_student":
+            return self.set_student(message.get('class'), message.get('name'))
+        if command == "set_backup_drive":
+            return self.set_backup_drive(message.get('device_id', ''))
+        if command == "shutdown":
+            return {"success": True, "message": "学生端服务正在退出"}
+        return {"success": False, "message": f"未知命令: {command}"}
+
+    def _send(self, client: socket.socket, message: Dict[str, Any]) -> bool:
+        with self._clients_lock:
+            lock = self._clients.get(client)
+        if lock is None:
+            return False
+        try:
+            with lock:
+                client.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8'))
+            return True
+        except OSError:
+            return False
+
+    def _broadcast(self, event: Dict[str, Any]):
+        """把事件发送给所有接入的窗口"""
+        event = dict(event, type="event")
+        with self._clients_lock:
+            clients = list(self._clients)
+        for client in clients:
+            self._send(client, event)
+
+
+class ServiceClient:
+    """学生端窗口到后台服务的控制连接"""
+
+    def __init__(self, port: int = SERVICE_PORT, timeout: float = REQUEST_TIMEOUT,
+                 settings_file: str = SETTINGS_FILE, token: str = None):
+        """
+        Args:
+            settings_file: 服务使用的设置文件，从旁边的令牌文件读取控制连接令牌
+            token: 直接指定令牌（不读取令牌文件）
+        """
+        self.port = port
+        self.timeout = timeout
+        self.token = token if token is not None else read_token(settings_file)
+        self.sock = None
+        self.connected = False
+        self._listeners = []
+        self._pending = {}  # {request_id: [完成事件, 回应]}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def connect(self) -> bool:
+        """连接本机的后台服务，服务没有运行时返回False"""
+        try:
+            self.sock = socket.create_connection(('127.0.0.1', self.port), timeout=self.timeout)
+            self.sock.settimeout(None)
+        except OSError:
+            self.sock = None
+            return False
+        self.connected = True
+        threading.Thread(target=self._receive, daemon=True).start()
+        return True
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]):
+        """添加事件监听器 listener(事件)（在接收线程中调用）"""
+        self._listeners.append(listener)
+
+    def request(self, command: str, **params) -> Dict[str, Any]:
+        """发送命令并等待回应"""
+        if not self.connected:
+            return {"success": False, "message": "未接入学生端服务"}
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            pending = self._pending[request_id] = [threading.Event(), None]
+        message = dict(params, type=command, request_id=request_id, token=self.token)
+        try:
+            with self._lock:
+                self.sock.sendall(json.dumps(message, ensure_ascii=False).encode('utf-8'))
+            if not pending[0].wait(self.timeout):
+                return {"success": False, "message": "学生端服务没有回应"}
+            return pending[1] or {"success": False, "message": "与学生端服务的连接已断开"}
+        except OSError as e:
+            return {"success": False, "message": f"与学生端服务通信失败: {e}"}
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    def _receive(self):
+        reader = MessageReader()
+        try:
+            while True:
+                data = self.sock.recv(RECV_BUFFER_SIZE)
+                if not data:
+                    break
+                for message in reader.feed(data):
+                    if message.get('type') == "reply":
+                        with self._lock:
+                            pending = self._pending.get(message.get('request_id'))
+                        if pending is not None:
+                            pending[1] = message
+                            pending[0].set()
+                    elif message.get('type') == "event":
+                        for listener in list(self._listeners):
+                            try:
+                                listener(message)
+                            except Exception as e:
+                                print(f"处理学生端服务事件出错: {e}")
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.connected = False
+            with self._lock:
+                for pending in self._pending.values():
+                    pending[0].set()
+            for listener in list(self._listeners):
+                try:
+                    listener({"type": "event", "event": "disconnected"})
+                except Exception as e:
+                    print(f"处理学生端服务事件出错: {e}")
+
+    def close(self):
+        """断开控制连接（服务继续运行）"""
+        self.connected = False
+        if self.sock:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.sock.close()
+
+
+def attach(port: int = SERVICE_PORT, settings_file: str = SETTINGS_FILE) -> Optional[ServiceClient]:
+    """接入本机已在运行的后台服务，没有运行或令牌不正确时返回None"""
+    client = ServiceClient(port, settings_file=settings_file)
+    if client.token is None or not client.connect():
+        return None
+    if not client.request("status")["success"]:
+        client.close()
+        return None
+    return client
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="学生端后台服务（不打开窗口）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="学生服务器端口")
+    parser.add_argument("--service-port", type=int, default=SERVICE_PORT, help="本机控制连接端口")
+    parser.add_argument("--data-file", default="student_data.json", help="数据文件名（相对数据目录）或绝对路径")
+    parser.add_argument("--settings", default=SETTINGS_FILE, help="设置文件")
+    args = parser.parse_args(argv)
+
+    service = StudentService(args.data_file, port=args.port, service_port=args.service_port,
+                             settings_file=args.settings)
+    result = service.start()
+    print(result["message"])
+    if not result["success"]:
+        service.data_manager.close()
+        return 1
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stop())
+    try:
+        # 带超时等待，Windows上才能响应Ctrl+C
+        while not service.wait(1):
+            pass
+    except KeyboardInterrupt:
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,16 @@
 """
 老师端主程序
 提供学科选择、作业发送功能
+
+窗口先显示出来，再打开数据文件和全文检索索引填充列表（见 startup_profiler）
 """
 
+try:
+    import startup_profiler
+    STARTUP = startup_profiler.StartupProfiler("teacher")
+except ModuleNotFoundError:
+    STARTUP = None
+
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
@@ -27,19 +35,29 @@ except ModuleNotFoundError:
         CLASS_LIST_RESPONSE = "class_list_response"  # 添加缺失的属性
 
 try:
-    from data_manager import DataManager
+    from data_manager import DataManager, storage_options
 except ModuleNotFoundError:
+    def storage_options(settings): return {}
     # 最小桩实现，避免程序无法启动
     class DataManager:
-        def __init__(self, filename): pass
+        version = 0
+        def __init__(self, filename, **kwargs): pass
         def add_class(self, class_name): pass
         def get_classes(self): return ["高一(1)班", "高一(2)班", "高一(3)班"]
         def get_subjects(self): return ["语文", "数学", "英语"]
         def add_homework(self, **kw): return {"id": 1, **kw}
         def get_homeworks(self, class_name=None, subject=None): return []
+        def get_homeworks_page(self, class_name=None, subject=None, limit=200, after=None): return {"items": [], "next": None, "total": 0}
+        def search_homeworks(self, query, class_name=None, limit=None): return []
+        def add_change_listener(self, callback): pass
+        def reload_changes(self): return False
+        def close(self): pass
         def delete_homework(self, hid): pass
         def clear_all_data(self): pass
         def get_statistics(self): return {"total_homeworks": 0, "message_count": 0, "class_count": 0, "subject_stats": {}}
+        def transaction(self):
+            import contextlib
+            return contextlib.nullcontext(self)
 
 try:
     from communication import TeacherClient
@@ -53,6 +71,32 @@ except ModuleNotFoundError:
         def _send_message(self, msg): pass
         def is_connected(self): return False
 
+if STARTUP:
+    STARTUP.mark("imports")
+
+# 检索框停止输入多少毫秒后刷新列表，以及最多显示的检索结果数
+SEARCH_DEBOUNCE_MS = 150
+SEARCH_RESULT_LIMIT = 500
+
+# 作业列表每次加载的行数，滚动到底部或点击"加载更多"时加载下一页
+HOMEWORK_LIST_PAGE_SIZE = 200
+
+# 老师端设置文件，可以开启按班级分片、归档、留言容量等存储选项（见 data_manager.STORAGE_SETTINGS）
+SETTINGS_FILE = "teacher_settings.json"
+
+
+def load_settings(settings_file=SETTINGS_FILE):
+    """读取设置文件，不存在或无法读取时返回空字典"""
+    try:
+        with open(settings_file, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+        return settings if isinstance(settings, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"读取设置文件失败: {e}")
+        return {}
+
 class TeacherGUI:
     def __init__(self):
         self.root = tk.Tk()
@@ -60,9 +104,9 @@ class TeacherGUI:
         self.root.geometry("900x700")
         self.root.resizable(True, True)
         
-        # 初始化组件
+        # 初始化组件（数据管理器在窗口显示后再打开，见load_data）
         self.comm = TeacherClient()
-        self.data_manager = DataManager("teacher_data.json")
+        self.data_manager = None
         
         # 初始化变量
         self.selected_subject = tk.StringVar()
@@ -71,6 +115,12 @@ class TeacherGUI:
         self.homework_content = tk.StringVar()
         self.server_ip = tk.StringVar(value="127.0.0.1")
         self.auto_search = tk.BooleanVar(value=True)  # 添加自动搜索选项
+        self.search_query = tk.StringVar()  # 作业列表检索关键字
+        self._search_job = None
+        self._rendered_key = None  # 当前列表对应的 (数据版本, 检索关键字)
+        self._homework_cursor = None  # 作业列表下一页的游标，None表示已全部加载
+        self._homework_request = None  # 正在向学生分页请求的 (班级, 学科)
+        self._student_cursor = None  # 学生端作业下一页的游标，点击"加载更多"时才请求
         
         # 客户端状态
         self.is_connected = False
@@ -86,6 +136,28 @@ class TeacherGUI:
         
         # 绑定关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # 窗口显示后再加载数据
+        if STARTUP:
+            STARTUP.mark("window")
+            STARTUP.after_first_paint(self.root, self.load_data)
+        else:
+            self.load_data()
+    
+    def load_data(self):
+        """打开数据文件并填充列表（窗口已显示）"""
+        # 启动时加载全文检索索引；数据目录可能同时被其它程序使用，保存时加锁合并，其它程序保存后自动刷新列表；
+        # 按班级分片、归档、留言容量只在设置文件中开启时使用（见 data_manager.storage_options）
+        self.data_manager = DataManager("teacher_data.json", enable_search=True, shared=True,
+                                        **storage_options(load_settings()))
+        self.data_manager.add_change_listener(lambda: self.root.after(0, self.on_data_changed))
+        
+        # 初始化数据
+        self.init_data()
+        
+        if STARTUP:
+            STARTUP.mark("data")
+            STARTUP.finish()
     
     def setup_ui(self):
         """设置用户界面"""
@@ -142,10 +214,11 @@ class TeacherGUI:
         self.class_combo.grid(row=0, column=3, sticky=tk.W, padx=(0, 20))
         
         ttk.Button(homework_frame, text="发送作业", command=self.send_homework).grid(row=0, column=4, padx=(10, 0))
+        ttk.Button(homework_frame, text="请求学生作业", command=self.request_selected_homeworks).grid(row=0, column=5, padx=(10, 0))
         
         # 作业内容输入框架
         content_frame = ttk.Frame(homework_frame)
-        content_frame.grid(row=1, column=0, columnspan=5, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
+        content_frame.grid(row=1, column=0, columnspan=6, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(10, 0))
         content_frame.columnconfigure(0, weight=1)
         content_frame.rowconfigure(0, weight=1)
         
@@ -168,6 +241,12 @@ class TeacherGUI:
         ttk.Button(buttons_frame, text="关于", command=self.show_about).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(buttons_frame, text="刷新", command=self.refresh_data).pack(side=tk.LEFT, padx=(10, 0))
         
+        # 检索框：输入时即时过滤作业列表
+        search_entry = ttk.Entry(buttons_frame, textvariable=self.search_query, width=20)
+        search_entry.pack(side=tk.RIGHT)
+        ttk.Label(buttons_frame, text="搜索内容:").pack(side=tk.RIGHT, padx=(10, 5))
+        self.search_query.trace_add("write", self.on_search_changed)
+        
         # 移除了全屏模式相关功能
         
         # 作业列表框架
@@ -186,13 +265,27 @@ class TeacherGUI:
             self.homework_tree.heading(col, text=col)
             self.homework_tree.column(col, width=column_widths.get(col, 100))
         
-        # 添加滚动条
+        # 添加滚动条（滚动到底部时加载下一页）
         list_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.homework_tree.yview)
-        self.homework_tree.configure(yscrollcommand=list_scrollbar.set)
+        
+        def on_list_scrolled(first, last):
+            list_scrollbar.set(first, last)
+            if float(last) >= 1.0 and self._homework_cursor is not None:
+                self.root.after_idle(self.load_more_homeworks)
+        
+        self.homework_tree.configure(yscrollcommand=on_list_scrolled)
         
         self.homework_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         list_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
+        # 分页状态
+        page_frame = ttk.Frame(management_frame)
+        page_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.page_label = ttk.Label(page_frame, text="")
+        self.page_label.pack(side=tk.LEFT)
+        self.load_more_btn = ttk.Button(page_frame, text="加载更多", command=self.load_more_homeworks, state="disabled")
+        self.load_more_btn.pack(side=tk.RIGHT)
+        
         # 统计信息框架
         stats_frame = ttk.LabelFrame(main_frame, text="统计信息", padding="10")
         stats_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -202,9 +295,6 @@ class TeacherGUI:
         
         # 配置主框架行权重
         main_frame.rowconfigure(2, weight=2)
-        
-        # 初始化数据
-        self.init_data()
     
     def init_data(self):
         """初始化数据"""
@@ -240,17 +330,22 @@ class TeacherGUI:
                 
                 print(f"学生 {student_name} ({student_class}) 回应了 {len(homeworks)} 份作业")
                 
-                # 在老师端显示收到的作业
-                for homework in homeworks:
-                    self.root.after(0, self.display_received_homework, {
-                        'student': student_name,
-                        'class': student_class,
-                        'subject': homework.get('subject', ''),
-                        'content': homework.get('content', ''),
-                        'teacher': homework.get('teacher', ''),
-                        'timestamp': homework.get('timestamp', ''),
-                        'status': homework.get('status', '已完成')
-                    })
+                # 在老师端批量显示收到的作业（一次事务只写一次文件）
+                received = [{
+                    'student': student_name,
+                    'class': student_class,
+                    'subject': homework.get('subject', ''),
+                    'content': homework.get('content', ''),
+                    'teacher': homework.get('teacher', ''),
+                    'timestamp': homework.get('timestamp', ''),
+                    'ts': homework.get('ts'),
+                    'status': homework.get('status', '已完成')
+                } for homework in homeworks]
+                if received:
+                    self.root.after(0, self.display_received_homeworks, received)
+                
+                # 学生端还有下一页时记下游标，由"加载更多"请求
+                self.root.after(0, self._set_student_cursor, homework_data.get('next'))
             else:
                 # 旧格式兼容
                 student = homework_data.get('student', 'Unknown')
@@ -599,15 +694,48 @@ class TeacherGUI:
         messagebox.showinfo("成功", f"作业发送成功！已向 {class_name} 发送 {subject} 作业")
     
     def load_homework_list(self):
-        """加载作业列表"""
+        """加载作业列表（输入了检索关键字时只显示匹配的作业，按相关度排序）"""
+        if self.data_manager is None:
+            return  # 数据尚未加载，加载后会填充列表
+        query = self.search_query.get().strip()
+        
+        # 数据版本和检索关键字都没有变化时列表内容相同，不重新插入
+        render_key = (self.data_manager.version, query)
+        if render_key == self._rendered_key:
+            return
+        self._rendered_key = render_key
+        
         # 清空现有项目
         for item in self.homework_tree.get_children():
             self.homework_tree.delete(item)
         
-        # 获取所有作业
-        homeworks = self.data_manager.get_homeworks()
+        if query:
+            homeworks = self.data_manager.search_homeworks(query, limit=SEARCH_RESULT_LIMIT)
+            self._homework_cursor = None
+            self._homework_total = len(homeworks)
+        else:
+            # 只加载第一页，其余的在滚动到底部时加载
+            page = self.data_manager.get_homeworks_page(limit=HOMEWORK_LIST_PAGE_SIZE)
+            homeworks = page["items"]
+            self._homework_cursor = page["next"]
+            self._homework_total = page["total"]
         
-        # 添加到列表
+        self._insert_homework_rows(homeworks)
+    
+    def load_more_homeworks(self):
+        """加载作业列表的下一页，本地作业已全部显示时向学生请求下一页"""
+        if self._homework_cursor is None:
+            if self._student_cursor and self._homework_request:
+                class_name, subject = self._homework_request
+                self.request_homeworks(class_name, subject, self._student_cursor)
+            return
+        page = self.data_manager.get_homeworks_page(limit=HOMEWORK_LIST_PAGE_SIZE, after=self._homework_cursor)
+        self._homework_cursor = page["next"]
+        self._homework_total = page["total"]
+        self._insert_homework_rows(page["items"])
+    
+    def _insert_homework_rows(self, homeworks):
+        """在作业列表末尾添加作业，并更新分页状态"""
         for homework in homeworks:
             values = (
                 homework.get("id", ""),
@@ -619,6 +747,30 @@ class TeacherGUI:
                 homework.get("status", "")
             )
             self.homework_tree.insert("", tk.END, values=values)
+        
+        shown = len(self.homework_tree.get_children())
+        self.page_label.config(text=f"已显示 {shown} / 共 {max(shown, self._homework_total)} 份作业")
+        self._update_load_more_button()
+    
+    def _set_student_cursor(self, cursor):
+        """记录学生端作业下一页的游标"""
+        self._student_cursor = cursor
+        self._update_load_more_button()
+    
+    def _update_load_more_button(self):
+        """本地或学生端还有下一页时启用"加载更多"按钮"""
+        has_more = self._homework_cursor is not None or bool(self._student_cursor and self._homework_request)
+        self.load_more_btn.config(state="normal" if has_more else "disabled")
+    
+    def on_search_changed(self, *args):
+        """检索关键字变化时延迟刷新列表，连续输入只检索一次"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(SEARCH_DEBOUNCE_MS, self._apply_search)
+    
+    def _apply_search(self):
+        self._search_job = None
+        self.load_homework_list()
     
     def view_all_homeworks(self):
         """查看所有作业"""
@@ -656,8 +808,16 @@ class TeacherGUI:
         self.update_statistics()
         messagebox.showinfo("提示", "数据已刷新")
     
+    def on_data_changed(self):
+        """其它程序修改了数据：合并修改后刷新列表和统计"""
+        if self.data_manager.reload_changes():
+            self.load_homework_list()
+            self.update_statistics()
+    
     def update_statistics(self):
         """更新统计信息"""
+        if self.data_manager is None:
+            return
         stats = self.data_manager.get_statistics()
         
         subject_stats_text = []
@@ -705,49 +865,59 @@ class TeacherGUI:
     
     def display_received_homework(self, homework_data):
         """显示收到的作业"""
-        student = homework_data.get("student", "匿名")
-        class_name = homework_data.get("class", "")
-        subject = homework_data.get("subject", "")
-        content = homework_data.get("content", "")
-        teacher = homework_data.get("teacher", "")
-        timestamp = homework_data.get("timestamp", "刚刚")
-        status = homework_data.get("status", "已完成")
+        self.display_received_homeworks([homework_data])
+    
+    def display_received_homeworks(self, homework_list):
+        """批量显示收到的作业，所有作业在同一个事务中保存"""
+        rows = []
         
         # 添加作业到数据管理器
         try:
-            homework = self.data_manager.add_homework(
-                subject=subject,
-                content=content,
-                class_name=class_name,
-                teacher_name=teacher,
-                timestamp=timestamp,
-                status=status
-            )
-            homework_id = homework.get("id", 0)
-        except:
-            homework_id = 0  # 如果添加失败，使用临时ID
+            with self.data_manager.transaction():
+                for homework_data in homework_list:
+                    homework = self.data_manager.add_homework(
+                        subject=homework_data.get("subject", ""),
+                        content=homework_data.get("content", ""),
+                        class_name=homework_data.get("class", ""),
+                        teacher_name=homework_data.get("teacher", ""),
+                        timestamp=homework_data.get("ts") or homework_data.get("timestamp", "刚刚"),
+                        status=homework_data.get("status", "已完成")
+                    )
+                    # 显示规范化之后的时间
+                    rows.append((homework.get("id", 0), dict(homework_data, timestamp=homework.get("timestamp", "刚刚"))))
+        except Exception as e:
+            print(f"保存收到的作业失败: {e}")
+            rows = [(0, homework_data) for homework_data in homework_list]  # 如果添加失败，使用临时ID
         
         # 添加到作业列表
-        values = (
-            homework_id,
-            subject,
-            content[:50] + "..." if len(content) > 50 else content,
-            class_name,
-            teacher,
-            timestamp,
-            status
-        )
-        
-        self.root.after(0, lambda: self.homework_tree.insert("", tk.END, values=values))
+        for homework_id, homework_data in rows:
+            content = homework_data.get("content", "")
+            values = (
+                homework_id,
+                homework_data.get("subject", ""),
+                content[:50] + "..." if len(content) > 50 else content,
+                homework_data.get("class", ""),
+                homework_data.get("teacher", ""),
+                homework_data.get("timestamp", "刚刚"),
+                homework_data.get("status", "已完成")
+            )
+            self.root.after(0, lambda values=values: self.homework_tree.insert("", tk.END, values=values))
         
         # 显示通知
-        self.root.after(0, lambda: messagebox.showinfo(
-            "收到作业", 
-            f"学生 {student} ({class_name}) 提交了作业\n"
-            f"科目: {subject}\n"
-            f"内容: {content[:30]}...\n"
-            f"时间: {timestamp}"
-        ))
+        first = homework_list[0]
+        student = first.get("student", "匿名")
+        class_name = first.get("class", "")
+        if len(homework_list) == 1:
+            content = first.get("content", "")
+            notice = (f"学生 {student} ({class_name}) 提交了作业\n"
+                      f"科目: {first.get('subject', '')}\n"
+                      f"内容: {content[:30]}...\n"
+                      f"时间: {first.get('timestamp', '刚刚')}")
+        else:
+            subjects = sorted({homework_data.get("subject", "") for homework_data in homework_list})
+            notice = (f"学生 {student} ({class_name}) 提交了 {len(homework_list)} 份作业\n"
+                      f"科目: {', '.join(subjects)}")
+        self.root.after(0, lambda: messagebox.showinfo("收到作业", notice))
         
         # 更新统计信息
         self.root.after(0, self.update_statistics)
@@ -768,6 +938,31 @@ class TeacherGUI:
         except Exception as e:
             print(f"发送班级列表请求失败: {e}")
     
+    def request_selected_homeworks(self):
+        """向学生端请求所选班级、学科的作业"""
+        if not self.is_connected:
+            messagebox.showerror("错误", "请先连接到服务器")
+            return
+        
+        class_name = self.selected_class.get()
+        if not class_name:
+            messagebox.showerror("错误", "请选择班级")
+            return
+        
+        self.request_homeworks(class_name, self.selected_subject.get() or "全部")
+    
+    def request_homeworks(self, class_name, subject, after=None):
+        """分页请求学生作业，after为上一页回应中的游标；下一页由"加载更多"请求"""
+        try:
+            from communication import MessageStructure
+            message = MessageStructure.homework_request(class_name, subject, after=after)
+            self._homework_request = (class_name, subject)
+            self._set_student_cursor(None)  # 收到回应前不重复请求同一页
+            self.comm._send_message(message)
+            print(f"已请求 {class_name} {subject} 作业" + ("（下一页）" if after else ""))
+        except Exception as e:
+            print(f"发送作业请求失败: {e}")
+    
 
     
 
@@ -829,6 +1024,8 @@ class TeacherGUI:
         
         if self.is_connected:
             self.disconnect_from_server()
+        if self.data_manager:
+            self.data_manager.close()
         self.root.destroy()
     
     def run(self):
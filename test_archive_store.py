@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按月归档
+验证旧记录移入压缩归档、数据文件只保留近期记录，归档记录仍可通过原有查询接口读取
+"""
+
+import os
+import json
+import tempfile
+from data_manager import DataManager
+import archive_store
+
+
+def _seed(data_file):
+    """写入2024年9月至2025年3月每月的作业和留言"""
+    dm = DataManager(data_file)
+    with dm.transaction():
+        for month in (9, 10, 11, 12, 13, 14, 15):
+            year, month_number = 2024 + (month - 1) // 12, (month - 1) % 12 + 1
+            for class_name in ("701", "702"):
+                dm.add_homework("数学", f"{year}-{month_number:02d} 作业", class_name, overwrite=False,
+                                timestamp=f"{year}-{month_number:02d}-15 08:00:00")
+        dm.add_homework("语文", "时间未知", "701", overwrite=False, timestamp="刚刚")
+    return dm
+
+
+def test_archive_moves_old_records():
+    """旧记录写入按月压缩文件，数据文件只保留近期记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "archive.json")
+        dm = _seed(data_file)
+
+        result = dm.archive_old_records(before="2025-01-01")
+        assert result["success"] and result["archived"]["homeworks"] == 8, result
+
+        with open(data_file, 'r', encoding='utf-8') as f:
+            hot = json.load(f)["homeworks"]
+        assert len(hot) == 7  # 2025年的6份 + "刚刚"按当前时间记录的1份
+        assert os.path.exists(os.path.join(archive_store.archive_dir(data_file), "homeworks", "2024-09.json.gz"))
+
+        # 再次归档没有新记录
+        assert dm.archive_old_records(before="2025-01-01")["archived"]["homeworks"] == 0
+        print("✓ 旧记录已移入按月归档")
+
+
+def test_archived_records_queryable():
+    """归档记录可以按日期范围、ID查询，默认列表只包含近期记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "archive.json")
+        _seed(data_file).archive_old_records(before="2025-01-01")
+
+        dm = DataManager(data_file)
+        assert len(dm.get_homeworks("701")) == 4
+        autumn = dm.get_homeworks("701", since="2024-10-01", until="2025-01-31")
+        assert [h["content"] for h in autumn] == ["2025-01 作业", "2024-12 作业", "2024-11 作业", "2024-10 作业"]
+        assert len(dm.get_homeworks(include_archive=True)) == 15
+
+        first = dm.get_homework(1)
+        assert first is not None and first["content"] == "2024-09 作业"
+        stats = dm.get_statistics()
+        assert stats["homework_count"] == 7 and stats["archived_homework_count"] == 8
+
+        # 只打开查询范围内的月份
+        assert {month for _, month in dm.archive._month_cache} >= {"2024-10", "2024-11", "2024-12"}
+        assert ("homeworks", "2024-09") in dm.archive._month_cache  # 按ID查找时打开
+        print("✓ 归档记录可通过原有接口查询")
+
+
+def test_delete_archived_records():
+    """删除作业时数据文件中没有就删除归档中的作业，事务回滚时归档不变"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "archive.json")
+        dm = _seed(data_file)
+        dm.archive_old_records(before="2025-01-01")
+        september = [h["id"] for h in dm.get_homeworks(since="2024-09-01", until="2024-09-30")]
+        assert len(september) == 2
+
+        try:
+            with dm.transaction():
+                assert dm.delete_homework(september[0])
+                raise RuntimeError("回滚")
+        except RuntimeError:
+            pass
+        assert dm.get_homework(september[0]) is not None
+
+        assert dm.delete_homework(september[0])
+        assert dm.get_homework(september[0]) is None
+        assert dm.archive.count("homeworks") == 7
+        assert not dm.delete_homework(september[0])
+
+        # 月份删空时删除月份文件
+        assert dm.delete_homework(september[1])
+        assert "2024-09" not in dm.archive.months("homeworks")
+        assert not os.path.exists(os.path.join(archive_store.archive_dir(data_file), "homeworks", "2024-09.json.gz"))
+        assert DataManager(data_file).get_statistics()["archived_homework_count"] == 6
+        print("✓ 可以删除已归档的作业")
+
+
+def test_auto_archive_on_startup():
+    """设置归档期限后启动时自动归档，延迟加载模式同样适用"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "archive.json")
+        _seed(data_file)
+        DataManager(data_file, lazy=True)
+
+        dm = DataManager(data_file, lazy=True, archive_horizon_days=30)
+        assert [h["content"] for h in dm.get_homeworks()] == ["时间未知"]
+        assert dm.archive.count("homeworks") == 14
+
+        reopened = DataManager(data_file, lazy=True, archive_horizon_days=30)
+        assert reopened._lazy_store is not None, "没有需要归档的记录时不应完整加载"
+        print("✓ 启动时自动归档")
+
+
+if __name__ == "__main__":
+    test_archive_moves_old_records()
+    test_archived_records_queryable()
+    test_delete_archived_records()
+    test_auto_archive_on_startup()
+    print("\n所有归档测试通过")
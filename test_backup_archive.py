@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试压缩去重的备份格式
+验证按内容切分的数据块在插入内容后大部分保持不变、每天的备份只写入新的数据块、旧版清单仍可读取，以及无法压缩的数据原样保存
+"""
+
+import io
+import os
+import json
+import random
+import hashlib
+import tempfile
+from data_manager import DataManager
+import backup_archive
+import backup_engine
+
+
+def _lines(count, seed=0):
+    rng = random.Random(seed)
+    return [f'    {{"id": {i}, "content": "第{rng.randint(1, 200)}页练习"}},\n'.encode('utf-8') for i in range(count)]
+
+
+def test_chunk_boundaries_follow_content():
+    """在文件开头插入内容后，后面的数据块不变"""
+    lines = _lines(20000)
+    original = b"".join(lines)
+    chunks = list(backup_archive.iter_chunks(io.BytesIO(original)))
+    assert b"".join(chunks) == original and len(chunks) > 10
+    assert all(len(chunk) <= backup_archive.MAX_CHUNK_SIZE for chunk in chunks)
+
+    edited = b"".join(lines[:100] + [b'    {"id": 0, "content": "new"},\n'] + lines[100:])
+    edited_chunks = list(backup_archive.iter_chunks(io.BytesIO(edited)))
+    assert b"".join(edited_chunks) == edited
+    shared = set(chunks) & set(edited_chunks)
+    assert len(shared) >= len(chunks) - 2
+
+    # 没有换行的数据按最大长度切开
+    binary = bytes(random.Random(1).getrandbits(8) for _ in range(100000)).replace(b"\n", b" ")
+    binary_chunks = list(backup_archive.iter_chunks(io.BytesIO(binary), max_size=30000))
+    assert b"".join(binary_chunks) == binary and max(len(chunk) for chunk in binary_chunks) == 30000
+    print("✓ 数据块切分点由内容决定")
+
+
+def test_daily_backups_share_chunks():
+    """每天的备份只写入变化部分的数据块，所有备份都能完整还原"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "daily.json")
+        usb_dir = os.path.join(temp_dir, "usb")
+        dm = DataManager(data_file, use_snapshot_cache=False)
+        with dm.transaction():
+            for i in range(3000):
+                dm.add_homework("数学", f"第{i}页练习", str(700 + i % 10), overwrite=False)
+
+        full_bytes = 0
+        for day in range(5):
+            dm.add_homework("语文", f"第{day}天的作业", "701", overwrite=False)
+            result = dm.backup_to(usb_dir)
+            assert result["success"] and result["bytes_written"] < result["bytes_copied"], result
+            full_bytes += os.path.getsize(data_file)
+            if day > 0:
+                assert result["bytes_written"] < os.path.getsize(data_file) / 20
+
+        engine = backup_engine.BackupEngine(usb_dir)
+        assert engine.stored_size() < full_bytes / 5
+        latest = engine.latest()
+        restore_dir = os.path.join(temp_dir, "restore")
+        engine.extract(latest["name"], restore_dir)
+        with open(data_file, 'rb') as f:
+            assert f.read() == b"".join(engine.read(latest["name"], "daily.json"))
+        with open(os.path.join(restore_dir, "daily.json"), 'rb') as f:
+            assert hashlib.sha256(f.read()).hexdigest() == latest["files"]["daily.json"]["sha256"]
+        print("✓ 每天的备份共享数据块")
+
+
+def test_reads_version_1_manifest():
+    """旧版清单中按整个文件保存的备份仍可读取，之后的备份改用数据块"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        usb_dir = os.path.join(temp_dir, "usb")
+        content = b'{"homeworks": []}'
+        sha256 = hashlib.sha256(content).hexdigest()
+        engine = backup_engine.BackupEngine(usb_dir)
+        os.makedirs(os.path.dirname(engine.object_path(sha256)))
+        with open(engine.object_path(sha256), 'wb') as f:
+            f.write(content)
+        source = os.path.join(temp_dir, "data.json")
+        with open(source, 'wb') as f:
+            f.write(content)
+        stat = os.stat(source)
+        manifest = {"version": 1, "backups": [{"name": "old", "time": 0, "files": {
+            "data.json": {"size": len(content), "mtime_ns": stat.st_mtime_ns, "sha256": sha256}}}]}
+        with open(os.path.join(usb_dir, backup_engine.MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+
+        engine = backup_engine.BackupEngine(usb_dir)
+        assert b"".join(engine.read("old", "data.json")) == content
+        assert engine.backup({"data.json": source})["name"] == "old"
+
+        with open(source, 'wb') as f:
+            f.write(b'{"homeworks": [1]}')
+        result = engine.backup({"data.json": source}, name="new")
+        assert result["success"] and result["copied"] == ["data.json"]
+        assert "chunks" in engine.find("new")["files"]["data.json"]
+        reopened = backup_engine.BackupEngine(usb_dir)
+        assert reopened.manifest["version"] == backup_engine.MANIFEST_VERSION
+        assert b"".join(reopened.read("old", "data.json")) == content
+        assert b"".join(reopened.read("new", "data.json")) == b'{"homeworks": [1]}'
+        print("✓ 旧版清单仍可读取")
+
+
+def test_codecs_and_raw_chunks():
+    """lzma压缩的数据块可以读取，无法压缩的数据块原样保存"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        store = backup_archive.ChunkStore(temp_dir, codec="lzma")
+        text = "".join(f"第{i}页练习\n" for i in range(2000)).encode('utf-8')
+        noise = os.urandom(4096)
+        writer = store.writer("pack")
+        chunks = [writer.add(text), writer.add(noise), writer.add(text)]
+        writer.commit()
+        assert chunks[0] == chunks[2] and len(store.index) == 2
+        assert store.index[chunks[0]][4] == "lzma" and store.index[chunks[1]][4] == "raw"
+        assert b"".join(backup_archive.ChunkStore(temp_dir).read(chunks)) == text + noise + text
+        print("✓ 压缩方式与原样保存")
+
+
+if __name__ == "__main__":
+    print("开始测试压缩去重的备份格式...")
+    test_chunk_boundaries_follow_content()
+    test_daily_backups_share_chunks()
+    test_reads_version_1_manifest()
+    test_codecs_and_raw_chunks()
+    print("所有测试通过！")
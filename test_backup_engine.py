@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量备份
+验证备份只复制有变化的文件、内容相同时不产生新备份、写入校验失败时不记录备份，以及备份可以完整还原
+"""
+
+import os
+import tempfile
+from data_manager import DataManager
+import backup_engine
+import backup_archive
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_incremental_backup():
+    """第一次备份复制全部文件，之后只复制变化的文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "backup.json")
+        usb_dir = os.path.join(temp_dir, "usb", backup_engine.BACKUP_DIR_NAME)
+        dm = DataManager(data_file)
+        dm.add_homework("数学", "2024年的练习", "701", timestamp="2024-09-15 08:00:00", overwrite=False)
+        dm.add_homework("语文", "背诵", "701")
+        dm.archive_old_records(before="2025-01-01")
+        sources = dm.backup_sources()
+        assert "backup.json" in sources and any(path.startswith("backup.json.archive/") for path in sources)
+        assert not any(path.endswith(".snapshot") for path in sources)
+
+        first = dm.backup_to(usb_dir)
+        assert first["success"] and sorted(first["copied"]) == sorted(sources), first
+
+        again = dm.backup_to(usb_dir)
+        assert again["success"] and again["copied"] == [] and again["name"] == first["name"]
+        assert len(backup_engine.BackupEngine(usb_dir).backups()) == 1
+
+        dm.add_homework("语文", "默写", "701")  # 覆盖作业：数据文件和修订历史变化，归档不变
+        third = dm.backup_to(usb_dir)
+        assert third["success"] and "backup.json" in third["copied"]
+        assert not any(path.startswith("backup.json.archive/") for path in third["copied"])
+        assert third["unchanged"] >= 2
+        assert len(backup_engine.BackupEngine(usb_dir).backups()) == 2
+        print("✓ 增量备份只复制变化的文件")
+
+
+def test_extract_restores_bytes():
+    """还原的文件与备份时的源文件逐字节相同，只修改了时间的文件不产生新备份"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "backup.json")
+        usb_dir = os.path.join(temp_dir, "usb")
+        dm = DataManager(data_file)
+        dm.add_homework("数学", "练习", "701")
+        dm.add_homework("数学", "订正", "701")
+        originals = {path: _read_bytes(source) for path, source in dm.backup_sources().items()}
+        name = dm.backup_to(usb_dir)["name"]
+
+        os.utime(data_file, None)
+        engine = backup_engine.BackupEngine(usb_dir)
+        result = engine.backup(dm.backup_sources())
+        assert result["copied"] == [] and result["name"] == name and len(engine.backups()) == 1
+
+        restore_dir = os.path.join(temp_dir, "restore")
+        assert sorted(engine.extract(name, restore_dir)) == sorted(originals)
+        for path, content in originals.items():
+            assert _read_bytes(os.path.join(restore_dir, path)) == content
+        assert b"".join(engine.read(name, "backup.json")) == originals["backup.json"]
+        print("✓ 备份可以完整还原")
+
+
+def test_verification_failure_keeps_manifest():
+    """写入后校验不一致时备份失败，清单和数据块索引不变，不留下写了一半的数据包"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "backup.json")
+        usb_dir = os.path.join(temp_dir, "usb")
+        dm = DataManager(data_file)
+        dm.add_homework("数学", "练习", "701")
+
+        crc32_range = backup_archive.crc32_range
+        backup_archive.crc32_range = lambda path, start: -1
+        try:
+            result = dm.backup_to(usb_dir)
+        finally:
+            backup_archive.crc32_range = crc32_range
+        assert not result["success"] and "校验" in result["message"]
+        engine = backup_engine.BackupEngine(usb_dir)
+        assert engine.backups() == [] and engine.chunks.index == {} and engine.stored_size() == 0
+
+        assert dm.backup_to(usb_dir)["success"]
+        print("✓ 写入校验失败时不记录备份")
+
+
+if __name__ == "__main__":
+    print("开始测试增量备份...")
+    test_incremental_backup()
+    test_extract_restores_bytes()
+    test_verification_failure_keeps_manifest()
+    print("所有测试通过！")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试备份保留策略
+验证按小时/天/月保留的选择结果稳定、带时间戳副本的索引可以重建并按策略清理，以及U盘备份目录清理后回收和合并数据包
+"""
+
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+import backup_engine
+import backup_retention
+
+
+def _write(path, content):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def _random_text(rng, size):
+    return "".join(f"{rng.getrandbits(64):016x}\n" for _ in range(size // 17))
+
+
+def test_select_retained_tiers():
+    """一天内每小时、一个月内每天、更早每月各保留一个，之后再清理时结果不变"""
+    now = datetime(2025, 6, 15, 12, 0, 0)
+    times = [(now - timedelta(minutes=30 * i)).timestamp() for i in range(90 * 48, -1, -1)]
+    keep = backup_retention.select_retained(times, now.timestamp())
+    kept = [t for t, k in zip(times, keep) if k]
+    recent = [t for t in kept if now.timestamp() - t <= 24 * 3600]
+    month = [t for t in kept if 24 * 3600 < now.timestamp() - t <= 31 * 24 * 3600]
+    older = [t for t in kept if now.timestamp() - t > 31 * 24 * 3600]
+    assert backup_retention.KEEP_LAST <= len(recent) <= 25 + backup_retention.KEEP_LAST
+    assert len({datetime.fromtimestamp(t).date() for t in month}) == len(month)
+    assert len({datetime.fromtimestamp(t).strftime("%Y%m") for t in older}) == len(older) <= 4
+    assert keep[-1] and len(kept) < 70
+
+    # 十天后再次清理：先清理过的结果与直接清理原始列表相同
+    later = (now + timedelta(days=10)).timestamp()
+    again = [t for t, k in zip(kept, backup_retention.select_retained(kept, later)) if k]
+    direct = [t for t, k in zip(times, backup_retention.select_retained(times, later)) if k]
+    assert again == direct
+    print("✓ 按小时/天/月保留备份")
+
+
+def test_index_rebuild_and_prune():
+    """没有索引时扫描一次目录，清理后索引和目录一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        now = datetime(2025, 6, 15, 12, 0, 0)
+        names = []
+        for days in range(60):
+            name = f"student_data_{(now - timedelta(days=days)).strftime('%Y%m%d_%H%M%S')}.json"
+            _write(os.path.join(temp_dir, name), f'{{"day": {days}}}')
+            names.append(name)
+        _write(os.path.join(temp_dir, "student_data.json"), "{}")
+
+        index = backup_retention.BackupIndex(temp_dir)
+        assert len(index.list()) == 60 and os.path.exists(index.index_file)
+        assert index.list()[-1]["file"] == names[0]
+        assert index.find("student_data", len('{"day": 5}'), index.list()[-6]["sha256"]) is not None
+
+        removed = backup_retention.BackupIndex(temp_dir).prune(now.timestamp())
+        assert removed and all(not os.path.exists(os.path.join(temp_dir, name)) for name in removed)
+        remaining = backup_retention.BackupIndex(temp_dir).list()
+        assert len(remaining) == 60 - len(removed)
+        assert all(os.path.exists(os.path.join(temp_dir, item["file"])) for item in remaining)
+        assert os.path.exists(os.path.join(temp_dir, "student_data.json"))
+
+        os.remove(index.index_file)
+        assert [item["file"] for item in backup_retention.BackupIndex(temp_dir).list()] == \
+            [item["file"] for item in remaining]
+        print("✓ 带时间戳副本的索引")
+
+
+def test_prune_collects_and_compacts_packs():
+    """删除较早的备份后回收不再引用的数据块，部分有效的数据包合并，剩下的备份仍可还原"""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        usb_dir = os.path.join(temp_dir, "usb")
+        small = os.path.join(temp_dir, "small.json")
+        large = os.path.join(temp_dir, "large.json")
+        _write(small, _random_text(rng, 20 * 1024))
+        engine = backup_engine.BackupEngine(usb_dir)
+        for i in range(6):
+            _write(large, _random_text(rng, 200 * 1024))
+            assert engine.backup({"small.json": small, "large.json": large}, name=f"b{i}")["success"]
+
+        now = datetime(2025, 6, 15, 12, 0, 0)
+        for i, backup in enumerate(engine.manifest["backups"]):
+            backup["time"] = int((datetime(2025, 3, 10, 10, i) if i < 3 else now - timedelta(hours=6 - i)).timestamp())
+        size_before = engine.stored_size()
+        result = engine.prune(now.timestamp())
+        assert result["removed"] == ["b0", "b1"], result
+        assert result["compacted_packs"] == 1 and result["removed_packs"] == 2 and result["bytes_freed"] > 0
+        assert engine.stored_size() == size_before - result["bytes_freed"]
+
+        reopened = backup_engine.BackupEngine(usb_dir)
+        assert [backup["name"] for backup in reopened.backups()] == ["b2", "b3", "b4", "b5"]
+        with open(small, 'rb') as f:
+            assert b"".join(reopened.read("b2", "small.json")) == f.read()
+        with open(large, 'rb') as f:
+            assert b"".join(reopened.read("b5", "large.json")) == f.read()
+        assert reopened.prune(now.timestamp())["removed"] == []
+        print("✓ 清理备份后回收数据包")
+
+
+if __name__ == "__main__":
+    print("开始测试备份保留策略...")
+    test_select_retained_tiers()
+    test_index_rebuild_and_prune()
+    test_prune_collects_and_compacts_packs()
+    print("所有测试通过！")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多版本快照
+验证已取得的快照不受之后修改的影响、读取线程不会看到修改了一半的数据、版本号作为缓存键，
+以及没有读取时发布新版本的开销不随记录数增长
+"""
+
+import os
+import json
+import time
+import threading
+import tempfile
+from datetime import date
+from data_manager import DataManager
+
+
+def test_snapshot_isolated_from_writes():
+    """修改、删除、修改全局字段后，之前取得的快照保持不变"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "mvcc.json"))
+        first = dm.add_homework("数学", "练习", "701", timestamp="2025-03-03 08:00:00")
+        dm.add_homework("语文", "背诵", "701", timestamp="2025-03-03 09:00:00")
+        before = dm.snapshot()
+        version = dm.version
+
+        dm.update_homework(first["id"], content="订正", timestamp="2025-03-05 08:00:00")
+        dm.delete_homework(2)
+        dm.add_class("702")
+
+        assert dm.version > version
+        assert len(before.items("homeworks")) == 2
+        assert before.get("homeworks", first["id"])["content"] == "练习"
+        assert set(before.buckets("homeworks")[date(2025, 3, 3).toordinal()]) == {1, 2}
+        assert before.statistics.subject_counts["语文"] == 1
+        assert before.globals["classes"] == []
+
+        assert [h["content"] for h in dm.get_homeworks()] == ["订正"]
+        assert dm.get_statistics()["subject_stats"]["语文"] == 0
+        assert dm.get_classes() == ["702"]
+
+        # 没有变化的操作不产生新版本
+        version = dm.version
+        dm.add_class("702")
+        dm.get_homeworks()
+        assert dm.version == version
+        print("✓ 快照不受之后修改的影响")
+
+
+def test_readers_see_whole_transactions():
+    """其它线程读取时不等待事务，也看不到事务中途的数据"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "mvcc.json"))
+        entered = threading.Event()
+        release = threading.Event()
+
+        def writer():
+            for i in range(20):
+                with dm.transaction():
+                    dm.add_homework("数学", f"第{i}题", "701", overwrite=False)
+                    if i == 0:
+                        entered.set()
+                        release.wait(5)
+                    dm.add_homework("语文", f"第{i}题", "701", overwrite=False)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            assert entered.wait(5)
+            # 事务进行中：读取立即返回事务开始前的数据
+            result = []
+            reader = threading.Thread(target=lambda: result.append(dm.get_homeworks("701")))
+            reader.start()
+            reader.join(2)
+            assert not reader.is_alive() and result == [[]]
+            assert dm.snapshot().version == dm.version
+        finally:
+            release.set()
+
+        errors = []
+        last_version = 0
+        while thread.is_alive():
+            snapshot = dm.snapshot()
+            if snapshot.version < last_version:
+                errors.append("版本号回退")
+            last_version = snapshot.version
+            count = len(dm.get_homeworks())
+            if count % 2:
+                errors.append(f"读到事务中途的数据: {count}")
+        thread.join()
+        assert not errors, errors[:3]
+        assert len(dm.get_homeworks()) == 40
+        print("✓ 读取不等待事务，只看到完整的版本")
+
+
+def test_version_as_cache_key():
+    """同一版本内相同查询只排序一次，版本变化后重新计算"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "mvcc.json"))
+        dm.add_homework("数学", "练习", "701")
+        dm.add_homework("语文", "背诵", "702")
+
+        snapshot = dm.snapshot()
+        built = []
+        rows = lambda: built.append(snapshot.version) or ("rows", snapshot.version)
+        assert snapshot.memo("teacher_rows", rows) == snapshot.memo("teacher_rows", rows)
+        assert built == [snapshot.version]
+
+        dm.get_homeworks("701")
+        cached = snapshot.memo(("homeworks", "701", None, None, None), list)
+        assert [h.content for h in cached] == ["练习"]
+
+        dm.add_homework("数学", "新练习", "701")
+        assert [h["content"] for h in dm.get_homeworks("701")] == ["新练习"]
+        assert dm.snapshot() is not snapshot
+        print("✓ 版本号作为缓存键")
+
+
+def _publish_cost(dm, rounds=200):
+    """每次修改结束时发布新版本的平均耗时（秒），取三次中最快的一次"""
+    best = None
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            with dm._writing():
+                dm._modified = True
+        elapsed = (time.perf_counter() - start) / rounds
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def test_publish_cost_flat():
+    """连续修改而没有读取时不复制记录集合和索引，10万条记录与1000条记录的发布开销相近；读取时才生成快照"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        costs = {}
+        for count in (1000, 100000):
+            path = os.path.join(temp_dir, f"publish_{count}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"homeworks": [{"id": i, "subject": "数学", "content": "练习", "class": "701",
+                                          "timestamp": f"2025-03-{i % 28 + 1:02d} 08:00:00"}
+                                         for i in range(1, count + 1)], "messages": []}, f)
+            dm = DataManager(path, use_snapshot_cache=False)
+            dm.snapshot()
+            costs[count] = _publish_cost(dm)
+
+            version = dm.version
+            first = dm.add_homework("语文", "新作业", "702", overwrite=False)
+            assert dm.version == version + 1
+            snapshot = dm.snapshot()
+            assert snapshot.version == dm.version and snapshot.get("homeworks", first["id"]) is not None
+            assert len(snapshot.items("homeworks")) == count + 1
+        assert costs[100000] < costs[1000] * 5 + 0.0001, costs
+        print("✓ 发布新版本的开销不随记录数增长")
+
+
+if __name__ == "__main__":
+    print("开始测试多版本快照...")
+    test_snapshot_isolated_from_writes()
+    test_readers_see_whole_transactions()
+    test_version_as_cache_key()
+    test_publish_cost_flat()
+    print("所有测试通过！")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试U盘插拔监视
+用模拟U盘验证插入、拔出的回调和插入时自动备份，解析Linux挂载表、关闭后端时释放文件描述符，以及环境变量指定模拟目录时从U盘备份数据
+"""
+
+import os
+import json
+import select
+import shutil
+import threading
+import tempfile
+from data_manager import DataManager
+import backup_engine
+import drive_watcher
+
+MOCK_USB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_usb")
+
+
+def test_mock_drive_insert_and_remove():
+    """模拟目录下新建子目录视为插入U盘，插入时备份到U盘，删除子目录视为拔出"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "watch.json"))
+        dm.add_homework("数学", "练习", "701")
+        root = os.path.join(temp_dir, "drives")
+        os.makedirs(os.path.join(root, "existing"))
+
+        inserted, removed = [], []
+        backed_up, unplugged = threading.Event(), threading.Event()
+
+        def on_insert(drive):
+            inserted.append(drive)
+            dm.backup_to(os.path.join(drive["path"], backup_engine.BACKUP_DIR_NAME))
+            backed_up.set()
+
+        def on_remove(drive):
+            removed.append(drive)
+            unplugged.set()
+
+        watcher = drive_watcher.DriveWatcher(drive_watcher.MockDriveBackend(root, interval=0.02),
+                                             on_insert=on_insert, on_remove=on_remove)
+        watcher.start()
+        try:
+            assert [drive["name"] for drive in watcher.drives] == ["existing"] and not inserted
+
+            os.makedirs(os.path.join(root, "usb1"))
+            assert backed_up.wait(5)
+            assert [drive["name"] for drive in inserted] == ["usb1"]
+            engine = backup_engine.BackupEngine(os.path.join(root, "usb1", backup_engine.BACKUP_DIR_NAME))
+            assert len(engine.backups()) == 1
+            assert sorted(drive["name"] for drive in watcher.drives) == ["existing", "usb1"]
+
+            shutil.rmtree(os.path.join(root, "usb1"))
+            assert unplugged.wait(5)
+            assert [drive["device_id"] for drive in removed] == ["mock:usb1"]
+            assert [drive["name"] for drive in watcher.drives] == ["existing"]
+        finally:
+            watcher.stop()
+        assert len(inserted) == 1
+        print("✓ 模拟U盘插拔")
+
+
+def test_parse_mountinfo():
+    """只列出 /media、/run/media、/mnt 下的挂载点，挂载点中的转义字符还原"""
+    text = "\n".join([
+        "22 1 8:2 / / rw,relatime shared:1 - ext4 /dev/sda2 rw",
+        "35 22 0:31 / /proc rw,nosuid shared:12 - proc proc rw",
+        "88 22 8:17 / /media/student/MY\\040USB rw,nosuid shared:50 - vfat /dev/sdb1 rw,uid=1000",
+        "89 22 8:33 / /run/media/student/DATA rw,nosuid shared:51 - exfat /dev/sdc1 rw",
+    ])
+    drives = drive_watcher.parse_mountinfo(text)
+    assert [drive["path"] for drive in drives] == ["/media/student/MY USB", "/run/media/student/DATA"]
+    assert drives[0]["name"] == "MY USB" and drives[0]["description"] == "/dev/sdb1"
+    print("✓ 解析挂载表")
+
+
+def test_linux_backend_close():
+    """关闭Linux后端时唤醒正在等待的线程，并关闭挂载表和唤醒用的管道"""
+    if not hasattr(select, "poll"):
+        print("- 当前系统不支持poll，跳过")
+        return
+    with tempfile.TemporaryDirectory() as temp_dir:
+        mountinfo = os.path.join(temp_dir, "mountinfo")
+        with open(mountinfo, 'w', encoding='utf-8') as f:
+            f.write("88 22 8:17 / /media/student/USB rw shared:50 - vfat /dev/sdb1 rw\n")
+        backend = drive_watcher.LinuxMountBackend(mountinfo)
+        assert [drive["name"] for drive in backend.list_drives()] == ["USB"]
+        fds = (backend._wake_read, backend._wake_write)
+
+        waiter = threading.Thread(target=backend.wait, args=(30,))
+        waiter.start()
+        backend.close()
+        waiter.join(5)
+        assert not waiter.is_alive()
+        assert backend._file.closed
+        for fd in fds:
+            try:
+                os.fstat(fd)
+            except OSError:
+                continue
+            raise AssertionError(f"文件描述符 {fd} 没有关闭")
+        backend.close()
+        assert backend.wait(1) is False
+        print("✓ 关闭Linux后端时释放文件描述符")
+
+
+def test_backup_from_mock_usb():
+    """环境变量指定模拟目录时，get_usb_drives列出仓库中的mock_usb，从中备份数据文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "student_data.json"))
+        dm.base_data_dir = os.path.join(temp_dir, "data")
+        os.makedirs(dm.base_data_dir)
+        os.environ[drive_watcher.MOCK_USB_ENV] = MOCK_USB_DIR
+        try:
+            assert dm.get_usb_drives() == [MOCK_USB_DIR]
+            result = dm.backup_from_usb()
+        finally:
+            del os.environ[drive_watcher.MOCK_USB_ENV]
+        assert result["success"], result
+        copies = [name for name in os.listdir(dm.base_data_dir) if name.startswith("demo_data_")]
+        assert len(copies) == 1
+        with open(os.path.join(MOCK_USB_DIR, "demo_data.json"), encoding='utf-8') as f:
+            expected = json.load(f)
+        with open(os.path.join(dm.base_data_dir, copies[0]), encoding='utf-8') as f:
+            assert json.load(f) == expected
+        print("✓ 从模拟U盘备份")
+
+
+if __name__ == "__main__":
+    print("开始测试U盘插拔监视...")
+    test_mock_drive_insert_and_remove()
+    test_parse_mountinfo()
+    test_linux_backend_close()
+    test_backup_from_mock_usb()
+    print("所有测试通过！")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多进程共享数据文件
+验证文件锁跨进程互斥、文件变化通知，以及多个DataManager同时写入时不会丢失其它实例的修改
+"""
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+from data_manager import DataManager
+import file_sync
+
+
+def _wait_for(event, timeout=3.0):
+    return event.wait(timeout)
+
+
+def test_lock_excludes_other_process():
+    """持有锁时其它进程获取锁超时，释放后可以获取"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        lock_path = os.path.join(temp_dir, "data.json.lock")
+        script = ("import sys, file_sync\n"
+                  "lock = file_sync.FileLock(sys.argv[1], timeout=0.2)\n"
+                  "try:\n"
+                  "    lock.acquire()\n"
+                  "except TimeoutError:\n"
+                  "    sys.exit(3)\n"
+                  "lock.release()\n")
+        cwd = os.path.dirname(os.path.abspath(__file__))
+
+        lock = file_sync.FileLock(lock_path)
+        with lock:
+            with lock:  # 同一实例可重入
+                assert lock.locked
+            result = subprocess.run([sys.executable, "-c", script, lock_path], cwd=cwd)
+            assert result.returncode == 3
+        assert not lock.locked
+        result = subprocess.run([sys.executable, "-c", script, lock_path], cwd=cwd)
+        assert result.returncode == 0
+        print("✓ 文件锁跨进程互斥")
+
+
+def test_watcher_detects_changes():
+    """inotify和定时检查两种方式都能发现替换写入"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "data.json")
+        with open(path, 'w') as f:
+            f.write("{}")
+
+        for use_inotify in (True, False):
+            watcher = file_sync.FileWatcher([path], poll_interval=0.05, use_inotify=use_inotify)
+            watcher.start()
+            try:
+                time.sleep(0.1)
+                with open(os.path.join(temp_dir, "other.txt"), 'w') as f:
+                    f.write("无关文件")
+                with open(path + ".tmp", 'w') as f:
+                    f.write('{"a": 1}')
+                os.replace(path + ".tmp", path)
+                assert _wait_for(watcher.changed), watcher.mode
+            finally:
+                watcher.stop()
+        print("✓ 文件变化通知正常")
+
+
+def test_concurrent_writers_merge():
+    """两个实例交替写入：双方的新增、删除、设置都保留，冲突的ID重新编号"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shared.json")
+        first = DataManager(data_file, shared=True)
+        first.add_homework("数学", "练习", "701")
+        first.add_homework("语文", "背诵", "701")
+        second = DataManager(data_file, shared=True)
+        second.close()  # 停止监视，模拟second尚未收到first保存的通知
+        try:
+            third = first.add_homework("英语", "单词", "702", overwrite=False)
+            first.delete_homework(2)
+            first.add_class("703")
+
+            # second新增的作业同样分配到ID 3，保存时合并first的修改并重新编号
+            fourth = second.add_homework("物理", "实验", "702", overwrite=False)
+            assert third["id"] == 3 and fourth["id"] == 4
+            second.set_password("new-password")
+
+            check = DataManager(data_file)
+            contents = sorted(h["content"] for h in check.get_homeworks())
+            assert contents == ["单词", "实验", "练习"], contents
+            ids = [h["id"] for h in check.get_homeworks()]
+            assert len(set(ids)) == 3
+            assert check.get_classes() == ["703"]
+            assert check.verify_password("new-password")
+
+            # first收到通知后增量合并second的修改
+            assert first.reload_changes()
+            assert sorted(h["content"] for h in first.get_homeworks()) == contents
+            assert first.verify_password("new-password")
+        finally:
+            first.close()
+            second.close()
+        print("✓ 多个实例写入时合并修改")
+
+
+def test_incremental_reload():
+    """读取时只合并变化的记录，索引增量更新"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shared.json")
+        writer = DataManager(data_file, shared=True)
+        writer.add_homework("数学", "第三单元练习", "701")
+        reader = DataManager(data_file, shared=True, enable_search=True)
+        try:
+            indexes = reader._search_indexes
+            original = reader._id_index["homeworks"][1]
+
+            writer.add_homework("语文", "第三单元背诵", "702")
+            assert _wait_for(reader._watcher.changed)
+            assert len(reader.get_homeworks()) == 2
+            assert reader._search_indexes is indexes
+            assert sorted(reader.search("第三单元")) == [1, 2]
+            assert reader._id_index["homeworks"][1] is original  # 未变化的记录不重新创建
+
+            writer.update_homework(1, content="订正")
+            writer.delete_homework(2)
+            assert reader.reload_changes()
+            assert [h["content"] for h in reader.get_homeworks()] == ["订正"]
+            assert reader.search("第三单元") == []
+            assert not reader.reload_changes()
+        finally:
+            writer.close()
+            reader.close()
+        print("✓ 增量合并其它实例的修改")
+
+
+def test_sharded_reload_only_changed_shards():
+    """分片模式下只重新读取被改写的分片"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shared.json")
+        writer = DataManager(data_file, sharded=True, shared=True)
+        writer.add_homework("数学", "练习", "701")
+        writer.add_homework("数学", "练习", "702")
+        reader = DataManager(data_file, sharded=True, shared=True)
+        try:
+            assert len(reader.get_homeworks()) == 2
+
+            read = []
+            read_shard = reader._shards.read_shard
+            reader._shards.read_shard = lambda class_name: read.append(class_name) or read_shard(class_name)
+
+            writer.add_homework("语文", "背诵", "702", overwrite=False)
+            assert reader.reload_changes()
+            assert read == ["702"]
+            assert len(reader.get_homeworks("702")) == 2
+
+            # reader向701添加作业，保存时合并writer的修改，ID不冲突
+            writer.add_homework("英语", "听写", "702", overwrite=False)
+            reader.add_homework("物理", "实验", "701", overwrite=False)
+            check = DataManager(data_file, sharded=True)
+            ids = [h["id"] for h in check.get_homeworks()]
+            assert len(ids) == 5 and len(set(ids)) == 5, ids
+        finally:
+            writer.close()
+            reader.close()
+        print("✓ 分片模式只重新读取变化的分片")
+
+
+if __name__ == "__main__":
+    print("开始测试多进程共享...")
+    test_lock_excludes_other_process()
+    test_watcher_detects_changes()
+    test_concurrent_writers_merge()
+    test_incremental_reload()
+    test_sharded_reload_only_changed_shards()
+    print("所有测试通过！")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试作业/留言ID分配
+验证删除后ID不复用、旧数据重复ID的迁移以及按ID查找
+"""
+
+import os
+import json
+import tempfile
+from data_manager import DataManager
+
+
+def test_ids_not_reused_after_delete():
+    """删除作业后新作业不会复用已有ID"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "ids.json"))
+        first = dm.add_homework("语文", "背诵", "701")
+        second = dm.add_homework("数学", "习题", "701")
+        dm.delete_homework(first["id"])
+        third = dm.add_homework("英语", "单词", "701")
+
+        assert third["id"] not in (first["id"], second["id"])
+        assert dm.delete_homework(third["id"])
+        assert dm.get_homework(second["id"]) == second
+        assert [h["id"] for h in dm.get_homeworks()] == [second["id"]]
+
+        # 重新加载后序列继续递增
+        reloaded = DataManager(dm.data_file)
+        assert reloaded.add_homework("物理", "实验报告", "701")["id"] == third["id"] + 1
+        print("✓ 删除后ID不复用，序列持久化")
+
+
+def test_migrate_duplicate_ids():
+    """旧数据中的重复ID会被重新编号"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "legacy.json")
+        legacy = {
+            "homeworks": [
+                {"id": 1, "subject": "语文", "content": "a", "class": "701", "timestamp": "2025-01-01 08:00:00"},
+                {"id": 2, "subject": "数学", "content": "b", "class": "701", "timestamp": "2025-01-01 08:00:00"},
+                {"id": 2, "subject": "英语", "content": "c", "class": "701", "timestamp": "2025-01-01 08:00:00"},
+            ],
+            "messages": [],
+            "classes": ["701"],
+            "subjects": ["语文", "数学", "英语"],
+        }
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump(legacy, f, ensure_ascii=False)
+
+        dm = DataManager(data_file)
+        ids = sorted(h["id"] for h in dm.get_homeworks())
+        assert ids == [1, 2, 3], ids
+
+        # 删除其中一个ID只删除一条记录
+        assert dm.delete_homework(2)
+        assert len(dm.get_homeworks()) == 2
+        assert dm.add_homework("物理", "d", "701", overwrite=False)["id"] == 4
+
+        with open(data_file, 'r', encoding='utf-8') as f:
+            assert json.load(f)["id_sequences"]["homeworks"] == 4
+        print("✓ 重复ID已重新编号")
+
+
+def test_update_by_id():
+    """按ID更新作业"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "ids.json"))
+        homework = dm.add_homework("语文", "背诵", "701")
+        updated = dm.update_homework(homework["id"], content="默写", id=999)
+        assert updated["content"] == "默写" and updated["id"] == homework["id"]
+        assert dm.update_homework(12345, content="x") is None
+        print("✓ 按ID更新作业")
+
+
+if __name__ == "__main__":
+    test_ids_not_reused_after_delete()
+    test_migrate_duplicate_ids()
+    test_update_by_id()
+    print("\n所有ID分配测试通过")
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试数据文件完整性校验
+验证数据文件格式不变、校验发现损坏的块，以及数据文件损坏后不再重置为默认数据：
+从快照缓存还原、保留完好的记录并从带时间戳副本找回损坏的记录、没有可用来源时保留损坏的原文件
+"""
+
+import os
+import json
+import time
+import tempfile
+from data_manager import DataManager
+import integrity
+import snapshot_cache
+
+
+def _fill(dm, count):
+    with dm.transaction():
+        for i in range(count):
+            dm.add_homework("数学", f"第{i}页练习" + "题" * 200, str(700 + i))
+            dm.add_message(f"留言{i}", "老师", str(700 + i))
+
+
+def _corrupt(path, offset, data=b"#"):
+    """在文件的offset处改写数据，保持修改时间不变（模拟磁盘错误）"""
+    stat = os.stat(path)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_format_and_verify():
+    """数据文件仍是原来格式的JSON，校验在改动一个字节后发现损坏的块"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "check.json"))
+        _fill(dm, 300)
+        with open(dm.data_file, 'rb') as f:
+            content = f.read()
+        assert content == json.dumps(json.loads(content), ensure_ascii=False, indent=2).encode('utf-8')
+
+        report = dm.verify_integrity()
+        assert report["success"] and report["checked"] and report["size"] == len(content), report
+        _corrupt(dm.data_file, len(content) // 2)
+        report = dm.verify_integrity()
+        assert not report["success"] and report["damaged_blocks"] == [len(content) // 2 // integrity.BLOCK_SIZE]
+
+        # 被其它程序改写后不再对应校验文件，不报告为损坏
+        with open(dm.data_file, 'w', encoding='utf-8') as f:
+            json.dump({"homeworks": [], "messages": []}, f)
+        report = dm.verify_integrity()
+        assert not report["success"] and not report["checked"]
+        print("✓ 校验数据文件")
+
+
+def test_recover_from_snapshot():
+    """JSON仍然有效但内容被改动时，用同一次保存的快照缓存还原全部数据"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "snap.json"))
+        _fill(dm, 50)
+        dm.set_password("secret")
+        expected = sorted(hw["content"] for hw in dm.get_homeworks())
+        with open(dm.data_file, 'rb') as f:
+            content = f.read()
+        _corrupt(dm.data_file, content.index("第7页".encode('utf-8')), "第9".encode('utf-8'))
+
+        reopened = DataManager(dm.data_file)
+        assert reopened.recovery is not None and reopened.recovery["sources"] == ["快照缓存"]
+        assert sorted(hw["content"] for hw in reopened.get_homeworks()) == expected
+        assert reopened.verify_password("secret")
+        with open(reopened.recovery["corrupt_copy"], 'rb') as f:
+            assert "第9页".encode('utf-8') in f.read()
+        assert reopened.verify_integrity()["success"]
+        assert DataManager(dm.data_file).recovery is None
+        print("✓ 从快照缓存还原")
+
+
+def test_salvage_truncated_file():
+    """文件被截断：完好的记录保留，损坏的记录和全局字段从带时间戳副本找回，副本之后添加的记录报告为丢失"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "student_data.json"), use_snapshot_cache=False)
+        _fill(dm, 100)
+        dm.set_password("secret")
+        with open(dm.data_file, 'rb') as f:
+            backup = f.read()
+        with open(os.path.join(temp_dir, "student_data_20250101_080000.json"), 'wb') as f:
+            f.write(backup)
+        newest = dm.add_homework("英语", "听写", "701")
+
+        size = os.path.getsize(dm.data_file)
+        with open(dm.data_file, 'r+b') as f:
+            f.truncate(size * 3 // 4)
+
+        reopened = DataManager(dm.data_file, use_snapshot_cache=False)
+        recovery = reopened.recovery
+        assert recovery is not None and recovery["salvaged"] > 50, recovery
+        assert recovery["sources"] == ["副本 student_data_20250101_080000.json"]
+        assert recovery["lost"] == {"homeworks": [newest["id"]]}
+        assert len(reopened.get_homeworks()) == 100 and len(reopened.get_messages()) == 100
+        assert reopened.verify_password("secret") and not recovery["reset"]
+        assert reopened.add_homework("物理", "实验", "701")["id"] > 100
+        assert os.path.getsize(recovery["corrupt_copy"]) == size * 3 // 4
+        print("✓ 截断的数据文件保留完好的记录")
+
+
+def test_salvage_keeps_globals_and_sequences():
+    """没有快照和副本时截断的数据文件：密码等全局字段从校验文件找回，ID序列不低于丢失的记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "alone.json"), use_snapshot_cache=False)
+        _fill(dm, 100)
+        dm.set_password("secret")
+        dm.add_class("八年级1班")
+        size = os.path.getsize(dm.data_file)
+        with open(dm.data_file, 'r+b') as f:
+            f.truncate(size * 3 // 4)
+
+        reopened = DataManager(dm.data_file, use_snapshot_cache=False)
+        recovery = reopened.recovery
+        assert recovery is not None and recovery["sources"] == [] and not recovery["reset"], recovery
+        assert recovery["lost"]["messages"], recovery
+        assert reopened.verify_password("secret")
+        assert "八年级1班" in reopened.data["classes"]
+        assert reopened.data["id_sequences"] == dm.data["id_sequences"]
+        assert reopened.add_message("新留言", "老师", "701")["id"] == 101
+        print("✓ 没有备份时保留全局字段和ID序列")
+
+
+def test_unrecoverable_file_is_preserved():
+    """没有校验文件、快照和副本时使用默认数据，但损坏的原文件另存，不会被覆盖丢失"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "legacy.json")
+        with open(path, 'wb') as f:
+            f.write(b'{"homeworks": [{"id": 1, "subject": "\xe6\x95')
+        dm = DataManager(path, use_snapshot_cache=False)
+        assert dm.recovery is not None and dm.recovery["sources"] == [] and "password" in dm.recovery["reset"]
+        assert dm.get_homeworks() == []
+        with open(dm.recovery["corrupt_copy"], 'rb') as f:
+            assert f.read().startswith(b'{"homeworks": [{"id": 1')
+        with open(path, 'r', encoding='utf-8') as f:
+            assert json.load(f)["homeworks"] == []
+        print("✓ 无法恢复时保留损坏的原文件")
+
+
+def test_verify_speed():
+    """校验只计算块CRC，10MB以上的数据文件也在0.5秒内完成"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "large.json")
+        data = {"homeworks": [{"id": i, "content": "练习" * 100} for i in range(1, 20001)], "messages": []}
+        content, layout = integrity.dump_data(data, ("homeworks", "messages"))
+        with open(path, 'wb') as f:
+            f.write(content)
+        integrity.write_check(path, content, layout, snapshot_cache.hash_bytes(content))
+        assert len(content) > 10 * 1024 * 1024
+        start = time.perf_counter()
+        report = integrity.verify(path)
+        assert report["success"], report
+        assert time.perf_counter() - start < 0.5
+        print(f"✓ 校验 {len(content) / 1024 / 1024:.0f}MB 耗时 {report['elapsed'] * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    print("开始测试数据文件完整性校验...")
+    test_format_and_verify()
+    test_recover_from_snapshot()
+    test_salvage_truncated_file()
+    test_salvage_keeps_globals_and_sequences()
+    test_unrecoverable_file_is_preserved()
+    test_verify_speed()
+    print("所有测试通过！")
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试延迟加载模式
+验证按班级、日期范围查询与完整加载结果一致，修改记录时切换为完整加载、只修改全局字段时保持延迟加载，数据文件变化后索引失效
+"""
+
+import os
+import json
+import tempfile
+from data_manager import DataManager
+import lazy_store
+import search_index
+import integrity
+import records
+
+
+def _seed(data_file):
+    """写入三个班级、跨越多天的作业"""
+    dm = DataManager(data_file)
+    with dm.transaction():
+        for i in range(60):
+            dm.add_homework(["语文", "数学", "英语"][i % 3], f"作业{i}", f"70{i % 3 + 1}",
+                            overwrite=False, timestamp=f"2025-03-{i % 28 + 1:02d} 08:{i % 60:02d}:00")
+        dm.add_message("老师好", "小明", "701")
+    return dm
+
+
+def test_lazy_queries_match_eager():
+    """延迟加载的查询结果与完整加载一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "lazy.json")
+        eager = _seed(data_file)
+
+        DataManager(data_file, lazy=True)  # 首次启动生成记录文件
+        lazy = DataManager(data_file, lazy=True, lazy_cache_size=8)
+        assert lazy._lazy_store is not None
+
+        assert lazy.get_homeworks("701") == eager.get_homeworks("701")
+        assert lazy.get_homeworks("702", "数学") == eager.get_homeworks("702", "数学")
+        assert lazy.get_homeworks("701", "数学") == []
+        assert lazy.get_homeworks() == eager.get_homeworks()
+        assert lazy.get_homeworks(since="2025-03-10", until="2025-03-12") == \
+            eager.get_homeworks(since="2025-03-10", until="2025-03-12")
+        assert len(lazy.get_homeworks(since="2025-03-10", until="2025-03-12")) > 0
+        assert lazy.get_messages("701") == eager.get_messages("701")
+        assert lazy.get_homework(5) == eager.get_homework(5)
+        assert lazy.get_classes() == eager.get_classes()
+
+        # 缓存容量有限
+        assert len(lazy._lazy_store._cache) <= 8
+        assert lazy._lazy_store is not None, "只读查询不应触发完整加载"
+        print("✓ 延迟加载查询结果与完整加载一致")
+
+
+def test_write_materializes():
+    """修改数据时切换为完整加载，并为下次启动更新记录文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "lazy.json")
+        _seed(data_file)
+        DataManager(data_file, lazy=True)
+
+        lazy = DataManager(data_file, lazy=True)
+        lazy.add_homework("物理", "实验报告", "701", overwrite=False)
+        assert lazy._lazy_store is None
+        assert len(lazy.get_homeworks()) == 61
+        assert lazy.delete_homework(1)
+
+        reopened = DataManager(data_file, lazy=True)
+        assert reopened._lazy_store is not None
+        assert len(reopened.get_homeworks()) == 60
+        assert reopened.get_homeworks("701", "物理")[0]["content"] == "实验报告"
+        assert reopened.get_homework(1) is None
+
+        # 只修改全局字段也会保留全部记录
+        reopened.add_class("799")
+        assert len(DataManager(data_file).get_homeworks()) == 60
+        assert list(DataManager(data_file).data)[:2] == ["homeworks", "messages"]
+        print("✓ 修改数据后记录完整保存")
+
+
+def test_global_save_stays_lazy():
+    """只修改全局字段时保持延迟加载，数据文件与完整序列化的结果相同，记录文件不重新生成，检索索引仍然有效"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "lazy.json")
+        _seed(data_file)
+        DataManager(data_file, lazy=True, enable_search=True)
+        records_mtime = os.stat(lazy_store.records_path(data_file)).st_mtime_ns
+
+        lazy = DataManager(data_file, lazy=True)
+        lazy.add_class("799")
+        lazy.set_password("newpass")
+        assert lazy._lazy_store is not None
+        assert os.stat(lazy_store.records_path(data_file)).st_mtime_ns == records_mtime
+        assert lazy.verify_integrity()["success"]
+        assert "799" in lazy.get_classes() and len(lazy.get_homeworks("701")) == 20
+
+        reopened = DataManager(data_file, lazy=True)
+        assert reopened._lazy_store is not None and "799" in reopened.get_classes()
+        assert reopened.verify_password("newpass")
+        assert search_index.load_indexes(data_file) is not None
+
+        # 导出数据不读入记录，结果与完整加载时相同
+        exported = json.loads(lazy.export_data().decode('utf-8'))
+        assert lazy._lazy_store is not None
+        assert exported == json.loads(DataManager(data_file).export_data().decode('utf-8'))
+        assert len(exported["homeworks"]) == 60 and "799" in exported["classes"]
+
+        # 与完整加载后序列化的结果逐字节相同
+        with open(data_file, 'rb') as f:
+            spliced = f.read()
+        full = DataManager(data_file)
+        assert full.get_classes() == lazy.get_classes() and len(full.get_homeworks()) == 60
+        assert integrity.dump_data(full.data, ("homeworks", "messages"), default=records.json_default)[0] == spliced
+        print("✓ 只修改全局字段时保持延迟加载")
+
+
+def test_stale_index_ignored():
+    """数据文件被外部修改后不再使用旧索引"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "lazy.json")
+        _seed(data_file)
+        DataManager(data_file, lazy=True)
+        assert lazy_store.LazyRecordStore.open(data_file) is not None
+
+        DataManager(data_file).add_homework("化学", "预习", "703", overwrite=False)
+        assert lazy_store.LazyRecordStore.open(data_file) is None
+        assert len(DataManager(data_file, lazy=True).get_homeworks("703")) == 21
+        print("✓ 数据文件变化后索引失效")
+
+
+def test_line_separator_in_content():
+    """内容中含有U+2028等Unicode换行符时，切换为完整加载后照常写入"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "lazy.json")
+        contents = ["第一行\u2028第二行", "段落\u2029分隔", "记录\x1e分隔\x85下一行"]
+        dm = DataManager(data_file, lazy=True)
+        for content in contents:
+            dm.add_homework("语文", content, "701", overwrite=False)
+        dm.close()
+
+        lazy = DataManager(data_file, lazy=True)
+        assert lazy._lazy_store is not None
+        assert lazy.add_homework("数学", "练习", "701", overwrite=False)["id"] == 4
+        lazy.close()
+        assert sorted(hw["content"] for hw in DataManager(data_file).get_homeworks()) == sorted(contents + ["练习"])
+        print("✓ 内容中的Unicode换行符不影响延迟加载")
+
+
+def test_results_do_not_share_cache():
+    """修改查询返回的记录不影响缓存，与完整加载一样每次返回新的字典"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "lazy.json")
+        _seed(data_file)
+        DataManager(data_file, lazy=True)  # 首次启动生成记录文件
+        lazy = DataManager(data_file, lazy=True)
+        assert lazy._lazy_store is not None
+
+        original = lazy.get_homework(5)["content"]
+        lazy.get_homework(5)["content"] = "被修改"
+        for homework in lazy.get_homeworks("701"):
+            homework["content"] = "被修改"
+        for homework in lazy.get_homeworks_page(limit=50)["items"]:
+            homework["content"] = "被修改"
+        lazy.get_message(1)["content"] = "被修改"
+
+        assert lazy.get_homework(5)["content"] == original
+        assert "被修改" not in {hw["content"] for hw in lazy.get_homeworks()}
+        assert "被修改" not in {hw["content"] for hw in lazy.get_homeworks_page(limit=50)["items"]}
+        assert lazy.get_message(1)["content"] == "老师好"
+        assert lazy._lazy_store is not None
+        print("✓ 修改查询结果不影响缓存")
+
+
+if __name__ == "__main__":
+    test_lazy_queries_match_eager()
+    test_write_materializes()
+    test_global_save_stays_lazy()
+    test_stale_index_ignored()
+    test_line_separator_in_content()
+    test_results_do_not_share_cache()
+    print("\n所有延迟加载测试通过")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试留言环形缓冲
+验证每个班级的留言数不超过容量、超过保留天数的留言被淘汰，以及被淘汰的留言移入归档
+"""
+
+import os
+import json
+import tempfile
+from data_manager import DataManager
+from message_store import MessageRing
+
+
+def test_ring_keeps_time_order():
+    """合并来的旧留言插入到对应位置，淘汰时从最旧的开始"""
+    ring = MessageRing(capacity=3)
+    for record_id, ts in ((1, 100), (2, 300), (3, 200), (4, 400)):
+        ring.add({"id": record_id, "ts": ts, "class": "701"})
+    ring.add({"id": 5, "ts": 50, "class": "702"})
+
+    assert ring.overflow("701") == [1]
+    assert ring.overflow("701", cutoff_ts=250) == [1, 3]
+    assert ring.overflow("702") == []
+
+    ring.remove({"id": 3, "ts": 200, "class": "701"})
+    assert ring.overflow("701") == [] and ring.count("701") == 3
+    assert len(ring) == 4
+    print("✓ 环形缓冲按时间排序淘汰")
+
+
+def test_capacity_evicts_into_archive():
+    """超出容量时一次淘汰一批最旧的留言并移入归档，其它班级不受影响"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "messages.json")
+        dm = DataManager(data_file, message_capacity=20, class_message_capacities={"702": 5})
+        for i in range(25):
+            dm.add_message(f"留言{i}", "小明", "701")
+        for i in range(4):
+            dm.add_message(f"提问{i}", "小红", "702")
+
+        # 超过20条时淘汰到 20 - 20//10 + 1 = 19 条，之后再次增长到20条
+        messages = dm.get_messages("701")
+        assert len(messages) <= 20
+        assert sorted(m["id"] for m in messages) == list(range(26 - len(messages), 26))  # 保留的是最新的留言
+        assert len(dm.get_messages("702")) == 4
+
+        with open(data_file, 'r', encoding='utf-8') as f:
+            assert len(json.load(f)["messages"]) == len(messages) + 4
+
+        everything = dm.get_messages("701", include_archive=True)
+        assert sorted(m["content"] for m in everything) == sorted(f"留言{i}" for i in range(25))
+        assert dm.get_message(1)["content"] == "留言0"  # 已归档的留言仍可按ID读取
+
+        for i in range(3):
+            dm.add_message(f"提问{i + 4}", "小红", "702")
+        assert len(dm.get_messages("702")) <= 5
+        print("✓ 超出容量的留言移入归档")
+
+
+def test_max_age_and_discard():
+    """超过保留天数的留言被淘汰；不归档时直接删除"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "messages.json")
+        # 旧版本数据文件中的留言没有ts，读取时由显示时间补充
+        old = [{"id": i, "content": f"旧留言{i}", "student": "小明", "class": "701",
+                "timestamp": f"2020-01-0{i} 08:00:00", "status": "active"} for i in (1, 2, 3)]
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump({"homeworks": [], "messages": old, "classes": [], "subjects": []}, f, ensure_ascii=False)
+
+        limited = DataManager(data_file, message_max_age_days=30, archive_evicted_messages=False)
+        limited.add_message("新留言", "小明", "701")
+        assert [m["content"] for m in limited.get_messages()] == ["新留言"]
+        assert limited.get_messages(include_archive=True) == limited.get_messages()
+
+        assert limited.trim_messages()["evicted"] == 0
+        print("✓ 超过保留天数的留言被淘汰")
+
+
+if __name__ == "__main__":
+    print("开始测试留言环形缓冲...")
+    test_ring_keeps_time_order()
+    test_capacity_evicts_into_archive()
+    test_max_age_and_discard()
+    print("所有测试通过！")
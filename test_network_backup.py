@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试网络备份
+验证老师端从学生服务器拉取的备份与学生数据一致、数据没有变化时不再传输、中断后从断点继续，以及并行收集多个服务器
+"""
+
+import os
+import json
+import random
+import socket
+import tempfile
+from datetime import datetime
+from communication import StudentServer, MessageTypes
+from data_manager import DataManager
+import backup_engine
+import network_backup
+
+
+def _start_server(dm, chunk_size=network_backup.BACKUP_CHUNK_SIZE):
+    server = StudentServer(host='127.0.0.1', port=0)
+    assert server.start_server()
+    source = network_backup.BackupSource(dm, chunk_size=chunk_size)
+    source.register(server)
+    return server, server.server_socket.getsockname()[1], source
+
+
+def _stored_data(backup_root, port, file_name):
+    engine = backup_engine.BackupEngine(os.path.join(backup_root, f"127.0.0.1_{port}", backup_engine.BACKUP_DIR_NAME))
+    latest = engine.latest()
+    return json.loads(b"".join(engine.read(latest["name"], file_name)).decode('utf-8')), engine
+
+
+def test_pull_backup_and_unchanged():
+    """拉取的备份与学生数据一致，数据没有变化时不再传输，变化后产生新的备份"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "student_data.json"))
+        for i in range(50):
+            dm.add_homework("数学", f"练习{i}", str(700 + i))
+        server, port, _source = _start_server(dm)
+        backup_root = os.path.join(temp_dir, "backups")
+        try:
+            result = network_backup.pull_backup("127.0.0.1", port, backup_root, timeout=5)
+            assert result["success"], result
+            assert 0 < result["bytes_received"] < result["raw_size"]
+            data, engine = _stored_data(backup_root, port, "student_data.json")
+            assert data == json.loads(dm.export_data(include_private=False).decode('utf-8'))
+            assert "password" not in data and "password_version" not in data
+            assert data["homeworks"] and data["id_sequences"]["homeworks"] == 50
+
+            again = network_backup.pull_backup("127.0.0.1", port, backup_root, timeout=5)
+            assert again["success"] and again["unchanged"] and again["bytes_received"] == 0
+
+            dm.add_homework("语文", "背诵", "701")
+            changed = network_backup.pull_backup("127.0.0.1", port, backup_root, timeout=5)
+            assert changed["success"] and not changed["unchanged"], changed
+            data, engine = _stored_data(backup_root, port, "student_data.json")
+            assert len(data["homeworks"]) == 51 and len(engine.backups()) == 2
+        finally:
+            server.stop_server()
+        print("✓ 拉取网络备份")
+
+
+def test_interrupted_pull_resumes():
+    """传输中断后下次从已收到的字节处继续"""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "student_data.json"))
+        with dm.transaction():
+            for i in range(600):
+                dm.add_homework("数学", "%0256x" % rng.getrandbits(1024), str(700 + i))
+        chunk_size = 8 * 1024
+        server, port, source = _start_server(dm, chunk_size=chunk_size)
+        backup_root = os.path.join(temp_dir, "backups")
+
+        # 发送3个数据块后断开连接
+        def handle_interrupted(message, client_socket, teacher_id):
+            sent = []
+
+            def send(reply):
+                if len(sent) == 3:
+                    client_socket.close()
+                    return False
+                sent.append(reply)
+                return server.send_to_teacher(teacher_id, reply)
+            source.serve(message, send)
+
+        server.register_handler(MessageTypes.BACKUP_REQUEST, handle_interrupted)
+        try:
+            first = network_backup.pull_backup("127.0.0.1", port, backup_root, timeout=5)
+            assert not first["success"] and first["bytes_received"] == 3 * chunk_size, first
+
+            source.register(server)
+            second = network_backup.pull_backup("127.0.0.1", port, backup_root, timeout=5)
+            assert second["success"], second
+            assert second["resumed_from"] == 3 * chunk_size
+            assert second["resumed_from"] + second["bytes_received"] == len(source.snapshot()["payload"])
+            data, _engine = _stored_data(backup_root, port, "student_data.json")
+            assert len(data["homeworks"]) == 600
+            assert not os.path.exists(os.path.join(backup_root, f"127.0.0.1_{port}", network_backup.PARTIAL_NAME))
+        finally:
+            server.stop_server()
+        print("✓ 中断后继续传输")
+
+
+def test_collector_pulls_in_parallel():
+    """并行收集多个学生服务器，无法连接的服务器单独报告失败"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        servers = []
+        try:
+            for number in range(3):
+                dm = DataManager(os.path.join(temp_dir, f"class{number}.json"))
+                dm.add_homework("数学", f"第{number}班", f"70{number}")
+                servers.append(_start_server(dm)[:2])
+            addresses = [f"127.0.0.1:{port}" for _server, port in servers]
+            backup_root = os.path.join(temp_dir, "backups")
+
+            result = network_backup.BackupCollector(backup_root, addresses, timeout=5).collect()
+            assert result["success"], result
+            for number, (_server, port) in enumerate(servers):
+                data, _engine = _stored_data(backup_root, port, f"class{number}.json")
+                assert [hw["content"] for hw in data["homeworks"]] == [f"第{number}班"]
+
+            # 没有在监听的端口
+            probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            probe.bind(('127.0.0.1', 0))
+            closed_port = probe.getsockname()[1]
+            probe.close()
+            addresses[0] = f"127.0.0.1:{closed_port}"
+            partial = network_backup.BackupCollector(backup_root, addresses, timeout=5).collect()
+            assert not partial["success"] and partial["message"].startswith("2/3")
+            assert [item["success"] for item in partial["results"]] == [False, True, True]
+            assert partial["results"][0]["server"] == f"127.0.0.1:{closed_port}"
+        finally:
+            for server, _port in servers:
+                server.stop_server()
+
+        assert network_backup.parse_server("10.0.0.5") == ("10.0.0.5", network_backup.DEFAULT_PORT)
+        assert network_backup.parse_server("10.0.0.5:9000") == ("10.0.0.5", 9000)
+        assert network_backup.next_run_time(datetime(2025, 6, 15, 1, 0), "02:00") == datetime(2025, 6, 15, 2, 0)
+        assert network_backup.next_run_time(datetime(2025, 6, 15, 3, 0), "02:00") == datetime(2025, 6, 16, 2, 0)
+        print("✓ 并行收集多个学生服务器")
+
+
+if __name__ == "__main__":
+    print("开始测试网络备份...")
+    test_pull_backup_and_unchanged()
+    test_interrupted_pull_resumes()
+    test_collector_pulls_in_parallel()
+    print("所有测试通过！")
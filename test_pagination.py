@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分页查询
+验证键集分页逐页取完全部记录且不重复、翻页期间新增作业不影响后续页、延迟加载模式结果一致，
+以及网络消息跨多次recv到达时能正确拆分
+"""
+
+import os
+import json
+import time
+import tempfile
+from data_manager import DataManager
+from communication import MessageReader
+
+
+def _fill(dm):
+    # 同一时间的作业较多，验证游标中的id能区分时间相同的记录
+    with dm.transaction():
+        for i in range(23):
+            dm.add_homework("数学" if i % 2 else "语文", f"第{i}题", "701" if i % 3 else "702",
+                            timestamp=f"2025-03-{i // 4 + 1:02d} 08:00:00", overwrite=False)
+
+
+def _all_pages(dm, limit, **filters):
+    ids, after = [], None
+    while True:
+        page = dm.get_homeworks_page(limit=limit, after=after, **filters)
+        assert len(page["items"]) <= limit
+        ids.extend(h["id"] for h in page["items"])
+        after = page["next"]
+        if after is None:
+            return ids, page["total"]
+
+
+def _expected(dm, *filters):
+    # 分页按 (ts, id) 倒序，时间相同时ID大的在前
+    return [h["id"] for h in sorted(dm.get_homeworks(*filters), key=lambda h: (h["ts"], h["id"]), reverse=True)]
+
+
+def _pages_after(dm, after, limit):
+    ids = []
+    while after is not None:
+        page = dm.get_homeworks_page(limit=limit, after=after)
+        ids.extend(h["id"] for h in page["items"])
+        after = page["next"]
+    return ids
+
+
+def test_pages_cover_all_records():
+    """逐页取完全部作业，按 (ts, id) 倒序，没有重复"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "page.json"))
+        _fill(dm)
+
+        for limit in (1, 5, 23, 100):
+            ids, total = _all_pages(dm, limit)
+            assert total == 23
+            assert ids == _expected(dm), limit
+
+        ids, total = _all_pages(dm, 4, class_name="701", subject="数学")
+        assert total == len(ids) and ids == _expected(dm, "701", "数学")
+        print("✓ 分页取完全部作业")
+
+
+def test_cursor_stable_across_inserts():
+    """翻页期间新增作业，后续页不重复、不遗漏已有作业"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "page.json"))
+        _fill(dm)
+        expected = _expected(dm)
+
+        first = dm.get_homeworks_page(limit=10)
+        dm.add_homework("英语", "新作业", "701", timestamp="2025-04-01 08:00:00", overwrite=False)
+        rest = _pages_after(dm, first["next"], 10)
+        assert [h["id"] for h in first["items"]] + rest == expected
+
+        # 游标可以序列化为JSON后再传回来
+        cursor = json.loads(json.dumps(first["next"]))
+        assert dm.get_homeworks_page(limit=10, after=cursor)["items"][0]["id"] == rest[0]
+        print("✓ 翻页期间新增作业不影响后续页")
+
+
+def test_lazy_pages_match_eager():
+    """延迟加载模式的分页结果与完整加载一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "page.json")
+        _fill(DataManager(data_file))
+        eager = DataManager(data_file)
+        DataManager(data_file, lazy=True)  # 首次启动生成记录文件
+        lazy = DataManager(data_file, lazy=True)
+        assert lazy._lazy_store is not None
+
+        for filters in ({}, {"class_name": "702"}, {"subject": "语文"}):
+            assert _all_pages(lazy, 6, **filters) == _all_pages(eager, 6, **filters), filters
+        print("✓ 延迟加载模式分页一致")
+
+
+def test_messages_page():
+    """留言分页"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "page.json"))
+        for i in range(7):
+            dm.add_message(f"留言{i}", "小明", "701" if i % 2 else "702")
+
+        page = dm.get_messages_page(limit=3)
+        assert len(page["items"]) == 3 and page["total"] == 7
+        second = dm.get_messages_page(limit=10, after=page["next"])
+        assert second["next"] is None
+        seen = [m["id"] for m in page["items"] + second["items"]]
+        assert sorted(seen) == list(range(1, 8))
+        assert dm.get_messages_page("701")["total"] == 3
+        print("✓ 留言分页")
+
+
+def test_message_reader_splits_stream():
+    """多条消息粘连、单条消息跨多次recv、多字节字符被拆开时都能正确拆分"""
+    messages = [{"type": "homework_response", "homework": {"homeworks": [{"content": "背诵课文" * 500}]}},
+                {"type": "message", "content": '括号}{和引号\\"、反斜杠\\\\'},
+                {"type": "heartbeat"}]
+    data = b"".join(json.dumps(m, ensure_ascii=False).encode('utf-8') for m in messages)
+
+    for size in (1, 7, 4096, len(data)):
+        reader = MessageReader()
+        received = []
+        for start in range(0, len(data), size):
+            received.extend(reader.feed(data[start:start + size]))
+        assert received == messages, size
+
+    # 大消息分很多次到达时每个字节只扫描一次
+    big = json.dumps({"type": "homework_response", "homeworks": ["作业内容" * 50] * 20000},
+                     ensure_ascii=False).encode('utf-8')
+    reader = MessageReader()
+    start_time = time.perf_counter()
+    received = []
+    for start in range(0, len(big), 8192):
+        received.extend(reader.feed(big[start:start + 8192]))
+    elapsed = time.perf_counter() - start_time
+    assert len(received) == 1 and elapsed < 1.0, elapsed
+
+    try:
+        MessageReader().feed(b"{" + b"x" * (17 * 1024 * 1024))
+    except ValueError:
+        pass
+    else:
+        assert False, "超长的不完整消息应当报错"
+    print("✓ 网络消息正确拆分")
+
+
+if __name__ == "__main__":
+    print("开始测试分页查询...")
+    test_pages_cover_all_records()
+    test_cursor_stable_across_inserts()
+    test_lazy_pages_match_eager()
+    test_messages_page()
+    test_message_reader_splits_stream()
+    print("所有测试通过！")
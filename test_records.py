@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试槽位记录类型
+验证与字典的相互转换、额外字段保留、字符串驻留，以及DataManager对外仍返回字典
+"""
+
+import os
+import json
+import tempfile
+from records import HomeworkRecord, adopt_records
+from data_manager import DataManager
+
+
+def test_roundtrip_and_extra_fields():
+    """字典 -> 记录 -> 字典保持字段和顺序，未知字段保存在extra中"""
+    data = {"id": 1, "subject": "语文", "content": "背诵", "class": "701",
+            "teacher": "张老师", "timestamp": "2025-03-01 08:00:00", "status": "active", "note": "附加"}
+    record = HomeworkRecord.from_dict(data)
+    assert record.to_dict() == data and list(record.to_dict()) == list(data)
+    assert record["class"] == "701" and record.get("note") == "附加" and "note" in record
+
+    # 旧数据缺少字段时不补出不存在的键
+    legacy = {"id": 2, "subject": "数学", "content": "习题", "class": "702", "timestamp": "2025-03-01"}
+    assert HomeworkRecord.from_dict(legacy).to_dict() == legacy
+    assert "teacher" not in HomeworkRecord.from_dict(legacy)
+    print("✓ 记录与字典相互转换")
+
+
+def test_categorical_fields_interned():
+    """学科、班级等重复字符串共用同一个对象"""
+    rows = json.loads(json.dumps([
+        {"id": i, "subject": "数学", "content": f"习题{i}", "class": "701",
+         "teacher": "李老师", "timestamp": "2025-03-01 08:00:00", "status": "active"}
+        for i in range(3)
+    ], ensure_ascii=False))
+    assert rows[0]["subject"] is not rows[1]["subject"]
+    items = adopt_records("homeworks", rows)
+    assert items[0].subject is items[1].subject is items[2].subject
+    assert items[0].class_name is items[2].class_name
+    print("✓ 重复字符串已驻留")
+
+
+def test_data_manager_returns_dicts():
+    """DataManager内部使用记录，对外返回普通字典，文件格式不变"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "records.json"))
+        homework = dm.add_homework("语文", "背诵", "701")
+        assert type(homework) is dict and type(dm.get_homeworks()[0]) is dict
+        assert isinstance(dm.data["homeworks"][0], HomeworkRecord)
+
+        # 修改返回的字典不影响内部数据
+        homework["content"] = "被调用方修改"
+        assert dm.get_homework(homework["id"])["content"] == "背诵"
+
+        with open(dm.data_file, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        assert saved["homeworks"][0] == dm.get_homework(homework["id"])
+        assert DataManager(dm.data_file, use_snapshot_cache=False).get_homeworks() == dm.get_homeworks()
+        print("✓ 对外接口返回字典，文件格式不变")
+
+
+if __name__ == "__main__":
+    test_roundtrip_and_extra_fields()
+    test_categorical_fields_interned()
+    test_data_manager_returns_dicts()
+    print("\n所有记录类型测试通过")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试从备份恢复
+验证备份目录列出本机副本、U盘备份和U盘文件并缓存记录数，预览列出恢复前后的差异，以及恢复在一次写入中完成并保留恢复前的数据
+"""
+
+import os
+import json
+import tempfile
+from data_manager import DataManager
+import backup_catalog
+import backup_engine
+
+
+def _manager(temp_dir, name="restore.json"):
+    dm = DataManager(os.path.join(temp_dir, name))
+    dm.base_data_dir = os.path.join(temp_dir, "data")
+    os.makedirs(dm.base_data_dir, exist_ok=True)
+    return dm
+
+
+def test_catalog_lists_sources_incrementally():
+    """三种来源都能列出，记录数只在出现新内容时解析"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _manager(temp_dir)
+        drive = os.path.join(temp_dir, "usb")
+        dm.add_homework("数学", "练习", "701")
+        dm.backup_to(os.path.join(drive, backup_engine.BACKUP_DIR_NAME))
+        with open(os.path.join(drive, "student_data.json"), 'w', encoding='utf-8') as f:
+            json.dump({"homeworks": [], "messages": [{"id": 1}]}, f)
+        dm.restore_backup(dm.list_restore_points([drive])[0])  # 留下一个本机副本
+
+        entries = dm.list_restore_points([drive])
+        sources = sorted(entry["source"] for entry in entries)
+        assert sources == sorted([backup_catalog.SOURCE_LOCAL, backup_catalog.SOURCE_USB_BACKUP,
+                                  backup_catalog.SOURCE_USB_FILE]), entries
+        counts = {entry["source"]: (entry["homeworks"], entry["messages"]) for entry in entries}
+        assert counts[backup_catalog.SOURCE_USB_BACKUP] == (1, 0)
+        assert counts[backup_catalog.SOURCE_USB_FILE] == (0, 1)
+        assert entries == sorted(entries, key=lambda entry: (entry["time"], entry["id"]), reverse=True)
+
+        # 没有新内容时不再读取备份
+        load = backup_catalog.BackupCatalog.load
+        backup_catalog.BackupCatalog.load = lambda self, entry: (_ for _ in ()).throw(AssertionError("不应重新解析"))
+        try:
+            assert dm.list_restore_points([drive]) == entries
+        finally:
+            backup_catalog.BackupCatalog.load = load
+
+        dm.add_homework("语文", "背诵", "701")
+        dm.backup_to(os.path.join(drive, backup_engine.BACKUP_DIR_NAME))
+        newer = dm.list_restore_points([drive])
+        assert len(newer) == len(entries) + 1
+        assert max(entry["homeworks"] for entry in newer if entry["source"] == backup_catalog.SOURCE_USB_BACKUP) == 2
+        print("✓ 备份目录增量建立")
+
+
+def test_preview_and_restore():
+    """预览列出恢复、删除、改回的记录；恢复后数据与备份一致，密码不变，新ID不重复"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _manager(temp_dir)
+        drive = os.path.join(temp_dir, "usb")
+        kept = dm.add_homework("数学", "练习", "701")
+        removed = dm.add_homework("语文", "背诵", "702")
+        dm.backup_to(os.path.join(drive, backup_engine.BACKUP_DIR_NAME))
+        entry = dm.list_restore_points([drive])[0]
+
+        dm.delete_homework(removed["id"])
+        dm.add_homework("数学", "订正", "701")  # 覆盖作业
+        added = dm.add_homework("英语", "听写", "703")
+        dm.set_password("newpass")
+
+        preview = dm.preview_restore(entry)
+        assert preview["success"], preview
+        assert preview["homeworks"]["added_count"] == 1 and "背诵" in preview["homeworks"]["added"][0]
+        assert preview["homeworks"]["removed_count"] == 1 and "听写" in preview["homeworks"]["removed"][0]
+        assert preview["homeworks"]["changed_count"] == 1 and "练习" in preview["homeworks"]["changed"][0]
+
+        before = dm.snapshot()
+        result = dm.restore_backup(entry)
+        assert result["success"], result
+        assert sorted(hw["content"] for hw in dm.get_homeworks()) == ["练习", "背诵"]
+        assert dm.get_homework(added["id"]) is None and dm.get_homework(kept["id"])["content"] == "练习"
+        assert len(before.items("homeworks")) == 2 and dm.version > before.version
+        assert dm.verify_password("newpass")
+        assert dm.add_homework("物理", "实验", "701")["id"] > added["id"]
+
+        # 恢复前的数据保存为本机副本，可以再恢复回来
+        reopened = DataManager(dm.data_file)
+        assert sorted(hw["content"] for hw in reopened.get_homeworks()) == ["实验", "练习", "背诵"]
+        saved = [item for item in dm.list_restore_points([]) if item["file"] == os.path.basename(result["saved_copy"])]
+        assert saved and saved[0]["homeworks"] == 2
+        print("✓ 预览并恢复备份")
+
+
+def test_corrupt_backup_is_rejected():
+    """内容与登记的哈希不一致时不恢复，数据不变"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _manager(temp_dir)
+        drive = os.path.join(temp_dir, "usb")
+        os.makedirs(drive)
+        with open(os.path.join(drive, "data.json"), 'w', encoding='utf-8') as f:
+            json.dump({"homeworks": [], "messages": []}, f)
+        dm.add_homework("数学", "练习", "701")
+        entry = dm.list_restore_points([drive])[0]
+        entry["sha256"] = "0" * 64
+
+        assert not dm.preview_restore(entry)["success"]
+        result = dm.restore_backup(entry)
+        assert not result["success"] and "哈希" in result["message"]
+        assert [hw["content"] for hw in dm.get_homeworks()] == ["练习"]
+        print("✓ 损坏的备份不会恢复")
+
+
+if __name__ == "__main__":
+    print("开始测试从备份恢复...")
+    test_catalog_lists_sources_incrementally()
+    test_preview_and_restore()
+    test_corrupt_backup_is_rejected()
+    print("所有测试通过！")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试作业修订历史
+验证覆盖作业后可以取回任意修订、比较两个修订，修订链按差异+关键帧保存，以及事务回滚后修订链仍与数据一致
+"""
+
+import os
+import json
+import tempfile
+from data_manager import DataManager
+import revision_store
+
+
+def test_delta_roundtrip():
+    """差异应用到旧内容上得到新内容"""
+    cases = [
+        ("", "完成练习册第12页"),
+        ("完成练习册第12页\n背诵课文", "完成练习册第13页（必做）\n背诵课文\n预习下一课"),
+        ("整理错题", ""),
+        ("Write a short essay", "Write a long essay about your weekend"),
+    ]
+    for old, new in cases:
+        assert revision_store.apply_delta(old, revision_store.make_delta(old, new)) == new
+    print("✓ 文本差异可以还原")
+
+
+def test_overwrite_keeps_revisions():
+    """多次覆盖同一份作业后可以取回每个修订，修订链使用差异和关键帧"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "revisions.json")
+        dm = DataManager(data_file)
+        contents = [f"完成练习册第{page}页\n背诵课文第二段\n整理本周错题" for page in range(10, 25)]
+        for i, content in enumerate(contents):
+            homework = dm.add_homework("数学", content, "701", teacher_name=f"老师{i % 2}")
+        assert len(dm.get_homeworks()) == 1
+
+        history = dm.get_homework_revisions(homework["id"])
+        assert [revision["content"] for revision in history] == contents
+        assert [revision["revision"] for revision in history] == list(range(1, 16))
+        assert dm.get_homework_revision(homework["id"], 4)["teacher"] == "老师1"
+        assert dm.get_homework_revision(homework["id"], 12)["content"] == contents[11]
+        assert dm.get_homework_revision(homework["id"], 16) is None
+
+        with open(os.path.join(revision_store.revisions_dir(data_file), f"{homework['id']}.jsonl"), encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        assert ["content" in entry for entry in entries] == [i % 10 == 0 for i in range(15)]
+        assert dm.revisions.storage_size() < sum(len(json.dumps(h, ensure_ascii=False).encode('utf-8')) for h in history)
+
+        diff = dm.diff_homework_revisions(homework["id"], 1)
+        assert "-完成练习册第10页" in diff and "+完成练习册第24页" in diff
+        assert " 背诵课文第二段" in diff.splitlines()  # 没有变化的行只作为上下文
+        assert dm.diff_homework_revisions(homework["id"], 3, 3) == ""
+        assert dm.diff_homework_revisions(homework["id"], 1, 99) is None
+        print("✓ 覆盖作业后保留修订历史")
+
+
+def test_history_follows_rollback_and_delete():
+    """事务回滚的修改和删除不影响修订链，提交后才写入；删除作业时删除修订历史；可以关闭修订历史"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "revisions.json")
+        dm = DataManager(data_file)
+        homework = dm.add_homework("语文", "背诵第一段", "701")
+        assert dm.get_homework_revisions(homework["id"])[0]["content"] == "背诵第一段"
+        assert dm.revisions.count(homework["id"]) == 0
+
+        try:
+            with dm.transaction():
+                dm.update_homework(homework["id"], content="背诵第二段")
+                raise RuntimeError("回滚")
+        except RuntimeError:
+            pass
+        dm.update_homework(homework["id"], content="背诵第三段", status="completed")
+
+        # 回滚的修改不留在修订链中
+        history = dm.get_homework_revisions(homework["id"])
+        assert [revision["content"] for revision in history] == ["背诵第一段", "背诵第三段"]
+        assert history[-1]["status"] == "completed"
+
+        # 回滚的删除不删除修订历史
+        try:
+            with dm.transaction():
+                assert dm.delete_homework(homework["id"])
+                raise RuntimeError("回滚")
+        except RuntimeError:
+            pass
+        assert dm.get_homework(homework["id"]) is not None
+        assert len(dm.get_homework_revisions(homework["id"])) == 2
+
+        # 事务提交后才写入修订历史
+        with dm.transaction():
+            dm.update_homework(homework["id"], content="背诵第四段")
+            assert dm.revisions.count(homework["id"]) == 2
+        assert dm.get_homework_revisions(homework["id"])[-1]["content"] == "背诵第四段"
+
+        assert dm.delete_homework(homework["id"])
+        assert dm.get_homework_revisions(homework["id"]) == []
+
+        plain = DataManager(os.path.join(temp_dir, "plain.json"), keep_revisions=False)
+        plain.add_homework("语文", "背诵第一段", "701")
+        plain.add_homework("语文", "背诵第二段", "701")
+        assert plain.revisions.storage_size() == 0
+        print("✓ 修订历史与数据保持一致")
+
+
+if __name__ == "__main__":
+    print("开始测试作业修订历史...")
+    test_delta_roundtrip()
+    test_overwrite_keeps_revisions()
+    test_history_follows_rollback_and_delete()
+    print("所有测试通过！")
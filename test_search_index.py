@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试全文检索
+验证字符二元组索引的中文检索、排序，以及添加、修改、删除、回滚后的增量维护和索引文件的保存
+"""
+
+import os
+import tempfile
+from data_manager import DataManager
+import search_index
+
+
+def _seed(data_file, enable_search=True):
+    dm = DataManager(data_file, enable_search=enable_search)
+    with dm.transaction():
+        dm.add_homework("数学", "完成第三单元练习题", "701", overwrite=False)
+        dm.add_homework("语文", "背诵古诗三首，预习第三单元", "701", overwrite=False)
+        dm.add_homework("英语", "Unit 3 单词听写", "702", overwrite=False)
+        dm.add_homework("数学", "第三单元测验订正", "702", overwrite=False)
+    return dm
+
+
+def test_terms():
+    """二元组切分：忽略空白、标点，英文转为小写"""
+    assert search_index.document_terms("第三单元") == {"第", "三", "单", "元", "第三", "三单", "单元"}
+    assert search_index.query_terms("Unit 3") == {"un", "ni", "it", "t3"}
+    assert search_index.query_terms("，数") == {"数"}
+    assert search_index.query_terms("  ") == set()
+    print("✓ 二元组切分正确")
+
+
+def test_search_ranked():
+    """检索结果只包含全部二元组都命中的记录，短文本排在前面"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _seed(os.path.join(temp_dir, "search.json"))
+
+        ids = dm.search("第三单元")
+        assert set(ids) == {1, 2, 4}, ids
+        assert ids[-1] == 2  # 最长的文本排在最后
+        assert dm.search("三单元练") == [1]
+        assert dm.search("unit") == [3]
+        assert dm.search("物理") == []
+        assert dm.search("") == []
+        assert len(dm.search("第三单元", limit=2)) == 2
+
+        # 命中任意二元组
+        assert 3 not in dm.search("单元听写")
+        assert 3 in dm.search("单元听写", require_all=False)
+
+        homeworks = dm.search_homeworks("第三单元", class_name="702")
+        assert [h["id"] for h in homeworks] == [4]
+        print("✓ 检索结果与排序正确")
+
+
+def test_incremental_maintenance():
+    """添加、修改、删除和事务回滚后索引与数据一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _seed(os.path.join(temp_dir, "search.json"))
+
+        new = dm.add_homework("物理", "实验报告", "701", overwrite=False)
+        assert dm.search("实验报告") == [new["id"]]
+
+        dm.update_homework(new["id"], content="光学实验预习")
+        assert dm.search("实验报告") == []
+        assert dm.search("光学") == [new["id"]]
+
+        dm.delete_homework(new["id"])
+        assert dm.search("光学") == []
+
+        try:
+            with dm.transaction():
+                dm.add_homework("化学", "元素周期表", "701", overwrite=False)
+                raise RuntimeError("回滚")
+        except RuntimeError:
+            pass
+        assert dm.search("周期表") == []
+
+        message = dm.add_message("作业太多了", "小明", "701")
+        assert dm.search("太多", collection="messages") == [message["id"]]
+        assert dm.search_messages("作业")[0]["content"] == "作业太多了"
+        print("✓ 索引随数据增量维护")
+
+
+def test_index_persisted():
+    """索引与数据一起保存，数据文件被修改后重新建立"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "search.json")
+        _seed(data_file)
+        assert search_index.load_indexes(data_file) is not None
+
+        dm = DataManager(data_file, enable_search=True)
+        assert set(dm.search("第三单元")) == {1, 2, 4}
+
+        # 只修改全局字段时索引只更新签名，仍然有效
+        DataManager(data_file).add_class("799")
+        assert search_index.load_indexes(data_file) is not None
+
+        # 不启用检索的实例修改数据后，已保存的索引过期
+        DataManager(data_file).add_homework("历史", "第三单元大事年表", "701", overwrite=False)
+        assert search_index.load_indexes(data_file) is None
+        dm = DataManager(data_file, enable_search=True)
+        assert set(dm.search("第三单元")) == {1, 2, 4, 5}
+        print("✓ 索引保存与过期检测正确")
+
+
+def test_lazy_mode_search():
+    """延迟加载模式下使用已保存的索引检索，不需要读入全部记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "search.json")
+        _seed(data_file)
+        DataManager(data_file, lazy=True)
+
+        dm = DataManager(data_file, lazy=True, enable_search=True)
+        assert dm._lazy_store is not None
+        assert [h["content"] for h in dm.search_homeworks("练习")] == ["完成第三单元练习题"]
+        assert dm._lazy_store is not None
+        print("✓ 延迟加载模式下可以检索")
+
+
+if __name__ == "__main__":
+    print("开始测试全文检索...")
+    test_terms()
+    test_search_ranked()
+    test_incremental_maintenance()
+    test_index_persisted()
+    test_lazy_mode_search()
+    print("所有测试通过！")
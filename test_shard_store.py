@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按班级分片存储
+验证修改某个班级只重写该班级的分片、分片按需读取，以及从单个数据文件迁移、回滚和清空，
+分片、归档和留言容量只在设置中开启时使用
+"""
+
+import os
+import json
+import tempfile
+from data_manager import DataManager, storage_options
+import shard_store
+
+
+def _shard_path(data_file, class_name):
+    return os.path.join(shard_store.shard_dir(data_file), shard_store.shard_file_name(class_name))
+
+
+def _track_writes(dm):
+    """记录分片写入的班级"""
+    written = []
+    write_shard = dm._shards.write_shard
+
+    def tracked(class_name, shard):
+        written.append(class_name)
+        write_shard(class_name, shard)
+
+    dm._shards.write_shard = tracked
+    return written
+
+
+def test_write_only_affected_shard():
+    """添加作业只重写对应班级的分片和全局文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shard.json")
+        dm = DataManager(data_file, sharded=True)
+        dm.add_homework("数学", "练习一", "701")
+        dm.add_homework("语文", "背诵", "高一(2)班")
+        dm.add_message("收到", "小明", "701")
+
+        assert not os.path.exists(data_file)
+        assert os.path.exists(_shard_path(data_file, "701"))
+        assert os.path.exists(_shard_path(data_file, "高一(2)班"))
+
+        written = _track_writes(dm)
+        dm.add_homework("英语", "单词", "701", overwrite=False)
+        assert written == ["701"]
+
+        with open(_shard_path(data_file, "701"), 'r', encoding='utf-8') as f:
+            shard = json.load(f)
+        assert shard["class"] == "701"
+        assert len(shard["homeworks"]) == 2 and len(shard["messages"]) == 1
+
+        with open(os.path.join(shard_store.shard_dir(data_file), shard_store.GLOBAL_FILE), 'r', encoding='utf-8') as f:
+            global_data = json.load(f)
+        assert "homeworks" not in global_data
+        assert global_data["shards"]["701"]["homeworks"] == 2
+        assert global_data["id_sequences"]["homeworks"] == 3
+        print("✓ 只重写受影响的分片")
+
+
+def test_shards_loaded_on_demand():
+    """重新打开时只读取全局数据，访问班级时才读取对应分片"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shard.json")
+        dm = DataManager(data_file, sharded=True)
+        for class_name in ("701", "702", "703"):
+            dm.add_homework("数学", f"{class_name} 练习", class_name)
+
+        dm = DataManager(data_file, sharded=True)
+        assert dm._loaded_shards == set()
+        assert dm.get_classes() == []
+
+        assert [h["content"] for h in dm.get_homeworks("702")] == ["702 练习"]
+        assert dm._loaded_shards == {"702"}
+
+        # 向未读取的班级添加作业时先读入该分片，不会覆盖已有记录；新ID不与其它分片重复
+        new = dm.add_homework("语文", "背诵", "703", overwrite=False)
+        assert new["id"] == 4
+        assert dm._loaded_shards == {"702", "703"}
+
+        assert len(dm.get_homeworks()) == 4
+        assert dm._loaded_shards == {"701", "702", "703"}
+        assert dm.get_homework(1)["class"] == "701"
+        print("✓ 分片按需读取")
+
+
+def test_migrate_from_single_file():
+    """首次启用分片时拆分原数据文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shard.json")
+        dm = DataManager(data_file)
+        with dm.transaction():
+            dm.add_homework("数学", "练习", "701")
+            dm.add_homework("数学", "练习", "702")
+            dm.add_message("问题", "小红", "702")
+
+        dm = DataManager(data_file, sharded=True)
+        assert os.path.exists(_shard_path(data_file, "701"))
+        assert os.path.exists(_shard_path(data_file, "702"))
+
+        dm = DataManager(data_file, sharded=True)
+        assert len(dm.get_homeworks()) == 2
+        assert [m["student"] for m in dm.get_messages("702")] == ["小红"]
+        print("✓ 原数据文件拆分为分片")
+
+
+def test_update_delete_and_rollback():
+    """修改班级时两个分片都会更新，事务回滚后丢弃事务中读入的分片"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shard.json")
+        dm = DataManager(data_file, sharded=True)
+        homework = dm.add_homework("数学", "练习", "701")
+        dm.add_homework("语文", "背诵", "702")
+
+        dm.update_homework(homework["id"], **{"class": "702"})
+        assert not os.path.exists(_shard_path(data_file, "701"))
+        assert len(DataManager(data_file, sharded=True).get_homeworks("702")) == 2
+
+        dm = DataManager(data_file, sharded=True)
+        try:
+            with dm.transaction():
+                dm.add_homework("英语", "听写", "702", overwrite=False)
+                raise RuntimeError("回滚")
+        except RuntimeError:
+            pass
+        assert dm._loaded_shards == set()
+        assert len(dm.get_homeworks("702")) == 2
+
+        assert dm.delete_homework(homework["id"])
+        assert len(DataManager(data_file, sharded=True).get_homeworks()) == 1
+        print("✓ 修改、删除、回滚正确")
+
+
+def test_clear_and_archive():
+    """清空时删除全部分片；归档只读取有旧记录的分片"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shard.json")
+        dm = DataManager(data_file, sharded=True)
+        dm.add_homework("数学", "旧作业", "701", overwrite=False, timestamp="2024-09-01 08:00:00")
+        dm.add_homework("数学", "新作业", "701", overwrite=False)
+        dm.add_homework("数学", "新作业", "702", overwrite=False)
+
+        dm = DataManager(data_file, sharded=True)
+        result = dm.archive_old_records(before="2025-01-01")
+        assert result["archived"]["homeworks"] == 1
+        assert dm._loaded_shards == {"701"}
+        assert [h["content"] for h in DataManager(data_file, sharded=True).get_homeworks("701")] == ["新作业"]
+
+        dm.clear_all_data()
+        assert not os.path.exists(_shard_path(data_file, "701"))
+        assert not os.path.exists(_shard_path(data_file, "702"))
+        assert DataManager(data_file, sharded=True).get_homeworks() == []
+        print("✓ 清空与归档正确")
+
+
+def test_search_and_statistics_without_loading_shards():
+    """检索索引与分片概况一起保存，统计由概况中的计数汇总，都不需要读入分片"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "shard.json")
+        dm = DataManager(data_file, sharded=True, enable_search=True)
+        dm.add_homework("数学", "第三单元练习", "701", overwrite=False, timestamp="2025-03-03 08:00:00")
+        dm.add_homework("语文", "背诵第三单元", "702", overwrite=False, timestamp="2025-03-04 08:00:00")
+        dm.add_homework("数学", "口算", "702", overwrite=False, timestamp="2025-03-11 08:00:00")
+        dm.add_message("收到", "小明", "701")
+        expected = (dm.get_statistics(), dm.get_daily_statistics(), dm.get_weekly_rollup())
+        assert os.path.exists(os.path.join(shard_store.shard_dir(data_file), shard_store.GLOBAL_FILE + ".search"))
+
+        dm = DataManager(data_file, sharded=True, enable_search=True)
+        assert sorted(dm.search("第三单元")) == [1, 2]
+        assert (dm.get_statistics(), dm.get_daily_statistics(), dm.get_weekly_rollup()) == expected
+        assert dm._loaded_shards == set()
+        assert expected[0]["homework_count"] == 3 and expected[0]["message_count"] == 1
+        assert expected[2]["702"]["数学"] == {"2025-W11": 1}
+
+        # 读入分片后统计不重复计算，索引中的记录不重复加入
+        assert len(dm.get_homeworks("702")) == 2
+        assert dm.get_statistics() == expected[0]
+        assert len(dm._search_indexes["homeworks"]) == 3
+
+        # 导出全部数据时读取未读入的分片，不加入内存
+        exported = json.loads(dm.export_data().decode('utf-8'))
+        assert sorted(h["id"] for h in exported["homeworks"]) == [1, 2, 3]
+        assert len(exported["messages"]) == 1 and dm._loaded_shards == {"702"}
+
+        # 修改后重新打开，索引和统计与修改一致
+        dm.add_homework("英语", "第三单元单词", "703", overwrite=False, timestamp="2025-03-12 08:00:00")
+        dm = DataManager(data_file, sharded=True, enable_search=True)
+        assert sorted(dm.search("第三单元")) == [1, 2, 4]
+        assert dm.get_statistics()["subject_stats"]["英语"] == 1
+        assert dm._loaded_shards == set()
+        print("✓ 检索和统计不读入分片")
+
+
+def test_storage_options_opt_in():
+    """没有设置时不分片、不归档、不淘汰留言；设置开启后才使用，已经分片的数据即使关闭设置也继续使用分片"""
+    assert storage_options({}) == {}
+    assert storage_options({"sharded": "yes", "archive_horizon_days": 0, "message_capacity": "10"}) == {}
+    assert storage_options({"sharded": True, "archive_horizon_days": 180, "message_capacity": 2}) == {
+        "sharded": True, "archive_horizon_days": 180, "message_capacity": 2}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "plain.json")
+        dm = DataManager(data_file, **storage_options({}))
+        with dm.transaction():
+            dm.add_homework("数学", "旧作业", "701", timestamp="2020-01-01 08:00:00")
+            for i in range(3):
+                dm.add_message(f"留言{i}", "小明", "701")
+        dm = DataManager(data_file, **storage_options({}))
+        assert not os.path.exists(shard_store.shard_dir(data_file))
+        assert len(dm.get_homeworks()) == 1 and len(dm.get_messages("701")) == 3
+
+        dm = DataManager(data_file, **storage_options({"sharded": True, "message_capacity": 2}))
+        assert os.path.exists(shard_store.shard_dir(data_file))
+        dm.add_message("新留言", "小明", "701")
+        assert len(dm.get_messages("701")) == 2
+
+        # 关闭设置后原数据文件已过时，继续读取分片
+        dm = DataManager(data_file)
+        assert dm._shards is not None
+        assert [m["content"] for m in dm.get_messages("701")] == ["新留言", "留言2"]
+        print("✓ 存储选项只在设置中开启时使用")
+
+
+if __name__ == "__main__":
+    print("开始测试分片存储...")
+    test_write_only_affected_shard()
+    test_shards_loaded_on_demand()
+    test_migrate_from_single_file()
+    test_update_delete_and_rollback()
+    test_clear_and_archive()
+    test_search_and_statistics_without_loading_shards()
+    test_storage_options_opt_in()
+    print("所有测试通过！")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试快照缓存功能
+验证快照与JSON数据一致，源文件变化后快照失效
+"""
+
+import os
+import json
+import tempfile
+import snapshot_cache
+from data_manager import DataManager
+
+
+def test_snapshot_roundtrip():
+    """快照读取的数据与JSON完全一致（包括字段顺序）"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "snap.json"))
+        with dm.transaction():
+            dm.add_homework("语文", "背诵", "701")
+            dm.add_homework("数学", "习题", "702")
+            dm.add_message("老师好", "小明", "701")
+            dm.data["homeworks"][0]["note"] = "带额外字段的记录"
+            dm.save_data()
+
+        assert os.path.exists(snapshot_cache.snapshot_path(dm.data_file))
+        with open(dm.data_file, 'r', encoding='utf-8') as f:
+            from_json = json.load(f)
+        from_snapshot = snapshot_cache.load_snapshot(dm.data_file)
+        assert from_snapshot == from_json
+        assert list(from_snapshot) == list(from_json)
+        assert [list(h) for h in from_snapshot["homeworks"]] == [list(h) for h in from_json["homeworks"]]
+        print("✓ 快照内容与JSON一致")
+
+
+def test_snapshot_invalidated_by_external_change():
+    """数据文件被外部修改后不再使用快照"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "snap.json"))
+        dm.add_homework("语文", "背诵", "701")
+
+        with open(dm.data_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data["homeworks"][0]["content"] = "外部修改"
+        with open(dm.data_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+        assert snapshot_cache.load_snapshot(dm.data_file) is None
+        assert DataManager(dm.data_file).get_homeworks()[0]["content"] == "外部修改"
+        # 重新解析后快照已更新
+        assert snapshot_cache.load_snapshot(dm.data_file)["homeworks"][0]["content"] == "外部修改"
+        print("✓ 源文件变化后快照失效并重建")
+
+
+if __name__ == "__main__":
+    test_snapshot_roundtrip()
+    test_snapshot_invalidated_by_external_change()
+    print("\n所有快照缓存测试通过")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试启动耗时分析
+验证按阶段记录耗时并标记超出预算的阶段、解析 python -X importtime 的输出，
+以及学生端、老师端的界面模块和数据模块导入时不加载PIL、pystray、pywin32和WMI
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+import startup_profiler
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_phases_and_budget():
+    """mark按顺序记录各阶段，measure可在后台线程中单独计时，超出预算的阶段在报告中标记"""
+    profiler = startup_profiler.StartupProfiler("student", budgets={"imports": 1000, "window": 1, "background": 1},
+                                                verbose=False)
+    profiler.mark("imports")
+    time.sleep(0.02)
+    profiler.mark("window")
+
+    def background():
+        with profiler.measure("background"):
+            time.sleep(0.02)
+    worker = threading.Thread(target=background)
+    worker.start()
+    worker.join()
+
+    report = profiler.report()
+    assert not report["success"]
+    phases = {row["phase"]: row for row in report["phases"]}
+    assert list(phases) == ["imports", "window", "background"]
+    assert not phases["imports"]["over"] and phases["window"]["over"] and phases["window"]["ms"] >= 20
+    assert phases["window"]["label"] == "创建窗口"
+    # 后台子系统与界面并行，不计入总耗时
+    assert report["total_ms"] == round(phases["imports"]["ms"] + phases["window"]["ms"], 1)
+    assert sorted(profiler.over_budget()) == ["background", "window"]
+    assert "超出预算" in startup_profiler.format_report(report)
+
+    # 同一阶段再次记录时覆盖
+    profiler.mark("window")
+    assert len(profiler.report()["phases"]) == 3
+    print("✓ 按阶段记录启动耗时")
+
+
+def test_parse_importtime():
+    """解析importtime输出中的模块、耗时和嵌套深度"""
+    text = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     _json",
+        "import time:       900 |       1500 |   json.decoder",
+        "import time:      2000 |       3500 | json",
+        "some other output",
+    ])
+    assert startup_profiler.parse_importtime(text) == [
+        ("_json", 120, 120, 2), ("json.decoder", 900, 1500, 1), ("json", 2000, 3500, 0)]
+    print("✓ 解析importtime输出")
+
+
+# 导入较慢或只在Windows上可用的可选库：测试时用空的替身模块代替，导入了就会出现在sys.modules中
+OPTIONAL_MODULES = ("PIL", "pystray", "win32api", "win32con", "win32file", "win32gui", "win32event",
+                    "win32process", "winerror", "winreg", "wmi", "pythoncom")
+
+
+def _imported_optional(stub_dir, path, module):
+    """在子进程中导入module（替身模块优先于已安装的库），返回导入时加载的可选库"""
+    code = (f"import sys; sys.path[:0] = [{stub_dir!r}, {HERE!r}, {path!r}]; import {module}; "
+            f"print(sorted(m for m in sys.modules if m.split('.')[0] in {OPTIONAL_MODULES + ('ctypes',)!r}))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    assert output.returncode == 0, output.stderr
+    return output.stdout.strip().splitlines()[-1]
+
+
+def test_gui_modules_defer_optional_imports():
+    """界面模块和数据模块导入时不加载托盘、图片和Windows专用的库，导入耗时在预算内"""
+    with tempfile.TemporaryDirectory() as stub_dir:
+        for name in OPTIONAL_MODULES:
+            with open(os.path.join(stub_dir, name + ".py"), 'w', encoding='utf-8') as f:
+                f.write("# 测试用的替身模块\n")
+
+        # 替身模块确实会被导入，检查才有意义
+        assert _imported_optional(stub_dir, HERE, "win32gui") == "['win32gui']"
+
+        for module in ("drive_watcher", "data_manager", "student_service"):
+            assert _imported_optional(stub_dir, HERE, module) == "[]", module
+        for app, (directory, module) in startup_profiler.GUI_MODULES.items():
+            assert _imported_optional(stub_dir, os.path.join(HERE, directory), module) == "[]", module
+
+            result = startup_profiler.profile_imports(app)
+            assert result["total_ms"] > 0 and result["modules"], result
+            assert result["modules"][0][1] >= result["modules"][-1][1]
+    print("✓ 界面模块延迟导入可选的库")
+
+if __name__ == "__main__":
+    print("开始测试启动耗时分析...")
+    test_phases_and_budget()
+    test_parse_importtime()
+    test_gui_modules_defer_optional_imports()
+    print("所有测试通过！")
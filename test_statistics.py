@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试增量统计功能
+验证增删改后的统计结果与全量扫描一致，以及按周汇总
+"""
+
+import os
+import tempfile
+from data_manager import DataManager
+
+
+def _scan_subject_stats(dm):
+    """全量扫描计算学科统计，用于对照"""
+    return {subject: len([h for h in dm.get_homeworks() if h["subject"] == subject])
+            for subject in dm.get_subjects()}
+
+
+def test_incremental_statistics():
+    """增删改后统计与全量扫描一致"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "stats.json"))
+        with dm.transaction():
+            for i in range(30):
+                dm.add_homework(["语文", "数学", "英语"][i % 3], f"作业{i}", f"70{i % 5}",
+                                overwrite=False, timestamp=f"2025-03-{1 + i % 14:02d} 08:00:00")
+        first = dm.get_homeworks()[0]
+        dm.delete_homework(first["id"])
+        dm.add_homework("物理", "覆盖前", "701", overwrite=False, timestamp="2025-03-03 09:00:00")
+        dm.add_homework("物理", "覆盖后", "701", timestamp="2025-03-10 09:00:00")
+
+        stats = dm.get_statistics()
+        assert stats["subject_stats"] == _scan_subject_stats(dm)
+        assert stats["total_homeworks"] == len(dm.get_homeworks()) == 30
+        assert sum(stats["class_stats"].values()) == 30
+        assert sum(dm.get_daily_statistics().values()) == 30
+
+        # 重新加载后的统计与增量结果一致
+        assert DataManager(dm.data_file).get_statistics() == stats
+        print("✓ 增量统计与全量扫描一致")
+
+
+def test_weekly_rollup():
+    """按日期范围汇总每周作业数"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "stats.json"))
+        with dm.transaction():
+            dm.add_homework("语文", "a", "701", overwrite=False, timestamp="2025-03-03 08:00:00")
+            dm.add_homework("语文", "b", "701", overwrite=False, timestamp="2025-03-04 08:00:00")
+            dm.add_homework("数学", "c", "701", overwrite=False, timestamp="2025-03-11 08:00:00")
+            dm.add_homework("语文", "d", "702", overwrite=False, timestamp="2025-04-01 08:00:00")
+
+        rollup = dm.get_weekly_rollup("2025-03-01", "2025-03-31")
+        assert rollup == {"701": {"语文": {"2025-W10": 2}, "数学": {"2025-W11": 1}}}, rollup
+        assert dm.get_weekly_rollup(class_name="702") == {"702": {"语文": {"2025-W14": 1}}}
+        print("✓ 按周汇总正确")
+
+
+if __name__ == "__main__":
+    test_incremental_statistics()
+    test_weekly_rollup()
+    print("\n所有统计测试通过")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试学生端后台服务
+验证服务不导入界面相关的库、不打开窗口也能回应老师的作业请求、窗口通过控制连接接入服务、
+控制连接拒绝没有令牌的请求，以及插入设置的U盘时自动备份
+"""
+
+import os
+import sys
+import json
+import socket
+import tempfile
+import threading
+import subprocess
+from communication import TeacherClient, MessageTypes, MessageStructure
+from data_manager import DataManager
+import backup_engine
+import drive_watcher
+import student_service
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _start_service(temp_dir, **kwargs):
+    dm = DataManager(os.path.join(temp_dir, "student_data.json"))
+    service = student_service.StudentService(port=0, service_port=0, host='127.0.0.1', data_manager=dm,
+                                             settings_file=os.path.join(temp_dir, "student_settings.json"),
+                                             **kwargs)
+    result = service.start()
+    assert result["success"], result
+    return service, dm
+
+
+def test_no_gui_imports():
+    """导入服务模块不会加载tkinter、pystray、PIL和WMI"""
+    code = ("import sys, student_service; "
+            "print(sorted(m for m in sys.modules if m.split('.')[0] in "
+            "('tkinter', '_tkinter', 'pystray', 'PIL', 'wmi', 'win32api')))")
+    output = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]", output.stdout
+    print("✓ 后台服务不导入界面相关的库")
+
+
+def test_serve_teacher_and_attach():
+    """服务回应老师的作业请求；窗口接入后能看到老师连接、修改班级，服务按新班级回应"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        service, dm = _start_service(temp_dir, drive_backend=drive_watcher.MockDriveBackend(temp_dir))
+        dm.add_homework("数学", "练习册第3页", "701")
+        dm.add_homework("语文", "背诵古诗", "702")
+        client = student_service.attach(service.service_port, settings_file=service.settings_file)
+        teacher = TeacherClient()
+        try:
+            assert client is not None and client.connected
+            events = []
+            connected = threading.Event()
+
+            def on_event(event):
+                events.append(event)
+                if event["event"] == "teacher_connected":
+                    connected.set()
+            client.add_listener(on_event)
+
+            status = client.request("status")
+            assert status["success"] and status["server_running"] and status["student_class"] == "701", status
+
+            responses = []
+            received = threading.Event()
+
+            def on_homework(message):
+                responses.append(message["homework"])
+                received.set()
+            teacher.register_handler(MessageTypes.HOMEWORK_RESPONSE, on_homework)
+            assert teacher.connect_to_student_server('127.0.0.1', service.server.port, "t1", "王老师")
+            assert connected.wait(5)
+            assert client.request("status")["teachers"] == [["t1", "王老师"]]
+
+            teacher._send_message(MessageStructure.homework_request("全部", "全部"))
+            assert received.wait(5)
+            assert [hw["content"] for hw in responses[-1]["homeworks"]] == ["练习册第3页"]
+
+            assert client.request("set_student", **{"class": "702", "name": "小明"})["success"]
+            received.clear()
+            teacher._send_message(MessageStructure.homework_request("702", "全部"))
+            assert received.wait(5)
+            assert [hw["content"] for hw in responses[-1]["homeworks"]] == ["背诵古诗"]
+            assert responses[-1]["student_name"] == "小明"
+            with open(service.settings_file, 'r', encoding='utf-8') as f:
+                assert json.load(f)["student_class"] == "702"
+
+            assert client.request("unknown")["success"] is False
+            assert client.request("shutdown")["success"]
+            assert service.wait(5)
+        finally:
+            teacher.disconnect()
+            if client:
+                client.close()
+            service.stop()
+
+        # 控制端口被占用（服务已在运行）时不能再启动
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        probe.bind(('127.0.0.1', 0))
+        probe.listen(1)
+        busy_port = probe.getsockname()[1]
+        try:
+            second = student_service.StudentService(port=0, service_port=busy_port, host='127.0.0.1',
+                                                    data_manager=DataManager(os.path.join(temp_dir, "second.json")),
+                                                    settings_file=os.path.join(temp_dir, "second_settings.json"))
+            assert not second.start()["success"]
+        finally:
+            probe.close()
+        # 服务没有运行时窗口不接入
+        assert student_service.attach(busy_port) is None
+        print("✓ 后台服务回应老师并接受窗口接入")
+
+
+def test_control_requires_token():
+    """控制连接只接受带正确令牌的请求，令牌文件只有当前用户能读取，其它人收不到事件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        service, dm = _start_service(temp_dir, drive_backend=drive_watcher.MockDriveBackend(temp_dir))
+        path = student_service.token_path(service.settings_file)
+        try:
+            if os.name == 'posix':
+                assert os.stat(path).st_mode & 0o777 == 0o600
+            token = student_service.read_token(service.settings_file)
+            assert token and student_service.ensure_token(service.settings_file) == token
+
+            # 没有令牌文件时不接入
+            assert student_service.attach(service.service_port,
+                                          settings_file=os.path.join(temp_dir, "other_settings.json")) is None
+
+            # 令牌不正确：请求被拒绝，连接断开，服务状态不变
+            wrong = student_service.ServiceClient(service.service_port, token="0" * 64)
+            assert wrong.connect()
+            reply = wrong.request("set_student", **{"class": "709"})
+            assert not reply["success"] and "令牌" in reply["message"], reply
+            wrong.close()
+            assert service.student_class != "709"
+
+            for message in ({"type": "shutdown", "request_id": 1},
+                            {"type": "shutdown", "request_id": 1, "token": None}):
+                raw = socket.create_connection(('127.0.0.1', service.service_port), timeout=5)
+                try:
+                    raw.sendall(json.dumps(message).encode('utf-8'))
+                    reply = json.loads(raw.recv(65536).decode('utf-8'))
+                    assert not reply["success"] and reply["request_id"] == 1
+                    assert raw.recv(65536) == b""
+                finally:
+                    raw.close()
+            assert not service.wait(0.1)
+
+            # 停止学生服务器同样需要令牌（学生端窗口通过ServiceClient停止）
+            assert service.server.is_running
+            wrong = student_service.ServiceClient(service.service_port, token="0" * 64)
+            assert wrong.connect() and not wrong.request("stop_server")["success"]
+            wrong.close()
+            assert service.server.is_running
+
+            client = student_service.attach(service.service_port, settings_file=service.settings_file)
+            assert client is not None and client.request("status")["success"]
+            assert client.request("stop_server")["success"] and not service.server.is_running
+            client.close()
+        finally:
+            service.stop()
+        print("✓ 控制连接需要令牌")
+
+
+def test_auto_backup_on_insert():
+    """插入设置的U盘时服务自动备份并通知接入的窗口，其它U盘不备份"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = os.path.join(temp_dir, "drives")
+        os.makedirs(root)
+        service, dm = _start_service(temp_dir, drive_backend=drive_watcher.MockDriveBackend(root, interval=0.02))
+        dm.add_homework("数学", "练习", "701")
+        client = student_service.attach(service.service_port, settings_file=service.settings_file)
+        try:
+            backed_up = threading.Event()
+            done = []
+
+            def on_event(event):
+                if event["event"] == "backup_done":
+                    done.append(event)
+                    backed_up.set()
+            client.add_listener(on_event)
+            assert client.request("set_backup_drive", device_id="mock:usb1")["success"]
+
+            os.makedirs(os.path.join(root, "other"))
+            os.makedirs(os.path.join(root, "usb1"))
+            assert backed_up.wait(5)
+            assert done[0]["success"] and done[0]["path"].endswith("usb1")
+            engine = backup_engine.BackupEngine(os.path.join(root, "usb1", backup_engine.BACKUP_DIR_NAME))
+            assert len(engine.backups()) == 1
+            assert not os.path.exists(os.path.join(root, "other", backup_engine.BACKUP_DIR_NAME))
+            with open(service.settings_file, 'r', encoding='utf-8') as f:
+                assert json.load(f)["selected_usb"] == "mock:usb1"
+        finally:
+            client.close()
+            service.stop()
+        print("✓ 插入U盘时自动备份")
+
+
+if __name__ == "__main__":
+    print("开始测试学生端后台服务...")
+    test_no_gui_imports()
+    test_serve_teacher_and_attach()
+    test_control_requires_token()
+    test_auto_backup_on_insert()
+    print("所有测试通过！")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试整数时间戳与按天分桶索引
+验证时间规范化、旧数据迁移、since/until查询以及今日作业
+"""
+
+import os
+import json
+import tempfile
+from datetime import datetime, date, timedelta
+from data_manager import DataManager
+from records import normalize_timestamp, to_epoch
+
+
+def test_normalize_timestamp():
+    """各种时间写法统一为Unix时间戳和显示字符串"""
+    ts, display = normalize_timestamp("2025-03-01T08:30:00.123456")
+    assert display == "2025-03-01 08:30:00" and ts == to_epoch("2025-03-01 08:30:00")
+    assert normalize_timestamp(ts) == (ts, display)
+    assert normalize_timestamp(datetime(2025, 3, 1, 8, 30)) == (ts, display)
+    assert normalize_timestamp("2025/03/01")[1] == "2025-03-01 00:00:00"
+    assert normalize_timestamp("刚刚", now=ts) == (ts, display)
+    print("✓ 时间规范化")
+
+
+def test_migrate_legacy_timestamps():
+    """旧数据的字符串时间迁移为整数时间戳，无法解析的按当前时间"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_file = os.path.join(temp_dir, "legacy.json")
+        legacy = {
+            "homeworks": [
+                {"id": 1, "subject": "语文", "content": "a", "class": "701", "timestamp": "2025-03-02 08:00:00"},
+                {"id": 2, "subject": "数学", "content": "b", "class": "701", "timestamp": "刚刚"},
+                {"id": 3, "subject": "英语", "content": "c", "class": "701", "timestamp": "2025-03-10T09:00:00"},
+            ],
+            "messages": [],
+            "classes": ["701"],
+            "subjects": ["语文", "数学", "英语"],
+        }
+        with open(data_file, 'w', encoding='utf-8') as f:
+            json.dump(legacy, f, ensure_ascii=False)
+
+        before = int(datetime.now().timestamp())
+        dm = DataManager(data_file)
+        homeworks = dm.get_homeworks()
+        assert [h["id"] for h in homeworks] == [2, 3, 1]
+        assert homeworks[0]["ts"] >= before
+        assert homeworks[1]["timestamp"] == "2025-03-10 09:00:00"
+
+        with open(data_file, 'r', encoding='utf-8') as f:
+            saved = json.load(f)["homeworks"]
+        assert all(isinstance(h["ts"], int) for h in saved)
+        print("✓ 旧数据时间已迁移")
+
+
+def test_range_queries_and_today():
+    """按日期、精确时间查询，今日作业来自当天的分桶"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "ts.json"))
+        with dm.transaction():
+            for day in range(1, 11):
+                dm.add_homework("数学", f"3月{day}日", "701", overwrite=False,
+                                timestamp=f"2025-03-{day:02d} 18:00:00")
+            dm.add_homework("语文", "今天的作业", "701", overwrite=False)
+            dm.add_homework("英语", "昨天的作业", "702", overwrite=False,
+                            timestamp=datetime.now() - timedelta(days=1))
+
+        assert [h["content"] for h in dm.get_homeworks(since="2025-03-03", until="2025-03-05")] == \
+            ["3月5日", "3月4日", "3月3日"]
+        assert [h["content"] for h in dm.get_homeworks(since=datetime(2025, 3, 9, 19, 0))][-1] == "3月10日"
+        assert len(dm.get_homeworks(until=date(2025, 3, 2))) == 2
+
+        assert [h["content"] for h in dm.get_today_homeworks()] == ["今天的作业"]
+        assert dm.get_today_homeworks("702") == []
+
+        # 覆盖、删除后分桶同步更新
+        dm.add_homework("语文", "改到3月1日", "701", timestamp="2025-03-01 07:00:00")
+        assert dm.get_today_homeworks() == []
+        assert [h["content"] for h in dm.get_homeworks(since="2025-03-01", until="2025-03-01")] == \
+            ["3月1日", "改到3月1日"]
+        first = dm.get_homeworks(until="2025-03-01")[-1]
+        dm.delete_homework(first["id"])
+        assert len(dm.get_homeworks(until="2025-03-01")) == 1
+        print("✓ 日期范围查询与今日作业")
+
+
+if __name__ == "__main__":
+    test_normalize_timestamp()
+    test_migrate_legacy_timestamps()
+    test_range_queries_and_today()
+    print("\n所有时间戳测试通过")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试DataManager批量事务功能
+验证事务内多次修改只写一次文件，异常或写入失败时回滚，以及事务只复制修改过的记录
+"""
+
+import os
+import tempfile
+from data_manager import DataManager
+
+
+def _new_manager(temp_dir):
+    """在临时目录中创建数据管理器"""
+    return DataManager(os.path.join(temp_dir, "transaction_data.json"))
+
+
+def test_single_write():
+    """事务内的多次修改只写一次文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _new_manager(temp_dir)
+        write_count = {"count": 0}
+        original_write = dm._write_data
+
+        def counting_write():
+            write_count["count"] += 1
+            return original_write()
+
+        dm._write_data = counting_write
+
+        with dm.transaction():
+            for i in range(1000):
+                dm.add_homework("数学", f"习题{i}", f"{700 + i % 10}", overwrite=False)
+            dm.add_message("老师好", "小明", "701")
+            dm.add_class("711")
+
+        assert write_count["count"] == 1, f"期望写入1次，实际 {write_count['count']} 次"
+        assert len(DataManager(dm.data_file).get_homeworks()) == 1000
+        print("✓ 1000次插入只写入一次文件")
+
+
+def test_rollback():
+    """事务内抛出异常时回滚"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _new_manager(temp_dir)
+        dm.add_homework("语文", "背诵课文", "701")
+
+        try:
+            with dm.transaction():
+                dm.add_homework("数学", "习题1-10", "701", overwrite=False)
+                dm.add_homework("语文", "覆盖内容", "701")
+                raise RuntimeError("模拟失败")
+        except RuntimeError:
+            pass
+
+        homeworks = dm.get_homeworks()
+        assert len(homeworks) == 1
+        assert homeworks[0]["content"] == "背诵课文"
+        assert DataManager(dm.data_file).get_homeworks()[0]["content"] == "背诵课文"
+        print("✓ 异常时内存与文件都已回滚")
+
+
+def test_validation():
+    """提交前校验数据，非法数据回滚"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _new_manager(temp_dir)
+        try:
+            with dm.transaction():
+                dm.add_homework("数学", "习题", "701")
+                dm.data["homeworks"].append({"subject": "缺少字段"})
+            assert False, "非法数据应当校验失败"
+        except ValueError:
+            pass
+        assert dm.get_homeworks() == []
+        print("✓ 非法数据校验失败并回滚")
+
+
+def test_clear_all_data_keeps_password():
+    """清空数据保留密码且只写一次文件"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _new_manager(temp_dir)
+        dm.set_password("abc123456")
+        dm.add_homework("数学", "习题", "701")
+        dm.clear_all_data()
+        assert dm.get_homeworks() == []
+        assert dm.verify_password("abc123456")
+        assert DataManager(dm.data_file).verify_password("abc123456")
+        print("✓ 清空数据后密码保持不变")
+
+
+def test_failed_write_rolls_back():
+    """提交时写入文件失败：内存数据回滚，异常抛给调用方"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _new_manager(temp_dir)
+        kept = dm.add_homework("语文", "背诵课文", "701")
+        dm._write_data = lambda: False
+        try:
+            with dm.transaction():
+                dm.add_homework("数学", "习题", "701", overwrite=False)
+                dm.update_homework(kept["id"], content="已修改")
+                dm.add_class("799")
+            assert False, "写入失败应当抛出异常"
+        except OSError:
+            pass
+        assert [hw["content"] for hw in dm.get_homeworks()] == ["背诵课文"]
+        assert "799" not in dm.get_classes()
+        assert dm.data["id_sequences"]["homeworks"] == 1
+        print("✓ 写入失败时回滚并抛出异常")
+
+
+def test_undo_log_only_copies_changes():
+    """事务不复制全部数据：只保存修改过的记录；延迟加载模式下只修改全局字段时不读入记录"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = _new_manager(temp_dir)
+        with dm.transaction():
+            for i in range(500):
+                dm.add_homework("数学", f"习题{i}", "701", overwrite=False)
+
+        def no_full_copy():
+            raise AssertionError("事务不应复制全部数据")
+        dm._copy_data = no_full_copy
+        try:
+            with dm.transaction():
+                dm.delete_homework(1)
+                dm.update_homework(2, content="订正")
+                raise RuntimeError("回滚")
+        except RuntimeError:
+            pass
+        assert len(dm.get_homeworks()) == 500 and dm.get_homework(2)["content"] == "习题1"
+
+        DataManager(dm.data_file, lazy=True)  # 首次启动生成记录文件
+        lazy = DataManager(dm.data_file, lazy=True)
+        assert lazy._lazy_store is not None
+        with lazy.transaction():
+            lazy.add_class("712")
+        assert lazy._lazy_store is not None and "712" in DataManager(dm.data_file).get_classes()
+        print("✓ 事务只保存修改过的记录")
+
+
+if __name__ == "__main__":
+    test_single_write()
+    test_rollback()
+    test_validation()
+    test_clear_all_data_keeps_password()
+    test_failed_write_rolls_back()
+    test_undo_log_only_copies_changes()
+    print("\n所有事务测试通过")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多个U盘并行恢复
+验证与现有数据相同的文件被跳过、多个U盘内容不同时以最新的为准，以及带时间戳的副本与当前数据文件内容一致
+"""
+
+import os
+import json
+import time
+import tempfile
+from data_manager import DataManager
+import usb_restore
+
+
+def _write(path, data, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_restore_from_several_drives():
+    """相同内容只复制一次，最新的一份成为当前数据文件，其余保存为带时间戳的副本"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target_dir = os.path.join(temp_dir, "data")
+        drives = [os.path.join(temp_dir, f"usb{i}") for i in range(3)]
+        now = time.time()
+        _write(os.path.join(target_dir, "demo_data.json"), {"v": "现有"})
+        _write(os.path.join(drives[0], "demo_data.json"), {"v": "现有"}, now)
+        _write(os.path.join(drives[0], "student_data.json"), {"v": "旧"}, now - 3600)
+        _write(os.path.join(drives[1], "student_data.json"), {"v": "新"}, now)
+        _write(os.path.join(drives[2], "student_data.json"), {"v": "新"}, now - 60)
+
+        result = usb_restore.restore_from_drives(drives, target_dir)
+        copied = {item["from"]: item for item in result["backed_up_files"]}
+        assert sorted(copied) == sorted([os.path.join(drives[0], "student_data.json"),
+                                         os.path.join(drives[1], "student_data.json")])
+        reasons = {item["from"]: item["reason"] for item in result["skipped_files"]}
+        assert "相同" in reasons[os.path.join(drives[0], "demo_data.json")]
+        assert os.path.join(drives[2], "student_data.json") in reasons
+
+        assert _read(os.path.join(target_dir, "student_data.json")) == {"v": "新"}
+        newest = copied[os.path.join(drives[1], "student_data.json")]
+        assert newest["to"] == os.path.join(target_dir, "student_data.json")
+        assert newest["link"] in ("reflink", "hardlink", "copy") and newest["bytes"] > 0
+        assert _read(newest["backup"]) == {"v": "新"}
+        assert _read(copied[os.path.join(drives[0], "student_data.json")]["backup"]) == {"v": "旧"}
+        assert len({item["backup"] for item in copied.values()}) == 2
+
+        # 再次插入同样的U盘：全部跳过
+        again = usb_restore.restore_from_drives(drives, target_dir)
+        assert again["backed_up_files"] == [] and len(again["skipped_files"]) == 4
+        print("✓ 多个U盘并行恢复")
+
+
+def test_backup_from_usb_reports_skips():
+    """DataManager.backup_from_usb 使用并行恢复，内容相同时报告无需备份"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        dm = DataManager(os.path.join(temp_dir, "dm.json"))
+        dm.base_data_dir = os.path.join(temp_dir, "data")
+        drive = os.path.join(temp_dir, "usb")
+        _write(os.path.join(drive, "data.json"), {"homeworks": []})
+        dm.get_usb_drives = lambda: [drive]
+
+        first = dm.backup_from_usb()
+        assert first["success"] and len(first["backed_up_files"]) == 1
+        assert first["backed_up_files"][0]["throughput"] >= 0
+        second = dm.backup_from_usb()
+        assert second["success"] and second["backed_up_files"] == [] and "无需备份" in second["message"]
+        print("✓ 内容相同的文件不再复制")
+
+
+if __name__ == "__main__":
+    print("开始测试U盘并行恢复...")
+    test_restore_from_several_drives()
+    test_backup_from_usb_reports_skips()
+    print("所有测试通过！")
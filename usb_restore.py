@@ -0,0 +1,193 @@
+"""
+U盘数据恢复模块
+从一个或多个U盘上的数据文件恢复到程序的数据目录：
+1. 并行扫描各个U盘，计算候选文件的SHA-256，与数据目录中现有文件内容相同的直接跳过
+2. 同名文件在多个U盘上内容不同时，修改时间最新的一份作为当前数据文件，其余的只保存带时间戳的副本
+   （按备份索引查找，已经保存过相同内容的副本时跳过，见 backup_retention.BackupIndex）
+3. 使用线程池同时从多个U盘复制（先写临时文件再替换，不会留下复制到一半的数据文件）
+4. 带时间戳的副本尽量用reflink（写时复制）或硬链接代替再复制一次
+
+数据文件总是整体替换（先写临时文件再os.replace），不会原地修改，所以硬链接的副本不会随之变化。
+"""
+
+import os
+import time
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List
+
+from backup_engine import hash_file, COPY_BUFFER_SIZE
+from backup_retention import BackupIndex
+
+# 在U盘根目录查找的数据文件名
+DATA_FILE_NAMES = ["data.json", "student_data.json", "teacher_data.json", "demo_data.json"]
+
+# 同时复制的最大线程数
+DEFAULT_RESTORE_WORKERS = 4
+
+# Linux上创建reflink的ioctl请求号
+FICLONE = 0x40049409
+
+# 可选：Linux上通过ioctl创建reflink
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def clone_file(source: str, target: str) -> str:
+    """创建source的副本target，依次尝试reflink、硬链接、复制，返回使用的方式"""
+    if fcntl is not None:
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            if os.path.exists(target):
+                os.remove(target)
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError:
+        shutil.copy2(source, target)
+        return "copy"
+
+
+def _scan_drive(drive: str, file_names: List[str]) -> List[Dict[str, Any]]:
+    """列出U盘上的候选数据文件并计算哈希"""
+    candidates = []
+    for file_name in file_names:
+        path = os.path.join(drive, file_name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            stat = os.stat(path)
+            candidates.append({"drive": drive, "file": file_name, "path": path, "size": stat.st_size,
+                               "mtime": stat.st_mtime, "sha256": hash_file(path)})
+        except OSError as e:
+            print(f"读取U盘文件 {path} 时出错: {e}")
+    return candidates
+
+
+def _copy(source: str, target: str) -> int:
+    """复制到target（先写临时文件再替换），返回复制的字节数"""
+    temp_file = target + ".tmp"
+    copied = 0
+    try:
+        with open(source, 'rb') as src, open(temp_file, 'wb') as dst:
+            for block in iter(lambda: src.read(COPY_BUFFER_SIZE), b""):
+                dst.write(block)
+                copied += len(block)
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copystat(source, temp_file)
+        os.replace(temp_file, target)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return copied
+
+
+def restore_from_drives(drives: List[str], target_dir: str, file_names: List[str] = None,
+                        workers: int = DEFAULT_RESTORE_WORKERS, index: BackupIndex = None) -> Dict[str, Any]:
+    """从多个U盘并行恢复数据文件到target_dir，新的带时间戳副本登记到备份索引
+
+    Returns:
+        Dict[str, Any]: {"backed_up_files": [{"file", "from", "to", "backup", "bytes", "seconds",
+        "throughput", "link"}], "skipped_files": [{"file", "from", "reason"}]}
+    """
+    file_names = file_names or DATA_FILE_NAMES
+    index = index or BackupIndex(target_dir)
+    workers = max(1, min(workers, len(drives) or 1))
+    result = {"backed_up_files": [], "skipped_files": []}
+
+    # 1. 并行扫描各U盘并计算哈希
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scanned = list(executor.map(lambda drive: _scan_drive(drive, file_names), drives))
+
+    # 2. 按文件名分组，跳过与数据目录中现有内容相同或重复的候选
+    tasks = []
+    for file_name in file_names:
+        candidates = [candidate for drive_candidates in scanned for candidate in drive_candidates
+                      if candidate["file"] == file_name]
+        if not candidates:
+            continue
+        target_path = os.path.join(target_dir, file_name)
+        current_hash = None
+        if os.path.exists(target_path) and any(c["size"] == os.path.getsize(target_path) for c in candidates):
+            current_hash = hash_file(target_path)
+
+        distinct = {}
+        for candidate in sorted(candidates, key=lambda c: c["mtime"], reverse=True):
+            if candidate["sha256"] == current_hash:
+                result["skipped_files"].append({"file": file_name, "from": candidate["path"],
+                                                "reason": "与数据目录中的文件相同"})
+            elif candidate["sha256"] in distinct:
+                result["skipped_files"].append({"file": file_name, "from": candidate["path"],
+                                                "reason": f"与 {distinct[candidate['sha256']]['path']} 相同"})
+            else:
+                distinct[candidate["sha256"]] = candidate
+
+        newest = max(candidates, key=lambda c: c["mtime"])
+        stem = os.path.splitext(file_name)[0]
+        for candidate in list(distinct.values()):
+            # 较旧的内容之前已经保存过副本
+            saved = (None if candidate["sha256"] == newest["sha256"]
+                     else index.find(stem, candidate["size"], candidate["sha256"]))
+            if saved is not None:
+                result["skipped_files"].append({"file": file_name, "from": candidate["path"],
+                                                "reason": f"已有副本 {saved}"})
+                del distinct[candidate["sha256"]]
+
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        for number, candidate in enumerate(distinct.values()):
+            suffix = f"_{number + 1}" if len(distinct) > 1 else ""
+            tasks.append({
+                "candidate": candidate,
+                "live": target_path if candidate["sha256"] == newest["sha256"] else None,
+                "backup": os.path.join(target_dir, f"{stem}_{timestamp}{suffix}.json"),
+                "stem": stem,
+                "created": now.timestamp()
+            })
+
+    # 3. 并行复制
+    def run(task):
+        candidate = task["candidate"]
+        start = time.perf_counter()
+        try:
+            if task["live"] is not None:
+                copied = _copy(candidate["path"], task["live"])
+                link = clone_file(task["live"], task["backup"])
+            else:
+                copied = _copy(candidate["path"], task["backup"])
+                link = None
+        except Exception as e:
+            print(f"备份文件 {candidate['path']} 时出错: {e}")
+            return None
+        seconds = time.perf_counter() - start
+        return {
+            "file": candidate["file"],
+            "from": candidate["path"],
+            "to": task["live"] or task["backup"],
+            "backup": task["backup"],
+            "bytes": copied,
+            "seconds": seconds,
+            "throughput": copied / seconds if seconds > 0 else 0.0,
+            "link": link
+        }
+
+    os.makedirs(target_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for task, copied in zip(tasks, executor.map(run, tasks)):
+            if copied is not None:
+                candidate = task["candidate"]
+                index.add(task["stem"], os.path.basename(task["backup"]), task["created"], candidate["size"],
+                          candidate["sha256"])
+                result["backed_up_files"].append(copied)
+                print(f"从 {copied['from']} 复制 {copied['bytes'] / 1024:.1f}KB 到 {copied['to']}，"
+                      f"{copied['throughput'] / 1024 / 1024:.1f}MB/s")
+    if result["backed_up_files"]:
+        index.save()
+    return result